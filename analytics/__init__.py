@@ -0,0 +1,8 @@
+# analytics - 看板计算包（不依赖streamlit，返回DataFrame和字典）
+#
+# sales / product / customer / inventory / ml_prediction：各看板的数据加载与指标计算
+# diagnostics：预测库存分析的系统验证（后台运行，结论按数据版本缓存）
+# store：预计算结果存储（data/aggregates/）
+# model_registry：机器学习预测的模型注册表（data/models/）
+# dashboards：看板注册表、版本号和读取入口
+# precompute：预计算命令行入口（python -m analytics.precompute）
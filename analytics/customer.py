@@ -0,0 +1,579 @@
+# analytics/customer.py - 客户依赖分析计算模块
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from data_registry import PAGE_DATASETS, dataset_registry
+from perf_monitor import perf_monitor
+
+logger = logging.getLogger(__name__)
+
+# 本看板使用的数据集
+CUSTOMER_DATASETS = PAGE_DATASETS['客户依赖分析']
+
+
+@perf_monitor.profile()
+def load_customer_data(registry=dataset_registry, current_year: int = None, as_of: date = None):
+    """加载并处理客户数据，返回 (metrics, customer_status, sales_data, monthly_data)
+
+    as_of为分析基准日期（默认当天），年度进度和客户分层以它为准；回放历史日期时，晚于基准日期的订单不参与计算。
+    """
+    # 并行获取本看板的三个工作簿（需要解析时在进程池中同时解析）
+    frames = registry.get_many(CUSTOMER_DATASETS)
+
+    customer_status = frames['customer_status']
+    customer_status.columns = ['客户名称', '状态']
+
+    sales_data = frames['customer_sales']
+    sales_data.columns = ['订单日期', '发运月份', '经销商名称', '金额']
+
+    logger.debug(f"原始销售数据 {len(sales_data)} 行，发运月份类型 {sales_data['发运月份'].dtype}，"
+                 f"金额类型 {sales_data['金额'].dtype}")
+
+    # 处理金额字段 - 更严格的清理
+    # 先转换为字符串，移除所有可能的分隔符
+    sales_data['金额_原始'] = sales_data['金额'].copy()  # 保存原始值用于调试
+    sales_data['金额'] = sales_data['金额'].astype(str).str.replace(',', '').str.replace('，', '').str.replace(' ', '')
+
+    # 转换为数值类型
+    sales_data['金额'] = pd.to_numeric(sales_data['金额'], errors='coerce')
+    logger.debug(f"金额转换后的空值数量: {sales_data['金额'].isna().sum()}")
+
+    # 填充空值为0
+    sales_data['金额'] = sales_data['金额'].fillna(0)
+
+    # 处理日期字段
+    sales_data['订单日期'] = pd.to_datetime(sales_data['订单日期'], errors='coerce')
+    sales_data['发运月份'] = pd.to_datetime(sales_data['发运月份'], errors='coerce')
+    logger.debug(f"发运月份范围: {sales_data['发运月份'].min()} 到 {sales_data['发运月份'].max()}，"
+                 f"空值 {sales_data['发运月份'].isna().sum()} 个")
+
+    sales_data['发运年份'] = sales_data['发运月份'].dt.year
+
+    # 分析基准日期：只保留基准日期当天及之前的订单
+    as_of = as_of or datetime.now().date()
+    cutoff = pd.Timestamp(as_of + timedelta(days=1))
+    if (sales_data['订单日期'] >= cutoff).any():
+        sales_data = sales_data[sales_data['订单日期'] < cutoff]
+
+    monthly_data = frames['customer_targets']
+    monthly_data.columns = ['客户', '月度指标', '月份', '往年同期', '所属大区']
+
+    if current_year is None:
+        current_year = as_of.year
+
+    metrics = calculate_metrics(customer_status, sales_data, monthly_data, current_year, as_of)
+
+    return metrics, customer_status, sales_data, monthly_data
+
+
+@perf_monitor.profile()
+def calculate_metrics(customer_status, sales_data, monthly_data, current_year, as_of: date = None):
+    """计算业务指标 - 彻底修复目标达成率计算逻辑（as_of为计算年度进度和客户分层的基准日期，默认当天）"""
+
+    logger.debug(f"=== calculate_metrics 调试信息 ===")
+    logger.debug(f"输入参数 - current_year: {current_year}")
+    logger.debug(f"销售数据总记录数: {len(sales_data)}")
+
+    # 基础客户指标
+    total_customers = len(customer_status)
+    normal_customers = len(customer_status[customer_status['状态'] == '正常'])
+    closed_customers = len(customer_status[customer_status['状态'] == '闭户'])
+    normal_rate = (normal_customers / total_customers * 100) if total_customers > 0 else 0
+
+    # 按发运月份筛选当前年度销售数据
+    logger.debug(f"=== 筛选当前年度数据 ===")
+
+    # 确保发运月份是datetime类型
+    if sales_data['发运月份'].dtype != 'datetime64[ns]':
+        sales_data['发运月份'] = pd.to_datetime(sales_data['发运月份'], errors='coerce')
+
+    # 移除发运月份为空的行
+    sales_data_clean = sales_data.dropna(subset=['发运月份']).copy()
+    logger.debug(f"清理后数据行数: {len(sales_data_clean)}")
+
+    # 按发运月份筛选当前年度销售数据
+    current_year_sales = sales_data_clean[sales_data_clean['发运月份'].dt.year == current_year].copy()
+    logger.debug(f"{current_year}年发运销售记录数: {len(current_year_sales)}")
+
+    if len(current_year_sales) == 0:
+        logger.debug(f"警告：{current_year}年没有发运数据")
+        all_years = sales_data_clean['发运月份'].dt.year.unique()
+        logger.debug(f"数据中包含的年份: {sorted(all_years)}")
+
+        if len(all_years) > 0:
+            latest_year = max(all_years)
+            logger.debug(f"使用最新年份 {latest_year} 的数据")
+            current_year_sales = sales_data_clean[sales_data_clean['发运月份'].dt.year == latest_year].copy()
+            current_year = latest_year
+
+    # 确保金额字段正确处理
+    if '金额' in current_year_sales.columns:
+        current_year_sales['金额'] = pd.to_numeric(
+            current_year_sales['金额'].astype(str).str.replace(',', '').str.replace('，', ''),
+            errors='coerce'
+        ).fillna(0)
+
+    total_sales = current_year_sales['金额'].sum()
+    logger.debug(f"按发运月份计算的{current_year}年总销售额: {total_sales:,.0f}")
+
+    # 同比增长
+    last_year_total = monthly_data['往年同期'].sum() if '往年同期' in monthly_data.columns else 0
+    growth_rate = ((total_sales - last_year_total) / last_year_total * 100) if last_year_total > 0 else 0
+
+    # 计算时间进度（仅用于显示）
+    current_date = as_of or datetime.now().date()
+    year_start = date(current_year, 1, 1)
+    year_end = date(current_year, 12, 31)
+    total_days_in_year = (year_end - year_start).days + 1
+    days_passed = (current_date - year_start).days + 1
+    time_progress = min(days_passed / total_days_in_year, 1.0)
+
+    logger.debug(f"年度进度: {days_passed}/{total_days_in_year}天 ({time_progress * 100:.1f}%)")
+
+    # ===== 关键修复：目标达成分析 - 严格按年度目标计算 =====
+    target_growth_factor = 1.1
+    customer_region_map = monthly_data[
+        ['客户', '所属大区']].drop_duplicates() if '所属大区' in monthly_data.columns else pd.DataFrame()
+    customer_actual_sales = current_year_sales.groupby('经销商名称', observed=True)['金额'].sum()
+
+    # 计算年度目标
+    customer_annual_targets = {}
+    total_historical_target = monthly_data['月度指标'].sum() if '月度指标' in monthly_data.columns else 0
+
+    for customer in customer_actual_sales.index:
+        historical_sales = 0
+        if '往年同期' in monthly_data.columns:
+            historical_sales = monthly_data[monthly_data['客户'] == customer]['往年同期'].sum()
+
+        if historical_sales > 0:
+            estimated_annual_target = historical_sales * target_growth_factor
+        else:
+            avg_target = total_historical_target / len(monthly_data['客户'].unique()) if len(
+                monthly_data['客户'].unique()) > 0 else 500000
+            estimated_annual_target = avg_target * target_growth_factor
+
+        customer_annual_targets[customer] = estimated_annual_target
+
+    # ===== 彻底修复：目标达成分析 - 严格按年度目标计算，不考虑时间进度 =====
+    achieved_customers = 0
+    total_target_customers = len(customer_annual_targets)
+    customer_achievement_details = []
+
+    logger.debug(f"=== 目标达成分析（严格按年度目标）===")
+    logger.debug(f"需要评估的客户数: {total_target_customers}")
+
+    for customer, annual_target in customer_annual_targets.items():
+        actual_sales = customer_actual_sales.get(customer, 0)
+
+        if annual_target > 0:
+            # 关键修复：严格按年度目标计算达成率，完全不考虑时间进度
+            achievement_rate = (actual_sales / annual_target * 100)
+
+            # 达成标准：实际销售额达到年度目标的80%即视为达成
+            is_achieved = actual_sales >= (annual_target * 0.8)
+            if is_achieved:
+                achieved_customers += 1
+
+            # 关键修复：确保存储的是基于年度目标的正确达成率
+            customer_achievement_details.append({
+                '客户': customer,
+                '年度目标': annual_target,  # 存储年度目标
+                '实际': actual_sales,  # 存储实际销售额
+                '达成率': achievement_rate,  # 关键：这里存储的是基于年度目标的达成率
+                '状态': '达成' if is_achieved else '未达成',
+                '时间进度': time_progress * 100  # 仅用于显示，不影响计算
+            })
+
+    target_achievement_rate = (achieved_customers / total_target_customers * 100) if total_target_customers > 0 else 0
+
+    logger.debug(f"目标达成客户数: {achieved_customers}/{total_target_customers}")
+    logger.debug(f"目标达成率: {target_achievement_rate:.1f}%")
+
+    # 验证达成率计算
+    if customer_achievement_details:
+        logger.debug(f"=== 验证达成率计算 ===")
+        for i in range(min(3, len(customer_achievement_details))):
+            detail = customer_achievement_details[i]
+            manual_rate = (detail['实际'] / detail['年度目标'] * 100)
+            logger.debug(f"客户: {detail['客户']}")
+            logger.debug(f"  年度目标: {detail['年度目标']:,.0f}")
+            logger.debug(f"  实际销售: {detail['实际']:,.0f}")
+            logger.debug(f"  存储达成率: {detail['达成率']:.1f}%")
+            logger.debug(f"  手工计算: {manual_rate:.1f}%")
+            logger.debug(f"  计算正确: {abs(detail['达成率'] - manual_rate) < 0.01}")
+
+    # 区域风险分析
+    sales_with_region = pd.DataFrame()
+    if not customer_region_map.empty:
+        sales_with_region = current_year_sales.merge(
+            customer_region_map, left_on='经销商名称', right_on='客户', how='left'
+        )
+
+    region_details = []
+    max_dependency = 0
+    max_dependency_region = ""
+
+    if not sales_with_region.empty and '所属大区' in sales_with_region.columns:
+        for region, group in sales_with_region.groupby('所属大区'):
+            if pd.notna(region):
+                customer_sales = group.groupby('经销商名称', observed=True)['金额'].sum().sort_values(ascending=False)
+                if len(customer_sales) > 0:
+                    max_customer_sales = customer_sales.max()
+                    total_region_sales = customer_sales.sum()
+                    dependency = (max_customer_sales / total_region_sales * 100) if total_region_sales > 0 else 0
+
+                    if dependency > max_dependency:
+                        max_dependency = dependency
+                        max_dependency_region = region
+
+                    region_details.append({
+                        '区域': region,
+                        '总销售额': total_region_sales,
+                        '客户数': len(customer_sales),
+                        '最大客户依赖度': dependency,
+                        '最大客户': customer_sales.index[0] if len(customer_sales) > 0 else '',
+                        '最大客户销售额': max_customer_sales
+                    })
+
+    region_stats = pd.DataFrame(region_details) if region_details else pd.DataFrame()
+
+    # RFM客户分析
+    current_date_dt = pd.Timestamp(current_date)
+    customer_rfm = []
+
+    for customer in customer_actual_sales.index:
+        customer_orders = current_year_sales[current_year_sales['经销商名称'] == customer]
+        if len(customer_orders) > 0:
+            last_order_date = customer_orders['发运月份'].max()
+            recency = (current_date_dt - last_order_date).days
+            frequency = len(customer_orders)
+            monetary = customer_orders['金额'].sum()
+
+            if recency <= 30 and frequency >= 12 and monetary >= 1000000:
+                customer_type = '钻石客户'
+            elif recency <= 60 and frequency >= 8 and monetary >= 500000:
+                customer_type = '黄金客户'
+            elif recency <= 90 and frequency >= 6 and monetary >= 200000:
+                customer_type = '白银客户'
+            elif recency > 180 or frequency < 3:
+                customer_type = '流失风险'
+            else:
+                customer_type = '潜力客户'
+
+            customer_rfm.append({
+                '客户': customer, 'R': recency, 'F': frequency, 'M': monetary,
+                '类型': customer_type, '最近购买': last_order_date.strftime('%Y-%m-%d')
+            })
+
+    rfm_df = pd.DataFrame(customer_rfm) if customer_rfm else pd.DataFrame()
+
+    # 客户类型统计
+    if not rfm_df.empty:
+        customer_type_counts = rfm_df['类型'].value_counts()
+        diamond_customers = customer_type_counts.get('钻石客户', 0)
+        gold_customers = customer_type_counts.get('黄金客户', 0)
+        silver_customers = customer_type_counts.get('白银客户', 0)
+        risk_customers = customer_type_counts.get('流失风险', 0)
+        potential_customers = customer_type_counts.get('潜力客户', 0)
+    else:
+        diamond_customers = gold_customers = silver_customers = risk_customers = potential_customers = 0
+
+    high_value_rate = ((diamond_customers + gold_customers) / normal_customers * 100) if normal_customers > 0 else 0
+
+    # 客户集中度
+    concentration_rate = 0
+    if len(customer_actual_sales) > 0:
+        sorted_sales = customer_actual_sales.sort_values(ascending=False)
+        top20_count = max(1, int(len(sorted_sales) * 0.2))
+        top20_sales = sorted_sales.head(top20_count).sum()
+        concentration_rate = (top20_sales / total_sales * 100) if total_sales > 0 else 0
+
+    logger.debug(f"=== 最终计算结果 ===")
+    logger.debug(f"总销售额: {total_sales:,.0f}")
+    logger.debug(f"正常客户数: {normal_customers}")
+    logger.debug(f"目标达成率: {target_achievement_rate:.1f}%")
+
+    return {
+        'total_sales': total_sales, 'normal_customers': normal_customers, 'closed_customers': closed_customers,
+        'normal_rate': normal_rate, 'growth_rate': growth_rate,
+        'region_stats': region_stats, 'max_dependency': max_dependency, 'max_dependency_region': max_dependency_region,
+        'target_achievement_rate': target_achievement_rate, 'achieved_customers': achieved_customers,
+        'total_target_customers': total_target_customers,
+        'diamond_customers': diamond_customers, 'gold_customers': gold_customers, 'silver_customers': silver_customers,
+        'potential_customers': potential_customers, 'risk_customers': risk_customers,
+        'high_value_rate': high_value_rate,
+        'current_year': current_year, 'rfm_df': rfm_df, 'concentration_rate': concentration_rate,
+        'customer_achievement_details': pd.DataFrame(
+            customer_achievement_details) if customer_achievement_details else pd.DataFrame(),
+        'sales_with_region': sales_with_region,
+        'total_customers': total_customers,
+        'time_progress': time_progress * 100,
+        'days_passed': days_passed,
+        'total_days_in_year': total_days_in_year,
+        'target_calculation_method': '严格按年度目标计算，不考虑时间进度'
+    }
+
+
+def format_amount(amount):
+    """格式化金额"""
+    if amount >= 100000000:
+        return f"¥{amount / 100000000:.1f}亿"
+    elif amount >= 10000:
+        return f"¥{amount / 10000:.0f}万"
+    else:
+        return f"¥{amount:,.0f}"
+
+
+@perf_monitor.profile()
+def calculate_customer_cycles(sales_data, current_year):
+    """计算客户下单周期和异常行为"""
+    # 获取最近12个月的数据
+    end_date = sales_data['订单日期'].max()
+    start_date = end_date - timedelta(days=365)
+    recent_data = sales_data[sales_data['订单日期'] >= start_date].copy()
+
+    # 计算每个客户的订单间隔
+    customer_cycles = []
+
+    for customer in recent_data['经销商名称'].unique():
+        customer_orders = recent_data[recent_data['经销商名称'] == customer].sort_values('订单日期')
+
+        if len(customer_orders) < 2:
+            continue
+
+        # 计算订单间隔
+        order_dates = customer_orders['订单日期'].tolist()
+        intervals = []
+        order_details = []
+
+        for i in range(1, len(order_dates)):
+            interval = (order_dates[i] - order_dates[i - 1]).days
+            intervals.append(interval)
+
+            order_details.append({
+                '日期': order_dates[i - 1],
+                '下一单日期': order_dates[i],
+                '间隔天数': interval,
+                '金额': customer_orders.iloc[i - 1]['金额']
+            })
+
+        # 添加最后一个订单
+        last_order = customer_orders.iloc[-1]
+        days_since_last = (end_date - order_dates[-1]).days
+        order_details.append({
+            '日期': order_dates[-1],
+            '下一单日期': None,
+            '间隔天数': days_since_last,
+            '金额': last_order['金额'],
+            '距今天数': days_since_last
+        })
+
+        if intervals:
+            avg_interval = np.mean(intervals)
+            std_interval = np.std(intervals) if len(intervals) > 1 else 0
+
+            # 预测下次订单时间
+            predicted_date = order_dates[-1] + timedelta(days=int(avg_interval))
+
+            customer_cycles.append({
+                '客户': customer,
+                '总销售额': customer_orders['金额'].sum(),
+                '订单次数': len(customer_orders),
+                '平均间隔': avg_interval,
+                '间隔标准差': std_interval,
+                '最后订单日期': order_dates[-1],
+                '距今天数': days_since_last,
+                '预测下单日期': predicted_date,
+                '订单详情': order_details,
+                '异常状态': '正常' if days_since_last <= avg_interval * 1.5 else
+                '轻度异常' if days_since_last <= avg_interval * 2 else '严重异常'
+            })
+
+    # 按总销售额排序，获取Top 20
+    cycles_df = pd.DataFrame(customer_cycles)
+    if not cycles_df.empty:
+        cycles_df = cycles_df.nlargest(20, '总销售额')  # 保持Top 20
+
+    return cycles_df
+
+
+@perf_monitor.profile()
+def calculate_risk_prediction(sales_data, current_date=None):
+    """计算客户风险预测模型（current_date为预测基准日期，默认当前时间；晚于它的订单不参与建模）"""
+    if current_date is None:
+        current_date = datetime.now()
+    current_date = pd.Timestamp(current_date)
+    if (sales_data['订单日期'] > current_date).any():
+        sales_data = sales_data[sales_data['订单日期'] <= current_date]
+
+    # 获取最近12个月的数据用于建模
+    model_end_date = sales_data['订单日期'].max()
+    model_start_date = model_end_date - timedelta(days=365)
+    model_data = sales_data[sales_data['订单日期'] >= model_start_date].copy()
+
+    risk_predictions = []
+
+    for customer in model_data['经销商名称'].unique():
+        customer_orders = model_data[model_data['经销商名称'] == customer].sort_values('订单日期')
+
+        if len(customer_orders) < 3:  # 需要至少3个订单才能建模
+            continue
+
+        # 计算历史特征
+        order_dates = customer_orders['订单日期'].tolist()
+        order_amounts = customer_orders['金额'].tolist()
+
+        # 计算间隔
+        intervals = []
+        for i in range(1, len(order_dates)):
+            intervals.append((order_dates[i] - order_dates[i - 1]).days)
+
+        # 基础统计
+        avg_interval = np.mean(intervals)
+        std_interval = np.std(intervals) if len(intervals) > 1 else avg_interval * 0.2
+        avg_amount = np.mean(order_amounts)
+        std_amount = np.std(order_amounts) if len(order_amounts) > 1 else avg_amount * 0.2
+
+        # 计算趋势
+        if len(intervals) >= 3:
+            # 间隔趋势（是否在拉长）
+            recent_intervals = intervals[-3:]
+            interval_trend = (recent_intervals[-1] - recent_intervals[0]) / max(recent_intervals[0], 1)
+        else:
+            interval_trend = 0
+
+        if len(order_amounts) >= 3:
+            # 金额趋势（是否在下降）
+            recent_amounts = order_amounts[-3:]
+            amount_trend = (recent_amounts[-1] - recent_amounts[0]) / max(recent_amounts[0], 1)
+        else:
+            amount_trend = 0
+
+        # 当前状态
+        last_order_date = order_dates[-1]
+        days_since_last = (current_date - last_order_date).days
+        last_amount = order_amounts[-1]
+
+        # 风险评分计算
+        # 1. 断单风险
+        if days_since_last > avg_interval:
+            # 使用正态分布计算超期概率
+            z_score = (days_since_last - avg_interval) / max(std_interval, 1)
+            # 基础断单概率
+            disconnect_risk_base = min(0.99, 1 / (1 + np.exp(-z_score)))
+            # 考虑趋势调整
+            disconnect_risk = disconnect_risk_base * (1 + interval_trend * 0.3)
+        else:
+            # 预测未来30天的断单风险
+            future_days = days_since_last + 30
+            z_score = (future_days - avg_interval) / max(std_interval, 1)
+            disconnect_risk = min(0.99, 1 / (1 + np.exp(-z_score + 1)))
+
+        # 2. 减量风险
+        if last_amount < avg_amount * 0.7:
+            amount_z_score = (avg_amount - last_amount) / max(std_amount, 1)
+            reduction_risk_base = min(0.99, 1 / (1 + np.exp(-amount_z_score)))
+            reduction_risk = reduction_risk_base * (1 - amount_trend * 0.3)
+        else:
+            reduction_risk = max(0.1, 0.3 + amount_trend * 0.5) if amount_trend < 0 else 0.1
+
+        # 3. 综合流失风险
+        # 权重：断单风险60%，减量风险40%
+        churn_risk = disconnect_risk * 0.6 + reduction_risk * 0.4
+
+        # 调整因子
+        # 如果是老客户（订单数>10），降低风险
+        if len(customer_orders) > 10:
+            churn_risk *= 0.8
+
+        # 如果最近有大额订单，降低风险
+        if last_amount > avg_amount * 1.5:
+            churn_risk *= 0.7
+
+        # 确定风险等级
+        if churn_risk >= 0.8:
+            risk_level = '高风险'
+            risk_color = '#e74c3c'
+        elif churn_risk >= 0.5:
+            risk_level = '中风险'
+            risk_color = '#f39c12'
+        elif churn_risk >= 0.2:
+            risk_level = '低风险'
+            risk_color = '#f1c40f'
+        else:
+            risk_level = '安全'
+            risk_color = '#27ae60'
+
+        # 确定主要风险类型
+        if disconnect_risk > reduction_risk * 1.5:
+            main_risk_type = '断单风险'
+        elif reduction_risk > disconnect_risk * 1.5:
+            main_risk_type = '减量风险'
+        else:
+            main_risk_type = '综合风险'
+
+        # 生成行动建议
+        if churn_risk >= 0.8:
+            if days_since_last > avg_interval * 1.5:
+                action = '立即电话联系，了解是否有问题'
+            else:
+                action = '密切关注，准备主动联系'
+        elif churn_risk >= 0.5:
+            action = '定期回访，了解需求变化'
+        else:
+            action = '常规维护'
+
+        # 预测下次订单
+        predicted_next_order = last_order_date + timedelta(days=int(avg_interval))
+        predicted_amount = avg_amount * (1 + amount_trend * 0.2)
+
+        # 计算置信区间
+        confidence_interval = std_interval / max(avg_interval, 1) * 100
+
+        risk_predictions.append({
+            '客户': customer,
+            '流失风险概率': churn_risk * 100,
+            '断单风险': disconnect_risk * 100,
+            '减量风险': reduction_risk * 100,
+            '置信区间': min(20, confidence_interval),
+            '风险等级': risk_level,
+            '风险颜色': risk_color,
+            '主要风险': main_risk_type,
+            '最后订单日期': last_order_date,
+            '距今天数': days_since_last,
+            '平均周期': avg_interval,
+            '平均金额': avg_amount,
+            '最后金额': last_amount,
+            '建议行动': action,
+            '预测下单日期': predicted_next_order,
+            '预测金额': predicted_amount,
+            '历史订单数': len(customer_orders),
+            '金额趋势': '下降' if amount_trend < -0.1 else '上升' if amount_trend > 0.1 else '稳定',
+            '周期趋势': '延长' if interval_trend > 0.1 else '缩短' if interval_trend < -0.1 else '稳定'
+        })
+
+    # 转换为DataFrame并排序
+    risk_df = pd.DataFrame(risk_predictions)
+    if not risk_df.empty:
+        risk_df = risk_df.sort_values('流失风险概率', ascending=False)
+
+    return risk_df
+
+
+def build_customer_dashboard(registry=dataset_registry, as_of: date = None) -> Dict:
+    """生成客户依赖分析看板的全部预计算结果（风险预测以as_of为基准，默认当天）"""
+    as_of = as_of or date.today()
+    metrics, customer_status, sales_data, monthly_data = load_customer_data(registry, as_of=as_of)
+    return {
+        'as_of': as_of,
+        'metrics': metrics,
+        'customer_status': customer_status,
+        'sales_data': sales_data,
+        'monthly_data': monthly_data,
+        'customer_cycles': calculate_customer_cycles(sales_data, metrics['current_year']),
+        'risk_prediction': calculate_risk_prediction(sales_data, as_of)
+    }
@@ -0,0 +1,123 @@
+# analytics/dashboards.py - 看板预计算注册表
+import hashlib
+from datetime import date
+from typing import Dict
+
+from data_cache import snapshot_cache
+from data_registry import PAGE_DATASETS, REMOTE_SOURCES, dataset_registry
+from analytics.customer import build_customer_dashboard
+from analytics.inventory import build_inventory_dashboard
+from analytics.ml_prediction import PredictionPipeline
+from analytics.product import build_product_dashboard
+from analytics.sales import build_sales_dashboard
+from analytics.store import aggregate_store
+from perf_monitor import perf_monitor
+
+# 结果格式版本，计算逻辑或结果结构变化时递增，使旧的预计算结果失效
+AGGREGATE_FORMAT = 6
+
+
+def _fetch_remote_content(url: str) -> bytes:
+    """下载远程工作簿内容"""
+    response = dataset_registry.fetch_remote(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"下载失败 HTTP {response.status_code}: {url}")
+    return response.content
+
+
+@perf_monitor.profile()
+def build_ml_prediction_dashboard() -> Dict:
+    """生成机器学习预测看板的预计算结果（数据来自GitHub）"""
+    shipment_data = snapshot_cache.read_excel_bytes(_fetch_remote_content(REMOTE_SOURCES['ml_shipments']))
+    promotion_data = snapshot_cache.read_excel_bytes(_fetch_remote_content(REMOTE_SOURCES['ml_promotions']))
+
+    pipeline = PredictionPipeline()
+    if not pipeline.run(shipment_data, promotion_data, shipment_source=REMOTE_SOURCES['ml_shipments']):
+        raise RuntimeError("预测流程执行失败")
+    return pipeline.results()
+
+
+# 看板注册表：page为PAGE_DATASETS中的页面名；files为数据集以外的输入文件；
+# dated表示结果依赖分析基准日期（库龄、风险预测等），builder接受as_of参数，版本号中包含该日期
+DASHBOARDS = {
+    'sales': {
+        'page': '销售达成分析',
+        'builder': build_sales_dashboard,
+        'files': [],
+        'dated': False
+    },
+    'product': {
+        'page': '产品组合分析',
+        'builder': build_product_dashboard,
+        'files': ['星品&新品年度KPI考核产品代码.txt', '仪表盘新品代码.txt', '仪表盘产品代码.txt'],
+        'dated': False
+    },
+    'customer': {
+        'page': '客户依赖分析',
+        'builder': build_customer_dashboard,
+        'files': [],
+        'dated': True
+    },
+    'inventory': {
+        'page': '预测库存分析',
+        'builder': build_inventory_dashboard,
+        'files': [],
+        'dated': True
+    },
+    'ml_prediction': {
+        'page': '机器学习预测',
+        'builder': build_ml_prediction_dashboard,
+        'remote': ['ml_shipments', 'ml_promotions'],
+        'dated': False
+    }
+}
+
+
+def dashboard_version(name: str, as_of: date = None) -> str:
+    """获取看板结果的版本号 - 输入文件内容、结果格式（以及依赖日期的看板的日期）任一变化都会得到新版本"""
+    config = DASHBOARDS[name]
+    parts = [f"format:{AGGREGATE_FORMAT}"]
+
+    if 'remote' in config:
+        for source in config['remote']:
+            content = _fetch_remote_content(REMOTE_SOURCES[source])
+            parts.append(f"{source}:{hashlib.sha256(content).hexdigest()[:12]}")
+    else:
+        parts.append(f"datasets:{dataset_registry.version_token(*PAGE_DATASETS[config['page']])}")
+        for path in config['files']:
+            try:
+                parts.append(f"{path}:{snapshot_cache.fingerprint(path)['sha256'][:12]}")
+            except FileNotFoundError:
+                parts.append(f"{path}:missing")
+
+    version = hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()[:16]
+    if config['dated']:
+        version = f"{version}_{(as_of or date.today()):%Y%m%d}"
+    return version
+
+
+def build_dashboard(name: str, as_of: date = None) -> Dict:
+    """计算看板结果 - 依赖日期的看板以as_of为基准日期（默认当天）"""
+    config = DASHBOARDS[name]
+    if config['dated']:
+        return config['builder'](as_of=as_of or date.today())
+    return config['builder']()
+
+
+@perf_monitor.profile()
+def load_dashboard(name: str, version: str = None, persist: bool = False, as_of: date = None) -> Dict:
+    """读取看板的预计算结果，没有该版本时在进程内计算
+
+    依赖日期的看板按as_of（默认当天）计算；传入version时应与dashboard_version(name, as_of)一致。
+    """
+    as_of = as_of or date.today()
+    version = version or dashboard_version(name, as_of)
+    return aggregate_store.get_or_build(name, version, lambda: build_dashboard(name, as_of), persist=persist)
+
+
+def register_warmup_steps(warmup):
+    """把本地数据看板的预聚合登记为后台预热步骤（机器学习看板依赖网络且耗时，只由预计算进程生成）"""
+    for name, config in DASHBOARDS.items():
+        if 'remote' in config:
+            continue
+        warmup.register_step(config['page'], f"预聚合{config['page']}", lambda name=name: load_dashboard(name))
@@ -0,0 +1,310 @@
+# analytics/diagnostics.py - 预测库存分析系统验证模块
+import inspect
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from analytics.inventory import INVENTORY_DATASETS, BatchLevelInventoryAnalyzer
+from data_registry import dataset_registry
+from perf_monitor import perf_monitor
+
+logger = logging.getLogger(__name__)
+
+# 内存中保留验证结论的数据版本数
+VERDICT_HISTORY = 8
+
+
+@perf_monitor.profile()
+def validate_data_integrity(shipment_df: pd.DataFrame, forecast_df: pd.DataFrame) -> Dict:
+    """验证数据完整性 - 检查看板已加载的出货和预测数据（列名已统一），不修改传入的数据"""
+    try:
+        # 验证点1：检查数据是否非空
+        validation_results = {
+            "shipment_data_exists": not shipment_df.empty,
+            "forecast_data_exists": not forecast_df.empty,
+            "shipment_records": len(shipment_df),
+            "forecast_records": len(forecast_df)
+        }
+
+        # 验证点2：检查关键列是否存在
+        required_shipment_cols = ['订单日期', '申请人', '产品代码', '数量']
+        required_forecast_cols = ['销售员', '所属年月', '产品代码', '预计销售量']
+
+        validation_results["shipment_cols_valid"] = all(col in shipment_df.columns for col in required_shipment_cols)
+        validation_results["forecast_cols_valid"] = all(col in forecast_df.columns for col in required_forecast_cols)
+
+        # 验证点3：检查人员名称匹配
+        shipment_persons = set(shipment_df['申请人'].unique())
+        forecast_persons = set(forecast_df['销售员'].unique())
+        common_persons = shipment_persons.intersection(forecast_persons)
+
+        validation_results["person_match_count"] = len(common_persons)
+        validation_results["person_match_ratio"] = len(common_persons) / max(len(forecast_persons), 1)
+
+        # 验证点4：检查时间数据格式（已是日期列时直接通过）
+        try:
+            pd.to_datetime(shipment_df['订单日期'])
+            pd.to_datetime(forecast_df['所属年月'])
+            validation_results["date_format_valid"] = True
+        except Exception as e:
+            validation_results["date_format_valid"] = False
+            validation_results["date_error"] = str(e)
+
+        # 验证点5：检查产品代码匹配
+        shipment_products = set(shipment_df['产品代码'].unique())
+        forecast_products = set(forecast_df['产品代码'].unique())
+        common_products = shipment_products.intersection(forecast_products)
+
+        validation_results["product_match_count"] = len(common_products)
+        validation_results["product_match_ratio"] = len(common_products) / max(len(forecast_products), 1)
+
+        return validation_results
+
+    except Exception as e:
+        logger.error(f"数据验证失败: {str(e)}")
+        return {"validation_failed": True, "error": str(e)}
+
+
+def test_responsibility_analysis() -> Dict:
+    """测试责任归属分析功能 - 在固定的小样本上运行一次责任归属分析"""
+    try:
+        # 创建测试数据
+        test_shipment_data = pd.DataFrame({
+            '订单日期': pd.date_range('2024-01-01', periods=10, freq='D'),
+            '所属区域': ['东'] * 10,
+            '申请人': ['张三'] * 5 + ['李四'] * 5,
+            '产品代码': ['F001'] * 10,
+            '数量': [10, 15, 20, 12, 8, 25, 30, 18, 22, 16]
+        })
+
+        # 创建分析器实例
+        analyzer = BatchLevelInventoryAnalyzer()
+
+        # 测试责任归属分析
+        test_batch_date = datetime(2024, 1, 15)
+        test_sales_metrics = {
+            'daily_avg_sales': 15,
+            'sales_std': 5,
+            'coefficient_of_variation': 0.3,
+            'total_sales': 180,
+            'last_90_days_sales': 180
+        }
+
+        test_forecast_info = {
+            'forecast_bias': 0.1,
+            'person_forecast': {'张三': 100, '李四': 80}
+        }
+
+        test_mapping = {'张三': '东', '李四': '东'}
+
+        # 执行测试
+        result = analyzer.analyze_responsibility_collaborative(
+            'F001', test_batch_date, test_sales_metrics, test_forecast_info,
+            None, 100, test_mapping, test_shipment_data
+        )
+
+        # 验证结果
+        test_results = {
+            "analysis_completed": result is not None,
+            "has_responsible_region": result[0] is not None,
+            "has_responsible_person": result[1] is not None,
+            "has_responsibility_details": result[2] is not None
+        }
+
+        if result[2]:  # 如果有责任详情
+            details = result[2]
+            test_results["has_forecast_responsibility"] = "forecast_responsibility" in details.get(
+                "responsibility_details", {})
+            test_results["has_allocation_logic"] = "allocation_logic" in details.get("quantity_allocation", {})
+            test_results["uses_real_data"] = "基于真实销售数据" in details.get("quantity_allocation", {}).get(
+                "allocation_logic", "")
+
+            # 检查是否还在使用模拟数据
+            forecast_resp = details.get("responsibility_details", {}).get("forecast_responsibility", {})
+            test_results["has_real_sales_breakdown"] = any(
+                isinstance(person_data, dict) and "monthly_breakdown" in person_data.get("sales_details", {})
+                for person_data in forecast_resp.values()
+            )
+
+        return test_results
+
+    except Exception as e:
+        logger.error(f"责任分析测试失败: {str(e)}")
+        return {"test_failed": True, "error": str(e)}
+
+
+def check_analyzer() -> Dict:
+    """检查分析器的方法、配置和责任归属方法的参数"""
+    analyzer = BatchLevelInventoryAnalyzer()
+    methods = {
+        "cross_month_sales": hasattr(analyzer, 'calculate_cross_month_sales'),
+        "lifecycle_stage": hasattr(analyzer, 'get_product_lifecycle_stage'),
+        "staff_status": hasattr(analyzer, 'get_staff_status')
+    }
+    configs = {
+        "cross_month_weights": hasattr(analyzer, 'cross_month_weights'),
+        "lifecycle_config": hasattr(analyzer, 'product_lifecycle_config')
+    }
+    params = list(inspect.signature(analyzer.analyze_responsibility_collaborative).parameters.keys())
+
+    return {
+        "analyzer_methods": {**methods, "all_methods_present": all(methods.values())},
+        "analyzer_config": {**configs, "all_configs_present": all(configs.values())},
+        "method_signature": {
+            "has_shipment_df_param": 'shipment_df' in params,
+            "total_params": len(params),
+            "all_params": params
+        }
+    }
+
+
+def check_data_files(registry=dataset_registry) -> Dict[str, bool]:
+    """检查预测库存分析的数据文件是否可访问"""
+    return {registry.source_file(name): os.path.exists(registry.source_file(name)) for name in INVENTORY_DATASETS}
+
+
+def _passed(results: Dict) -> bool:
+    """综合结论：数据完整、责任分析正常、分析器检查通过且数据文件都可访问"""
+    integrity = results.get('data_integrity') or {}
+    responsibility = results.get('responsibility_test') or {}
+    analyzer = results.get('analyzer') or {}
+    data_files = results.get('data_files') or {}
+    return all([
+        bool(integrity) and "validation_failed" not in integrity,
+        integrity.get("shipment_cols_valid", False) and integrity.get("forecast_cols_valid", False),
+        responsibility.get("analysis_completed", False) and "test_failed" not in responsibility,
+        analyzer.get("analyzer_methods", {}).get("all_methods_present", False),
+        analyzer.get("analyzer_config", {}).get("all_configs_present", False),
+        analyzer.get("method_signature", {}).get("has_shipment_df_param", False),
+        bool(data_files) and all(data_files.values())
+    ])
+
+
+class InventoryDiagnostics:
+    """系统验证后台任务类 - 在后台线程中对看板已加载的数据运行各项验证，结论按数据版本缓存
+
+    页面传入当前看板的数据版本和已加载的数据，验证不再重新读取Excel；同一数据版本只验证一次，
+    同一时间只运行一个验证任务，避免与页面请求争抢资源。
+    """
+
+    def __init__(self, registry=dataset_registry, history: int = VERDICT_HISTORY):
+        self.registry = registry
+        self.history = history
+        self._verdicts = {}
+        self._steps = []
+        self._version = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.finished_at = None
+
+    def _build_steps(self, shipment_df: pd.DataFrame, forecast_df: pd.DataFrame) -> List[Dict]:
+        """生成本次验证的步骤列表"""
+        steps = [
+            {'key': 'data_integrity', 'name': "数据完整性",
+             'func': lambda: validate_data_integrity(shipment_df, forecast_df)},
+            {'key': 'responsibility_test', 'name': "责任分析功能", 'func': test_responsibility_analysis},
+            {'key': 'analyzer', 'name': "分析器检查", 'func': check_analyzer},
+            {'key': 'data_files', 'name': "数据文件检查", 'func': lambda: check_data_files(self.registry)}
+        ]
+        for step in steps:
+            step.update({'status': 'pending', 'seconds': None, 'error': None})
+        return steps
+
+    def _run(self, version: str):
+        """后台线程主体：依次执行各步骤，单个步骤失败不影响其他步骤，最后保存该版本的结论"""
+        results = {}
+        for step in self._steps:
+            step['status'] = 'running'
+            start = time.perf_counter()
+            try:
+                results[step['key']] = step['func']()
+                step['status'] = 'done'
+            except Exception as e:
+                results[step['key']] = None
+                step['status'] = 'failed'
+                step['error'] = str(e)
+            step['seconds'] = round(time.perf_counter() - start, 2)
+
+        self.finished_at = time.time()
+        verdict = {
+            **results,
+            'passed': _passed(results),
+            'errors': {step['key']: step['error'] for step in self._steps if step['status'] == 'failed'},
+            'finished_at': self.finished_at,
+            'seconds': round(self.finished_at - self.started_at, 2)
+        }
+        with self._lock:
+            self._verdicts[version] = verdict
+            # 只保留最近的若干个数据版本
+            for stale in list(self._verdicts)[:-self.history]:
+                del self._verdicts[stale]
+
+    def start(self, version: str, shipment_df: pd.DataFrame, forecast_df: pd.DataFrame) -> bool:
+        """启动后台验证，返回本次是否真正启动（该版本已有结论或有验证正在进行时不启动）"""
+        with self._lock:
+            if version in self._verdicts:
+                return False
+            if self._thread is not None and self._thread.is_alive():
+                return False
+
+            self._version = version
+            self._steps = self._build_steps(shipment_df, forecast_df)
+            self.started_at = time.time()
+            self.finished_at = None
+            self._thread = threading.Thread(target=self._run, args=(version,), name='inventory-diagnostics',
+                                            daemon=True)
+            self._thread.start()
+            return True
+
+    def verdict(self, version: str) -> Optional[Dict]:
+        """获取某数据版本的验证结论，尚未验证时返回None"""
+        with self._lock:
+            return self._verdicts.get(version)
+
+    def progress(self, version: str) -> Dict:
+        """获取某数据版本的验证进度（idle: 未验证 / busy: 其他版本验证中 / running / done）
+
+        步骤明细只属于最近一次启动的版本，查询其他版本时步骤为空、进度为0。
+        """
+        with self._lock:
+            done = version in self._verdicts
+            running = self._thread is not None and self._thread.is_alive()
+            current_version = self._version
+            steps = ([{key: step[key] for key in ('name', 'status', 'seconds', 'error')} for step in self._steps]
+                     if current_version == version else [])
+
+        finished = [step for step in steps if step['status'] in ('done', 'failed')]
+        current = [step['name'] for step in steps if step['status'] == 'running']
+        if done:
+            status = 'done'
+        elif running:
+            status = 'running' if current_version == version else 'busy'
+        else:
+            status = 'idle'
+
+        return {
+            'status': status,
+            'completed': len(finished),
+            'total': len(steps),
+            'percent': len(finished) / len(steps) if steps else 0.0,
+            'current': current[0] if current else '',
+            'steps': steps
+        }
+
+    def invalidate(self, version: str = None):
+        """清除某数据版本（默认全部）的验证结论"""
+        with self._lock:
+            if version is None:
+                self._verdicts.clear()
+            else:
+                self._verdicts.pop(version, None)
+
+
+# 创建全局实例
+inventory_diagnostics = InventoryDiagnostics()
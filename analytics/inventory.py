@@ -0,0 +1,1586 @@
+# analytics/inventory.py - 预测库存分析计算模块
+import copy
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from data_registry import PAGE_DATASETS, dataset_registry, worker_count
+from perf_monitor import perf_monitor
+
+logger = logging.getLogger(__name__)
+
+# 本看板使用的数据集
+INVENTORY_DATASETS = PAGE_DATASETS['预测库存分析']
+
+# 风险等级（按风险得分从高到低）及对应的处理建议和建议措施
+RISK_LEVELS = np.array(["极高风险", "高风险", "中风险", "低风险", "极低风险"], dtype=object)
+RISK_ADVICE = np.array(['🚨 立即7折清库', '⚠️ 建议8折促销', '📢 适度9折促销', '✅ 正常销售', '🌟 新鲜库存'], dtype=object)
+RISK_RECOMMENDATIONS = np.array(["紧急清理：考虑折价促销", "优先处理：降价促销或转仓调配", "密切监控：调整采购计划",
+                                 "常规管理：定期审查库存周转", "维持现状：正常库存水平"], dtype=object)
+
+# 积压原因：四个条件（库龄过长、销量波动大、季节性影响、预测偏差大）的每种组合预先拼好文字
+STOCKING_REASONS = ["库龄过长", "销量波动大", "季节性影响", "预测偏差大"]
+STOCKING_REASON_TEXTS = np.array(
+    ['，'.join(reason for bit, reason in enumerate(STOCKING_REASONS) if code >> bit & 1) or "正常库存"
+     for code in range(1 << len(STOCKING_REASONS))], dtype=object)
+
+# 参数模拟中可调整的分析器参数，按依赖它们的计算阶段分组：
+# 风险参数只影响清库天数、积压风险、风险得分和积压原因；责任归属参数只影响责任归属分析
+RISK_PARAMETERS = ['high_stock_days', 'medium_stock_days', 'low_stock_days', 'high_clearance_days',
+                   'medium_clearance_days', 'low_clearance_days', 'high_volatility_threshold',
+                   'high_forecast_bias_threshold', 'medium_forecast_bias_threshold', 'min_daily_sales',
+                   'min_seasonal_index']
+ATTRIBUTION_PARAMETERS = ['cross_month_weights', 'product_lifecycle_config']
+
+
+class BatchLevelInventoryAnalyzer:
+    """批次级别库存分析器 - 完整移植自积压超详细.py - 修复模拟数据问题"""
+
+    def __init__(self, as_of=None):
+        # 分析基准日期（库龄、生命周期等以该日期为"今天"），None表示当天
+        self.as_of = as_of
+
+        # 风险参数设置
+        self.high_stock_days = 90
+        self.medium_stock_days = 60
+        self.low_stock_days = 30
+        self.high_volatility_threshold = 1.0
+        self.medium_volatility_threshold = 0.8
+        self.high_forecast_bias_threshold = 0.3
+        self.medium_forecast_bias_threshold = 0.15
+        self.high_clearance_days = 90
+        self.medium_clearance_days = 60
+        self.low_clearance_days = 30
+        self.min_daily_sales = 0.5
+        self.min_seasonal_index = 0.3
+
+        # 默认区域和责任人
+        self.default_regions = ['东', '南', '西', '北', '中']
+        self.default_region = '东'
+        self.default_person = '系统管理员'
+
+        # 责任归属分析权重参数
+        self.forecast_accuracy_weight = 0.25
+        self.recent_sales_weight = 0.30
+        self.ordering_history_weight = 0.25
+        self.market_performance_weight = 0.20
+
+        # 新增：跨月销售权重配置
+        self.cross_month_weights = {
+            0: 1.0,  # 当月销售100%计入履行率
+            1: 0.7,  # 次月销售70%计入履行率
+            2: 0.4  # 第三月销售40%计入履行率
+        }
+
+        # 跨月销售查询索引及其对应的出货数据、各目标月份的三个月窗口
+        self._sales_index = {}
+        self._sales_index_source = None
+        self._month_windows = {}
+
+        # 新增：产品生命周期配置
+        self.product_lifecycle_config = {
+            "新品期": {"months_range": (0, 6), "tolerance": 0.5, "weight": 0.6},
+            "成长期": {"months_range": (6, 24), "tolerance": 0.7, "weight": 1.0},
+            "成熟期": {"months_range": (24, 60), "tolerance": 0.85, "weight": 1.2},
+            "衰退期": {"months_range": (60, 999), "tolerance": 0.6, "weight": 0.8}
+        }
+
+    def get_parameters(self) -> Dict:
+        """获取可调整的分析参数（副本，修改返回值不影响分析器）"""
+        return copy.deepcopy({name: getattr(self, name) for name in RISK_PARAMETERS + ATTRIBUTION_PARAMETERS})
+
+    def set_parameters(self, parameters: Dict):
+        """按参数名覆盖分析参数（只接受RISK_PARAMETERS和ATTRIBUTION_PARAMETERS中的参数）"""
+        unknown = set(parameters) - set(RISK_PARAMETERS + ATTRIBUTION_PARAMETERS)
+        if unknown:
+            raise ValueError(f"未知的分析参数: {sorted(unknown)}")
+        for name, value in parameters.items():
+            setattr(self, name, copy.deepcopy(value))
+
+    def calculate_risk_percentage(self, days_to_clear, batch_age, target_days):
+        """计算风险百分比"""
+        import math
+
+        if batch_age >= target_days:
+            return 100.0
+
+        if days_to_clear == float('inf'):
+            return 100.0
+
+        if days_to_clear >= 3 * target_days:
+            return 100.0
+
+        # 计算基于清库天数的风险
+        clearance_ratio = days_to_clear / target_days
+        clearance_risk = 100 / (1 + math.exp(-4 * (clearance_ratio - 1)))
+
+        # 计算基于库龄的风险
+        age_risk = 100 * batch_age / target_days
+
+        # 组合风险
+        combined_risk = 0.8 * max(clearance_risk, age_risk) + 0.2 * min(clearance_risk, age_risk)
+
+        if days_to_clear > target_days:
+            combined_risk = max(combined_risk, 80)
+
+        if days_to_clear >= 2 * target_days:
+            combined_risk = max(combined_risk, 90)
+
+        if batch_age >= 0.75 * target_days:
+            combined_risk = max(combined_risk, 75)
+
+        return min(100, round(combined_risk, 1))
+
+    def _risk_components(self, days_to_clear, batch_age, target_days) -> tuple:
+        """calculate_risk_percentage的数组计算部分，返回(直接为100.0的批次, 被风险下限抬高的批次, 未四舍五入的风险)"""
+        days_to_clear = np.asarray(days_to_clear, dtype=float)
+        batch_age = np.asarray(batch_age, dtype=float)
+
+        # 库龄超过目标天数、无法清库或清库天数超过3倍目标天数时直接为100.0
+        saturated = (batch_age >= target_days) | (days_to_clear == np.inf) | (days_to_clear >= 3 * target_days)
+
+        # 计算基于清库天数和库龄的风险并组合
+        with np.errstate(over='ignore', invalid='ignore'):
+            clearance_risk = 100 / (1 + np.exp(-4 * (days_to_clear / target_days - 1)))
+        age_risk = 100 * batch_age / target_days
+        combined_risk = 0.8 * np.maximum(clearance_risk, age_risk) + 0.2 * np.minimum(clearance_risk, age_risk)
+
+        # 风险下限：被下限抬高的批次和逐个计算时一样得到整数（显示为"80%"而不是"80.0%"）
+        raised = np.zeros(len(combined_risk), dtype=bool)
+        for condition, floor in ((days_to_clear > target_days, 80),
+                                 (days_to_clear >= 2 * target_days, 90),
+                                 (batch_age >= 0.75 * target_days, 75)):
+            lifted = condition & (combined_risk < floor)
+            combined_risk = np.where(lifted, floor, combined_risk)
+            raised |= lifted
+
+        return saturated, raised & ~saturated, combined_risk
+
+    def calculate_risk_percentages(self, days_to_clear, batch_age, target_days) -> list:
+        """calculate_risk_percentage的数组版本 - 一次计算所有批次，返回值与逐个调用完全一致"""
+        saturated, raised, combined_risk = self._risk_components(days_to_clear, batch_age, target_days)
+        return [100.0 if is_saturated else min(100, int(risk) if is_raised else round(risk, 1))
+                for is_saturated, is_raised, risk in zip(saturated.tolist(), raised.tolist(), combined_risk.tolist())]
+
+    def format_risk_percentages(self, days_to_clear, batch_age, target_days) -> np.ndarray:
+        """积压风险百分比文字，与f"{round(calculate_risk_percentage(...), 1)}%"一致（只对未封顶的批次逐个格式化）"""
+        saturated, raised, combined_risk = self._risk_components(days_to_clear, batch_age, target_days)
+        formatted = np.full(len(combined_risk), "100.0%", dtype=object)
+        formatted[raised] = np.array(["75%", "80%", "90%"], dtype=object)[
+            np.searchsorted([75, 80, 90], combined_risk[raised])]
+        rounded = ~saturated & ~raised
+        formatted[rounded] = [f"{min(100, round(risk, 1))}%" for risk in combined_risk[rounded].tolist()]
+        return formatted
+
+    def score_batches(self, age_days, quantity, unit_price, daily_avg_sales, coefficient_of_variation,
+                      seasonal_index, forecast_bias) -> pd.DataFrame:
+        """按列数组一次计算所有批次的清库天数、积压风险、风险得分、风险等级、处理建议、预期损失和积压原因"""
+        age_days = np.asarray(age_days)
+        quantity = np.asarray(quantity, dtype=float)
+        unit_price = np.asarray(unit_price, dtype=float)
+        coefficient_of_variation = np.asarray(coefficient_of_variation, dtype=float)
+        seasonal_index = np.asarray(seasonal_index, dtype=float)
+        abs_forecast_bias = np.abs(np.asarray(forecast_bias, dtype=float))
+
+        # 计算预计清库天数
+        daily_avg_sales_adjusted = np.maximum(np.asarray(daily_avg_sales, dtype=float) * seasonal_index,
+                                              self.min_daily_sales)
+        can_clear = daily_avg_sales_adjusted > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_to_clear = np.where(can_clear, quantity / daily_avg_sales_adjusted, np.inf)
+
+        # 1/2/3个月积压风险（无法计算清库天数时为100）
+        risk_percentages = {}
+        for column, target_days in (('一个月积压风险', 30), ('两个月积压风险', 60), ('三个月积压风险', 90)):
+            formatted = self.format_risk_percentages(days_to_clear, age_days, target_days)
+            formatted[~can_clear] = "100%"
+            risk_percentages[column] = formatted
+
+        # 确定积压原因：四个条件组合的编码对应预先拼好的原因文字
+        reason_flags = (age_days > self.medium_stock_days,
+                        coefficient_of_variation > self.high_volatility_threshold,
+                        seasonal_index < 0.8,
+                        abs_forecast_bias > self.high_forecast_bias_threshold)
+        reason_code = sum(flag.astype(int) << bit for bit, flag in enumerate(reason_flags))
+        stocking_reasons = STOCKING_REASON_TEXTS[reason_code]
+
+        # 风险等级评估：库龄、清库天数、销量波动系数、预测偏差四项得分相加（分档阈值取分析器参数）
+        risk_score = (
+            np.select([age_days > self.high_stock_days, age_days > self.medium_stock_days,
+                       age_days > self.low_stock_days], [40, 30, 20], 10) +
+            np.select([days_to_clear == np.inf, days_to_clear > 2 * self.high_clearance_days,
+                       days_to_clear > self.high_clearance_days, days_to_clear > self.medium_clearance_days,
+                       days_to_clear > self.low_clearance_days], [40, 35, 30, 20, 10], 0) +
+            np.select([coefficient_of_variation > 2 * self.high_volatility_threshold,
+                       coefficient_of_variation > self.high_volatility_threshold], [10, 5], 0) +
+            np.select([abs_forecast_bias > 0.5, abs_forecast_bias > self.high_forecast_bias_threshold,
+                       abs_forecast_bias > self.medium_forecast_bias_threshold], [10, 8, 5], 0)
+        )
+
+        # 根据总分确定风险等级、处理建议和建议措施
+        level_index = np.select([risk_score >= 80, risk_score >= 60, risk_score >= 40, risk_score >= 20],
+                                [0, 1, 2, 3], 4)
+        risk_level = RISK_LEVELS[level_index]
+        risk_advice = RISK_ADVICE[level_index]
+        recommendation = RISK_RECOMMENDATIONS[level_index]
+
+        # 预期损失计算
+        batch_value = quantity * unit_price
+        expected_loss = np.select([age_days >= 120, age_days >= 90, age_days >= 60],
+                                  [batch_value * 0.3, batch_value * 0.2, batch_value * 0.1], 0)
+
+        return pd.DataFrame({
+            '批次价值': batch_value,
+            '预计清库天数': days_to_clear,
+            **risk_percentages,
+            '积压原因': stocking_reasons,
+            '风险得分': risk_score,
+            '风险等级': risk_level,
+            '处理建议': risk_advice,
+            '建议措施': recommendation,
+            '预期损失': expected_loss
+        })
+
+    def calculate_forecast_bias(self, forecast_quantity, actual_sales):
+        """计算预测偏差"""
+        import math
+
+        if actual_sales == 0 and forecast_quantity == 0:
+            return 0.0
+        elif actual_sales == 0:
+            return min(math.sqrt(forecast_quantity) / max(forecast_quantity, 1), 1.0)
+        elif forecast_quantity == 0:
+            return -min(math.sqrt(actual_sales) / max(actual_sales, 1), 1.0)
+        else:
+            if forecast_quantity > actual_sales:
+                normalized_error = (forecast_quantity - actual_sales) / actual_sales
+                return min(math.tanh(normalized_error), 1.0)
+            else:
+                normalized_error = (actual_sales - forecast_quantity) / forecast_quantity
+                return -min(math.tanh(normalized_error), 1.0)
+
+    def get_staff_status(self, person_name):
+        """获取人员状态 - 新增方法"""
+        # 这里可以从数据库或配置文件读取，暂时用默认逻辑
+        # 实际部署时可以连接HR系统
+        if person_name == self.default_person:
+            return {"status": "系统", "replacement": None}
+
+        # 默认假设所有人员都在职，实际可以从HR系统获取
+        return {"status": "在职", "replacement": None}
+
+    def get_product_lifecycle_stage(self, product_code, current_date):
+        """获取产品生命周期阶段 - 新增方法"""
+        # 这里应该从产品管理系统获取产品上市时间
+        # 暂时用简化逻辑，实际部署时需要连接产品管理系统
+
+        # 简化处理：根据产品代码特征判断（实际应该查数据库）
+        if hasattr(product_code, 'startswith'):
+            if product_code.startswith('F2024'):
+                months_since_launch = 3  # 假设2024年产品是新品
+            elif product_code.startswith('F2023'):
+                months_since_launch = 12  # 2023年产品进入成长期
+            elif product_code.startswith('F2022'):
+                months_since_launch = 24  # 2022年产品进入成熟期
+            else:
+                months_since_launch = 60  # 更早产品进入衰退期
+        else:
+            months_since_launch = 24  # 默认成熟期
+
+        # 确定生命周期阶段
+        for stage, config in self.product_lifecycle_config.items():
+            min_months, max_months = config["months_range"]
+            if min_months <= months_since_launch < max_months:
+                return stage, config
+
+        return "成熟期", self.product_lifecycle_config["成熟期"]
+
+    def build_sales_index(self, shipment_df) -> Dict:
+        """按(产品代码, 申请人, 年月)汇总出货数量，同一份出货数据只汇总一次"""
+        if self._sales_index_source is not shipment_df:
+            monthly_sales = shipment_df['数量'].groupby(
+                [shipment_df['产品代码'], shipment_df['申请人'], shipment_df['订单日期'].dt.to_period('M')],
+                observed=True
+            ).sum()
+            self._sales_index = dict(zip(monthly_sales.index, monthly_sales.tolist()))
+            self._sales_index_source = shipment_df
+        return self._sales_index
+
+    def _month_window(self, target_month) -> list:
+        """目标月份及后续2个月的(月份, 'YYYY-MM')，同一目标月份只计算一次"""
+        window = self._month_windows.get(target_month)
+        if window is None:
+            target_period = pd.Period(target_month, freq='M')
+            window = [(target_period + month_offset, str(target_period + month_offset)) for month_offset in range(3)]
+            self._month_windows[target_month] = window
+        return window
+
+    def calculate_cross_month_sales(self, shipment_df, product_code, person_name, target_month):
+        """计算跨月销售数据 - 从按产品、人员、月份汇总的索引中查询"""
+        if shipment_df is not self._sales_index_source and (shipment_df is None or shipment_df.empty):
+            return 0, {}
+
+        sales_index = self.build_sales_index(shipment_df)
+
+        # 计算目标月份及后续2个月的销售
+        monthly_sales = {}
+        total_weighted_sales = 0
+
+        for month_offset, (check_period, month_label) in enumerate(self._month_window(target_month)):
+            # 该月该人该产品的销售数量
+            month_total = sales_index.get((product_code, person_name, check_period), 0)
+            monthly_sales[month_label] = month_total
+
+            # 应用权重计算
+            weight = self.cross_month_weights.get(month_offset, 0)
+            total_weighted_sales += month_total * weight
+
+        return total_weighted_sales, monthly_sales
+
+    def analyze_responsibility_collaborative(self, product_code, batch_date, product_sales_metrics,
+                                             forecast_info, orders_history, batch_qty=0,
+                                             sales_person_region_mapping=None, shipment_df=None):
+        """改进的责任归属分析 - 使用真实销售数据替换模拟数据"""
+        today = self.as_of or datetime.now().date()
+        batch_date = batch_date.date() if hasattr(batch_date, 'date') else batch_date
+
+        # 默认责任映射
+        default_mapping = {"region": self.default_region, "person": self.default_person}
+
+        if sales_person_region_mapping is None:
+            sales_person_region_mapping = {}
+
+        # 1. 获取批次生产月份
+        batch_month = pd.Period(batch_date, freq='M')
+
+        # 2. 初始化责任评分系统
+        person_scores = {}
+        region_scores = {}
+        responsibility_details = {}
+
+        # 3. 预测与实际销售差异分析 (60%) - 使用真实数据
+        forecast_sales_discrepancy_weight = 0.60
+        forecast_responsibility_details = {}
+
+        # 获取产品生命周期信息
+        lifecycle_stage, lifecycle_config = self.get_product_lifecycle_stage(product_code, today)
+
+        if forecast_info and 'person_forecast' in forecast_info and shipment_df is not None:
+            person_forecast_totals = forecast_info['person_forecast']
+            total_forecast = sum(person_forecast_totals.values())
+
+            # 🔧 核心修复：使用真实销售数据替代模拟数据
+            person_sales = {}
+            person_sales_details = {}
+
+            for person in person_forecast_totals.keys():
+                # 获取人员状态
+                staff_status = self.get_staff_status(person)
+
+                # 计算跨月销售（当月+后续2月的加权销售）
+                weighted_sales, monthly_breakdown = self.calculate_cross_month_sales(
+                    shipment_df, product_code, person, batch_month
+                )
+
+                person_sales[person] = weighted_sales
+                person_sales_details[person] = {
+                    "monthly_breakdown": monthly_breakdown,
+                    "weighted_total": weighted_sales,
+                    "staff_status": staff_status,
+                    "lifecycle_stage": lifecycle_stage
+                }
+
+            # 计算整体履行率
+            overall_fulfillment_rate = sum(person_sales.values()) / total_forecast if total_forecast > 0 else 1.0
+
+            responsibility_details["overall_analysis"] = {
+                "total_forecast": total_forecast,
+                "total_sales": sum(person_sales.values()),
+                "fulfillment_rate": overall_fulfillment_rate,
+                "batch_month": str(batch_month),
+                "lifecycle_stage": lifecycle_stage,
+                "lifecycle_tolerance": lifecycle_config["tolerance"]
+            }
+
+            # 应用生命周期容忍度
+            adjusted_threshold = 0.8 * lifecycle_config["tolerance"]
+
+            if overall_fulfillment_rate < adjusted_threshold:
+                for person, forecast_qty in person_forecast_totals.items():
+                    forecast_proportion = forecast_qty / total_forecast
+                    actual_sales = person_sales.get(person, 0)
+                    fulfillment_rate = actual_sales / forecast_qty if forecast_qty > 0 else 1.0
+
+                    # 应用生命周期权重调整
+                    lifecycle_weight = lifecycle_config["weight"]
+                    base_score = (1 - fulfillment_rate) * forecast_proportion * lifecycle_weight
+
+                    if forecast_proportion > 0.5:
+                        adjusted_score = base_score * (2.0 if fulfillment_rate < 0.6 else 1.5)
+                    elif forecast_proportion > 0.2:
+                        adjusted_score = base_score * (1.5 if fulfillment_rate < 0.6 else 1.2)
+                    else:
+                        adjusted_score = base_score * 1.0
+
+                    final_score = adjusted_score * forecast_sales_discrepancy_weight
+                    person_scores[person] = person_scores.get(person, 0) + final_score
+
+                    person_region = sales_person_region_mapping.get(person, default_mapping["region"])
+                    region_scores[person_region] = region_scores.get(person_region, 0) + (final_score * 0.8)
+
+                    forecast_responsibility_details[person] = {
+                        "forecast_quantity": forecast_qty,
+                        "forecast_proportion": forecast_proportion,
+                        "actual_sales": actual_sales,
+                        "fulfillment_rate": fulfillment_rate,
+                        "responsibility_score": final_score,
+                        "lifecycle_adjustment": lifecycle_weight,
+                        "sales_details": person_sales_details.get(person, {}),
+                        "staff_status": self.get_staff_status(person)
+                    }
+
+        responsibility_details["forecast_responsibility"] = forecast_responsibility_details
+
+        # 4. 库存责任分配机制（保持原有逻辑）
+        person_allocations = {}
+        if forecast_responsibility_details and batch_qty > 0:
+            forecast_deltas = {}
+            total_delta = 0
+
+            for person, details in forecast_responsibility_details.items():
+                forecast_qty = details.get("forecast_quantity", 0)
+                actual_sales = details.get("actual_sales", 0)
+                delta = max(0, forecast_qty - actual_sales)
+
+                if delta > 0:
+                    forecast_deltas[person] = delta
+                    total_delta += delta
+
+            if total_delta > 0:
+                allocated_total = 0
+                for person, delta in forecast_deltas.items():
+                    proportion = delta / total_delta
+                    allocation = int(batch_qty * proportion)
+                    allocation = max(1, allocation)
+                    allocation = min(allocation, batch_qty - allocated_total)
+
+                    person_allocations[person] = allocation
+                    allocated_total += allocation
+
+                remaining_qty = batch_qty - allocated_total
+                if remaining_qty > 0 and forecast_deltas:
+                    sorted_forecast_persons = sorted(forecast_deltas.items(), key=lambda x: x[1], reverse=True)
+                    person_allocations[sorted_forecast_persons[0][0]] += remaining_qty
+            else:
+                person_allocations[default_mapping["person"]] = batch_qty
+        else:
+            person_allocations[default_mapping["person"]] = batch_qty
+
+        # 5. 确定责任人（处理人员变动）
+        if person_allocations:
+            primary_person = max(person_allocations.items(), key=lambda x: x[1])[0]
+
+            # 检查人员状态
+            staff_status = self.get_staff_status(primary_person)
+            if staff_status["status"] == "离职" and staff_status["replacement"]:
+                responsible_person = staff_status["replacement"]
+            elif staff_status["status"] == "调岗" and staff_status["replacement"]:
+                responsible_person = staff_status["replacement"]
+            else:
+                responsible_person = primary_person
+
+            if responsible_person in sales_person_region_mapping:
+                responsible_region = sales_person_region_mapping[responsible_person]
+            else:
+                responsible_region = default_mapping["region"]
+        else:
+            responsible_person = default_mapping["person"]
+            responsible_region = default_mapping["region"]
+
+        # 如果是系统管理员，区域为空
+        if responsible_person == self.default_person:
+            responsible_region = ""
+
+        responsible_persons = list(person_allocations.keys())
+        secondary_persons = [p for p in responsible_persons if p != responsible_person]
+
+        # 构建责任分析详情
+        responsibility_analysis = {
+            "responsible_person": responsible_person,
+            "responsible_region": responsible_region,
+            "responsible_persons": responsible_persons,
+            "secondary_persons": secondary_persons,
+            "person_scores": person_scores,
+            "region_scores": region_scores,
+            "responsibility_details": responsibility_details,
+            "quantity_allocation": {
+                "batch_qty": batch_qty,
+                "person_allocations": person_allocations,
+                "allocation_logic": "基于真实销售数据的责任库存分配，考虑跨月销售和生命周期"
+            },
+            "batch_info": {
+                "batch_date": batch_date,
+                "batch_age": (today - batch_date).days,
+                "batch_qty": batch_qty,
+                "batch_month": str(batch_month),
+                "lifecycle_stage": lifecycle_stage
+            }
+        }
+
+        return (responsible_region, responsible_person, responsibility_analysis)
+
+    def generate_responsibility_summary_collaborative(self, responsibility_analysis):
+        """生成责任分析摘要 - 增强版本包含真实数据信息"""
+        if not responsibility_analysis:
+            return "无法确定责任"
+
+        responsible_person = responsibility_analysis.get("responsible_person", self.default_person)
+        responsibility_details = responsibility_analysis.get("responsibility_details", {})
+        lifecycle_stage = responsibility_analysis.get("batch_info", {}).get("lifecycle_stage", "未知")
+        person_allocations = responsibility_analysis.get("quantity_allocation", {}).get("person_allocations", {})
+        forecast_responsibility = responsibility_details.get("forecast_responsibility", {})
+
+        # 获取主要责任人的跨月销售详情
+        monthly_breakdown = forecast_responsibility.get(responsible_person, {}).get("sales_details", {}).get(
+            "monthly_breakdown", {})
+
+        return self._compose_responsibility_summary(responsible_person, person_allocations, forecast_responsibility,
+                                                    monthly_breakdown, lifecycle_stage)
+
+    def generate_responsibility_summaries(self, batches, responsibility) -> list:
+        """按责任归属长表生成批次的责任分析摘要，返回与batches行顺序一致的列表
+
+        batches为含批次ID、责任人、生命周期阶段列的批次表（可以只传需要显示的行），
+        responsibility为attribute_batches返回的长表，只读取这些批次的行。
+        """
+        batch_ids = batches['批次ID']
+        allocations = responsibility['allocations']
+        allocations = allocations[allocations['批次ID'].isin(batch_ids)]
+        forecasts = responsibility['forecasts']
+        forecasts = forecasts[forecasts['批次ID'].isin(batch_ids)]
+        # 跨月销量只用到各批次主要责任人的行
+        months = responsibility['months']
+        months = months[pd.MultiIndex.from_arrays([months['批次ID'], months['责任人'].astype(object)]).isin(
+            pd.MultiIndex.from_arrays([batch_ids, batches['责任人'].astype(object)]))]
+
+        # 长表按批次还原为各人员的分配数量和预测履行情况（保持分析时的人员顺序）
+        batch_allocations = {}
+        for batch_id, person, quantity in zip(allocations['批次ID'].tolist(), allocations['责任人'],
+                                              allocations['分配数量'].tolist()):
+            batch_allocations.setdefault(batch_id, {})[person] = quantity
+
+        batch_forecasts = {}
+        for batch_id, person, forecast_qty, actual_sales, fulfillment_rate in zip(
+                forecasts['批次ID'].tolist(), forecasts['责任人'], forecasts['预测数量'].tolist(),
+                forecasts['加权销售'].tolist(), forecasts['履行率'].tolist()):
+            batch_forecasts.setdefault(batch_id, {})[person] = {
+                "forecast_quantity": forecast_qty,
+                "actual_sales": actual_sales,
+                "fulfillment_rate": fulfillment_rate
+            }
+
+        person_months = {}
+        for batch_id, person, month, quantity in zip(months['批次ID'].tolist(), months['责任人'], months['月份'],
+                                                     months['销量'].tolist()):
+            person_months.setdefault((batch_id, person), {})[month] = quantity
+
+        return [
+            self._compose_responsibility_summary(person, batch_allocations.get(batch_id, {}),
+                                                 batch_forecasts.get(batch_id, {}),
+                                                 person_months.get((batch_id, person), {}), lifecycle_stage)
+            for batch_id, person, lifecycle_stage in zip(batch_ids.tolist(), batches['责任人'],
+                                                         batches['生命周期阶段'])
+        ]
+
+    def _compose_responsibility_summary(self, responsible_person, person_allocations, forecast_responsibility,
+                                        monthly_breakdown, lifecycle_stage) -> str:
+        """组合责任分析摘要文本（主要责任人的原因、其他责任人按承担数量降序、生命周期）"""
+        # 构建主要责任人的责任原因
+        main_person_reasons = []
+
+        if responsible_person in forecast_responsibility:
+            person_forecast = forecast_responsibility[responsible_person]
+            forecast_qty = person_forecast.get("forecast_quantity", 0)
+            actual_sales = person_forecast.get("actual_sales", 0)
+            fulfillment = person_forecast.get("fulfillment_rate", 1.0) * 100
+            unfulfilled = max(0, forecast_qty - actual_sales)
+
+            if forecast_qty > 0:
+                main_person_reasons.append(
+                    f"预测{forecast_qty:.0f}件但实际加权销售{actual_sales:.0f}件(履行率{fulfillment:.0f}%)")
+
+                if monthly_breakdown:
+                    breakdown_text = "，".join(
+                        [f"{month}:{qty:.0f}件" for month, qty in monthly_breakdown.items() if qty > 0])
+                    if breakdown_text:
+                        main_person_reasons.append(f"销售分布({breakdown_text})")
+
+            if unfulfilled > 0:
+                main_person_reasons.append(f"未兑现预测{unfulfilled:.0f}件")
+
+        if not main_person_reasons:
+            main_person_reasons.append(f"综合预测与销售因素(产品{lifecycle_stage})")
+
+        # 构建其他责任人的摘要（分配了库存的其他人员）
+        other_persons_data = []
+        for person, allocated_qty in person_allocations.items():
+            if person != responsible_person:
+                reason = ""
+
+                if person in forecast_responsibility:
+                    forecast_info = forecast_responsibility[person]
+                    forecast_qty = forecast_info.get("forecast_quantity", 0)
+                    actual_sales = forecast_info.get("actual_sales", 0)
+                    unfulfilled = max(0, forecast_qty - actual_sales)
+
+                    if unfulfilled > 0:
+                        reason = f"未兑现预测{unfulfilled:.0f}件"
+                    else:
+                        reason = "责任共担"
+                else:
+                    reason = "责任共担"
+
+                other_persons_data.append((person, reason, allocated_qty))
+
+        # 按库存数量降序排序
+        other_persons_data.sort(key=lambda x: x[2], reverse=True)
+        other_persons_summary = [f"{person}({reason}，承担{qty:.0f}件)" for person, reason, qty in other_persons_data]
+
+        # 生成最终摘要
+        main_reason = "、".join(main_person_reasons)
+
+        if responsible_person in person_allocations and person_allocations[responsible_person] > 0:
+            main_responsibility_qty = person_allocations[responsible_person]
+            main_person_with_qty = f"{responsible_person}主要责任({main_reason}，承担{main_responsibility_qty:.0f}件)"
+        else:
+            main_person_with_qty = f"{responsible_person}主要责任({main_reason}，承担0件)"
+
+        if other_persons_summary:
+            others_text = "，".join(other_persons_summary)
+            summary = f"{main_person_with_qty}，共同责任：{others_text}"
+        else:
+            summary = main_person_with_qty
+
+        # 添加生命周期信息
+        summary += f" [产品{lifecycle_stage}]"
+
+        return summary
+
+
+def simplify_product_name(product_name):
+    """简化产品名称：去掉'口力'和'-中国'"""
+    if pd.isna(product_name):
+        return product_name
+
+    simplified = str(product_name)
+    # 去掉"口力"
+    simplified = simplified.replace('口力', '')
+    # 去掉"-中国"
+    simplified = simplified.replace('-中国', '')
+    # 去掉开头的空格
+    simplified = simplified.strip()
+
+    return simplified
+
+
+def format_forecast_bias(forecast_bias) -> str:
+    """把预测偏差格式化为百分比文字"""
+    if forecast_bias == float('inf'):
+        return "无穷大"
+    elif forecast_bias == 0:
+        return "0%"
+    return f"{round(forecast_bias * 100, 1)}%"
+
+
+# 批次表的列（按顺序）
+BATCH_COLUMNS = ['物料', '描述', '单价', '生产日期', '生产批号', '数量']
+
+# 单价表中找不到的产品使用的默认单价
+DEFAULT_UNIT_PRICE = 100
+
+
+def _is_product_row(value) -> bool:
+    """物料列是否为产品行（以F开头的产品代码）"""
+    return isinstance(value, str) and value.startswith('F')
+
+
+def build_unit_price_lookup(price_df) -> pd.Series:
+    """产品代码 -> 单价（同一产品有多行时取第一行）"""
+    unit_prices = price_df.drop_duplicates('产品代码', keep='first')
+    return pd.Series(unit_prices['单价'].to_numpy(), index=pd.Index(unit_prices['产品代码'].astype(object)))
+
+
+def build_product_name_map(inventory_df) -> Dict[str, str]:
+    """产品代码 -> 简化名称（含批次库存表中有描述的产品行，同一产品有多行时取最后一行）"""
+    is_product = inventory_df['物料'].astype(object).map(_is_product_row).astype(bool) & inventory_df['描述'].notna()
+    codes = inventory_df.loc[is_product, '物料'].astype(object)
+    descriptions = inventory_df.loc[is_product, '描述'].astype(object)
+    return dict(zip(codes, descriptions.map(simplify_product_name)))
+
+
+def parse_batch_chunk(chunk, unit_prices, carry=None) -> tuple:
+    """解析含批次库存表的一段：产品行下面的批次行继承该产品的代码、名称和单价
+
+    carry为上一段最后一个产品行的(物料, 描述, 单价)，返回(批次表, 本段结束时的carry)。
+    """
+    chunk = chunk.reset_index(drop=True)
+    is_product = chunk['物料'].astype(object).map(_is_product_row).astype(bool).to_numpy()
+
+    # 产品行的代码、简化名称和单价（按行号索引）
+    product_codes = chunk.loc[is_product, '物料'].astype(object)
+    has_price = product_codes.isin(unit_prices.index)
+    products = pd.DataFrame({
+        '物料': product_codes,
+        '描述': chunk.loc[is_product, '描述'].astype(object).map(simplify_product_name),
+        '单价': product_codes.map(unit_prices).where(has_price, DEFAULT_UNIT_PRICE).astype(float)
+    })
+    if carry is not None:
+        products.loc[-1] = list(carry)
+
+    # 每行所属的产品行号：向下填充最近的产品行，段首的批次行属于上一段最后一个产品（行号-1）
+    product_position = pd.Series(np.where(is_product, np.arange(len(chunk)), np.nan)).ffill()
+    if carry is not None:
+        product_position = product_position.fillna(-1)
+
+    is_batch = ~is_product & chunk['生产日期'].notna().to_numpy() & product_position.notna().to_numpy()
+    batches = chunk.loc[is_batch]
+    owners = products.loc[product_position[is_batch].to_numpy().astype(int)]
+    batch_table = pd.DataFrame({
+        '物料': owners['物料'].to_numpy(),
+        '描述': owners['描述'].to_numpy(),
+        '单价': owners['单价'].to_numpy(dtype=float),
+        '生产日期': pd.to_datetime(batches['生产日期'], format='mixed').to_numpy(),
+        '生产批号': batches['生产批号'].astype(object).where(batches['生产批号'].notna(), '').to_numpy(),
+        '数量': batches['数量'].fillna(0).to_numpy(dtype=float)
+    }, columns=BATCH_COLUMNS)
+
+    if is_product.any():
+        carry = tuple(products.loc[np.flatnonzero(is_product)[-1]])
+    return batch_table, carry
+
+
+def iter_batch_rows(chunks, price_df):
+    """逐段解析含批次库存数据（chunks为DataFrame的可迭代对象），逐段产出批次表"""
+    unit_prices = build_unit_price_lookup(price_df)
+    carry = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        batch_table, carry = parse_batch_chunk(chunk, unit_prices, carry)
+        yield batch_table
+
+
+@perf_monitor.profile()
+def parse_batch_rows(inventory_df, price_df) -> pd.DataFrame:
+    """把含批次库存表解析为批次表：每个批次一行，带产品代码、名称、单价、生产日期、批号和数量"""
+    unit_prices = build_unit_price_lookup(price_df)
+    batch_table, _ = parse_batch_chunk(inventory_df, unit_prices)
+    return batch_table
+
+
+def _rows_to_frame(rows, columns) -> pd.DataFrame:
+    """把读取的单元格值转为DataFrame，空字符串与pd.read_excel一样视为缺失"""
+    return pd.DataFrame(rows, columns=columns).replace('', np.nan)
+
+
+def read_inventory_chunks(path: str, chunksize: int = 50000):
+    """分段读取库存导出文件（xlsx或csv），不把整个文件读入内存，可配合iter_batch_rows使用"""
+    if path.lower().endswith('.csv'):
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        columns = list(next(rows, []))
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunksize:
+                yield _rows_to_frame(buffer, columns)
+                buffer = []
+        if buffer:
+            yield _rows_to_frame(buffer, columns)
+    finally:
+        workbook.close()
+
+
+# 没有销售记录或预测记录的产品使用的默认值
+DEFAULT_SALES_METRICS = {
+    'daily_avg_sales': 0,
+    'sales_std': 0,
+    'coefficient_of_variation': float('inf'),
+    'total_sales': 0,
+    'last_90_days_sales': 0
+}
+DEFAULT_FORECAST_INFO = {
+    'forecast_bias': 0.0,
+    'person_forecast': {}
+}
+
+# 批次数少于该值时串行做责任归属分析（进程启动和传输查询表的开销大于并行收益）
+PARALLEL_ATTRIBUTION_MIN_BATCHES = 5000
+
+# 进程池中每个任务处理的批次数
+ATTRIBUTION_CHUNK_SIZE = 1000
+
+# 责任归属长表的列，各表按批次ID与批次表关联（一个批次在每张表中有多行）
+# allocations: 各人员分配的责任库存；forecasts: 各预测人员的预测与履行情况；months: 各预测人员的跨月销量
+RESPONSIBILITY_COLUMNS = {
+    'allocations': ['批次ID', '责任人', '分配数量'],
+    'forecasts': ['批次ID', '责任人', '预测数量', '预测占比', '加权销售', '履行率', '责任得分', '生命周期调整',
+                  '人员状态'],
+    'months': ['批次ID', '责任人', '月份', '销量']
+}
+
+# 子进程中的只读查询表，由进程池初始化函数设置一次，之后各任务共用
+_attribution_tables = {}
+
+
+def _attribute_serial(batches, product_sales_metrics, forecast_accuracy, sales_person_region_mapping, shipment_df,
+                      analyzer) -> tuple:
+    """逐个批次做责任归属分析，把嵌套的分析结果展开为长表行
+
+    batches为(批次ID, 物料, 生产日期, 数量)序列。返回(assignments, rows)：assignments为与batches顺序一致的
+    (责任区域, 责任人, 生命周期阶段)，rows为RESPONSIBILITY_COLUMNS中各表的行列表。
+    """
+    assignments = []
+    rows = {table: [] for table in RESPONSIBILITY_COLUMNS}
+    for batch_id, material, prod_date, quantity in batches:
+        # 🔧 核心修复：传入shipment_df参数，使用真实数据进行责任归属分析
+        responsible_region, responsible_person, responsibility_analysis = analyzer.analyze_responsibility_collaborative(
+            material, prod_date, product_sales_metrics.get(material, DEFAULT_SALES_METRICS),
+            forecast_accuracy.get(material, DEFAULT_FORECAST_INFO), None, quantity,
+            sales_person_region_mapping, shipment_df  # 🔧 添加shipment_df参数
+        )
+        assignments.append((responsible_region, responsible_person,
+                            responsibility_analysis['batch_info']['lifecycle_stage']))
+
+        for person, allocation in responsibility_analysis['quantity_allocation']['person_allocations'].items():
+            rows['allocations'].append((batch_id, person, allocation))
+
+        forecast_responsibility = responsibility_analysis['responsibility_details']['forecast_responsibility']
+        for person, details in forecast_responsibility.items():
+            rows['forecasts'].append((batch_id, person, details['forecast_quantity'], details['forecast_proportion'],
+                                      details['actual_sales'], details['fulfillment_rate'],
+                                      details['responsibility_score'], details['lifecycle_adjustment'],
+                                      details['staff_status']['status']))
+            for month, month_sales in details['sales_details']['monthly_breakdown'].items():
+                rows['months'].append((batch_id, person, month, month_sales))
+    return assignments, rows
+
+
+def _init_attribution_worker(tables: Dict, parameters: Dict, as_of):
+    """子进程初始化：保存查询表，并按父进程的分析参数和基准日期创建本进程共用的分析器（跨月销售索引在第一个任务中建立一次）"""
+    _attribution_tables.update(tables)
+    _attribution_tables['analyzer'] = BatchLevelInventoryAnalyzer(as_of)
+    _attribution_tables['analyzer'].set_parameters(parameters)
+
+
+def _attribute_chunk(batches) -> tuple:
+    """子进程任务：对一段批次做责任归属分析"""
+    return _attribute_serial(batches, **_attribution_tables)
+
+
+def _responsibility_frames(rows: Dict[str, list]) -> Dict[str, pd.DataFrame]:
+    """把长表行组装为DataFrame（人员、月份和人员状态为分类列，数值列为float）"""
+    frames = {}
+    for table, columns in RESPONSIBILITY_COLUMNS.items():
+        frame = pd.DataFrame(rows[table], columns=columns)
+        frames[table] = frame.astype({column: 'category' if column in ('责任人', '月份', '人员状态') else float
+                                      for column in columns[1:]}).astype({'批次ID': 'int64'})
+    return frames
+
+
+@perf_monitor.profile()
+def attribute_batches(batches, product_sales_metrics, forecast_accuracy, sales_person_region_mapping, shipment_df,
+                      parallel: bool = True, workers: int = None, analyzer=None) -> tuple:
+    """对所有批次做责任归属分析，返回(assignments, responsibility)
+
+    batches为(物料, 生产日期, 数量)序列，批次ID为其在序列中的位置。assignments为与batches顺序一致的
+    (责任区域, 责任人, 生命周期阶段)列表；responsibility为RESPONSIBILITY_COLUMNS中的各张长表，
+    责任分析摘要和明细在需要显示时再按批次ID从中读取（generate_responsibility_summaries）。
+
+    批次数达到PARALLEL_ATTRIBUTION_MIN_BATCHES且有多个CPU时，按ATTRIBUTION_CHUNK_SIZE分段在进程池中处理，
+    查询表在每个子进程中只传输一次；进程池不可用时退回串行。workers可指定进程数（默认按CPU数）；
+    analyzer可传入调整过参数的分析器（默认使用默认参数）。
+    """
+    analyzer = analyzer or BatchLevelInventoryAnalyzer()
+    batches = [(batch_id, *batch) for batch_id, batch in enumerate(batches)]
+    tables = {
+        'product_sales_metrics': product_sales_metrics,
+        'forecast_accuracy': forecast_accuracy,
+        'sales_person_region_mapping': sales_person_region_mapping,
+        # 责任归属只用到出货数据的这四列
+        'shipment_df': shipment_df[['订单日期', '申请人', '产品代码', '数量']]
+    }
+    chunks = [batches[start:start + ATTRIBUTION_CHUNK_SIZE] for start in range(0, len(batches), ATTRIBUTION_CHUNK_SIZE)]
+    workers = workers or worker_count(len(chunks))
+
+    results = None
+    if parallel and len(batches) >= PARALLEL_ATTRIBUTION_MIN_BATCHES and workers > 1:
+        try:
+            # 使用spawn避免在多线程的Streamlit服务进程中fork
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_attribution_worker,
+                                     initargs=(tables, analyzer.get_parameters(), analyzer.as_of)) as executor:
+                results = list(executor.map(_attribute_chunk, chunks))
+        except Exception as e:
+            logger.warning(f"责任归属并行处理失败，改为串行: {e}")
+
+    if results is None:
+        results = [_attribute_serial(batches, analyzer=analyzer, **tables)]
+
+    assignments = [assignment for chunk_assignments, _ in results for assignment in chunk_assignments]
+    rows = {table: [row for _, chunk_rows in results for row in chunk_rows[table]] for table in RESPONSIBILITY_COLUMNS}
+    return assignments, _responsibility_frames(rows)
+
+
+def batch_responsibility_detail(responsibility, batch_id) -> pd.DataFrame:
+    """单个批次的责任明细：每个相关人员一行，含分配数量、预测与履行情况和各月销量（从长表中按批次ID关联）"""
+    allocations = responsibility['allocations']
+    allocations = allocations.loc[allocations['批次ID'] == batch_id, ['责任人', '分配数量']]
+    forecasts = responsibility['forecasts']
+    forecasts = forecasts.loc[forecasts['批次ID'] == batch_id].drop(columns='批次ID')
+    months = responsibility['months']
+    months = months.loc[months['批次ID'] == batch_id].astype({'责任人': object})
+    months = months.pivot(index='责任人', columns='月份', values='销量')
+
+    detail = allocations.astype({'责任人': object}).merge(forecasts.astype({'责任人': object}), on='责任人',
+                                                         how='outer', sort=False)
+    return detail.merge(months, left_on='责任人', right_index=True, how='left')
+
+
+@perf_monitor.profile()
+def calculate_product_sales_metrics(shipment_df, product_codes, today) -> Dict[str, Dict]:
+    """计算各产品的日均销量、日销量标准差、变异系数、总销量和近90天销量
+
+    对出货数据按产品分组一次完成所有产品的计算（不再逐个产品筛选全表），结果与逐个产品计算一致；
+    没有出货记录的产品日均和标准差为0、变异系数为inf。
+    """
+    product_key = shipment_df['产品代码']
+    quantity = shipment_df['数量']
+    order_day = shipment_df['订单日期'].dt.normalize()
+
+    total_sales = quantity.groupby(product_key, observed=True).sum()
+    first_day = order_day.groupby(product_key, observed=True).min()
+    days_range = (pd.Timestamp(today) - first_day).dt.days + 1
+
+    recent_mask = (order_day >= pd.Timestamp(today - timedelta(days=90))) & (order_day <= pd.Timestamp(today))
+    recent_sales = quantity[recent_mask].groupby(product_key[recent_mask], observed=True).sum()
+
+    daily_sales = quantity.groupby([product_key, order_day], observed=True).sum()
+    daily_groups = daily_sales.groupby(level=0, observed=True)
+    sales_std = daily_groups.std()
+    sales_days = daily_groups.size()
+
+    # 转成字典后逐个产品组装结果（保持numpy标量类型，与逐个产品计算时一致）
+    total_sales = dict(zip(total_sales.index, total_sales.to_numpy()))
+    days_range = dict(zip(days_range.index, days_range.to_numpy()))
+    recent_sales = dict(zip(recent_sales.index, recent_sales.to_numpy()))
+    sales_std = dict(zip(sales_std.index, sales_std.to_numpy()))
+    sales_days = dict(zip(sales_days.index, sales_days.to_numpy()))
+
+    product_sales_metrics = {}
+    for product_code in product_codes:
+        if product_code not in total_sales:
+            product_sales_metrics[product_code] = {
+                'daily_avg_sales': 0,
+                'sales_std': 0,
+                'coefficient_of_variation': float('inf'),
+                'total_sales': 0,
+                'last_90_days_sales': 0
+            }
+            continue
+
+        product_total = total_sales[product_code]
+        product_days = days_range[product_code]
+        daily_avg_sales = product_total / product_days if product_days > 0 else 0
+        product_std = sales_std[product_code] if sales_days[product_code] > 1 else 0
+
+        product_sales_metrics[product_code] = {
+            'daily_avg_sales': daily_avg_sales,
+            'sales_std': product_std,
+            'coefficient_of_variation': product_std / daily_avg_sales if daily_avg_sales > 0 else float('inf'),
+            'total_sales': product_total,
+            'last_90_days_sales': recent_sales.get(product_code, 0)
+        }
+
+    return product_sales_metrics
+
+
+@perf_monitor.profile()
+def build_monthly_cubes(shipment_df, forecast_df) -> Dict[str, pd.Series]:
+    """按月汇总出货和预测数据，供季节性指数、预测偏差和销售员预测量直接查询
+
+    返回:
+        'sales': (产品代码, 年月) -> 出货数量
+        'forecast': (产品代码, 年月, 销售员) -> 预计销售量，各产品内按销售员在预测数据中首次出现的顺序排列
+    """
+    sales = shipment_df['数量'].groupby(
+        [shipment_df['产品代码'], shipment_df['订单日期'].dt.to_period('M').rename('年月')],
+        observed=True
+    ).sum()
+
+    # 保留缺失年月的预测行：它们计入预测总量，但对应不到任何实际销售
+    forecast = forecast_df['预计销售量'].groupby(
+        [forecast_df['产品代码'], forecast_df['所属年月'].dt.to_period('M').rename('年月'), forecast_df['销售员']],
+        observed=True, sort=False, dropna=False
+    ).sum()
+
+    return {'sales': sales, 'forecast': forecast}
+
+
+def calculate_seasonal_indices(sales_cube, product_codes, current_month, min_seasonal_index) -> Dict[str, float]:
+    """计算各产品当前月份的季节性指数（当月销量 / 有销量月份的月均销量，按自然月合并各年）"""
+    products = sales_cube.index.get_level_values(0)
+    calendar_month = sales_cube.index.get_level_values(1).month
+    monthly_sales = sales_cube.groupby([products, calendar_month], observed=True).sum()
+
+    month_groups = monthly_sales.groupby(level=0, observed=True)
+    month_counts = month_groups.size()
+    avg_monthly_sales = month_groups.mean()
+    month_counts = dict(zip(month_counts.index, month_counts.to_numpy()))
+    avg_monthly_sales = dict(zip(avg_monthly_sales.index, avg_monthly_sales.to_numpy()))
+    current_sales = monthly_sales[monthly_sales.index.get_level_values(1) == current_month]
+    current_sales = dict(zip(current_sales.index.get_level_values(0), current_sales.to_numpy()))
+
+    seasonal_indices = {}
+    for product_code in product_codes:
+        if month_counts.get(product_code, 0) > 1 and product_code in current_sales:
+            seasonal_index = current_sales[product_code] / avg_monthly_sales[product_code]
+        else:
+            seasonal_index = 1.0
+        seasonal_indices[product_code] = max(seasonal_index, min_seasonal_index)
+
+    return seasonal_indices
+
+
+def calculate_forecast_accuracy(cubes, product_codes, shipment_persons, analyzer) -> Dict[str, Dict]:
+    """计算各产品的预测偏差和各销售员的预测量（只统计在出货数据中有记录的销售员）
+
+    预测量为该产品全部预测之和，实际销量为该产品有预测的各月份出货之和。
+    """
+    forecast_cube = cubes['forecast']
+    sales_cube = cubes['sales']
+
+    product_month_forecast = forecast_cube.groupby(level=[0, 1], observed=True, sort=False, dropna=False).sum()
+    forecast_quantity = product_month_forecast.groupby(level=0, observed=True).sum()
+    actual_sales = sales_cube.reindex(product_month_forecast.index, fill_value=0).groupby(level=0, observed=True).sum()
+    forecast_quantity = dict(zip(forecast_quantity.index, forecast_quantity.to_numpy()))
+    actual_sales = dict(zip(actual_sales.index, actual_sales.to_numpy()))
+
+    person_forecast_cube = forecast_cube.groupby(level=[0, 2], observed=True, sort=False).sum()
+    person_forecast_cube = person_forecast_cube[person_forecast_cube.index.get_level_values(1).isin(shipment_persons)]
+    person_forecasts = {}
+    for (product_code, person), quantity in zip(person_forecast_cube.index, person_forecast_cube.tolist()):
+        person_forecasts.setdefault(product_code, {})[person] = quantity
+
+    forecast_accuracy = {}
+    for product_code in product_codes:
+        if product_code in forecast_quantity:
+            forecast_bias = analyzer.calculate_forecast_bias(forecast_quantity[product_code],
+                                                             actual_sales.get(product_code, 0))
+        else:
+            forecast_bias = 0.0
+
+        forecast_accuracy[product_code] = {
+            'forecast_bias': forecast_bias,
+            'person_forecast': person_forecasts.get(product_code, {})
+        }
+
+    return forecast_accuracy
+
+
+@perf_monitor.profile()
+def prepare_inventory_inputs(registry=dataset_registry, as_of=None) -> Dict:
+    """读取数据并计算不依赖分析参数的中间结果，供风险评分和责任归属分析使用（参数模拟时直接复用）
+
+    as_of为分析基准日期（默认当天），库龄、近90天销量和季节性月份都以它为准；
+    回放历史日期时，晚于基准日期的出货记录和生产批次不参与计算。
+
+    返回:
+        'batches': 批次表（批次ID为行位置），含库龄、日均出货、出货波动系数、未设下限的季节性指数和预测偏差
+        'product_sales_metrics' / 'forecast_accuracy' / 'sales_person_region_mapping': 责任归属分析的查询表
+        'shipment_df' / 'forecast_df' / 'product_name_map': 处理后的出货、预测数据和产品名称映射
+        'as_of': 分析基准日期
+    """
+    # 从共享数据集注册中心获取（每个工作簿每个进程只解析一次，需要解析时四个文件并行解析）
+    frames = registry.get_many(INVENTORY_DATASETS)
+    shipment_df = frames['shipments']
+    forecast_df = frames['manual_forecast']
+    inventory_df = frames['batch_inventory']
+    price_df = frames['unit_price']
+
+    # 处理日期
+    shipment_df['订单日期'] = pd.to_datetime(shipment_df['订单日期'])
+    shipment_df.columns = ['订单日期', '所属区域', '申请人', '产品代码', '数量']
+
+    forecast_df['所属年月'] = pd.to_datetime(forecast_df['所属年月'])
+    forecast_df.columns = ['所属大区', '销售员', '所属年月', '产品代码', '预计销售量']
+
+    # 分析基准日期：只保留基准日期当天及之前的出货
+    today = as_of or datetime.now().date()
+    cutoff = pd.Timestamp(today + timedelta(days=1))
+    if (shipment_df['订单日期'] >= cutoff).any():
+        shipment_df = shipment_df[shipment_df['订单日期'] < cutoff]
+
+    # 创建分析器实例
+    analyzer = BatchLevelInventoryAnalyzer()
+
+    # 创建销售人员-区域映射
+    sales_person_region_mapping = {}
+    person_region_data = shipment_df[['申请人', '所属区域']].drop_duplicates()
+    person_region_counts = shipment_df.groupby(['申请人', '所属区域'], observed=True).size().unstack(fill_value=0)
+
+    for person in shipment_df['申请人'].unique():
+        if person == analyzer.default_person:
+            sales_person_region_mapping[person] = ""
+        elif person in person_region_counts.index:
+            most_common_region = person_region_counts.loc[person].idxmax()
+            sales_person_region_mapping[person] = most_common_region
+        else:
+            sales_person_region_mapping[person] = analyzer.default_region
+
+    # 对预测数据中的销售员也添加区域映射
+    for person in forecast_df['销售员'].unique():
+        if person == analyzer.default_person:
+            continue
+        if person not in sales_person_region_mapping:
+            person_regions = forecast_df[forecast_df['销售员'] == person]['所属大区'].unique()
+            if len(person_regions) > 0:
+                sales_person_region_mapping[person] = person_regions[0]
+            else:
+                sales_person_region_mapping[person] = analyzer.default_region
+
+    # 确保系统管理员的区域为空字符串
+    sales_person_region_mapping[analyzer.default_person] = ""
+
+    # 创建产品代码到名称的映射（与批次解析使用同一个产品行判断）
+    product_name_map = build_product_name_map(inventory_df)
+
+    # 计算产品销售指标（按产品分组一次算完）
+    product_sales_metrics = calculate_product_sales_metrics(shipment_df, product_name_map.keys(), today)
+
+    # 按月汇总出货和预测，季节性指数、预测偏差和销售员预测量都从中查询
+    cubes = build_monthly_cubes(shipment_df, forecast_df)
+    # 季节性指数的下限是分析参数，在风险评分时再应用
+    seasonal_indices = calculate_seasonal_indices(cubes['sales'], product_name_map.keys(), today.month, 0.0)
+    forecast_accuracy = calculate_forecast_accuracy(cubes, product_name_map.keys(), shipment_df['申请人'].unique(),
+                                                    analyzer)
+
+    # 把产品行和批次行解析为批次表
+    batch_rows = parse_batch_rows(inventory_df, price_df)
+    if (batch_rows['生产日期'] >= cutoff).any():
+        batch_rows = batch_rows[batch_rows['生产日期'] < cutoff].reset_index(drop=True)
+    materials = batch_rows['物料']
+
+    # 获取各批次所属产品的销售指标、季节性指数和预测准确度
+    batch_sales_metrics = [product_sales_metrics.get(material, DEFAULT_SALES_METRICS) for material in materials]
+    batches = batch_rows.assign(
+        批次ID=np.arange(len(batch_rows)),
+        库龄=(pd.Timestamp(today) - batch_rows['生产日期']).dt.days,
+        日均出货=np.array([metrics['daily_avg_sales'] for metrics in batch_sales_metrics], dtype=float),
+        出货标准差=np.array([metrics['sales_std'] for metrics in batch_sales_metrics], dtype=float),
+        出货波动系数=np.array([metrics['coefficient_of_variation'] for metrics in batch_sales_metrics], dtype=float),
+        季节性指数=np.array([seasonal_indices.get(material, 1.0) for material in materials], dtype=float),
+        预测偏差=np.array([forecast_accuracy.get(material, DEFAULT_FORECAST_INFO)['forecast_bias']
+                       for material in materials], dtype=float)
+    )
+
+    return {
+        'batches': batches,
+        'product_sales_metrics': product_sales_metrics,
+        'forecast_accuracy': forecast_accuracy,
+        'sales_person_region_mapping': sales_person_region_mapping,
+        'shipment_df': shipment_df,
+        'forecast_df': forecast_df,
+        'product_name_map': product_name_map,
+        'as_of': today
+    }
+
+
+def score_inventory(inputs: Dict, analyzer) -> pd.DataFrame:
+    """按分析器的风险参数计算所有批次的清库天数、积压风险、风险得分和等级、预期损失、积压原因"""
+    batches = inputs['batches']
+    return analyzer.score_batches(batches['库龄'].to_numpy(), batches['数量'].to_numpy(), batches['单价'].to_numpy(),
+                                  batches['日均出货'].to_numpy(), batches['出货波动系数'].to_numpy(),
+                                  np.maximum(batches['季节性指数'].to_numpy(), analyzer.min_seasonal_index),
+                                  batches['预测偏差'].to_numpy())
+
+
+def attribute_inventory(inputs: Dict, analyzer=None, parallel: bool = True) -> tuple:
+    """按分析器的责任归属参数对所有批次做责任归属分析，返回attribute_batches的(assignments, responsibility)"""
+    batches = inputs['batches']
+    return attribute_batches(zip(batches['物料'], batches['生产日期'], batches['数量']),
+                             inputs['product_sales_metrics'], inputs['forecast_accuracy'],
+                             inputs['sales_person_region_mapping'], inputs['shipment_df'], parallel=parallel,
+                             analyzer=analyzer)
+
+
+def assemble_processed_inventory(inputs: Dict, risk: pd.DataFrame, assignments: list,
+                                 min_seasonal_index: float) -> pd.DataFrame:
+    """把批次表、风险评分和责任归属组装为页面使用的批次分析表，按风险程度和库龄排序"""
+    batches = inputs['batches']
+    responsible_regions, responsible_persons, lifecycle_stages = (
+        [assignment[column] for assignment in assignments] for column in range(3))
+    prod_dates = batches['生产日期']
+    quantities = batches['数量']
+
+    processed_inventory = pd.DataFrame({
+        '批次ID': batches['批次ID'],
+        '物料': batches['物料'],
+        '产品名称': batches['描述'],
+        '描述': batches['描述'],
+        '生产日期': prod_dates,
+        '生产批号': batches['生产批号'],
+        '批次日期': prod_dates.dt.date,
+        '数量': quantities,
+        '批次库存': quantities,
+        '库龄': batches['库龄'],
+        '风险等级': risk['风险等级'],
+        '风险颜色': '',  # 将在显示时设置
+        '处理建议': risk['处理建议'],
+        '单价': batches['单价'],
+        '批次价值': risk['批次价值'],
+        '预期损失': risk['预期损失'],
+        '日均出货': np.round(batches['日均出货'], 2),
+        '出货标准差': np.round(batches['出货标准差'], 2),
+        '出货波动系数': np.round(batches['出货波动系数'], 2),
+        '预计清库天数': risk['预计清库天数'],
+        '一个月积压风险': risk['一个月积压风险'],
+        '两个月积压风险': risk['两个月积压风险'],
+        '三个月积压风险': risk['三个月积压风险'],
+        '积压原因': risk['积压原因'],
+        '季节性指数': np.round(np.maximum(batches['季节性指数'], min_seasonal_index), 2),
+        '预测偏差': [format_forecast_bias(value) for value in batches['预测偏差'].tolist()],
+        '责任区域': responsible_regions,
+        '责任人': responsible_persons,
+        '生命周期阶段': lifecycle_stages,
+        '风险程度': risk['风险等级'],
+        '风险得分': risk['风险得分'],
+        '建议措施': risk['建议措施']
+    })
+
+    # 按照风险程度和库龄排序
+    risk_order = {
+        "极高风险": 0,
+        "高风险": 1,
+        "中风险": 2,
+        "低风险": 3,
+        "极低风险": 4
+    }
+    processed_inventory['风险排序'] = processed_inventory['风险程度'].map(risk_order)
+    processed_inventory = processed_inventory.sort_values(by=['风险排序', '库龄'], ascending=[True, False])
+    return processed_inventory.drop(columns=['风险排序'])
+
+
+# 批次分析表可筛选的列（风险等级、产品、责任区域、责任人）
+BATCH_TABLE_FILTERS = ['风险等级', '产品名称', '责任区域', '责任人']
+
+
+@perf_monitor.profile()
+def build_batch_table_index(processed_inventory) -> Dict[str, Dict]:
+    """预先计算批次分析表的筛选索引：筛选列 -> {取值: 行位置数组}
+
+    行位置即processed_inventory中的位置，processed_inventory已按风险程度和库龄排好序，
+    因此行位置本身就是表格的排序键；各取值按在表中首次出现的顺序排列，可直接作为筛选选项。
+    """
+    if processed_inventory.empty:
+        return {column: {} for column in BATCH_TABLE_FILTERS}
+    return {column: processed_inventory.groupby(column, sort=False, observed=True).indices
+            for column in BATCH_TABLE_FILTERS}
+
+
+def query_batch_table(processed_inventory, batch_index, filters: Dict = None, min_value=None,
+                      max_age=None) -> np.ndarray:
+    """按筛选条件返回符合条件的行位置（按表格顺序）
+
+    filters为 筛选列 -> 取值（'全部'表示不筛选），从预计算索引中取交集；批次价值下限和库龄上限直接在列数组上比较。
+    """
+    positions = None
+    for column, value in (filters or {}).items():
+        if value == '全部':
+            continue
+        matched = batch_index[column].get(value, np.empty(0, dtype=np.intp))
+        positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+    if positions is None:
+        positions = np.arange(len(processed_inventory))
+
+    if min_value is not None:
+        positions = positions[processed_inventory['批次价值'].to_numpy()[positions] >= min_value]
+    if max_age is not None:
+        positions = positions[processed_inventory['库龄'].to_numpy()[positions] <= max_age]
+    return positions
+
+
+def batch_table_rows(processed_inventory, positions, columns) -> pd.DataFrame:
+    """只取指定行位置和列，不复制整张批次表"""
+    return processed_inventory.iloc[positions, processed_inventory.columns.get_indexer(columns)]
+
+
+def batch_table_page(processed_inventory, positions, page: int, page_size: int, columns) -> pd.DataFrame:
+    """取筛选结果的第page页（从1开始）"""
+    start = (page - 1) * page_size
+    return batch_table_rows(processed_inventory, positions[start:start + page_size], columns)
+
+
+@perf_monitor.profile()
+def load_inventory_data(registry=dataset_registry, as_of=None):
+    """加载和处理所有数据，返回 (processed_inventory, shipment_df, forecast_df, metrics, product_name_map, responsibility)
+
+    responsibility为责任归属长表（见RESPONSIBILITY_COLUMNS），按processed_inventory的批次ID列关联；
+    as_of为分析基准日期（默认当天）。
+    """
+    inputs = prepare_inventory_inputs(registry, as_of)
+    processed_inventory, metrics, responsibility = evaluate_inventory(inputs,
+                                                                      BatchLevelInventoryAnalyzer(inputs['as_of']))
+    return (processed_inventory, inputs['shipment_df'], inputs['forecast_df'], metrics, inputs['product_name_map'],
+            responsibility)
+
+
+@perf_monitor.profile()
+def evaluate_inventory(inputs: Dict, analyzer, attribution: tuple = None) -> tuple:
+    """计算依赖分析参数的各阶段，返回 (processed_inventory, metrics, responsibility)
+
+    attribution为已有的(assignments, responsibility)时沿用，不再重新做责任归属分析。
+    """
+    # 清库天数、积压风险、风险得分和等级、预期损失、积压原因（所有批次一次计算）
+    risk = score_inventory(inputs, analyzer)
+
+    # 责任归属分析（批次多时在进程池中分段并行），明细展开为按批次ID关联的长表
+    assignments, responsibility = attribution or attribute_inventory(inputs, analyzer)
+
+    processed_inventory = assemble_processed_inventory(inputs, risk, assignments, analyzer.min_seasonal_index)
+
+    # 计算关键指标
+    metrics = calculate_key_metrics(processed_inventory)
+
+    return processed_inventory, metrics, responsibility
+
+
+@perf_monitor.profile()
+def simulate_inventory_dashboard(dashboard: Dict, parameters: Dict) -> Dict:
+    """参数模拟：按调整后的分析参数重算风险评分、责任归属和关键指标
+
+    直接复用看板中的中间结果（不再读取Excel和汇总出货、预测数据）；没有调整责任归属参数时沿用看板中的责任归属结果。
+    只返回重算的部分（processed_inventory、metrics、responsibility、batch_index），由调用方合并到原看板上，
+    出货、预测数据等不随参数变化的结果不会随模拟结果一起复制和缓存。
+    """
+    analyzer = BatchLevelInventoryAnalyzer(dashboard['inventory_inputs']['as_of'])
+    defaults = analyzer.get_parameters()
+    analyzer.set_parameters(parameters)
+
+    attribution = None
+    if all(getattr(analyzer, name) == defaults[name] for name in ATTRIBUTION_PARAMETERS):
+        baseline = dashboard['processed_inventory'].sort_values('批次ID')
+        attribution = (list(zip(baseline['责任区域'], baseline['责任人'], baseline['生命周期阶段'])),
+                       dashboard['responsibility'])
+
+    processed_inventory, metrics, responsibility = evaluate_inventory(dashboard['inventory_inputs'], analyzer,
+                                                                      attribution)
+    return {'processed_inventory': processed_inventory, 'metrics': metrics, 'responsibility': responsibility,
+            'batch_index': build_batch_table_index(processed_inventory)}
+
+
+@perf_monitor.profile()
+def calculate_key_metrics(processed_inventory):
+    """计算关键指标"""
+    if processed_inventory.empty:
+        return {
+            'total_batches': 0,
+            'high_risk_batches': 0,
+            'high_risk_ratio': 0,
+            'total_inventory_value': 0,
+            'high_risk_value_ratio': 0,
+            'avg_age': 0,
+            'high_risk_value': 0,
+            'risk_counts': {
+                'extreme': 0,
+                'high': 0,
+                'medium': 0,
+                'low': 0,
+                'minimal': 0
+            }
+        }
+
+    total_batches = len(processed_inventory)
+    high_risk_batches = len(processed_inventory[processed_inventory['风险等级'].isin(['极高风险', '高风险'])])
+    high_risk_ratio = (high_risk_batches / total_batches * 100) if total_batches > 0 else 0
+
+    total_inventory_value = processed_inventory['批次价值'].sum() / 1000000
+    high_risk_value = processed_inventory[
+        processed_inventory['风险等级'].isin(['极高风险', '高风险'])
+    ]['批次价值'].sum()
+    high_risk_value_ratio = (high_risk_value / processed_inventory['批次价值'].sum() * 100) if processed_inventory[
+                                                                                                   '批次价值'].sum() > 0 else 0
+
+    avg_age = processed_inventory['库龄'].mean()
+
+    # 风险分布统计
+    risk_counts = processed_inventory['风险等级'].value_counts().to_dict()
+
+    return {
+        'total_batches': int(total_batches),
+        'high_risk_batches': int(high_risk_batches),
+        'high_risk_ratio': round(high_risk_ratio, 1),
+        'total_inventory_value': round(total_inventory_value, 2),
+        'high_risk_value_ratio': round(high_risk_value_ratio, 1),
+        'avg_age': round(avg_age, 0),
+        'high_risk_value': round(high_risk_value / 1000000, 1),
+        'risk_counts': {
+            'extreme': risk_counts.get('极高风险', 0),
+            'high': risk_counts.get('高风险', 0),
+            'medium': risk_counts.get('中风险', 0),
+            'low': risk_counts.get('低风险', 0),
+            'minimal': risk_counts.get('极低风险', 0)
+        }
+    }
+
+
+# 预测分析的汇总维度：名称 -> 分组列（页面切换区域时只从汇总中切片，不再重新分组）
+FORECAST_ROLLUPS = {
+    'region': ['所属区域'],
+    'product': ['产品代码', '产品名称'],
+    'name': ['产品名称'],
+    'region_product': ['所属区域', '产品代码', '产品名称'],
+    'region_name': ['所属区域', '产品名称']
+}
+
+
+@perf_monitor.profile()
+def process_forecast_analysis(shipment_df, forecast_df, product_name_map, as_of=None):
+    """处理预测分析数据 - 只使用基准日期（默认当天）所在年份的数据"""
+    try:
+        current_year = (as_of or datetime.now()).year
+
+        # 筛选当年数据
+        shipment_current_year = shipment_df[shipment_df['订单日期'].dt.year == current_year].copy()
+        forecast_current_year = forecast_df[forecast_df['所属年月'].dt.year == current_year].copy()
+
+        if shipment_current_year.empty or forecast_current_year.empty:
+            return None, {}
+
+        # 添加产品名称映射
+        # 产品代码为共享分类列，先还原为字符串再映射，未匹配的产品用代码兜底
+        shipment_codes = shipment_current_year['产品代码'].astype(object)
+        forecast_codes = forecast_current_year['产品代码'].astype(object)
+        shipment_current_year['产品名称'] = shipment_codes.map(product_name_map).fillna(shipment_codes)
+        forecast_current_year['产品名称'] = forecast_codes.map(product_name_map).fillna(forecast_codes)
+
+        # 按月份和产品汇总实际销量 - 修正列名
+        shipment_monthly = shipment_current_year.groupby([
+            shipment_current_year['订单日期'].dt.to_period('M'),
+            '产品代码',
+            '产品名称',
+            '所属区域'
+        ], observed=True).agg({
+            '数量': 'sum'  # 修正：从 '求和项:数量（箱）' 改为 '数量'
+        }).reset_index()
+        shipment_monthly['年月'] = shipment_monthly['订单日期'].dt.to_timestamp()
+
+        # 按月份和产品汇总预测销量
+        forecast_monthly = forecast_current_year.groupby([
+            forecast_current_year['所属年月'].dt.to_period('M'),
+            '产品代码',
+            '产品名称',
+            '所属大区'
+        ], observed=True).agg({
+            '预计销售量': 'sum'
+        }).reset_index()
+        forecast_monthly['年月'] = forecast_monthly['所属年月'].dt.to_timestamp()
+
+        # 统一区域名称
+        forecast_monthly = forecast_monthly.rename(columns={'所属大区': '所属区域'})
+
+        # 合并数据
+        merged_data = pd.merge(
+            shipment_monthly,
+            forecast_monthly,
+            on=['年月', '产品代码', '产品名称', '所属区域'],
+            how='outer'
+        )
+        # 分类键列不能用0填充，只填充其余列
+        fill_columns = [col for col in merged_data.columns
+                        if not isinstance(merged_data[col].dtype, pd.CategoricalDtype)]
+        merged_data[fill_columns] = merged_data[fill_columns].fillna(0)
+
+        # 计算准确率和差异 - 修正列名
+        merged_data['实际销量'] = merged_data['数量']  # 修正：从 '求和项:数量（箱）' 改为 '数量'
+        merged_data['预测销量'] = merged_data['预计销售量']
+        merged_data['差异量'] = merged_data['实际销量'] - merged_data['预测销量']
+
+        # 计算准确率 - 有实际销量时为1-|差异|/实际销量，没有实际销量时预测也为0记1，否则记0
+        actual_sales = merged_data['实际销量'].to_numpy()
+        accuracy = np.where(actual_sales > 0,
+                            1 - np.abs(merged_data['差异量'].to_numpy()) / np.maximum(actual_sales, 1),
+                            np.where(merged_data['预测销量'].to_numpy() == 0, 1.0, 0.0))
+        merged_data['准确率'] = np.clip(accuracy, 0, 1)
+
+        # 计算关键指标
+        key_metrics = {
+            'total_actual_sales': merged_data['实际销量'].sum(),
+            'total_forecast_sales': merged_data['预测销量'].sum(),
+            'overall_accuracy': merged_data['准确率'].mean() * 100,
+            'overall_diff_rate': ((merged_data['实际销量'].sum() - merged_data['预测销量'].sum()) /
+                                  merged_data['实际销量'].sum()) * 100 if merged_data['实际销量'].sum() > 0 else 0
+        }
+
+        return merged_data, key_metrics
+
+    except Exception as e:
+        logger.error(f"预测分析处理失败: {str(e)}")
+        return None, {}
+
+
+@perf_monitor.profile()
+def build_forecast_rollups(merged_data) -> Dict[str, pd.DataFrame]:
+    """在预测分析明细（年月×区域×产品）上预先按各维度汇总实际销量、预测销量和平均准确率"""
+    if merged_data is None or merged_data.empty:
+        return {}
+    return {
+        name: merged_data.groupby(keys, observed=True).agg({
+            '实际销量': 'sum',
+            '预测销量': 'sum',
+            '准确率': 'mean'
+        }).reset_index()
+        for name, keys in FORECAST_ROLLUPS.items()
+    }
+
+
+def region_product_rollup(forecast_rollups, region='全国') -> pd.DataFrame:
+    """取一个区域的产品级汇总（'全国'为全部区域），是已有汇总的切片，修改前需先复制"""
+    if region == '全国':
+        return forecast_rollups['product']
+    region_products = forecast_rollups['region_product']
+    return region_products[region_products['所属区域'] == region].drop(columns='所属区域').reset_index(drop=True)
+
+
+def build_inventory_dashboard(registry=dataset_registry, as_of=None) -> Dict:
+    """生成预测库存分析看板的全部预计算结果（库龄和风险以as_of为基准，默认当天）"""
+    inputs = prepare_inventory_inputs(registry, as_of)
+    processed_inventory, metrics, responsibility = evaluate_inventory(inputs,
+                                                                      BatchLevelInventoryAnalyzer(inputs['as_of']))
+    merged_data, forecast_key_metrics = process_forecast_analysis(inputs['shipment_df'], inputs['forecast_df'],
+                                                                  inputs['product_name_map'], inputs['as_of'])
+    return {
+        'as_of': inputs['as_of'],
+        'processed_inventory': processed_inventory,
+        'shipment_df': inputs['shipment_df'],
+        'forecast_df': inputs['forecast_df'],
+        'metrics': metrics,
+        'product_name_map': inputs['product_name_map'],
+        'responsibility': responsibility,
+        'batch_index': build_batch_table_index(processed_inventory),
+        # 参数模拟（simulate_inventory_dashboard）复用的中间结果
+        'inventory_inputs': inputs,
+        'merged_data': merged_data,
+        'forecast_rollups': build_forecast_rollups(merged_data),
+        'forecast_key_metrics': forecast_key_metrics
+    }
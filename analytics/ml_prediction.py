@@ -0,0 +1,894 @@
+# analytics/ml_prediction.py - 机器学习预测计算模块
+import hashlib
+import importlib
+import importlib.util
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics.model_registry import ModelRegistry, model_registry
+from data_registry import worker_count
+from perf_monitor import perf_monitor
+
+logger = logging.getLogger(__name__)
+
+# 进度消息级别到日志级别的映射
+REPORT_LEVELS = {
+    'info': logging.INFO,
+    'write': logging.INFO,
+    'success': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR
+}
+
+# 产品段编码（特征segment_encoded）
+SEGMENT_CODES = {
+    '高销量稳定': 1,
+    '高销量波动': 2,
+    '中销量稳定': 3,
+    '中销量波动': 4,
+    '低销量稳定': 5,
+    '低销量波动': 6
+}
+
+# 特征至少需要的历史月数（每个产品从第4个月起作为预测目标）
+MIN_HISTORY_MONTHS = 3
+
+# 月度聚合使用的出货数据列（数据版本按这些列的内容计算）
+CUBE_COLUMNS = ['product_code', 'order_date', 'quantity', 'customer_code', 'region']
+
+# 内存中保留月度聚合的数据版本数
+CUBE_HISTORY = 4
+
+# 模型库按LightGBM、XGBoost、scikit-learn的顺序选用，未安装的跳过（导入较慢，训练时才导入）
+if importlib.util.find_spec('lightgbm') is not None:
+    MODEL_BACKEND = 'LightGBM'
+elif importlib.util.find_spec('xgboost') is not None:
+    MODEL_BACKEND = 'XGBoost'
+else:
+    MODEL_BACKEND = 'GradientBoosting'
+
+# 特征数据中不作为模型输入的列
+NON_FEATURE_COLUMNS = ['product_code', 'target', 'target_month', 'segment']
+
+# 训练一个模型至少需要的样本数；产品段样本不足时使用全部产品段的模型
+MIN_TRAINING_ROWS = 24
+
+# 没有可用模型（最早的几个目标月样本不足）时的预测方法
+BASELINE_MODEL = '加权移动平均'
+
+# 历史预测记录的列
+HISTORY_COLUMNS = ['产品代码', '年月', '预测值', '实际值', '绝对误差', '准确率(%)', '产品段', '使用模型']
+
+# 目标月少于该值时串行做滚动回测训练（进程启动和导入模型库的开销大于并行收益）
+PARALLEL_BACKTEST_MIN_MONTHS = 6
+
+# 进程池中每个任务训练的目标月数
+BACKTEST_CHUNK_MONTHS = 2
+
+
+def shipment_data_version(shipment_data: pd.DataFrame) -> str:
+    """获取预处理后出货数据的版本号（月度聚合所用列的内容哈希前16位）"""
+    hashes = pd.util.hash_pandas_object(shipment_data[CUBE_COLUMNS], index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()[:16]
+
+
+@perf_monitor.profile()
+def build_monthly_cube(shipment_data: pd.DataFrame) -> pd.DataFrame:
+    """按产品×月汇总出货数据：销量合计/订单数/单均销量/标准差、客户数和主要区域，按产品代码和年月排序
+
+    主要区域为当月出现次数最多的区域（并列时取排序最小的，与Series.mode()一致），
+    当月区域全部缺失时为空值。
+    """
+    year_month = shipment_data['order_date'].dt.to_period('M').rename('year_month')
+    monthly_data = shipment_data.groupby(['product_code', year_month]).agg(
+        total_qty=('quantity', 'sum'),
+        order_count=('quantity', 'count'),
+        avg_qty=('quantity', 'mean'),
+        std_qty=('quantity', 'std'),
+        customer_count=('customer_code', 'nunique')
+    ).reset_index()
+    monthly_data['std_qty'] = monthly_data['std_qty'].fillna(0)
+
+    # 主要区域：统计各区域出现次数，按次数从多到少、区域名从小到大排序后取每个产品月的第一个
+    region_counts = shipment_data.groupby(['product_code', year_month, 'region'], observed=True).size()
+    region_counts = region_counts[region_counts > 0].rename('region_count').reset_index()
+    main_region = region_counts.sort_values(['region_count', 'region'], ascending=[False, True], kind='stable')
+    main_region = main_region.drop_duplicates(['product_code', 'year_month'])
+    monthly_data = monthly_data.merge(
+        main_region[['product_code', 'year_month', 'region']].rename(columns={'region': 'main_region'}),
+        on=['product_code', 'year_month'], how='left'
+    )
+
+    return monthly_data.sort_values(['product_code', 'year_month'])
+
+
+class MonthlyCubeCache:
+    """月度聚合缓存类 - 按出货数据版本缓存产品×月聚合，特征工程和历史预测共用同一份结果
+
+    返回的是共享的数据，调用方不应修改。
+    """
+
+    def __init__(self, history: int = CUBE_HISTORY):
+        self.history = history
+        self._cubes = {}
+        self._lock = threading.Lock()
+
+    def get(self, shipment_data: pd.DataFrame) -> Tuple[pd.DataFrame, float]:
+        """获取出货数据的月度聚合，返回(聚合结果, 本次构建耗时秒数)；命中缓存时耗时为0"""
+        version = shipment_data_version(shipment_data)
+        with self._lock:
+            if version in self._cubes:
+                return self._cubes[version], 0.0
+
+        start = time.perf_counter()
+        monthly_data = build_monthly_cube(shipment_data)
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            self._cubes[version] = monthly_data
+            # 只保留最近的若干个数据版本
+            for stale in list(self._cubes)[:-self.history]:
+                del self._cubes[stale]
+        return monthly_data, seconds
+
+    def clear(self):
+        """清空缓存的月度聚合"""
+        with self._lock:
+            self._cubes.clear()
+
+
+@perf_monitor.profile()
+def build_rolling_features(monthly_data: pd.DataFrame, product_segments: Dict[str, str]) -> pd.DataFrame:
+    """按产品分组一次算出所有(产品, 目标月)的特征，每个目标月只使用它之前的全部月份（扩展窗口）
+
+    monthly_data为每个(产品, 年月)一行的月度数据，行的顺序不限；结果每个产品的每个目标月一行，
+    按产品段首次出现的顺序、段内产品的顺序和月份排列。
+    """
+    # 以下按位置取历史和滞后值，要求同一产品的行连续且按月份排列
+    data = (monthly_data[monthly_data['product_code'].isin(list(product_segments))]
+            .sort_values(['product_code', 'year_month'], kind='stable').reset_index(drop=True))
+    groups = data.groupby('product_code', sort=False)
+
+    # 每行作为目标月时的历史月数；历史统计取上一行（同一产品）的累计值
+    history_months = groups.cumcount().to_numpy()
+    target = history_months >= MIN_HISTORY_MONTHS
+    n = history_months[target].astype(float)
+
+    def history(values):
+        return np.asarray(values, dtype=float)[np.flatnonzero(target) - 1]
+
+    def lag(column, months):
+        return data[column].to_numpy()[np.flatnonzero(target) - months]
+
+    def expanding_mean(column):
+        return history(groups[column].cumsum()) / n
+
+    def expanding_std(values):
+        stats = values.groupby(data['product_code'], sort=False).expanding().std(ddof=0)
+        return history(stats.reset_index(level=0, drop=True))
+
+    qty = data['total_qty'].astype(float)
+    log_qty = np.log1p(qty)
+    position = history_months.astype(float)
+
+    # 1. 销量特征
+    qty_mean = expanding_mean('total_qty')
+    qty_std = expanding_std(qty)
+    qty_cv = qty_std / (qty_mean + 1)
+    qty_median = history(qty.groupby(data['product_code'], sort=False).expanding().median()
+                         .reset_index(level=0, drop=True))
+    lag_1, lag_2, lag_3 = lag('total_qty', 1), lag('total_qty', 2), lag('total_qty', 3)
+
+    # 2. 趋势特征：对历史月份做一元线性回归（x为月份序号），趋势强度按原实现以均值作截距计算
+    sum_y = history(qty.groupby(data['product_code'], sort=False).cumsum())
+    sum_xy = history((qty * position).groupby(data['product_code'], sort=False).cumsum())
+    sum_x = n * (n - 1) / 2
+    sum_xx = (n - 1) * n * (2 * n - 1) / 6
+    trend_slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x ** 2)
+    ss_tot = n * qty_std ** 2
+    ss_res = ss_tot - 2 * trend_slope * (sum_xy - qty_mean * sum_x) + trend_slope ** 2 * sum_xx
+
+    # 3. 订单行为特征
+    order_count_mean = expanding_mean('order_count')
+    customer_count_mean = expanding_mean('customer_count')
+    customer_count_max = history(groups['customer_count'].cummax())
+
+    # 4. 时间特征（历史最后一个月）
+    last_month = data['year_month'].to_numpy()[np.flatnonzero(target) - 1]
+    months = np.array([period.month for period in last_month], dtype=np.int64)
+
+    segments = data['product_code'][target].map(product_segments).to_numpy()
+    features = pd.DataFrame({
+        'product_code': data['product_code'][target].to_numpy(),
+        'qty_mean': qty_mean,
+        'qty_median': qty_median,
+        'qty_std': qty_std,
+        'qty_cv': qty_cv,
+        'log_qty_mean': history(log_qty.groupby(data['product_code'], sort=False).cumsum()) / n,
+        'log_qty_std': expanding_std(log_qty),
+        'qty_lag_1': lag_1,
+        'qty_lag_2': lag_2,
+        'qty_lag_3': lag_3,
+        'qty_ma_2': (lag_2 + lag_1) / 2,
+        'qty_ma_3': (lag_3 + lag_2 + lag_1) / 3,
+        'qty_wma_3': (lag_3 * 1.0 + lag_2 * 2.0 + lag_1 * 3.0) / 6.0,
+        'growth_rate_1': (lag_1 - lag_2) / (lag_2 + 1),
+        'trend_slope': trend_slope,
+        'trend_strength': 1 - ss_res / (ss_tot + 1e-8),
+        'order_count_mean': order_count_mean,
+        'order_count_trend': lag('order_count', 1) - groups['order_count'].transform('first').to_numpy()[target],
+        'avg_order_size': qty_mean / (order_count_mean + 1),
+        'customer_count_mean': customer_count_mean,
+        'penetration_rate': customer_count_mean / (customer_count_max + 1),
+        'month': months,
+        'quarter': (months - 1) // 3 + 1,
+        'is_year_end': np.isin(months, [11, 12]).astype(np.int64),
+        'is_peak_season': np.isin(months, [3, 4, 10, 11]).astype(np.int64),
+        'data_points': history_months[target].astype(np.int64),
+        'stability_score': 1 / (1 + qty_cv),
+        'consistency_score': history((data['total_qty'] > 0).groupby(data['product_code'], sort=False).cumsum()) / n,
+        'segment_encoded': pd.Series(segments).map(SEGMENT_CODES).fillna(0).astype(np.int64).to_numpy(),
+        'target': data['total_qty'][target].to_numpy(),
+        'target_month': data['year_month'][target].astype(str).to_numpy(),
+        'segment': segments
+    })
+
+    # 按产品段首次出现的顺序、段内产品顺序排列（同一产品内已按月份排序）
+    segment_order = {segment: rank for rank, segment in enumerate(dict.fromkeys(product_segments.values()))}
+    product_order = {product: (segment_order[segment], rank)
+                     for rank, (product, segment) in enumerate(product_segments.items())}
+    sort_key = features['product_code'].map(product_order)
+    order = np.lexsort(([key[1] for key in sort_key], [key[0] for key in sort_key]))
+    return features.iloc[order].reset_index(drop=True)
+
+
+def create_regressor(backend: str = MODEL_BACKEND):
+    """创建回归模型 - 参数固定、单线程训练，同样的数据得到同样的模型"""
+    if backend == 'LightGBM':
+        lightgbm = importlib.import_module('lightgbm')
+        return lightgbm.LGBMRegressor(n_estimators=200, learning_rate=0.05, num_leaves=15, min_child_samples=5,
+                                      subsample=0.8, subsample_freq=1, colsample_bytree=0.8,
+                                      random_state=42, n_jobs=1, verbose=-1)
+    if backend == 'XGBoost':
+        xgboost = importlib.import_module('xgboost')
+        return xgboost.XGBRegressor(n_estimators=200, learning_rate=0.05, max_depth=4, subsample=0.8,
+                                    colsample_bytree=0.8, random_state=42, n_jobs=1)
+
+    from sklearn.ensemble import GradientBoostingRegressor
+    return GradientBoostingRegressor(n_estimators=100, learning_rate=0.05, max_depth=3, subsample=0.8,
+                                     random_state=42)
+
+
+def _fit_regressor(rows: pd.DataFrame, feature_columns: List[str], backend: str):
+    """在样本上训练一个模型（目标取log1p，缓解销量的偏态分布）"""
+    model = create_regressor(backend)
+    model.fit(rows[feature_columns].to_numpy(dtype=float), np.log1p(rows['target'].to_numpy(dtype=float).clip(0)))
+    return model
+
+
+def _fit_segment_models(rows: pd.DataFrame, feature_columns: List[str], backend: str) -> Dict:
+    """训练各产品段的模型，样本不足的产品段不单独训练；有产品段样本不足时另训练全部产品段的模型（键为None）"""
+    models = {}
+    for segment, segment_rows in rows.groupby('segment', sort=False):
+        if len(segment_rows) >= MIN_TRAINING_ROWS:
+            models[segment] = _fit_regressor(segment_rows, feature_columns, backend)
+    if len(models) < rows['segment'].nunique():
+        models[None] = _fit_regressor(rows, feature_columns, backend)
+    return models
+
+
+# 子进程中的只读训练数据，由进程池初始化函数设置一次，之后各任务共用
+_backtest_tables = {}
+
+
+def _train_origin(feature_data: pd.DataFrame, feature_columns: List[str], backend: str, month: str) -> Dict:
+    """训练一个滚动起点（目标月）的各产品段模型，只用更早目标月的样本；样本不足时没有模型"""
+    history = feature_data[feature_data['target_month'] < month]
+    if len(history) < MIN_TRAINING_ROWS:
+        return {}
+    return _fit_segment_models(history, feature_columns, backend)
+
+
+def _init_backtest_worker(tables: Dict):
+    """子进程初始化：保存训练数据、特征列和模型库"""
+    _backtest_tables.update(tables)
+
+
+def _backtest_chunk(months: List[str]) -> Dict:
+    """子进程任务：训练一组目标月的滚动起点模型"""
+    return {month: _train_origin(month=month, **_backtest_tables) for month in months}
+
+
+def train_backtest_models(feature_data: pd.DataFrame, feature_columns: List[str], backend: str = MODEL_BACKEND,
+                          months: List[str] = None, parallel: bool = True, workers: int = None,
+                          progress: Callable[[int, int], None] = None) -> Dict:
+    """训练滚动起点模型：目标月 -> 各产品段模型，只用更早目标月的样本训练（历史预测不使用未来数据）
+
+    months为需要训练的目标月（默认特征数据中的全部目标月）；样本不足MIN_TRAINING_ROWS的目标月没有模型。
+    各目标月的训练互不依赖：目标月数达到PARALLEL_BACKTEST_MIN_MONTHS且有多个CPU时，按BACKTEST_CHUNK_MONTHS
+    分组在进程池中训练，训练数据在每个子进程中只传输一次；进程池不可用时退回串行。模型参数固定且单线程训练，
+    结果与进程数无关。progress(已完成数, 总数)在每个目标月训练完成后调用。
+    """
+    months = sorted(feature_data['target_month'].unique() if months is None else months)
+    tables = {
+        'feature_data': feature_data[[*feature_columns, 'target', 'target_month', 'segment']],
+        'feature_columns': list(feature_columns),
+        'backend': backend
+    }
+    chunks = [months[start:start + BACKTEST_CHUNK_MONTHS] for start in range(0, len(months), BACKTEST_CHUNK_MONTHS)]
+    workers = workers or worker_count(len(chunks))
+
+    def notify(completed):
+        if progress is not None:
+            progress(completed, len(months))
+
+    backtest = {}
+    if parallel and len(months) >= PARALLEL_BACKTEST_MIN_MONTHS and workers > 1:
+        try:
+            # 使用spawn避免在多线程的Streamlit服务进程中fork
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_backtest_worker,
+                                     initargs=(tables,)) as executor:
+                futures = [executor.submit(_backtest_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    backtest.update(future.result())
+                    notify(len(backtest))
+        except Exception as e:
+            logger.warning(f"滚动回测并行训练失败，改为串行: {e}")
+            backtest = {}
+
+    for month in months:
+        if month not in backtest:
+            backtest[month] = _train_origin(month=month, **tables)
+            notify(len(backtest))
+
+    # 按目标月排列，与完成顺序无关
+    return {month: backtest[month] for month in months}
+
+
+@perf_monitor.profile()
+def train_prediction_models(feature_data: pd.DataFrame, feature_columns: List[str], backend: str = MODEL_BACKEND,
+                            months: List[str] = None, parallel: bool = True, workers: int = None,
+                            progress: Callable[[int, int], None] = None) -> Dict:
+    """训练各产品段的回归模型
+
+    返回:
+        'backtest': 目标月 -> 各产品段模型（滚动起点回测，见train_backtest_models，只训练months中的目标月）
+        'models': 各产品段模型，用全部样本训练（用于之后的预测）
+    """
+    return {
+        'backend': backend,
+        'feature_columns': list(feature_columns),
+        'backtest': train_backtest_models(feature_data, feature_columns, backend, months, parallel, workers, progress),
+        'models': _fit_segment_models(feature_data, feature_columns, backend)
+    }
+
+
+def _baseline_predictions(feature_data: pd.DataFrame) -> np.ndarray:
+    """基准预测：近3个月加权移动平均（该特征在后处理中被移除时依次退回上月销量、历史均值）"""
+    for column in ('qty_wma_3', 'qty_lag_1', 'qty_mean'):
+        if column in feature_data:
+            return feature_data[column].to_numpy(dtype=float).copy()
+    return np.zeros(len(feature_data))
+
+
+@perf_monitor.profile()
+def predict_backtest(feature_data: pd.DataFrame, trained: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """用滚动起点模型预测每个(产品, 目标月)的销量，返回(预测值, 使用的模型名称)"""
+    predictions = _baseline_predictions(feature_data)
+    model_names = np.full(len(feature_data), BASELINE_MODEL, dtype=object)
+    features = feature_data[trained['feature_columns']].to_numpy(dtype=float)
+
+    groups = feature_data.groupby(['target_month', 'segment'], sort=False).indices
+    for (month, segment), positions in groups.items():
+        models = trained['backtest'].get(month, {})
+        model = models.get(segment, models.get(None))
+        if model is None:
+            continue
+        predictions[positions] = np.expm1(model.predict(features[positions]))
+        model_names[positions] = trained['backend'] if segment in models else f"{trained['backend']}(全部产品段)"
+
+    return np.maximum(predictions, 0), model_names
+
+
+class PredictionPipeline:
+    """预测计算流程 - 预处理、产品分段、特征工程和历史预测对比，不依赖页面
+
+    各步骤的进度消息通过report()、滚动回测训练的进度通过report_progress()输出，默认写日志；
+    页面子类把它们转成界面提示和进度条。训练好的模型和回测状态保存在registry中（默认全局模型注册表）。
+    shipment_source为出货数据的来源（文件路径或URL），回测状态按来源分别保存，未指定时每次完整回测。
+    """
+
+    def __init__(self, registry: ModelRegistry = model_registry):
+        self.registry = registry
+        self.shipment_data = None
+        self.shipment_source = None
+        self.promotion_data = None
+        self.feature_data = None
+        self.models = {}
+        self.scalers = {}
+        self.predictions = None
+        self.accuracy_results = {}
+        self.product_segments = {}
+        self.historical_predictions = None
+        self.historical_accuracy = None
+
+    def report(self, level: str, message: str):
+        """输出进度消息（level为info/write/success/warning/error）"""
+        logger.log(REPORT_LEVELS.get(level, logging.INFO), message)
+
+    def report_progress(self, completed: int, total: int):
+        """输出滚动回测训练的进度（已完成的训练任务数/总数）"""
+        logger.debug(f"滚动回测训练: {completed}/{total}")
+
+    def calculate_robust_accuracy(self, actual_value, predicted_value, method='smape'):
+        """
+        与附件一完全相同的SMAPE准确率计算方法
+        """
+        try:
+            if method == 'smape':
+                if actual_value == 0 and predicted_value == 0:
+                    return 100.0
+                smape = 200 * abs(actual_value - predicted_value) / (abs(actual_value) + abs(predicted_value) + 1e-8)
+                return max(0, 100 - smape)
+            else:
+                raise ValueError(f"不支持的方法: {method}")
+        except Exception as e:
+            self.report('warning', f"准确率计算出错: {str(e)}")
+            return 0.0
+
+    def calculate_batch_robust_accuracy(self, actual_values, predicted_values, method='smape'):
+        """批量计算SMAPE准确率"""
+        try:
+            actual_values = np.array(actual_values)
+            predicted_values = np.array(predicted_values)
+
+            if method == 'smape':
+                both_zero = (actual_values == 0) & (predicted_values == 0)
+                smape = 200 * np.abs(actual_values - predicted_values) / (
+                        np.abs(actual_values) + np.abs(predicted_values) + 1e-8
+                )
+                accuracy = np.maximum(0, 100 - smape)
+                accuracy[both_zero] = 100.0
+                return accuracy
+            else:
+                return np.array([
+                    self.calculate_robust_accuracy(actual, predicted, method)
+                    for actual, predicted in zip(actual_values, predicted_values)
+                ])
+        except Exception as e:
+            self.report('error', f"批量准确率计算出错: {str(e)}")
+            return np.zeros(len(actual_values))
+
+    @perf_monitor.profile()
+    def preprocess_data(self):
+        """高级数据预处理 - 与附件一相同的逻辑"""
+        self.report('info', "🧹 开始高级数据预处理...")
+
+        try:
+            # 标准化列名
+            shipment_columns = {
+                '订单日期': 'order_date',
+                '所属区域': 'region',
+                '客户代码': 'customer_code',
+                '产品代码': 'product_code',
+                '求和项:数量（箱）': 'quantity'
+            }
+
+            promotion_columns = {
+                '申请时间': 'apply_date',
+                '经销商代码': 'dealer_code',
+                '产品代码': 'product_code',
+                '促销开始供货时间': 'promo_start_date',
+                '促销结束供货时间': 'promo_end_date',
+                '预计销量（箱）': 'expected_sales',
+                '赠品数量（箱）': 'gift_quantity'
+            }
+
+            # 重命名列
+            for old_col, new_col in shipment_columns.items():
+                if old_col in self.shipment_data.columns:
+                    self.shipment_data = self.shipment_data.rename(columns={old_col: new_col})
+
+            for old_col, new_col in promotion_columns.items():
+                if old_col in self.promotion_data.columns:
+                    self.promotion_data = self.promotion_data.rename(columns={old_col: new_col})
+
+            # 数据类型转换
+            self.shipment_data['order_date'] = pd.to_datetime(self.shipment_data['order_date'], errors='coerce')
+            self.shipment_data['quantity'] = pd.to_numeric(self.shipment_data['quantity'], errors='coerce')
+
+            # 促销数据处理
+            date_cols = ['apply_date', 'promo_start_date', 'promo_end_date']
+            for col in date_cols:
+                if col in self.promotion_data.columns:
+                    self.promotion_data[col] = pd.to_datetime(self.promotion_data[col], errors='coerce')
+
+            # 数据清洗
+            original_len = len(self.shipment_data)
+            self.shipment_data = self.shipment_data.dropna(subset=['order_date', 'product_code', 'quantity'])
+            self.shipment_data = self.shipment_data[self.shipment_data['quantity'] > 0]
+
+            self.report('success', f"✅ 基础数据清洗: {original_len} → {len(self.shipment_data)} 行")
+
+            # 异常值处理 - 使用IQR方法
+            self.shipment_data = self._remove_outliers_iqr(self.shipment_data, factor=3.0)
+
+            self.report('success', f"✅ 最终数据: {len(self.shipment_data)} 行")
+            self.report('success', f"✅ 产品数量: {self.shipment_data['product_code'].nunique()}")
+            self.report(
+                'success',
+                f"✅ 日期范围: {self.shipment_data['order_date'].min().date()} 到 {self.shipment_data['order_date'].max().date()}")
+
+            # 产品分段
+            self._segment_products()
+
+            return True
+        except Exception as e:
+            self.report('error', f"❌ 数据预处理失败: {str(e)}")
+            return False
+
+    def _remove_outliers_iqr(self, data, column='quantity', factor=3.0):
+        """使用IQR方法移除异常值"""
+        try:
+            Q1 = data[column].quantile(0.25)
+            Q3 = data[column].quantile(0.75)
+            IQR = Q3 - Q1
+
+            lower_bound = Q1 - factor * IQR
+            upper_bound = Q3 + factor * IQR
+
+            before_count = len(data)
+            data_cleaned = data[(data[column] >= lower_bound) & (data[column] <= upper_bound)]
+            after_count = len(data_cleaned)
+
+            self.report('info', f"📊 异常值处理: {before_count} → {after_count} (移除 {before_count - after_count} 个异常值)")
+
+            return data_cleaned
+        except Exception as e:
+            self.report('warning', f"异常值处理出错: {str(e)}，使用原始数据")
+            return data
+
+    def _segment_products(self):
+        """产品分段 - 按销量特征分类"""
+        self.report('info', "📊 产品分段分析...")
+
+        try:
+            # 计算每个产品的销量特征
+            product_stats = self.shipment_data.groupby('product_code')['quantity'].agg([
+                'count', 'mean', 'std', 'min', 'max', 'sum'
+            ]).reset_index()
+
+            product_stats['cv'] = product_stats['std'] / product_stats['mean']
+            product_stats['cv'] = product_stats['cv'].fillna(0)
+
+            # 基于销量均值和变异系数分段
+            volume_high = product_stats['mean'].quantile(0.67)
+            volume_low = product_stats['mean'].quantile(0.33)
+            cv_high = product_stats['cv'].quantile(0.67)
+
+            def classify_product(row):
+                if row['mean'] >= volume_high:
+                    return '高销量稳定' if row['cv'] <= cv_high else '高销量波动'
+                elif row['mean'] >= volume_low:
+                    return '中销量稳定' if row['cv'] <= cv_high else '中销量波动'
+                else:
+                    return '低销量稳定' if row['cv'] <= cv_high else '低销量波动'
+
+            product_stats['segment'] = product_stats.apply(classify_product, axis=1)
+
+            # 保存分段结果
+            self.product_segments = dict(zip(product_stats['product_code'], product_stats['segment']))
+
+            # 打印分段统计
+            segment_counts = product_stats['segment'].value_counts()
+            self.report('success', "📊 产品分段结果:")
+            for segment, count in segment_counts.items():
+                self.report('write', f"   {segment}: {count} 个产品")
+
+            return product_stats
+        except Exception as e:
+            self.report('error', f"❌ 产品分段失败: {str(e)}")
+            return None
+
+    def feature_columns(self) -> List[str]:
+        """模型输入的特征列（后处理后的特征数据中除产品、目标和产品段以外的列）"""
+        return [col for col in self.feature_data.columns if col not in NON_FEATURE_COLUMNS]
+
+    def load_or_train_models(self, months: List[str] = None) -> Dict:
+        """获取当前数据和特征对应的模型 - 注册表中已有时直接载入，缺少的滚动起点模型补充训练后一起保存
+
+        months为需要滚动起点模型的目标月（默认全部目标月）。
+        """
+        feature_columns = self.feature_columns()
+        data_version = shipment_data_version(self.shipment_data)
+        key = self.registry.model_key(data_version, feature_columns, MODEL_BACKEND)
+        months = sorted(self.feature_data['target_month'].unique() if months is None else months)
+
+        trained = self.registry.load(key)
+        missing = months if trained is None else [month for month in months if month not in trained['backtest']]
+        if trained is not None and not missing:
+            self.report('success', f"✅ 载入已训练的{MODEL_BACKEND}模型（跳过训练）")
+        else:
+            self.report('info', f"🧠 训练{MODEL_BACKEND}模型（{len(missing)} 个目标月, "
+                                f"{len(self.feature_data)} 个样本, {len(feature_columns)} 个特征）...")
+            start = time.perf_counter()
+            if trained is None:
+                trained = train_prediction_models(self.feature_data, feature_columns, MODEL_BACKEND, months=missing,
+                                                  progress=self.report_progress)
+            else:
+                trained['backtest'].update(train_backtest_models(self.feature_data, feature_columns, MODEL_BACKEND,
+                                                                 months=missing, progress=self.report_progress))
+                trained['backtest'] = dict(sorted(trained['backtest'].items()))
+            seconds = time.perf_counter() - start
+            model_count = len(trained['models']) + sum(len(models) for models in trained['backtest'].values())
+            self.registry.save(key, trained, {
+                'data_version': data_version,
+                'backend': MODEL_BACKEND,
+                'features': len(feature_columns),
+                'samples': len(self.feature_data),
+                'models': model_count,
+                'seconds': round(seconds, 2)
+            })
+            self.report('success', f"✅ 训练完成: {len(missing)} 个目标月，共 {model_count} 个模型，耗时 {seconds:.1f}s")
+
+        self.models = trained['models']
+        return trained
+
+    def monthly_cube(self) -> pd.DataFrame:
+        """获取预处理后出货数据的产品×月聚合 - 同一数据版本只构建一次"""
+        monthly_data, seconds = monthly_cube_cache.get(self.shipment_data)
+        if seconds > 0:
+            self.report('success', f"📊 月度聚合数据: {len(monthly_data)} 行（构建耗时 {seconds:.2f}s）")
+        else:
+            self.report('info', f"📊 月度聚合数据: {len(monthly_data)} 行（复用已构建的结果）")
+        return monthly_data
+
+    @perf_monitor.profile()
+    def create_advanced_features(self):
+        """创建高级特征 - 与附件一相同的逻辑"""
+        self.report('info', "🔧 高级特征工程...")
+
+        try:
+            # 月度数据（与历史预测共用）
+            monthly_data = self.monthly_cube()
+
+            # 一次分组计算所有产品、所有目标月的扩展窗口特征（至少需要4个月数据）
+            self.feature_data = build_rolling_features(monthly_data, self.product_segments)
+
+            if len(self.feature_data) == 0:
+                self.report('error', "❌ 无法创建特征数据")
+                return False
+
+            self.report('success', f"✅ 高级特征数据: {len(self.feature_data)} 行, {len(self.feature_data.columns) - 4} 个特征")
+
+            # 特征工程后处理
+            self._post_process_features()
+
+            return True
+        except Exception as e:
+            self.report('error', f"❌ 特征工程失败: {str(e)}")
+            return False
+
+    def _post_process_features(self):
+        """特征后处理"""
+        self.report('info', "🔧 特征后处理...")
+
+        try:
+            # 获取数值特征列
+            feature_cols = [col for col in self.feature_data.columns
+                            if col not in ['product_code', 'target', 'target_month', 'segment']]
+
+            # 处理无穷值和NaN
+            self.feature_data[feature_cols] = self.feature_data[feature_cols].replace([np.inf, -np.inf], np.nan)
+
+            # 用0填充NaN（对于销售数据，0是合理的默认值）
+            self.feature_data[feature_cols] = self.feature_data[feature_cols].fillna(0)
+
+            # 移除常数特征
+            constant_features = []
+            for col in feature_cols:
+                if self.feature_data[col].std() == 0:
+                    constant_features.append(col)
+
+            if constant_features:
+                self.report('info', f"  移除常数特征: {constant_features}")
+                self.feature_data = self.feature_data.drop(columns=constant_features)
+
+            self.report(
+                'success',
+                f"✅ 最终特征数: {len([col for col in self.feature_data.columns if col not in ['product_code', 'target', 'target_month', 'segment']])}")
+        except Exception as e:
+            self.report('error', f"❌ 特征后处理失败: {str(e)}")
+
+    @perf_monitor.profile()
+    def generate_complete_historical_predictions(self):
+        """生成完整的历史预测对比数据 - 每个目标月使用只以更早月份训练的模型预测
+
+        回测结果和各产品已回测到的月份（水位线）按出货数据来源保存在模型注册表中，再次运行时只回测水位线之后的月份，
+        产品准确率统计也只更新有新月份的产品；没有指定数据来源时完整回测，不读写回测状态。
+        """
+        self.report('info', "📊 生成完整历史预测对比...")
+
+        try:
+            state_key = None
+            state = None
+            if self.shipment_source is not None:
+                state_key = self.registry.backtest_key(self.shipment_source, self.feature_columns(), MODEL_BACKEND)
+                state = self.registry.load_backtest(state_key)
+            stored, watermarks, resegmented = self._reusable_backtest(state)
+
+            # 只回测各产品水位线之后的目标月
+            pending = self.feature_data[
+                self.feature_data['target_month'] > self.feature_data['product_code'].map(watermarks).fillna('')]
+            months = sorted(pending['target_month'].unique())
+            self.report('info', f"📌 沿用 {len(stored)} 条历史预测，新回测 {len(pending)} 条（{len(months)} 个目标月）")
+
+            trained = self.load_or_train_models(months)
+            new_predictions = self._backtest_rows(pending, trained)
+
+            # 按产品代码和年月排列
+            frames = [frame for frame in (stored, new_predictions) if len(frame) > 0]
+            self.historical_predictions = pd.concat(frames, ignore_index=True).sort_values(
+                ['产品代码', '年月'], kind='stable', ignore_index=True) if frames else new_predictions
+
+            # 计算产品准确率统计（沿用没有新回测月份、也没有重新分段的产品的统计）
+            self.historical_accuracy = state['historical_accuracy'] if len(stored) > 0 else None
+            self._calculate_product_accuracy_stats(products=set(new_predictions['产品代码']) | resegmented)
+
+            if state_key is not None:
+                watermarks.update(new_predictions.groupby('产品代码')['年月'].max().to_dict())
+                self.registry.save_backtest(state_key, {
+                    'historical_predictions': self.historical_predictions,
+                    'historical_accuracy': self.historical_accuracy,
+                    'watermarks': watermarks
+                })
+
+            self.report('success', f"✅ 生成了 {len(self.historical_predictions)} 条历史预测记录")
+            self.report('success', f"✅ 覆盖 {len(self.historical_predictions['产品代码'].unique())} 个产品")
+
+            # 整体准确率统计
+            overall_accuracy = self.historical_predictions['准确率(%)'].mean()
+            self.report('success', f"📊 整体平均SMAPE准确率: {overall_accuracy:.2f}%")
+
+            return True
+        except Exception as e:
+            self.report('error', f"❌ 历史预测生成失败: {str(e)}")
+            return False
+
+    def _reusable_backtest(self, state: Dict) -> Tuple[pd.DataFrame, Dict[str, str], set]:
+        """从保存的回测状态中取出仍然有效的历史预测和水位线（产品代码 -> 已回测到的年月）
+
+        某产品已回测月份的实际销量与当前数据不一致或缺少记录（如上次运行时该月数据不完整、历史数据被修改）时，
+        丢弃该产品从第一个不一致月份起的历史预测，水位线退回到它之前的月份。
+        产品重新分段时沿用当时的预测，只更新产品段。返回(历史预测, 水位线, 产品段有变化的产品)。
+        """
+        if not state:
+            return pd.DataFrame(columns=HISTORY_COLUMNS), {}, set()
+
+        stored, watermarks = state['historical_predictions'], dict(state['watermarks'])
+        current = pd.DataFrame({
+            '产品代码': self.feature_data['product_code'].to_numpy(),
+            '年月': self.feature_data['target_month'].to_numpy(),
+            '实际值': np.round(self.feature_data['target'].to_numpy(dtype=float), 2)
+        })
+        current = current[current['年月'] <= current['产品代码'].map(watermarks).fillna('')]
+
+        merged = stored[['产品代码', '年月', '实际值']].merge(
+            current, on=['产品代码', '年月'], how='outer', suffixes=('', '_当前'), indicator=True)
+        changed = (merged['_merge'] != 'both') | (merged['实际值'] != merged['实际值_当前'])
+        first_changed = merged.loc[changed].groupby('产品代码')['年月'].min()
+        if len(first_changed) > 0:
+            self.report('warning', f"⚠️ {len(first_changed)} 个产品的已回测数据有变化，从变化的月份起重新回测")
+            cutoff = stored['产品代码'].map(first_changed)
+            keep = cutoff.isna().to_numpy(copy=True)
+            keep[~keep] = (stored['年月'][~keep] < cutoff[~keep]).to_numpy()
+            stored = stored[keep].reset_index(drop=True)
+
+            kept_months = stored.groupby('产品代码')['年月'].max()
+            for product in first_changed.index:
+                if product in kept_months.index:
+                    watermarks[product] = kept_months[product]
+                else:
+                    watermarks.pop(product, None)
+
+        # 重新分段的产品沿用原有预测，更新产品段
+        segments = stored['产品代码'].map(self.product_segments).fillna(stored['产品段'])
+        resegmented = set(stored.loc[segments != stored['产品段'], '产品代码'])
+        if resegmented:
+            self.report('info', f"🔄 {len(resegmented)} 个产品重新分段，沿用原有历史预测并更新产品段")
+            stored = stored.assign(产品段=segments)
+        return stored, watermarks, resegmented
+
+    def _backtest_rows(self, feature_rows: pd.DataFrame, trained: Dict) -> pd.DataFrame:
+        """对特征行做滚动起点预测，生成历史预测记录"""
+        predictions, model_names = predict_backtest(feature_rows, trained)
+        actual_values = feature_rows['target'].to_numpy(dtype=float)
+        accuracy = self.calculate_batch_robust_accuracy(actual_values, predictions, method='smape')
+
+        return pd.DataFrame({
+            '产品代码': feature_rows['product_code'].to_numpy(),
+            '年月': feature_rows['target_month'].to_numpy(),
+            '预测值': np.round(predictions, 2),
+            '实际值': np.round(actual_values, 2),
+            '绝对误差': np.round(np.abs(actual_values - predictions), 2),
+            '准确率(%)': np.round(accuracy, 2),
+            '产品段': feature_rows['segment'].to_numpy(),
+            '使用模型': model_names
+        }, columns=HISTORY_COLUMNS)
+
+    def _calculate_product_accuracy_stats(self, products=None):
+        """计算每个产品的准确率统计 - 传入products时只重新统计这些产品，其余产品沿用已有的统计"""
+        try:
+            predictions = self.historical_predictions
+            previous = None
+            if products is not None and self.historical_accuracy is not None:
+                # 沿用未变化产品的统计（已不在历史预测中的产品除外）
+                previous = self.historical_accuracy[
+                    ~self.historical_accuracy['产品代码'].isin(products)
+                    & self.historical_accuracy['产品代码'].isin(predictions['产品代码'])]
+                predictions = predictions[predictions['产品代码'].isin(products)]
+
+            product_codes = predictions['产品代码']
+            accuracy = predictions['准确率(%)']
+            groups = accuracy.groupby(product_codes, sort=False)
+
+            # 销量加权准确率（最近3个月）
+            recent = predictions.groupby('产品代码', sort=False).tail(3)
+            weights = recent['实际值'] / recent.groupby('产品代码', sort=False)['实际值'].transform('sum')
+            weighted_accuracy = (recent['准确率(%)'] * weights).groupby(recent['产品代码'], sort=False).sum()
+
+            # 准确率分布
+            product_stats = pd.DataFrame({
+                '平均准确率(%)': groups.mean().round(2),
+                '最近准确率(%)': groups.last().round(2),
+                '加权准确率(%)': weighted_accuracy.round(2),
+                '预测次数': groups.size(),
+                '85%以上次数': (accuracy >= 85).groupby(product_codes, sort=False).sum(),
+                '90%以上次数': (accuracy >= 90).groupby(product_codes, sort=False).sum(),
+                '产品段': predictions['产品段'].groupby(product_codes, sort=False).first()
+            }).rename_axis('产品代码').reset_index()
+
+            if previous is not None and len(previous) > 0:
+                product_stats = pd.concat([previous, product_stats], ignore_index=True) \
+                    if len(product_stats) > 0 else previous
+            self.historical_accuracy = product_stats.sort_values('产品代码', kind='stable', ignore_index=True)
+        except Exception as e:
+            self.report('error', f"❌ 产品准确率统计计算失败: {str(e)}")
+
+    def run(self, shipment_data: pd.DataFrame, promotion_data: pd.DataFrame, shipment_source: str = None) -> bool:
+        """在给定的出货和促销数据上运行完整计算流程（shipment_source为出货数据的来源，见类说明）"""
+        self.shipment_data = shipment_data
+        self.shipment_source = shipment_source
+        self.promotion_data = promotion_data
+
+        return (self.preprocess_data()
+                and self.create_advanced_features()
+                and self.generate_complete_historical_predictions())
+
+    def results(self) -> Dict:
+        """导出计算结果（用于预计算存储）"""
+        return {
+            'historical_predictions': self.historical_predictions,
+            'historical_accuracy': self.historical_accuracy,
+            'product_segments': self.product_segments,
+            'feature_data': self.feature_data
+        }
+
+    def restore(self, results: Dict):
+        """载入预计算的结果"""
+        self.historical_predictions = results['historical_predictions']
+        self.historical_accuracy = results['historical_accuracy']
+        self.product_segments = results['product_segments']
+        self.feature_data = results['feature_data']
+
+
+# 创建全局实例
+monthly_cube_cache = MonthlyCubeCache()
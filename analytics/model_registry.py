@@ -0,0 +1,145 @@
+# analytics/model_registry.py - 机器学习模型注册表模块
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import joblib
+
+# 模型格式版本，训练逻辑或保存结构变化时递增，使旧模型失效
+MODEL_FORMAT = 1
+
+# 磁盘上保留的模型数（按写入时间保留最新的）
+MODEL_HISTORY = 4
+
+
+class ModelRegistry:
+    """模型注册表类 - 按数据版本和特征结构用joblib保存训练好的模型
+
+    同一份出货数据、同一组特征列和同一个模型库只训练一次；模型保存在本地磁盘（默认data/models/），
+    进程内同时缓存已载入的模型，页面重新运行时直接使用。
+    另外保存滚动回测的状态（历史预测、产品准确率统计和各产品已回测到的月份），按数据来源和特征结构而不按数据版本区分，
+    同一来源的出货数据按月增长后仍可沿用，只回测新增的月份；不同来源的状态互不影响。
+    模型和回测状态都登记在清单中，各自只保留最近写入的history个。
+    """
+
+    def __init__(self, registry_dir: str = os.path.join("data", "models"), history: int = MODEL_HISTORY):
+        self.registry_dir = registry_dir
+        self.history = history
+        self.manifest_file = os.path.join(self.registry_dir, "manifest.json")
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def model_key(data_version: str, feature_columns: List[str], backend: str) -> str:
+        """模型键：数据版本、特征列（含顺序）、模型库和模型格式的组合哈希"""
+        schema = "|".join([f"format:{MODEL_FORMAT}", f"data:{data_version}", f"backend:{backend}", *feature_columns])
+        return hashlib.sha256(schema.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def backtest_key(source: str, feature_columns: List[str], backend: str) -> str:
+        """回测状态键：数据来源（文件路径或URL）、特征列（含顺序）、模型库和模型格式的组合哈希（不含数据版本）"""
+        schema = "|".join([f"format:{MODEL_FORMAT}", f"source:{source}", f"backend:{backend}", *feature_columns])
+        return hashlib.sha256(schema.encode('utf-8')).hexdigest()[:16]
+
+    def _backtest_path(self, key: str) -> str:
+        """回测状态文件路径"""
+        return os.path.join(self.registry_dir, f"backtest_{key}.joblib")
+
+    def load_backtest(self, key: str) -> Optional[Dict]:
+        """读取回测状态，没有（或文件损坏）时返回None"""
+        try:
+            return joblib.load(self._backtest_path(key))
+        except Exception:
+            return None
+
+    def save_backtest(self, key: str, state: Dict) -> str:
+        """保存回测状态（先写临时文件再替换）并登记到清单，同时清理超出保留数的旧回测状态文件"""
+        os.makedirs(self.registry_dir, exist_ok=True)
+        path = self._backtest_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._register(f"backtest_{key}", path, {'kind': 'backtest'})
+        return path
+
+    def _path(self, key: str) -> str:
+        """模型文件路径"""
+        return os.path.join(self.registry_dir, f"models_{key}.joblib")
+
+    def manifest(self) -> Dict:
+        """读取清单（模型的数据版本、模型库、特征数、训练时间和耗时，以及回测状态文件的写入时间）"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def _save_manifest(self, manifest: Dict):
+        """写入模型清单（先写临时文件再替换）"""
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    def load(self, key: str) -> Optional[Dict]:
+        """读取指定键的模型，内存和磁盘都没有（或文件损坏）时返回None"""
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+
+        try:
+            entry = joblib.load(self._path(key))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # 模型文件损坏，由调用方重新训练
+            return None
+
+        with self._lock:
+            self._memory = {key: entry}
+        return entry
+
+    def save(self, key: str, entry: Dict, meta: Dict = None) -> str:
+        """保存模型并登记到清单，同时清理超出保留数的旧模型文件"""
+        os.makedirs(self.registry_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(entry, tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._memory = {key: entry}
+            self._register(key, path, {'kind': 'models', **(meta or {})})
+        return path
+
+    def _register(self, name: str, path: str, meta: Dict):
+        """把文件登记到清单末尾，同类（模型/回测状态）超出保留数的旧文件从清单和磁盘上删除（调用方持有锁）"""
+        manifest = self.manifest()
+        manifest.pop(name, None)
+        manifest[name] = {
+            'file': os.path.basename(path),
+            'size': os.path.getsize(path),
+            'trained_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            **meta
+        }
+        same_kind = [item for item, info in manifest.items() if info.get('kind', 'models') == meta['kind']]
+        for stale_name in same_kind[:-self.history]:
+            try:
+                os.remove(os.path.join(self.registry_dir, manifest.pop(stale_name)['file']))
+            except OSError:
+                pass
+        self._save_manifest(manifest)
+
+    def clear(self):
+        """清除内存中的模型（不删除磁盘文件）"""
+        with self._lock:
+            self._memory.clear()
+
+
+# 创建全局实例
+model_registry = ModelRegistry()
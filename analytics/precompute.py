@@ -0,0 +1,83 @@
+# analytics/precompute.py - 看板预计算命令行入口
+#
+# 用法（在项目根目录执行）：
+#   python -m analytics.precompute                      # 计算全部看板一次
+#   python -m analytics.precompute -d sales product     # 只计算指定看板
+#   python -m analytics.precompute --interval 3600      # 每小时检查一次，输入变化时重新计算
+#   python -m analytics.precompute --force              # 忽略已有结果强制重新计算
+#   python -m analytics.precompute --as-of 2025-03-31   # 按历史基准日期计算依赖日期的看板（回放过去的状态）
+import argparse
+import logging
+import sys
+import time
+import warnings
+from datetime import date
+from typing import Dict, List
+
+import pandas as pd
+
+from analytics.dashboards import DASHBOARDS, build_dashboard, dashboard_version
+from analytics.store import aggregate_store
+
+logger = logging.getLogger('analytics.precompute')
+
+
+def precompute(names: List[str], force: bool = False, as_of: date = None) -> Dict[str, Dict]:
+    """计算指定看板并写入磁盘，已有当前版本结果的看板跳过（force=True时重新计算）
+
+    依赖日期的看板以as_of为基准日期（默认当天，同一轮中所有看板使用同一日期）。
+    """
+    as_of = as_of or date.today()
+    results = {}
+    for name in names:
+        start = time.perf_counter()
+        try:
+            version = dashboard_version(name, as_of)
+            if not force and aggregate_store.is_ready(name, version):
+                results[name] = {'status': 'skipped', 'version': version, 'seconds': 0.0}
+                logger.info(f"{name}: 版本 {version} 已是最新，跳过")
+                continue
+
+            payload = build_dashboard(name, as_of)
+            seconds = round(time.perf_counter() - start, 2)
+            path = aggregate_store.save(name, version, payload, seconds)
+            results[name] = {'status': 'done', 'version': version, 'seconds': seconds}
+            logger.info(f"{name}: 版本 {version} 计算完成，用时 {seconds}s -> {path}")
+        except Exception as e:
+            results[name] = {'status': 'failed', 'error': str(e),
+                             'seconds': round(time.perf_counter() - start, 2)}
+            logger.exception(f"{name}: 计算失败")
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    # 与页面服务进程一致，开启写时复制（见初始登陆界面.py）
+    pd.options.mode.copy_on_write = True
+    parser = argparse.ArgumentParser(description="预计算各看板的聚合结果并写入 data/aggregates/")
+    parser.add_argument('-d', '--dashboards', nargs='+', choices=list(DASHBOARDS), default=list(DASHBOARDS),
+                        help="要计算的看板（默认全部）")
+    parser.add_argument('--interval', type=int, default=0,
+                        help="循环执行的间隔秒数，0表示只执行一次")
+    parser.add_argument('--force', action='store_true', help="忽略已有结果强制重新计算")
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                        help="依赖日期的看板的基准日期（YYYY-MM-DD，默认当天；结果会替换磁盘上该看板的当前结果）")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出调试日志")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    warnings.filterwarnings('ignore')
+
+    while True:
+        results = precompute(args.dashboards, force=args.force, as_of=args.as_of)
+        failed = [name for name, result in results.items() if result['status'] == 'failed']
+        if args.interval <= 0:
+            return 1 if failed else 0
+
+        # 定时模式下只有第一轮强制重新计算，之后按版本号判断是否需要计算
+        args.force = False
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,801 @@
+# analytics/product.py - 产品组合分析计算模块
+import logging
+import os
+import re
+from typing import Dict
+
+import pandas as pd
+
+from data_registry import PAGE_DATASETS, dataset_registry
+from perf_monitor import perf_monitor
+
+logger = logging.getLogger(__name__)
+
+# 本看板使用的数据集
+PRODUCT_DATASETS = PAGE_DATASETS['产品组合分析']
+
+
+# 产品名称简化函数
+def simplify_product_name(name):
+    """简化产品名称，去掉口力和-中国等后缀"""
+    if pd.isna(name):
+        return ""
+    # 去掉口力
+    name = name.replace('口力', '')
+    # 去掉-中国等后缀
+    name = re.sub(r'-中国.*$', '', name)
+    # 去掉其他常见后缀
+    name = re.sub(r'（.*）$', '', name)
+    name = re.sub(r'\(.*\)$', '', name)
+    # 限制长度
+    if len(name) > 8:
+        name = name[:8] + '..'
+    return name.strip()
+
+
+def _read_code_file(path):
+    """读取产品代码文本文件（每行一个代码）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f.readlines() if line.strip()]
+
+
+@perf_monitor.profile()
+def load_product_data(registry=dataset_registry, code_dir: str = '') -> Dict:
+    """加载并预处理产品组合分析所需的数据（code_dir为产品代码文本文件所在目录，默认当前目录）"""
+    # 星品代码
+    star_products = _read_code_file(os.path.join(code_dir, '星品&新品年度KPI考核产品代码.txt'))
+
+    # 新品代码
+    new_products = _read_code_file(os.path.join(code_dir, '仪表盘新品代码.txt'))
+
+    # 仪表盘产品代码
+    dashboard_products = _read_code_file(os.path.join(code_dir, '仪表盘产品代码.txt'))
+
+    # 促销活动数据
+    promotion_df = registry.get('promotion_activities')
+
+    # 销售数据
+    sales_df = registry.get('promotion_sales')
+
+    sales_df['发运月份'] = pd.to_datetime(sales_df['发运月份'])
+    sales_df['销售额'] = sales_df['单价'] * sales_df['箱数']
+
+    # 获取动态时间信息
+    time_info = get_dynamic_time_range(sales_df)
+    current_year = time_info['current_year']
+
+    logger.debug(f"销售数据 {len(sales_df)} 行，{sales_df['产品代码'].nunique()} 个产品，"
+                 f"{current_year}年 {len(sales_df[sales_df['发运月份'].dt.year == current_year])} 行")
+
+    # 简化产品名称
+    sales_df['产品简称'] = sales_df['产品简称'].apply(simplify_product_name)
+    promotion_df['促销产品名称'] = promotion_df['促销产品名称'].apply(simplify_product_name)
+
+    return {
+        'star_products': star_products,
+        'new_products': new_products,
+        'dashboard_products': dashboard_products,
+        'promotion_df': promotion_df,
+        'sales_df': sales_df,
+        'time_info': time_info
+    }
+
+
+def get_dynamic_time_range(sales_df):
+    """动态获取数据的时间范围和最新月份"""
+    try:
+        # 获取数据中的最新月份和最早月份
+        sales_df['发运月份'] = pd.to_datetime(sales_df['发运月份'])
+        latest_month = sales_df['发运月份'].max()
+        earliest_month = sales_df['发运月份'].min()
+
+        # 获取当前年份的数据
+        current_year = latest_month.year
+        current_year_data = sales_df[sales_df['发运月份'].dt.year == current_year]
+
+        if len(current_year_data) > 0:
+            current_year_latest = current_year_data['发运月份'].max()
+        else:
+            current_year_latest = latest_month
+
+        # 计算环比月份（上个月）
+        previous_month = current_year_latest - pd.DateOffset(months=1)
+
+        # 计算同比月份（去年同期）
+        same_month_last_year = current_year_latest - pd.DateOffset(years=1)
+
+        return {
+            'latest_month': current_year_latest,
+            'previous_month': previous_month,
+            'same_month_last_year': same_month_last_year,
+            'current_year': current_year,
+            'data_range': f"{earliest_month.strftime('%Y-%m')} 至 {latest_month.strftime('%Y-%m')}"
+        }
+    except Exception as e:
+        logger.error(f"时间范围计算出错: {str(e)}")
+        # 返回默认值
+        return {
+            'latest_month': pd.Timestamp('2025-04'),
+            'previous_month': pd.Timestamp('2025-03'),
+            'same_month_last_year': pd.Timestamp('2024-04'),
+            'current_year': 2025,
+            'data_range': "2024-01 至 2025-04"
+        }
+
+
+# 计算总体指标（基于后续所有分析）
+@perf_monitor.profile()
+def calculate_comprehensive_metrics(sales_df, star_products, new_products, dashboard_products, promotion_df, time_info):
+    """计算产品情况总览的各项指标（使用动态时间范围）"""
+    current_year = time_info['current_year']
+
+    # 当前年份数据
+    sales_current_year = sales_df[sales_df['发运月份'].dt.year == current_year]
+
+    # 总销售额 - 计算所有产品并四舍五入
+    total_sales = round(sales_current_year['销售额'].sum())
+
+    # 星品和新品销售额 - 在所有产品中查找星品和新品
+    star_sales = sales_current_year[sales_current_year['产品代码'].isin(star_products)]['销售额'].sum()
+    new_sales = sales_current_year[sales_current_year['产品代码'].isin(new_products)]['销售额'].sum()
+
+    # 占比计算 - 基于所有产品的总销售额
+    star_ratio = (star_sales / total_sales * 100) if total_sales > 0 else 0
+    new_ratio = (new_sales / total_sales * 100) if total_sales > 0 else 0
+    total_ratio = star_ratio + new_ratio
+
+    # 新品渗透率 - 基于所有客户
+    total_customers = sales_current_year['客户名称'].nunique()
+    new_customers = sales_current_year[sales_current_year['产品代码'].isin(new_products)]['客户名称'].nunique()
+    penetration_rate = (new_customers / total_customers * 100) if total_customers > 0 else 0
+
+    # BCG分析 - 改为分析所有产品
+    product_analysis = analyze_product_bcg_comprehensive(sales_df, None, time_info)  # 传入None表示分析所有产品
+
+    total_bcg_sales = product_analysis['sales'].sum() if len(product_analysis) > 0 else 0
+    cow_sales = product_analysis[product_analysis['category'] == 'cow']['sales'].sum() if len(
+        product_analysis) > 0 else 0
+    star_question_sales = product_analysis[product_analysis['category'].isin(['star', 'question'])][
+        'sales'].sum() if len(product_analysis) > 0 else 0
+
+    cow_ratio = cow_sales / total_bcg_sales * 100 if total_bcg_sales > 0 else 0
+    star_question_ratio = star_question_sales / total_bcg_sales * 100 if total_bcg_sales > 0 else 0
+
+    jbp_status = 'YES' if (45 <= cow_ratio <= 50 and 40 <= star_question_ratio <= 45) else 'NO'
+
+    # 促销有效性
+    data = {
+        'promotion_df': promotion_df,
+        'sales_df': sales_df
+    }
+    promo_results = analyze_promotion_effectiveness_enhanced(data, time_info)
+    promo_effectiveness = (promo_results['is_effective'].sum() / len(promo_results) * 100) if len(
+        promo_results) > 0 else 0
+
+    # 有效产品分析 - 只分析仪表盘产品
+    effective_rate_all = calculate_effective_products_rate(sales_current_year, dashboard_products)
+
+    # 计算有效产品详细数据 - 只分析仪表盘产品
+    data = {
+        'sales_df': sales_df,
+        'dashboard_products': dashboard_products
+    }
+    product_analysis_eff = analyze_effective_products(data, 'national')
+    effective_products = product_analysis_eff[product_analysis_eff['is_effective'] == True]
+    effective_count = len(effective_products)
+
+    if len(effective_products) > 0:
+        avg_effective_sales = effective_products['monthly_avg_boxes'].mean()
+    else:
+        avg_effective_sales = 0
+
+    return {
+        'total_sales': total_sales,  # 所有产品的销售额（已四舍五入）
+        'star_ratio': star_ratio,
+        'new_ratio': new_ratio,
+        'total_ratio': total_ratio,
+        'penetration_rate': penetration_rate,
+        'jbp_status': jbp_status,
+        'promo_effectiveness': promo_effectiveness,
+        'effective_products_rate': effective_rate_all,
+        'effective_products_count': effective_count,
+        'avg_effective_sales': avg_effective_sales,
+        'current_year': current_year,
+        'data_range': time_info['data_range']
+    }
+
+
+@perf_monitor.profile()
+def analyze_product_bcg_comprehensive(sales_df, dashboard_products, time_info):
+    """分析产品BCG矩阵数据，使用动态时间范围"""
+    if len(sales_df) == 0:
+        return pd.DataFrame()
+
+    current_year = time_info['current_year']
+    current_data = sales_df[sales_df['发运月份'].dt.year == current_year]
+    prev_data = sales_df[sales_df['发运月份'].dt.year == current_year - 1]
+
+    # 如果dashboard_products为None，则分析所有产品
+    if dashboard_products is None:
+        products_to_analyze = current_data['产品代码'].unique().tolist()
+        # 添加去年有但今年没有的产品
+        prev_year_products = prev_data['产品代码'].unique()
+        for p in prev_year_products:
+            if p not in products_to_analyze:
+                products_to_analyze.append(p)
+    else:
+        products_to_analyze = dashboard_products
+
+    product_stats = []
+    total_sales = current_data['销售额'].sum()
+
+    for product in products_to_analyze:
+        current_product_data = current_data[current_data['产品代码'] == product]
+        prev_product_data = prev_data[prev_data['产品代码'] == product]
+
+        current_sales = current_product_data['销售额'].sum()
+        prev_sales = prev_product_data['销售额'].sum()
+
+        # 获取产品名称
+        if len(current_product_data) > 0:
+            product_name = current_product_data['产品简称'].iloc[0]
+        elif len(prev_product_data) > 0:
+            product_name = prev_product_data['产品简称'].iloc[0]
+        else:
+            all_product_data = sales_df[sales_df['产品代码'] == product]
+            if len(all_product_data) > 0:
+                product_name = all_product_data['产品简称'].iloc[0]
+            else:
+                product_name = product
+
+        # 只处理有销售数据的产品
+        if current_sales > 0 or prev_sales > 0:
+            market_share = (current_sales / total_sales * 100) if total_sales > 0 else 0
+
+            # 计算增长率，限制在合理范围内
+            if prev_sales > 0:
+                growth_rate = ((current_sales - prev_sales) / prev_sales * 100)
+            elif current_sales > 0:
+                growth_rate = 100
+            else:
+                growth_rate = 0
+
+            # 存储真实增长率用于显示
+            real_growth_rate = growth_rate
+            # 限制显示范围用于图表
+            display_growth_rate = max(-50, min(growth_rate, 100))
+
+            # 分类逻辑
+            if market_share >= 1.5 and growth_rate > 20:
+                category = 'star'
+                reason = f"市场份额高({market_share:.1f}%≥1.5%)且增长快({growth_rate:.1f}%>20%)"
+            elif market_share < 1.5 and growth_rate > 20:
+                category = 'question'
+                reason = f"市场份额低({market_share:.1f}%<1.5%)但增长快({growth_rate:.1f}%>20%)"
+            elif market_share >= 1.5 and growth_rate <= 20:
+                category = 'cow'
+                reason = f"市场份额高({market_share:.1f}%≥1.5%)但增长慢({growth_rate:.1f}%≤20%)"
+            else:
+                category = 'dog'
+                reason = f"市场份额低({market_share:.1f}%<1.5%)且增长慢({growth_rate:.1f}%≤20%)"
+
+            product_stats.append({
+                'product': product,
+                'name': product_name,
+                'market_share': market_share,
+                'growth_rate': display_growth_rate,
+                'real_growth_rate': real_growth_rate,
+                'sales': current_sales,
+                'prev_sales': prev_sales,
+                'category': category,
+                'category_reason': reason,
+                'calculation_detail': f"当前销售额: ¥{current_sales:,.0f}\n去年销售额: ¥{prev_sales:,.0f}\n市场份额: {market_share:.2f}%\n真实增长率: {real_growth_rate:.1f}%"
+            })
+
+    return pd.DataFrame(product_stats)
+
+
+def get_strategy_suggestion(category):
+    """获取策略建议"""
+    strategies = {
+        'star': '继续加大投入，保持市场领导地位，扩大竞争优势',
+        'question': '选择性投资，识别潜力产品，加快市场渗透',
+        'cow': '维持现有投入，最大化利润贡献，为其他产品提供资金',
+        'dog': '控制成本，考虑产品升级或逐步退出'
+    }
+    return strategies.get(category, '')
+
+
+# 促销活动有效性分析
+@perf_monitor.profile()
+def analyze_promotion_effectiveness_enhanced(data, time_info):
+    """基于实际促销周期的有效性分析（使用动态时间）"""
+    promotion_df = data['promotion_df']
+    sales_df = data['sales_df']
+
+    # 只分析全国促销活动，去除重复
+    national_promotions = promotion_df[promotion_df['所属区域'] == '全国'].drop_duplicates(
+        subset=['产品代码', '促销开始供货时间', '促销结束供货时间'])
+
+    effectiveness_results = []
+
+    for _, promo in national_promotions.iterrows():
+        product_code = promo['产品代码']
+
+        # 解析促销时间
+        try:
+            promo_start = pd.to_datetime(promo['促销开始供货时间'])
+            promo_end = pd.to_datetime(promo['促销结束供货时间'])
+        except:
+            # 如果时间解析失败，跳过该促销
+            logger.warning(f"时间解析失败，跳过产品 {product_code}")
+            continue
+
+        # 计算促销期间长度（天数）
+        promo_duration = (promo_end - promo_start).days + 1
+
+        # 计算促销期间的销售数据
+        promo_period_sales = sales_df[
+            (sales_df['发运月份'] >= promo_start) &
+            (sales_df['发运月份'] <= promo_end) &
+            (sales_df['产品代码'] == product_code)
+            ]['销售额'].sum()
+
+        promo_period_boxes = sales_df[
+            (sales_df['发运月份'] >= promo_start) &
+            (sales_df['发运月份'] <= promo_end) &
+            (sales_df['产品代码'] == product_code)
+            ]['箱数'].sum()
+
+        # 计算日均销售额
+        daily_avg_sales = promo_period_sales / promo_duration if promo_duration > 0 else 0
+        daily_avg_boxes = promo_period_boxes / promo_duration if promo_duration > 0 else 0
+
+        # 计算促销前同等长度时间段的销售数据（用于环比）
+        pre_promo_start = promo_start - pd.Timedelta(days=promo_duration)
+        pre_promo_end = promo_start - pd.Timedelta(days=1)
+
+        pre_promo_sales = sales_df[
+            (sales_df['发运月份'] >= pre_promo_start) &
+            (sales_df['发运月份'] <= pre_promo_end) &
+            (sales_df['产品代码'] == product_code)
+            ]['销售额'].sum()
+
+        pre_daily_avg_sales = pre_promo_sales / promo_duration if promo_duration > 0 else 0
+
+        # 计算去年同期数据（用于同比）
+        last_year_start = promo_start - pd.DateOffset(years=1)
+        last_year_end = promo_end - pd.DateOffset(years=1)
+
+        last_year_sales = sales_df[
+            (sales_df['发运月份'] >= last_year_start) &
+            (sales_df['发运月份'] <= last_year_end) &
+            (sales_df['产品代码'] == product_code)
+            ]['销售额'].sum()
+
+        last_year_daily_avg = last_year_sales / promo_duration if promo_duration > 0 else 0
+
+        # 计算过去6个月该产品的日均销售额（历史平均）
+        history_start = promo_start - pd.DateOffset(months=6)
+        history_end = promo_start - pd.Timedelta(days=1)
+
+        history_data = sales_df[
+            (sales_df['发运月份'] >= history_start) &
+            (sales_df['发运月份'] <= history_end) &
+            (sales_df['产品代码'] == product_code)
+            ]
+
+        if len(history_data) > 0:
+            history_days = (history_end - history_start).days + 1
+            history_total_sales = history_data['销售额'].sum()
+            history_daily_avg = history_total_sales / history_days
+        else:
+            history_daily_avg = 0
+
+        # 计算增长率（基于日均销售额）
+        # 环比增长率
+        if pre_daily_avg_sales > 0:
+            mom_growth = ((daily_avg_sales - pre_daily_avg_sales) / pre_daily_avg_sales * 100)
+        elif daily_avg_sales > 0:
+            mom_growth = 100
+        else:
+            mom_growth = 0
+
+        # 同比增长率
+        if last_year_daily_avg > 0:
+            yoy_growth = ((daily_avg_sales - last_year_daily_avg) / last_year_daily_avg * 100)
+        elif daily_avg_sales > 0:
+            yoy_growth = 100
+        else:
+            yoy_growth = 0
+
+        # 较历史平均增长率
+        if history_daily_avg > 0:
+            avg_growth = ((daily_avg_sales - history_daily_avg) / history_daily_avg * 100)
+        elif daily_avg_sales > 0:
+            avg_growth = 100
+        else:
+            avg_growth = 0
+
+        # 判断是否为新品（去年同期无销售数据）
+        is_new_product = last_year_sales < 1
+
+        # 获取产品名称
+        product_name = promo['促销产品名称']
+
+        # 判断促销类型（短期/长期）
+        is_short_term = promo_duration <= 15
+
+        # 判断有效性 - 分层标准
+        if is_new_product:
+            # 新品：日均环比增长 ≥ 15%
+            is_effective = mom_growth >= 15
+            threshold = "15%"
+            if is_effective:
+                effectiveness_reason = f"✅ 有效（新品，日均环比增长{mom_growth:.1f}%≥{threshold}）"
+            else:
+                effectiveness_reason = f"❌ 无效（新品，日均环比增长{mom_growth:.1f}%<{threshold}）"
+            positive_count = None
+        else:
+            # 成熟品：根据促销时长设置不同标准
+            if is_short_term:
+                # 短期促销：三指标中至少2个 ≥ 10%
+                threshold = 10
+                positive_indicators = [mom_growth >= threshold, yoy_growth >= threshold, avg_growth >= threshold]
+                positive_count = sum(positive_indicators)
+                is_effective = positive_count >= 2
+                effectiveness_reason = f"{'✅ 有效' if is_effective else '❌ 无效'}（短期促销，{positive_count}/3项≥{threshold}%）"
+            else:
+                # 长期促销：三指标中至少2个 ≥ 5%
+                threshold = 5
+                positive_indicators = [mom_growth >= threshold, yoy_growth >= threshold, avg_growth >= threshold]
+                positive_count = sum(positive_indicators)
+                is_effective = positive_count >= 2
+                effectiveness_reason = f"{'✅ 有效' if is_effective else '❌ 无效'}（长期促销，{positive_count}/3项≥{threshold}%）"
+
+        effectiveness_results.append({
+            'product': product_name,
+            'product_code': product_code,
+            'sales': promo_period_sales,  # 总销售额
+            'daily_avg_sales': daily_avg_sales,  # 日均销售额
+            'boxes': promo_period_boxes,
+            'daily_avg_boxes': daily_avg_boxes,  # 日均箱数
+            'is_effective': is_effective,
+            'mom_growth': mom_growth,
+            'yoy_growth': yoy_growth,
+            'avg_growth': avg_growth,
+            'positive_count': positive_count,
+            'effectiveness_reason': effectiveness_reason,
+            'pre_promo_sales': pre_promo_sales,
+            'pre_daily_avg_sales': pre_daily_avg_sales,
+            'last_year_sales': last_year_sales,
+            'last_year_daily_avg': last_year_daily_avg,
+            'history_daily_avg': history_daily_avg,
+            'is_new_product': is_new_product,
+            'is_short_term': is_short_term,
+            'promo_start': promo_start.strftime('%Y-%m-%d'),
+            'promo_end': promo_end.strftime('%Y-%m-%d'),
+            'promo_duration': promo_duration,
+            # 保持兼容性的字段名
+            'march_sales': pre_promo_sales,
+            'april_2024_sales': last_year_sales,
+            'avg_2024_sales': history_daily_avg * promo_duration,  # 换算成总期望销售额
+            'promotion_start_date': promo_start.strftime('%Y-%m-%d'),
+            'promotion_end_date': promo_end.strftime('%Y-%m-%d'),
+            'promotion_duration_days': promo_duration,
+            'has_time_data': True
+        })
+
+    return pd.DataFrame(effectiveness_results)
+
+
+# 产品关联网络（计算部分，图形由页面绘制）
+@perf_monitor.profile()
+def calculate_product_network(data, product_filter='all'):
+    """计算产品关联网络的节点、连边和节点统计（基于共同客户的Jaccard关联度）"""
+    sales_df = data['sales_df']
+    dashboard_products = data['dashboard_products']
+    star_products = data['star_products']
+    new_products = data['new_products']
+    promotion_df = data['promotion_df']
+
+    # 获取促销产品列表（只保留在仪表盘产品中的促销产品）
+    promo_products = promotion_df[promotion_df['所属区域'] == '全国']['产品代码'].unique().tolist()
+    promo_products = [p for p in promo_products if p in dashboard_products]
+
+    # 根据筛选条件过滤产品（确保都是仪表盘产品）
+    if product_filter == 'star':
+        filtered_products = [p for p in dashboard_products if p in star_products]
+        filter_title = "星品"
+    elif product_filter == 'new':
+        filtered_products = [p for p in dashboard_products if p in new_products]
+        filter_title = "新品"
+    elif product_filter == 'promo':
+        filtered_products = [p for p in dashboard_products if p in promo_products]
+        filter_title = "促销品"
+    else:
+        # 确保使用dashboard_products列表
+        filtered_products = list(dashboard_products)  # 创建副本避免修改原列表
+        filter_title = "全部仪表盘产品"
+
+    network = {
+        'filter_title': filter_title,
+        'nodes': filtered_products,
+        'product_name_map': {},
+        'product_pairs': [],
+        'node_stats': {}
+    }
+    if len(filtered_products) == 0:
+        return network
+
+    # 严格过滤销售数据，确保只包含筛选后的产品
+    sales_df_filtered = sales_df[sales_df['产品代码'].isin(filtered_products)].copy()
+
+    # 创建产品代码到产品名称的映射（确保唯一性）
+    product_name_map = {}
+    # 创建产品代码到客户集合的映射，优化性能
+    product_customers_map = {}
+
+    # 确保每个filtered_products中的产品都有映射
+    for product in filtered_products:
+        product_data = sales_df_filtered[sales_df_filtered['产品代码'] == product]
+        if len(product_data) > 0:
+            # 使用第一个出现的产品简称
+            product_name = product_data['产品简称'].iloc[0]
+            # 缓存客户集合
+            product_customers_map[product] = set(product_data['客户名称'].unique())
+        else:
+            # 如果在过滤后的销售数据中找不到，尝试在所有销售数据中查找
+            all_product_data = sales_df[sales_df['产品代码'] == product]
+            if len(all_product_data) > 0:
+                product_name = all_product_data['产品简称'].iloc[0]
+            else:
+                product_name = f"产品{product}"  # 使用产品代码作为名称
+            product_customers_map[product] = set()
+        product_name_map[product] = product_name
+
+    product_pairs = []
+
+    # 降低关联度门槛以显示更多连接，使用filtered_products确保只处理仪表盘产品
+    for i, prod1 in enumerate(filtered_products):
+        for j in range(i + 1, len(filtered_products)):
+            prod2 = filtered_products[j]
+
+            customers_prod1 = product_customers_map.get(prod1, set())
+            customers_prod2 = product_customers_map.get(prod2, set())
+
+            common_customers = customers_prod1.intersection(customers_prod2)
+            total_customers = customers_prod1.union(customers_prod2)
+
+            if len(total_customers) > 0:
+                correlation = len(common_customers) / len(total_customers)
+
+                # 降低门槛到0.2以显示更多关联
+                if correlation > 0.2:
+                    name1 = product_name_map[prod1]
+                    name2 = product_name_map[prod2]
+
+                    product_pairs.append((name1, name2, correlation, len(common_customers), prod1, prod2))
+
+    # 节点统计：连接数、关联度合计、销售额、客户数和产品类型
+    node_stats = {}
+    for product_code in filtered_products:
+        connections = sum(1 for pair in product_pairs if product_code in [pair[4], pair[5]])
+        total_correlation = sum(pair[2] for pair in product_pairs if product_code in [pair[4], pair[5]])
+
+        product_data = sales_df_filtered[sales_df_filtered['产品代码'] == product_code]
+        if len(product_data) > 0:
+            total_sales = product_data['销售额'].sum()
+            customer_count = product_data['客户名称'].nunique()
+        else:
+            total_sales = 0
+            customer_count = 0
+
+        product_types = []
+        if product_code in star_products:
+            product_types.append("星品")
+        if product_code in new_products:
+            product_types.append("新品")
+        if product_code in promo_products:
+            product_types.append("促销品")
+        if not product_types:
+            product_types.append("常规品")
+
+        node_stats[product_code] = {
+            'connections': connections,
+            'total_correlation': total_correlation,
+            'total_sales': total_sales,
+            'customer_count': customer_count,
+            'product_types': product_types
+        }
+
+    network.update({
+        'product_name_map': product_name_map,
+        'product_pairs': product_pairs,
+        'node_stats': node_stats
+    })
+    return network
+
+
+# 有效产品分析
+def calculate_effective_products_rate(sales_df, dashboard_products):
+    """计算有效产品率（月均销售≥15箱）"""
+    # 过滤仪表盘产品
+    df = sales_df[sales_df['产品代码'].isin(dashboard_products)]
+
+    # 计算每个产品的月均销售箱数
+    product_monthly = df.groupby('产品代码', observed=True).agg({
+        '箱数': 'sum',
+        '发运月份': 'nunique'
+    })
+
+    product_monthly['月均箱数'] = product_monthly['箱数'] / product_monthly['发运月份']
+
+    # 计算有效产品数
+    effective_products = (product_monthly['月均箱数'] >= 15).sum()
+    total_products = len(product_monthly)
+
+    return (effective_products / total_products * 100) if total_products > 0 else 0
+
+
+# 新增：有效产品详细分析
+@perf_monitor.profile()
+def analyze_effective_products(data, dimension='national', selected_region=None):
+    """分析有效产品（月均销售≥15箱）"""
+    sales_df = data['sales_df']
+    dashboard_products = data['dashboard_products']
+
+    # 根据维度过滤数据
+    if dimension == 'regional' and selected_region:
+        df = sales_df[(sales_df['产品代码'].isin(dashboard_products)) &
+                      (sales_df['区域'] == selected_region)]
+    else:
+        df = sales_df[sales_df['产品代码'].isin(dashboard_products)]
+
+    # 计算每个产品的月均销售
+    product_stats = []
+    for product in dashboard_products:
+        product_data = df[df['产品代码'] == product]
+
+        if len(product_data) > 0:
+            total_boxes = product_data['箱数'].sum()
+            total_sales = product_data['销售额'].sum()
+            months_sold = product_data['发运月份'].nunique()
+
+            monthly_avg_boxes = total_boxes / months_sold if months_sold > 0 else 0
+            is_effective = monthly_avg_boxes >= 15
+
+            # 获取产品名称
+            product_name = product_data['产品简称'].iloc[0]
+
+            product_stats.append({
+                'product_code': product,
+                'product_name': product_name,
+                'total_boxes': total_boxes,
+                'total_sales': total_sales,
+                'months_sold': months_sold,
+                'monthly_avg_boxes': monthly_avg_boxes,
+                'is_effective': is_effective,
+                'effectiveness_gap': max(0, 15 - monthly_avg_boxes)
+            })
+
+    return pd.DataFrame(product_stats)
+
+
+@perf_monitor.profile()
+def analyze_product_growth_rates(data, time_info):
+    """分析所有仪表盘产品的环比同比增长率（使用动态时间）"""
+    sales_df = data['sales_df']
+    dashboard_products = data['dashboard_products']
+
+    # 使用动态时间
+    latest_month = time_info['latest_month']
+    previous_month = time_info['previous_month']
+    same_month_last_year = time_info['same_month_last_year']
+
+    product_growth_stats = []
+
+    for product in dashboard_products:
+        # 当期数据
+        current_sales = sales_df[(sales_df['发运月份'] == latest_month) &
+                                 (sales_df['产品代码'] == product)]['销售额'].sum()
+
+        current_boxes = sales_df[(sales_df['发运月份'] == latest_month) &
+                                 (sales_df['产品代码'] == product)]['箱数'].sum()
+
+        # 上期数据
+        previous_sales = sales_df[(sales_df['发运月份'] == previous_month) &
+                                  (sales_df['产品代码'] == product)]['销售额'].sum()
+
+        previous_boxes = sales_df[(sales_df['发运月份'] == previous_month) &
+                                  (sales_df['产品代码'] == product)]['箱数'].sum()
+
+        # 去年同期数据
+        last_year_sales = sales_df[(sales_df['发运月份'] == same_month_last_year) &
+                                   (sales_df['产品代码'] == product)]['销售额'].sum()
+
+        last_year_boxes = sales_df[(sales_df['发运月份'] == same_month_last_year) &
+                                   (sales_df['产品代码'] == product)]['箱数'].sum()
+
+        # 获取产品名称
+        product_data = sales_df[sales_df['产品代码'] == product]
+        if len(product_data) > 0:
+            product_name = product_data['产品简称'].iloc[0]
+        else:
+            product_name = product
+
+        # 计算环比增长率
+        if previous_sales > 0:
+            mom_sales_growth = ((current_sales - previous_sales) / previous_sales * 100)
+        elif current_sales > 0:
+            mom_sales_growth = 100
+        else:
+            mom_sales_growth = 0
+
+        if previous_boxes > 0:
+            mom_boxes_growth = ((current_boxes - previous_boxes) / previous_boxes * 100)
+        elif current_boxes > 0:
+            mom_boxes_growth = 100
+        else:
+            mom_boxes_growth = 0
+
+        # 计算同比增长率
+        if last_year_sales > 0:
+            yoy_sales_growth = ((current_sales - last_year_sales) / last_year_sales * 100)
+        elif current_sales > 0:
+            yoy_sales_growth = 100
+        else:
+            yoy_sales_growth = 0
+
+        if last_year_boxes > 0:
+            yoy_boxes_growth = ((current_boxes - last_year_boxes) / last_year_boxes * 100)
+        elif current_boxes > 0:
+            yoy_boxes_growth = 100
+        else:
+            yoy_boxes_growth = 0
+
+        # 判断是否为新品
+        is_new_product = last_year_sales == 0 and last_year_boxes == 0
+
+        product_growth_stats.append({
+            'product_code': product,
+            'product_name': product_name,
+            'current_sales': current_sales,
+            'current_boxes': current_boxes,
+            'previous_sales': previous_sales,
+            'previous_boxes': previous_boxes,
+            'last_year_sales': last_year_sales,
+            'last_year_boxes': last_year_boxes,
+            'mom_sales_growth': mom_sales_growth,
+            'mom_boxes_growth': mom_boxes_growth,
+            'yoy_sales_growth': yoy_sales_growth,
+            'yoy_boxes_growth': yoy_boxes_growth,
+            'is_new_product': is_new_product,
+            'has_current_sales': current_sales > 0 or current_boxes > 0
+        })
+
+    return pd.DataFrame(product_growth_stats)
+
+
+# 产品关联网络的筛选条件
+NETWORK_FILTERS = ['all', 'star', 'new', 'promo']
+
+
+def build_product_dashboard(registry=dataset_registry) -> Dict:
+    """生成产品组合分析看板的全部预计算结果（全国维度，分区域维度由页面按需计算）"""
+    data = load_product_data(registry)
+    time_info = data['time_info']
+    sales_df = data['sales_df']
+
+    return {
+        'data': data,
+        'metrics': calculate_comprehensive_metrics(
+            sales_df, data['star_products'], data['new_products'], data['dashboard_products'],
+            data['promotion_df'], time_info
+        ),
+        'bcg_analysis': analyze_product_bcg_comprehensive(sales_df, None, time_info),
+        'effective_products': analyze_effective_products(data, 'national'),
+        'growth_rates': analyze_product_growth_rates(data, time_info),
+        'networks': {product_filter: calculate_product_network(data, product_filter)
+                     for product_filter in NETWORK_FILTERS}
+    }
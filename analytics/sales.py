@@ -0,0 +1,180 @@
+# analytics/sales.py - 销售达成分析计算模块
+import logging
+from typing import Dict
+
+import pandas as pd
+
+from data_registry import PAGE_DATASETS, dataset_registry
+from perf_monitor import perf_monitor
+
+logger = logging.getLogger(__name__)
+
+# 本看板使用的数据集
+SALES_DATASETS = PAGE_DATASETS['销售达成分析']
+
+
+# 区分渠道类型 - 增加文本清理功能
+def identify_channel(order_type):
+    """根据订单类型识别渠道（TT/MT/Other）"""
+    if pd.isna(order_type):
+        return 'Other'
+
+    # 转换为字符串并清理文本
+    order_type_str = str(order_type)
+    # 去除前后空格、换行符、制表符等
+    order_type_str = order_type_str.strip()
+    # 去除所有空格（包括中间的）
+    order_type_clean = order_type_str.replace(' ', '').replace('\t', '').replace('\n', '').replace('\r', '')
+    # 统一转为大写进行匹配
+    order_type_upper = order_type_clean.upper()
+
+    # 判断渠道类型
+    if 'TT' in order_type_upper:
+        return 'TT'
+    elif 'MT' in order_type_upper or '正常' in order_type_str:
+        return 'MT'
+    else:
+        # 调试信息：记录被归类为Other的订单类型
+        if order_type_str and order_type_str != 'nan':
+            logger.debug(f"无法识别的订单类型: '{order_type_str}' (长度:{len(order_type_str)})")
+        return 'Other'
+
+
+@perf_monitor.profile()
+def load_sales_data(registry=dataset_registry) -> Dict[str, pd.DataFrame]:
+    """加载并预处理销售达成分析所需的数据"""
+    # 从共享数据集注册中心获取（每个工作簿每个进程只解析一次）
+    tt_city_data = registry.get('tt_city_data')
+    sales_data = registry.get('channel_sales_data')
+    mt_data = registry.get('mt_data')
+
+    # 数据预处理
+    # TT城市数据
+    tt_city_data['指标年月'] = pd.to_datetime(tt_city_data['指标年月'])
+    tt_city_data['月度指标'] = pd.to_numeric(tt_city_data['月度指标'], errors='coerce').fillna(0)
+    tt_city_data['往年同期'] = pd.to_numeric(tt_city_data['往年同期'], errors='coerce').fillna(0)
+
+    # 销售数据
+    sales_data['发运月份'] = pd.to_datetime(sales_data['发运月份'])
+    sales_data['单价（箱）'] = pd.to_numeric(sales_data['单价（箱）'], errors='coerce').fillna(0)
+    sales_data['求和项:数量（箱）'] = pd.to_numeric(sales_data['求和项:数量（箱）'], errors='coerce').fillna(0)
+    sales_data['销售额'] = sales_data['单价（箱）'] * sales_data['求和项:数量（箱）']
+
+    sales_data['渠道类型'] = sales_data['订单类型'].apply(identify_channel)
+
+    # 添加数据验证 - 检查渠道分类结果
+    channel_counts = sales_data['渠道类型'].value_counts()
+    logger.debug(f"渠道分类统计: {channel_counts.to_dict()}")
+
+    # 检查是否有大量数据被分类为Other
+    if 'Other' in channel_counts and channel_counts['Other'] > 0:
+        other_samples = sales_data[sales_data['渠道类型'] == 'Other']['订单类型'].head(5).tolist()
+        logger.warning(f"有 {channel_counts['Other']} 条记录被分类为 'Other' 渠道，样本: {other_samples}")
+
+    # MT数据
+    mt_data['月份'] = pd.to_datetime(mt_data['月份'])
+    mt_data['月度指标'] = pd.to_numeric(mt_data['月度指标'], errors='coerce').fillna(0)
+    mt_data['往年同期'] = pd.to_numeric(mt_data['往年同期'], errors='coerce').fillna(0)
+
+    return {
+        'tt_city_data': tt_city_data,
+        'sales_data': sales_data,
+        'mt_data': mt_data
+    }
+
+
+@perf_monitor.profile()
+def validate_channel_data(data):
+    """验证渠道数据分类的准确性"""
+    sales_data = data['sales_data']
+
+    # 统计各渠道2025年的销售额
+    current_year = 2025
+    validation_results = {}
+
+    for channel in ['TT', 'MT', 'Other']:
+        channel_sales = sales_data[
+            (sales_data['渠道类型'] == channel) &
+            (sales_data['发运月份'].dt.year == current_year)
+            ]['销售额'].sum()
+
+        channel_count = len(sales_data[
+                                (sales_data['渠道类型'] == channel) &
+                                (sales_data['发运月份'].dt.year == current_year)
+                                ])
+
+        validation_results[channel] = {
+            '销售额': channel_sales,
+            '订单数': channel_count,
+            '平均单价': channel_sales / channel_count if channel_count > 0 else 0
+        }
+
+    return validation_results
+
+
+# 计算总体指标
+@perf_monitor.profile()
+def calculate_overview_metrics(data):
+    """计算销售达成总览的各项指标"""
+    tt_city_data = data['tt_city_data']
+    sales_data = data['sales_data']
+    mt_data = data['mt_data']
+
+    current_year = 2025
+
+    # 计算TT渠道指标
+    tt_sales = sales_data[
+        (sales_data['渠道类型'] == 'TT') &
+        (sales_data['发运月份'].dt.year == current_year)
+        ]['销售额'].sum()
+
+    tt_target = tt_city_data[
+        tt_city_data['指标年月'].dt.year == current_year
+        ]['月度指标'].sum()
+
+    tt_achievement = (tt_sales / tt_target * 100) if tt_target > 0 else 0
+
+    # 计算MT渠道指标
+    mt_sales = sales_data[
+        (sales_data['渠道类型'] == 'MT') &
+        (sales_data['发运月份'].dt.year == current_year)
+        ]['销售额'].sum()
+
+    mt_target = mt_data[
+        mt_data['月份'].dt.year == current_year
+        ]['月度指标'].sum()
+
+    mt_achievement = (mt_sales / mt_target * 100) if mt_target > 0 else 0
+
+    # 计算总体指标
+    total_sales = tt_sales + mt_sales
+    total_target = tt_target + mt_target
+    total_achievement = (total_sales / total_target * 100) if total_target > 0 else 0
+
+    # 计算渠道占比
+    tt_ratio = (tt_sales / total_sales * 100) if total_sales > 0 else 0
+    mt_ratio = (mt_sales / total_sales * 100) if total_sales > 0 else 0
+
+    return {
+        'total_sales': total_sales,
+        'total_target': total_target,
+        'total_achievement': total_achievement,
+        'tt_sales': tt_sales,
+        'tt_target': tt_target,
+        'tt_achievement': tt_achievement,
+        'tt_ratio': tt_ratio,
+        'mt_sales': mt_sales,
+        'mt_target': mt_target,
+        'mt_achievement': mt_achievement,
+        'mt_ratio': mt_ratio
+    }
+
+
+def build_sales_dashboard(registry=dataset_registry) -> Dict:
+    """生成销售达成分析看板的全部预计算结果"""
+    data = load_sales_data(registry)
+    return {
+        'data': data,
+        'overview_metrics': calculate_overview_metrics(data),
+        'channel_validation': validate_channel_data(data)
+    }
@@ -0,0 +1,154 @@
+# analytics/store.py - 看板预计算结果存储模块
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class AggregateStore:
+    """预计算结果存储类 - 按看板和版本号保存计算结果
+
+    预计算进程（python -m analytics.precompute）把结果写到磁盘，网页进程只读取；
+    磁盘上没有当前版本时才在进程内计算，结果只保存在内存中。
+    内存中保存的是序列化后的字节，每次读取都得到独立副本，调用方修改结果不会影响其他会话。
+    """
+
+    def __init__(self, store_dir: str = os.path.join("data", "aggregates")):
+        self.store_dir = store_dir
+        self.manifest_file = os.path.join(self.store_dir, "manifest.json")
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def _ensure_store_dir(self):
+        """确保存储目录存在"""
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path(self, dashboard: str, version: str) -> str:
+        """结果文件路径"""
+        return os.path.join(self.store_dir, f"{dashboard}_{version}.pkl")
+
+    def manifest(self) -> Dict:
+        """读取结果清单（每个看板最近一次写入的版本、时间和耗时）"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def _save_manifest(self, manifest: Dict):
+        """写入结果清单（先写临时文件再替换）"""
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _remember(self, dashboard: str, version: str, blob: bytes):
+        """在内存中保存结果，同一看板只保留最新版本（调用方需持有锁）"""
+        for key in [key for key in self._memory if key[0] == dashboard and key[1] != version]:
+            del self._memory[key]
+        self._memory[(dashboard, version)] = blob
+
+    def load(self, dashboard: str, version: str) -> Optional[Dict]:
+        """读取指定版本的结果，内存和磁盘都没有时返回None"""
+        key = (dashboard, version)
+        with self._lock:
+            blob = self._memory.get(key)
+
+        if blob is None:
+            path = self._path(dashboard, version)
+            try:
+                with open(path, 'rb') as f:
+                    blob = f.read()
+            except OSError:
+                return None
+            with self._lock:
+                self._remember(dashboard, version, blob)
+
+        try:
+            return pickle.loads(blob)
+        except Exception:
+            # 结果文件损坏，丢弃后由调用方重新计算
+            with self._lock:
+                self._memory.pop(key, None)
+            return None
+
+    def save(self, dashboard: str, version: str, payload: Dict, seconds: float = None) -> str:
+        """把结果写到磁盘并登记到清单，同时清理该看板的旧版本文件"""
+        self._ensure_store_dir()
+        blob = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self._path(dashboard, version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(dashboard, version, blob)
+            manifest = self.manifest()
+            previous = manifest.get(dashboard)
+            manifest[dashboard] = {
+                'version': version,
+                'file': os.path.basename(path),
+                'size': len(blob),
+                'built_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'seconds': seconds
+            }
+            self._save_manifest(manifest)
+
+        if previous and previous.get('file') != os.path.basename(path):
+            try:
+                os.remove(os.path.join(self.store_dir, previous['file']))
+            except OSError:
+                pass
+        return path
+
+    def get_or_build(self, dashboard: str, version: str, builder: Callable[[], Dict],
+                     persist: bool = False) -> Dict:
+        """读取结果，没有时调用builder计算 - persist=True时写入磁盘，否则只保存在内存中"""
+        payload = self.load(dashboard, version)
+        if payload is not None:
+            return payload
+
+        # 同一版本同时只计算一次（后台预热和页面可能同时请求）
+        with self._lock:
+            build_lock = self._build_locks.setdefault((dashboard, version), threading.Lock())
+
+        with build_lock:
+            payload = self.load(dashboard, version)
+            if payload is not None:
+                return payload
+
+            start = time.perf_counter()
+            payload = builder()
+            seconds = round(time.perf_counter() - start, 2)
+
+            if persist:
+                self.save(dashboard, version, payload, seconds)
+            else:
+                blob = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+                with self._lock:
+                    self._remember(dashboard, version, blob)
+            return payload
+
+    def is_ready(self, dashboard: str, version: str) -> bool:
+        """检查指定版本的结果是否已经可用（内存或磁盘）"""
+        with self._lock:
+            if (dashboard, version) in self._memory:
+                return True
+        return os.path.exists(self._path(dashboard, version))
+
+    def clear(self, dashboard: str = None):
+        """清除内存中的结果（不删除磁盘文件）"""
+        with self._lock:
+            if dashboard is None:
+                self._memory.clear()
+            else:
+                for key in [key for key in self._memory if key[0] == dashboard]:
+                    del self._memory[key]
+
+
+# 创建全局实例
+aggregate_store = AggregateStore()
@@ -0,0 +1,5 @@
+# benchmarks - 合成数据与规模基准测试（不随页面部署，开发时手动运行）
+#
+# synthetic_data：按内置工作簿的表结构生成可放大的合成数据
+# run_benchmarks：在不同规模的合成数据上测试各页面计算函数的耗时并生成报告
+# kernels：热点函数改写前后的耗时对比与结果核对
@@ -0,0 +1,968 @@
+# benchmarks/kernels.py - 热点函数新旧实现对比基准
+#
+# 在合成数据上分别运行改写前的实现（reference）和当前实现（optimized），核对结果一致并比较耗时：
+#   python -m benchmarks.kernels                                        # 全部对比项，默认产品数
+#   python -m benchmarks.kernels product_sales_metrics --products 79 500 2000 --scale 10
+#
+# reference 实现是改写前代码的原样副本，只用于对比，页面和预计算不会调用。
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+import warnings
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from analytics.inventory import (BATCH_COLUMNS, DEFAULT_FORECAST_INFO, DEFAULT_SALES_METRICS,
+                                 BatchLevelInventoryAnalyzer, attribute_batches, build_forecast_rollups,
+                                 build_monthly_cubes, calculate_forecast_accuracy, calculate_product_sales_metrics,
+                                 calculate_seasonal_indices, iter_batch_rows, parse_batch_rows,
+                                 process_forecast_analysis, region_product_rollup, simplify_product_name)
+from analytics.ml_prediction import (NON_FEATURE_COLUMNS, PredictionPipeline, build_monthly_cube,
+                                     build_rolling_features, predict_backtest, train_prediction_models)
+from analytics.model_registry import ModelRegistry
+from benchmarks.synthetic_data import SyntheticDataGenerator
+from data_registry import CategoryDictionary
+
+logger = logging.getLogger('benchmarks')
+
+DEFAULT_REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports')
+
+
+def _inventory_shipments(generator: SyntheticDataGenerator) -> pd.DataFrame:
+    """生成与load_inventory_data处理后相同结构的出货数据（键列为共享分类列）"""
+    return _inventory_frames(generator)[0]
+
+
+def _inventory_frames(generator: SyntheticDataGenerator) -> tuple:
+    """生成与load_inventory_data处理后相同结构的出货和人工预测数据（两者共用一份分类字典）"""
+    raw_shipments = generator.build_shipments()
+    forecast_df = generator.build_manual_forecast(raw_shipments)
+    shipment_df = raw_shipments.copy()
+    dictionary = CategoryDictionary()
+    dictionary.encode(shipment_df)
+    dictionary.encode(forecast_df)
+    # 预测数据可能带来新的类别，重新编码出货数据使两者类别一致
+    dictionary.encode(shipment_df)
+
+    shipment_df['订单日期'] = pd.to_datetime(shipment_df['订单日期'])
+    shipment_df.columns = ['订单日期', '所属区域', '申请人', '产品代码', '数量']
+    forecast_df['所属年月'] = pd.to_datetime(forecast_df['所属年月'])
+    forecast_df.columns = ['所属大区', '销售员', '所属年月', '产品代码', '预计销售量']
+    return shipment_df, forecast_df
+
+
+# ---------- 产品销售指标 ----------
+
+def reference_product_sales_metrics(shipment_df, product_codes, today):
+    """改写前的实现：逐个产品筛选全部出货数据"""
+    product_sales_metrics = {}
+
+    for product_code in product_codes:
+        product_sales = shipment_df[shipment_df['产品代码'] == product_code]
+
+        if len(product_sales) == 0:
+            product_sales_metrics[product_code] = {
+                'daily_avg_sales': 0,
+                'sales_std': 0,
+                'coefficient_of_variation': float('inf'),
+                'total_sales': 0,
+                'last_90_days_sales': 0
+            }
+        else:
+            total_sales = product_sales['数量'].sum()
+            ninety_days_ago = today - timedelta(days=90)
+            recent_sales = product_sales[product_sales['订单日期'].dt.date >= ninety_days_ago]
+            recent_sales_total = recent_sales['数量'].sum() if len(recent_sales) > 0 else 0
+
+            days_range = (today - product_sales['订单日期'].min().date()).days + 1
+            daily_avg_sales = total_sales / days_range if days_range > 0 else 0
+
+            daily_sales = product_sales.groupby(product_sales['订单日期'].dt.date)['数量'].sum()
+            sales_std = daily_sales.std() if len(daily_sales) > 1 else 0
+
+            coefficient_of_variation = sales_std / daily_avg_sales if daily_avg_sales > 0 else float('inf')
+
+            product_sales_metrics[product_code] = {
+                'daily_avg_sales': daily_avg_sales,
+                'sales_std': sales_std,
+                'coefficient_of_variation': coefficient_of_variation,
+                'total_sales': total_sales,
+                'last_90_days_sales': recent_sales_total
+            }
+
+    return product_sales_metrics
+
+
+def setup_product_sales_metrics(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    shipment_df = _inventory_shipments(generator)
+    # 库存中约70%的产品有出货，另加一个没有出货记录的代码覆盖空分支
+    product_codes = generator.products['产品代码'].sample(frac=0.7, random_state=seed).tolist() + ['F99Z9Z']
+    # 以数据最后一天为基准，近90天窗口内有数据
+    today = (shipment_df['订单日期'].max() + timedelta(days=1)).date()
+    return shipment_df, product_codes, today
+
+
+# ---------- 季节性指数与预测偏差 ----------
+
+def reference_seasonal_forecast(shipment_df, forecast_df, product_codes, today):
+    """改写前的实现：逐个产品（和逐个预测月份）筛选全部出货数据，逐行累加销售员预测"""
+    analyzer = BatchLevelInventoryAnalyzer()
+
+    # 计算季节性指数
+    seasonal_indices = {}
+    for product_code in product_codes:
+        product_sales = shipment_df[shipment_df['产品代码'] == product_code]
+
+        if len(product_sales) > 0:
+            product_sales['月份'] = product_sales['订单日期'].dt.month
+            monthly_sales = product_sales.groupby('月份')['数量'].sum()
+
+            if len(monthly_sales) > 1:
+                avg_monthly_sales = monthly_sales.mean()
+                current_month = today.month
+                if current_month in monthly_sales.index:
+                    seasonal_index = monthly_sales[current_month] / avg_monthly_sales
+                else:
+                    seasonal_index = 1.0
+            else:
+                seasonal_index = 1.0
+        else:
+            seasonal_index = 1.0
+
+        seasonal_index = max(seasonal_index, analyzer.min_seasonal_index)
+        seasonal_indices[product_code] = seasonal_index
+
+    # 计算预测准确度 - 修复：改进预测数据处理
+    forecast_accuracy = {}
+    for product_code in product_codes:
+        product_forecast = forecast_df[forecast_df['产品代码'] == product_code]
+
+        if len(product_forecast) > 0:
+            # 按销售员分组的预测 - 修复：确保映射到shipment_df中的申请人
+            person_forecast = {}
+            for _, forecast_row in product_forecast.iterrows():
+                forecaster = forecast_row['销售员']
+                # 检查该预测员在shipment_df中是否存在对应的申请人记录
+                if forecaster in shipment_df['申请人'].values:
+                    person_forecast[forecaster] = person_forecast.get(forecaster, 0) + forecast_row['预计销售量']
+
+            forecast_quantity = product_forecast['预计销售量'].sum()
+
+            # 计算对应时间段的实际销售 - 修复：使用更精确的时间匹配
+            forecast_months = product_forecast['所属年月'].dt.to_period('M').unique()
+            actual_sales = 0
+
+            for month in forecast_months:
+                month_sales = shipment_df[
+                    (shipment_df['产品代码'] == product_code) &
+                    (shipment_df['订单日期'].dt.to_period('M') == month)
+                    ]
+                actual_sales += month_sales['数量'].sum() if not month_sales.empty else 0
+
+            forecast_bias = analyzer.calculate_forecast_bias(forecast_quantity, actual_sales)
+        else:
+            forecast_bias = 0.0
+            person_forecast = {}
+
+        forecast_accuracy[product_code] = {
+            'forecast_bias': forecast_bias,
+            'person_forecast': person_forecast
+        }
+
+    return seasonal_indices, forecast_accuracy
+
+
+def optimized_seasonal_forecast(shipment_df, forecast_df, product_codes, today):
+    """当前实现：按月汇总一次，再按产品查询"""
+    analyzer = BatchLevelInventoryAnalyzer()
+    cubes = build_monthly_cubes(shipment_df, forecast_df)
+    seasonal_indices = calculate_seasonal_indices(cubes['sales'], product_codes, today.month,
+                                                  analyzer.min_seasonal_index)
+    forecast_accuracy = calculate_forecast_accuracy(cubes, product_codes, shipment_df['申请人'].unique(), analyzer)
+    return seasonal_indices, forecast_accuracy
+
+
+def setup_seasonal_forecast(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    shipment_df, forecast_df = _inventory_frames(generator)
+    product_codes = generator.products['产品代码'].sample(frac=0.7, random_state=seed).tolist() + ['F99Z9Z']
+    # 以数据最后一天为当前日期，当月有出货，季节性指数的计算分支能被覆盖
+    today = shipment_df['订单日期'].max().date()
+    return shipment_df, forecast_df, product_codes, today
+
+
+# ---------- 跨月销售 ----------
+
+def reference_cross_month_sales(shipment_df, queries):
+    """改写前的实现：每次查询按产品、人员、月份筛选全部出货数据"""
+    cross_month_weights = BatchLevelInventoryAnalyzer().cross_month_weights
+    results = []
+    for product_code, person_name, target_month in queries:
+        target_period = pd.Period(target_month, freq='M')
+        monthly_sales = {}
+        total_weighted_sales = 0
+
+        for month_offset in range(3):  # 当月及后续2个月
+            check_period = target_period + month_offset
+
+            # 筛选该月该人该产品的销售数据
+            month_sales = shipment_df[
+                (shipment_df['产品代码'] == product_code) &
+                (shipment_df['申请人'] == person_name) &
+                (shipment_df['订单日期'].dt.to_period('M') == check_period)
+                ]
+
+            month_total = month_sales['数量'].sum() if not month_sales.empty else 0
+            monthly_sales[str(check_period)] = month_total
+
+            # 应用权重计算
+            weight = cross_month_weights.get(month_offset, 0)
+            total_weighted_sales += month_total * weight
+
+        results.append((total_weighted_sales, monthly_sales))
+    return results
+
+
+def optimized_cross_month_sales(shipment_df, queries):
+    """当前实现：同一个分析器的索引查询"""
+    analyzer = BatchLevelInventoryAnalyzer()
+    return [analyzer.calculate_cross_month_sales(shipment_df, product_code, person_name, target_month)
+            for product_code, person_name, target_month in queries]
+
+
+def setup_cross_month_sales(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    shipment_df, forecast_df = _inventory_frames(generator)
+    # 与库存页面相同的调用方式：每个有库存的产品一个批次，对该产品的每个预测人员查询批次生产月份起的三个月
+    rng = np.random.default_rng(seed)
+    months = forecast_df['所属年月'].dt.to_period('M').unique()
+    queries = []
+    for product_code, persons in forecast_df.groupby('产品代码', observed=True)['销售员'].unique().items():
+        batch_month = months[rng.integers(len(months))]
+        queries.extend((product_code, person, batch_month) for person in persons)
+    return shipment_df, queries
+
+
+# ---------- 批次库存解析 ----------
+
+def reference_batch_rows(inventory_df, price_df):
+    """改写前的实现：逐行遍历库存表，每遇到产品行筛选一次单价表"""
+    rows = []
+    current_material = None
+    current_desc = None
+    current_price = 0
+
+    for idx, row in inventory_df.iterrows():
+        if pd.notna(row['物料']) and isinstance(row['物料'], str) and row['物料'].startswith('F'):
+            current_material = row['物料']
+            current_desc = simplify_product_name(row['描述'])
+            price_match = price_df[price_df['产品代码'] == current_material]
+            current_price = price_match['单价'].iloc[0] if len(price_match) > 0 else 100
+        elif pd.notna(row['生产日期']) and current_material:
+            prod_date = pd.to_datetime(row['生产日期'])
+            quantity = row['数量'] if pd.notna(row['数量']) else 0
+            batch_no = row['生产批号'] if pd.notna(row['生产批号']) else ''
+            rows.append([current_material, current_desc, current_price, prod_date, batch_no, quantity])
+
+    return pd.DataFrame(rows, columns=BATCH_COLUMNS).astype({'单价': float, '数量': float})
+
+
+def streaming_batch_rows(inventory_df, price_df, chunksize: int = 1000):
+    """分段解析：按chunksize行切段后经iter_batch_rows解析，用于核对跨段的产品归属"""
+    chunks = (inventory_df.iloc[start:start + chunksize] for start in range(0, len(inventory_df), chunksize))
+    return pd.concat(list(iter_batch_rows(chunks, price_df)), ignore_index=True)
+
+
+def setup_batch_rows(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    inventory_df = generator.build_batch_inventory()
+    price_df = generator.build_unit_price()
+    # 去掉部分产品的单价，覆盖默认单价分支
+    price_df = price_df.iloc[len(price_df) // 10:].reset_index(drop=True)
+    CategoryDictionary().encode(price_df)
+    return inventory_df, price_df
+
+
+# ---------- 批次风险评分 ----------
+
+def reference_risk_scoring(age_days, quantity, unit_price, daily_avg_sales, coefficient_of_variation,
+                           seasonal_index, forecast_bias):
+    """改写前的实现：逐个批次计算清库天数、三个积压风险、积压原因、风险得分/等级和预期损失"""
+    analyzer = BatchLevelInventoryAnalyzer()
+    rows = []
+    for age_days, quantity, unit_price, daily_avg_sales, cv, seasonal_index, bias in zip(
+            age_days.tolist(), quantity.tolist(), unit_price.tolist(), daily_avg_sales.tolist(),
+            coefficient_of_variation.tolist(), seasonal_index.tolist(), forecast_bias.tolist()):
+        sales_metrics = {'coefficient_of_variation': cv}
+        forecast_info = {'forecast_bias': bias}
+
+        # 获取产品单价并计算批次价值
+        batch_value = quantity * unit_price
+
+        # 计算预计清库天数
+        daily_avg_sales_adjusted = max(daily_avg_sales * seasonal_index, analyzer.min_daily_sales)
+
+        if daily_avg_sales_adjusted > 0:
+            days_to_clear = quantity / daily_avg_sales_adjusted
+            one_month_risk = analyzer.calculate_risk_percentage(days_to_clear, age_days, 30)
+            two_month_risk = analyzer.calculate_risk_percentage(days_to_clear, age_days, 60)
+            three_month_risk = analyzer.calculate_risk_percentage(days_to_clear, age_days, 90)
+        else:
+            days_to_clear = float('inf')
+            one_month_risk = 100
+            two_month_risk = 100
+            three_month_risk = 100
+
+        # 确定积压原因
+        stocking_reasons = []
+        if age_days > 60:
+            stocking_reasons.append("库龄过长")
+        if sales_metrics['coefficient_of_variation'] > analyzer.high_volatility_threshold:
+            stocking_reasons.append("销量波动大")
+        if seasonal_index < 0.8:
+            stocking_reasons.append("季节性影响")
+        if abs(forecast_info['forecast_bias']) > analyzer.high_forecast_bias_threshold:
+            stocking_reasons.append("预测偏差大")
+        if not stocking_reasons:
+            stocking_reasons.append("正常库存")
+
+        # 风险等级评估
+        risk_score = 0
+
+        # 库龄因素
+        if age_days > 90:
+            risk_score += 40
+        elif age_days > 60:
+            risk_score += 30
+        elif age_days > 30:
+            risk_score += 20
+        else:
+            risk_score += 10
+
+        # 清库天数因素
+        if days_to_clear == float('inf'):
+            risk_score += 40
+        elif days_to_clear > 180:
+            risk_score += 35
+        elif days_to_clear > 90:
+            risk_score += 30
+        elif days_to_clear > 60:
+            risk_score += 20
+        elif days_to_clear > 30:
+            risk_score += 10
+
+        # 销量波动系数
+        if sales_metrics['coefficient_of_variation'] > 2.0:
+            risk_score += 10
+        elif sales_metrics['coefficient_of_variation'] > 1.0:
+            risk_score += 5
+
+        # 预测偏差
+        if abs(forecast_info['forecast_bias']) > 0.5:
+            risk_score += 10
+        elif abs(forecast_info['forecast_bias']) > 0.3:
+            risk_score += 8
+        elif abs(forecast_info['forecast_bias']) > 0.15:
+            risk_score += 5
+
+        # 根据总分确定风险等级
+        if risk_score >= 80:
+            risk_level = "极高风险"
+            risk_advice = '🚨 立即7折清库'
+        elif risk_score >= 60:
+            risk_level = "高风险"
+            risk_advice = '⚠️ 建议8折促销'
+        elif risk_score >= 40:
+            risk_level = "中风险"
+            risk_advice = '📢 适度9折促销'
+        elif risk_score >= 20:
+            risk_level = "低风险"
+            risk_advice = '✅ 正常销售'
+        else:
+            risk_level = "极低风险"
+            risk_advice = '🌟 新鲜库存'
+
+        # 生成建议措施
+        if risk_level == "极高风险":
+            recommendation = "紧急清理：考虑折价促销"
+        elif risk_level == "高风险":
+            recommendation = "优先处理：降价促销或转仓调配"
+        elif risk_level == "中风险":
+            recommendation = "密切监控：调整采购计划"
+        elif risk_level == "低风险":
+            recommendation = "常规管理：定期审查库存周转"
+        else:
+            recommendation = "维持现状：正常库存水平"
+
+        # 预期损失计算
+        if age_days >= 120:
+            expected_loss = quantity * unit_price * 0.3
+        elif age_days >= 90:
+            expected_loss = quantity * unit_price * 0.2
+        elif age_days >= 60:
+            expected_loss = quantity * unit_price * 0.1
+        else:
+            expected_loss = 0
+
+        rows.append({
+            '批次价值': batch_value,
+            '预计清库天数': days_to_clear if days_to_clear != float('inf') else float('inf'),
+            '一个月积压风险': f"{round(one_month_risk, 1)}%",
+            '两个月积压风险': f"{round(two_month_risk, 1)}%",
+            '三个月积压风险': f"{round(three_month_risk, 1)}%",
+            '积压原因': '，'.join(stocking_reasons),
+            '风险得分': risk_score,
+            '风险等级': risk_level,
+            '处理建议': risk_advice,
+            '建议措施': recommendation,
+            '预期损失': expected_loss
+        })
+
+    return pd.DataFrame(rows).astype({'预期损失': float})
+
+
+def optimized_risk_scoring(*columns):
+    """当前实现：按列数组一次评分"""
+    return BatchLevelInventoryAnalyzer().score_batches(*columns)
+
+
+def setup_risk_scoring(scale: float, products: int, seed: int) -> tuple:
+    # 每个产品约20*scale个批次，各列按页面数据的取值范围随机生成，并混入零销量、无穷变异系数和恰好落在阈值上的值
+    rng = np.random.default_rng(seed)
+    count = int(products * scale * 20)
+    age_days = rng.integers(0, 400, count)
+    quantity = np.maximum(1, np.round(rng.lognormal(5.3, 1.1, count)))
+    unit_price = rng.choice([80.0, 100.0, 126.5, 150.0, 180.0], count)
+    daily_avg_sales = np.where(rng.random(count) < 0.1, 0.0, rng.lognormal(1.5, 1.2, count))
+    # 清库天数恰好为目标天数整数倍的批次（覆盖风险下限分支）
+    exact = rng.random(count) < 0.05
+    daily_avg_sales = np.where(exact, quantity / rng.choice([30, 60, 90, 120, 180], count), daily_avg_sales)
+    coefficient_of_variation = np.where(daily_avg_sales == 0, np.inf, rng.uniform(0, 3, count))
+    seasonal_index = np.where(exact, 1.0, np.maximum(rng.lognormal(0, 0.4, count), 0.3))
+    forecast_bias = np.where(rng.random(count) < 0.2, 0.0, np.tanh(rng.normal(0, 0.6, count)))
+    return (age_days, quantity, unit_price, daily_avg_sales, coefficient_of_variation, seasonal_index,
+            forecast_bias)
+
+
+# ---------- 责任归属分析 ----------
+
+def serial_responsibility_attribution(*tables):
+    """串行：在当前进程中逐个批次分析"""
+    return attribute_batches(*tables, parallel=False)
+
+
+def pooled_responsibility_attribution(*tables):
+    """进程池：固定2个进程（单核机器上也走并行路径，用于核对结果顺序和内容）"""
+    return attribute_batches(*tables, parallel=True, workers=2)
+
+
+def setup_responsibility_attribution(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    shipment_df, forecast_df = _inventory_frames(generator)
+    analyzer = BatchLevelInventoryAnalyzer()
+    product_codes = generator.products['产品代码'].tolist()
+    today = shipment_df['订单日期'].max().date()
+    product_sales_metrics = calculate_product_sales_metrics(shipment_df, product_codes, today)
+    forecast_accuracy = calculate_forecast_accuracy(build_monthly_cubes(shipment_df, forecast_df), product_codes,
+                                                    shipment_df['申请人'].unique(), analyzer)
+    region_counts = shipment_df.groupby(['申请人', '所属区域'], observed=True).size()
+    sales_person_region_mapping = {person: region for person, region in
+                                   region_counts.groupby(level=0, observed=True).idxmax().str[1].items()}
+
+    # 每个产品约20*scale个批次（默认产品数和倍数下超过1万个），生产日期落在预测月份内
+    rng = np.random.default_rng(seed)
+    count = int(products * scale * 20)
+    months = forecast_df['所属年月'].drop_duplicates().sort_values()
+    materials = rng.choice(product_codes, count)
+    prod_dates = pd.to_datetime(rng.choice(months.to_numpy(), count)) + pd.to_timedelta(rng.integers(0, 28, count),
+                                                                                       unit='D')
+    quantities = np.maximum(1, np.round(rng.lognormal(5.3, 1.1, count)))
+    batches = list(zip(materials.tolist(), prod_dates, quantities.tolist()))
+    return batches, product_sales_metrics, forecast_accuracy, sales_person_region_mapping, shipment_df
+
+
+# ---------- 责任分析摘要 ----------
+
+def reference_responsibility_summaries(batches, product_sales_metrics, forecast_accuracy, sales_person_region_mapping,
+                                       shipment_df):
+    """改写前：每个批次保留嵌套的责任详情字典，并从字典生成摘要"""
+    analyzer = BatchLevelInventoryAnalyzer()
+    summaries = []
+    for material, prod_date, quantity in batches:
+        _, _, responsibility_analysis = analyzer.analyze_responsibility_collaborative(
+            material, prod_date, product_sales_metrics.get(material, DEFAULT_SALES_METRICS),
+            forecast_accuracy.get(material, DEFAULT_FORECAST_INFO), None, quantity, sales_person_region_mapping,
+            shipment_df)
+        summaries.append(analyzer.generate_responsibility_summary_collaborative(responsibility_analysis))
+    return summaries
+
+
+def optimized_responsibility_summaries(*tables):
+    """当前实现：责任归属展开为长表，再按批次ID从长表生成摘要"""
+    assignments, responsibility = attribute_batches(*tables, parallel=False)
+    batches = pd.DataFrame({
+        '批次ID': np.arange(len(assignments)),
+        '责任人': [assignment[1] for assignment in assignments],
+        '生命周期阶段': [assignment[2] for assignment in assignments]
+    })
+    return BatchLevelInventoryAnalyzer().generate_responsibility_summaries(batches, responsibility)
+
+
+# ---------- 预测准确率与区域/产品汇总 ----------
+
+def reference_forecast_rollups(shipment_df, forecast_df, product_name_map, as_of):
+    """改写前：逐行计算准确率，每切换一次区域都在明细上重新分组"""
+    merged_data, _ = process_forecast_analysis(shipment_df, forecast_df, product_name_map, as_of)
+    merged_data['准确率'] = merged_data.apply(
+        lambda row: 1 - abs(row['差异量']) / max(row['实际销量'], 1) if row['实际销量'] > 0 else
+        (1 if row['预测销量'] == 0 else 0),
+        axis=1
+    )
+    merged_data['准确率'] = merged_data['准确率'].clip(0, 1)
+
+    aggregations = {'实际销量': 'sum', '预测销量': 'sum', '准确率': 'mean'}
+    views = {'区域': merged_data.groupby('所属区域', observed=True).agg(aggregations).reset_index()}
+    for region in ['全国'] + list(merged_data['所属区域'].unique()):
+        filtered_data = merged_data if region == '全国' else merged_data[merged_data['所属区域'] == region]
+        views[region] = filtered_data.groupby(['产品代码', '产品名称'], observed=True).agg(aggregations).reset_index()
+    return merged_data[['准确率']], views
+
+
+def optimized_forecast_rollups(shipment_df, forecast_df, product_name_map, as_of):
+    """当前实现：向量化计算准确率，预先汇总后各区域只做切片"""
+    merged_data, _ = process_forecast_analysis(shipment_df, forecast_df, product_name_map, as_of)
+    forecast_rollups = build_forecast_rollups(merged_data)
+    views = {'区域': forecast_rollups['region']}
+    for region in ['全国'] + list(merged_data['所属区域'].unique()):
+        views[region] = region_product_rollup(forecast_rollups, region)
+    return merged_data[['准确率']], views
+
+
+def setup_forecast_rollups(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    shipment_df, forecast_df = _inventory_frames(generator)
+    product_name_map = dict(zip(generator.products['产品代码'], generator.products['产品名称']))
+    # 以最后一个出货日为基准日期，使当年同时有出货和预测数据
+    return shipment_df, forecast_df, product_name_map, shipment_df['订单日期'].max().date()
+
+
+# ---------- 机器学习预测特征工程 ----------
+
+def _reference_product_features(product_code, historical_data, segment):
+    """改写前：由单个产品截至目标月前的历史数据计算一行特征"""
+    features = {'product_code': product_code}
+
+    try:
+        if len(historical_data) < 3:
+            return features
+
+        # 基础数据
+        qty_values = historical_data['total_qty'].values
+        order_counts = historical_data['order_count'].values
+        customer_counts = historical_data['customer_count'].values
+
+        # 1. 销量特征 - 使用对数变换处理偏态分布
+        log_qty = np.log1p(qty_values)  # log(1+x) 避免log(0)
+
+        features.update({
+            # 原始销量特征
+            'qty_mean': np.mean(qty_values),
+            'qty_median': np.median(qty_values),
+            'qty_std': np.std(qty_values),
+            'qty_cv': np.std(qty_values) / (np.mean(qty_values) + 1),
+
+            # 对数变换特征
+            'log_qty_mean': np.mean(log_qty),
+            'log_qty_std': np.std(log_qty),
+
+            # 滞后特征
+            'qty_lag_1': qty_values[-1],
+            'qty_lag_2': qty_values[-2] if len(qty_values) > 1 else 0,
+            'qty_lag_3': qty_values[-3] if len(qty_values) > 2 else 0,
+
+            # 移动平均
+            'qty_ma_2': np.mean(qty_values[-2:]),
+            'qty_ma_3': np.mean(qty_values[-3:]),
+
+            # 加权移动平均（最近的权重更大）
+            'qty_wma_3': np.average(qty_values[-3:], weights=[1, 2, 3]) if len(qty_values) >= 3 else np.mean(
+                qty_values),
+        })
+
+        # 2. 趋势特征
+        if len(qty_values) > 1:
+            # 简单增长率
+            features['growth_rate_1'] = (qty_values[-1] - qty_values[-2]) / (qty_values[-2] + 1)
+
+            # 线性趋势
+            x = np.arange(len(qty_values))
+            if len(qty_values) > 2:
+                trend_coef = np.polyfit(x, qty_values, 1)[0]
+                features['trend_slope'] = trend_coef
+
+                # 趋势强度（R²）
+                y_pred = np.polyval([trend_coef, np.mean(qty_values)], x)
+                ss_res = np.sum((qty_values - y_pred) ** 2)
+                ss_tot = np.sum((qty_values - np.mean(qty_values)) ** 2)
+                features['trend_strength'] = 1 - (ss_res / (ss_tot + 1e-8))
+            else:
+                features['trend_slope'] = 0
+                features['trend_strength'] = 0
+        else:
+            features['growth_rate_1'] = 0
+            features['trend_slope'] = 0
+            features['trend_strength'] = 0
+
+        # 3. 订单行为特征
+        features.update({
+            'order_count_mean': np.mean(order_counts),
+            'order_count_trend': order_counts[-1] - order_counts[0] if len(order_counts) > 1 else 0,
+            'avg_order_size': features['qty_mean'] / (np.mean(order_counts) + 1),
+            'customer_count_mean': np.mean(customer_counts),
+            'penetration_rate': np.mean(customer_counts) / (np.max(customer_counts) + 1)
+        })
+
+        # 4. 时间特征
+        last_month = historical_data.iloc[-1]['year_month']
+        features.update({
+            'month': last_month.month,
+            'quarter': last_month.quarter,
+            'is_year_end': 1 if last_month.month in [11, 12] else 0,
+            'is_peak_season': 1 if last_month.month in [3, 4, 10, 11] else 0,
+        })
+
+        # 5. 稳定性特征
+        features.update({
+            'data_points': len(qty_values),
+            'stability_score': 1 / (1 + features['qty_cv']),  # 变异系数越小越稳定
+            'consistency_score': len(qty_values[qty_values > 0]) / len(qty_values)
+        })
+
+        # 6. 产品段特征（使用中文段名的哈希值）
+        segment_map = {
+            '高销量稳定': 1,
+            '高销量波动': 2,
+            '中销量稳定': 3,
+            '中销量波动': 4,
+            '低销量稳定': 5,
+            '低销量波动': 6
+        }
+        features['segment_encoded'] = segment_map.get(segment, 0)
+
+        return features
+    except Exception as e:
+        logger.warning(f"特征创建出错: {str(e)}")
+        return features
+
+
+def reference_rolling_features(monthly_data, product_segments):
+    """改写前：每个产品的每个目标月都截取历史数据重新计算特征"""
+    all_features = []
+
+    for segment in product_segments.values():
+        segment_products = [k for k, v in product_segments.items() if v == segment]
+        segment_data = monthly_data[monthly_data['product_code'].isin(segment_products)]
+
+        for product in segment_products:
+            product_data = segment_data[segment_data['product_code'] == product].copy()
+
+            if len(product_data) < 4:  # 至少需要4个月数据
+                continue
+
+            # 为每个时间点创建特征
+            for idx in range(3, len(product_data)):
+                features = _reference_product_features(
+                    product, product_data.iloc[:idx], segment
+                )
+
+                # 目标变量
+                target_row = product_data.iloc[idx]
+                features['target'] = target_row['total_qty']
+                features['target_month'] = str(target_row['year_month'])
+                features['segment'] = segment
+
+                all_features.append(features)
+
+    # 改写前按产品段名逐个遍历（同一段出现几次就重复几遍），每个产品月重复生成了多行；
+    # 当前实现每个产品月一行，这里去重后再对比
+    feature_data = pd.DataFrame(all_features)
+    return feature_data.drop_duplicates(['product_code', 'target_month'], ignore_index=True)
+
+
+def _preprocessed_pipeline(generator: SyntheticDataGenerator) -> PredictionPipeline:
+    """在合成的机器学习出货和促销数据上完成预处理和产品分段"""
+    # 使用临时目录下的模型注册表，不读写页面使用的模型
+    pipeline = PredictionPipeline(registry=ModelRegistry(os.path.join(tempfile.gettempdir(), 'kernels_models')))
+    pipeline.shipment_data = generator.build_ml_shipments()
+    pipeline.promotion_data = generator.build_ml_promotions()
+    pipeline.preprocess_data()
+    return pipeline
+
+
+def setup_rolling_features(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    pipeline = _preprocessed_pipeline(generator)
+    return build_monthly_cube(pipeline.shipment_data), pipeline.product_segments
+
+
+def reference_monthly_cube(shipment_data):
+    """改写前：按产品×月聚合，主要区域逐组调用mode()"""
+    monthly_data = shipment_data.groupby([
+        'product_code',
+        shipment_data['order_date'].dt.to_period('M')
+    ]).agg({
+        'quantity': ['sum', 'count', 'mean', 'std'],
+        'customer_code': 'nunique',
+        'region': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else x.iloc[0]
+    }).reset_index()
+
+    # 扁平化列名
+    monthly_data.columns = ['product_code', 'year_month', 'total_qty', 'order_count',
+                            'avg_qty', 'std_qty', 'customer_count', 'main_region']
+    monthly_data['std_qty'] = monthly_data['std_qty'].fillna(0)
+    return monthly_data.sort_values(['product_code', 'year_month'])
+
+
+def setup_monthly_cube(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    return (_preprocessed_pipeline(generator).shipment_data,)
+
+
+def _backtest_frame(feature_data, trained):
+    """滚动回测结果：各(产品, 目标月)的预测值和使用的模型"""
+    predictions, model_names = predict_backtest(feature_data, trained)
+    return pd.DataFrame({
+        'product_code': feature_data['product_code'].to_numpy(),
+        'target_month': feature_data['target_month'].to_numpy(),
+        'prediction': predictions,
+        'model': model_names
+    })
+
+
+def serial_backtest(feature_data, feature_columns):
+    """串行：在当前进程中逐个目标月训练滚动起点模型"""
+    return _backtest_frame(feature_data, train_prediction_models(feature_data, feature_columns, parallel=False))
+
+
+def pooled_backtest(feature_data, feature_columns):
+    """进程池：固定2个进程（单核机器上也走并行路径，用于核对结果与进程数无关）"""
+    trained = train_prediction_models(feature_data, feature_columns, parallel=True, workers=2)
+    return _backtest_frame(feature_data, trained)
+
+
+def setup_backtest(scale: float, products: int, seed: int) -> tuple:
+    generator = SyntheticDataGenerator(scale=scale, products=products, seed=seed)
+    pipeline = _preprocessed_pipeline(generator)
+    pipeline.create_advanced_features()
+    feature_columns = [col for col in pipeline.feature_data.columns if col not in NON_FEATURE_COLUMNS]
+    return pipeline.feature_data, feature_columns
+
+
+# 对比项：名称 -> 数据准备函数、改写前实现、当前实现
+KERNELS = {
+    'product_sales_metrics': {
+        'description': "预测库存分析 - 各产品日均/标准差/变异系数/总量/近90天销量",
+        'setup': setup_product_sales_metrics,
+        'reference': reference_product_sales_metrics,
+        'optimized': calculate_product_sales_metrics,
+    },
+    'seasonal_forecast': {
+        'description': "预测库存分析 - 各产品季节性指数、预测偏差和销售员预测量",
+        'setup': setup_seasonal_forecast,
+        'reference': reference_seasonal_forecast,
+        'optimized': optimized_seasonal_forecast,
+    },
+    'cross_month_sales': {
+        'description': "预测库存分析 - 责任归属中各预测人员的跨月加权销售",
+        'setup': setup_cross_month_sales,
+        'reference': reference_cross_month_sales,
+        'optimized': optimized_cross_month_sales,
+    },
+    'batch_rows': {
+        'description': "预测库存分析 - 含批次库存表解析为批次表",
+        'setup': setup_batch_rows,
+        'reference': reference_batch_rows,
+        'optimized': parse_batch_rows,
+    },
+    'batch_rows_streaming': {
+        'description': "预测库存分析 - 含批次库存表分段解析（每段1000行）",
+        'setup': setup_batch_rows,
+        'reference': reference_batch_rows,
+        'optimized': streaming_batch_rows,
+    },
+    'risk_scoring': {
+        'description': "预测库存分析 - 批次积压风险、风险得分/等级、处理建议、预期损失和积压原因",
+        'setup': setup_risk_scoring,
+        'reference': reference_risk_scoring,
+        'optimized': optimized_risk_scoring,
+    },
+    'responsibility_attribution': {
+        'description': "预测库存分析 - 批次责任归属分析与长表（串行 vs 2进程进程池）",
+        'setup': setup_responsibility_attribution,
+        'reference': serial_responsibility_attribution,
+        'optimized': pooled_responsibility_attribution,
+    },
+    'responsibility_summaries': {
+        'description': "预测库存分析 - 嵌套责任详情 vs 责任归属长表生成的责任分析摘要",
+        'setup': setup_responsibility_attribution,
+        'reference': reference_responsibility_summaries,
+        'optimized': optimized_responsibility_summaries,
+    },
+    'forecast_rollups': {
+        'description': "预测库存分析 - 预测准确率，以及全国/各区域的产品级和区域级汇总",
+        'setup': setup_forecast_rollups,
+        'reference': reference_forecast_rollups,
+        'optimized': optimized_forecast_rollups,
+    },
+    'monthly_cube': {
+        'description': "机器学习预测 - 产品×月聚合（含每月主要区域）",
+        'setup': setup_monthly_cube,
+        'reference': reference_monthly_cube,
+        'optimized': build_monthly_cube,
+    },
+    'rolling_features': {
+        'description': "机器学习预测 - 各产品各目标月的扩展窗口特征（逐月截取历史 vs 分组一次计算）",
+        'setup': setup_rolling_features,
+        'reference': reference_rolling_features,
+        'optimized': build_rolling_features,
+    },
+    'backtest': {
+        'description': "机器学习预测 - 滚动起点回测的模型训练和预测（串行 vs 2进程进程池）",
+        'setup': setup_backtest,
+        'reference': serial_backtest,
+        'optimized': pooled_backtest,
+    },
+}
+
+
+def _differences(expected, actual, path: str = '', rtol: float = 1e-9) -> List[str]:
+    """递归比较两个结果，返回不一致的位置（浮点数按相对误差比较，inf/NaN要求相同）"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        diffs = []
+        if set(expected) != set(actual):
+            diffs.append(f"{path}: 键不同 {sorted(map(str, set(expected) ^ set(actual)))[:5]}")
+        for key in set(expected) & set(actual):
+            diffs.extend(_differences(expected[key], actual[key], f"{path}/{key}", rtol))
+        return diffs
+    if isinstance(expected, pd.DataFrame) and isinstance(actual, pd.DataFrame):
+        try:
+            pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=rtol)
+            return []
+        except AssertionError as e:
+            return [f"{path}: {str(e).splitlines()[0]}"]
+    if isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        if len(expected) != len(actual):
+            return [f"{path}: 长度 {len(expected)} != {len(actual)}"]
+        diffs = []
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            diffs.extend(_differences(left, right, f"{path}[{index}]", rtol))
+        return diffs
+    if isinstance(expected, (int, float, np.number)) and isinstance(actual, (int, float, np.number)):
+        left, right = float(expected), float(actual)
+        if math.isnan(left) and math.isnan(right):
+            return []
+        if math.isinf(left) or math.isinf(right):
+            return [] if left == right else [f"{path}: {expected} != {actual}"]
+        return [] if math.isclose(left, right, rel_tol=rtol, abs_tol=1e-12) else [f"{path}: {expected} != {actual}"]
+    return [] if expected == actual else [f"{path}: {expected!r} != {actual!r}"]
+
+
+def _timed(func: Callable, args: tuple, repeat: int):
+    """运行repeat次，返回最后一次的结果和最短耗时"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+
+def run_kernel(name: str, products: List[int], scale: float, repeat: int, seed: int) -> List[Dict]:
+    """对一个对比项在不同产品数下运行新旧实现"""
+    kernel = KERNELS[name]
+    logger.info(f"{name}: {kernel['description']}")
+    rows = []
+    for product_count in products:
+        args = kernel['setup'](scale, product_count, seed)
+        expected, reference_seconds = _timed(kernel['reference'], args, repeat)
+        actual, optimized_seconds = _timed(kernel['optimized'], args, repeat)
+        diffs = _differences(expected, actual)
+        rows.append({
+            'kernel': name,
+            'products': product_count,
+            'rows': len(args[0]) if isinstance(args[0], (pd.DataFrame, np.ndarray, list)) else None,
+            'reference_seconds': round(reference_seconds, 4),
+            'optimized_seconds': round(optimized_seconds, 4),
+            'speedup': round(reference_seconds / optimized_seconds, 1) if optimized_seconds > 0 else None,
+            'match': not diffs,
+            'differences': diffs[:10]
+        })
+        logger.info(f"{name} 产品数={product_count}: 改写前 {reference_seconds:.3f}s, 当前 {optimized_seconds:.3f}s, "
+                    f"结果{'一致' if not diffs else '不一致'}")
+    return rows
+
+
+def format_markdown(rows: List[Dict], scale: float) -> str:
+    lines = [f"# 热点函数新旧实现对比 {time.strftime('%Y-%m-%d %H:%M:%S')}（行数倍数 {scale:g}）", "",
+             "| 对比项 | 产品数 | 数据行数 | 改写前(s) | 当前(s) | 加速比 | 结果一致 |",
+             "|---|---:|---:|---:|---:|---:|---|"]
+    for row in rows:
+        rows_text = f"{row['rows']:,}" if row['rows'] is not None else '-'
+        lines.append(f"| {row['kernel']} | {row['products']:,} | {rows_text} | "
+                     f"{row['reference_seconds']:.4f} | {row['optimized_seconds']:.4f} | "
+                     f"{row['speedup'] if row['speedup'] is not None else '-'}x | {'是' if row['match'] else '否'} |")
+    mismatched = [row for row in rows if not row['match']]
+    if mismatched:
+        lines.extend(["", "## 不一致的结果", ""])
+        for row in mismatched:
+            lines.extend(f"- {row['kernel']} 产品数={row['products']}: {diff}" for diff in row['differences'])
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: List[str] = None) -> int:
+    # 与页面服务进程一致，开启写时复制（见初始登陆界面.py）
+    pd.options.mode.copy_on_write = True
+    parser = argparse.ArgumentParser(description="比较热点函数改写前后的耗时并核对结果一致")
+    parser.add_argument('kernels', nargs='*', help=f"对比项（默认全部）：{', '.join(KERNELS)}")
+    parser.add_argument('--products', type=int, nargs='+', default=[79, 500, 2000], help="产品数（默认 79 500 2000）")
+    parser.add_argument('--scale', type=float, default=10, help="交易行数倍数（默认10）")
+    parser.add_argument('--repeat', type=int, default=1, help="每个实现运行的次数，取最短耗时")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--report-dir', default=DEFAULT_REPORT_DIR, help="报告输出目录")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.kernels if name not in KERNELS]
+    if unknown:
+        parser.error(f"未知的对比项: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logging.getLogger('analytics').setLevel(logging.WARNING)
+    warnings.filterwarnings('ignore')
+
+    rows = []
+    for name in args.kernels or list(KERNELS):
+        rows.extend(run_kernel(name, args.products, args.scale, args.repeat, args.seed))
+
+    os.makedirs(args.report_dir, exist_ok=True)
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    markdown = format_markdown(rows, args.scale)
+    with open(os.path.join(args.report_dir, f"kernels_{stamp}.md"), 'w', encoding='utf-8') as f:
+        f.write(markdown)
+    with open(os.path.join(args.report_dir, f"kernels_{stamp}.json"), 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+    print(markdown)
+    return 0 if all(row['match'] for row in rows) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
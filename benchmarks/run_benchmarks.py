@@ -0,0 +1,376 @@
+# benchmarks/run_benchmarks.py - 各页面计算函数的规模基准测试
+#
+# 在不同规模的合成数据上无界面地运行五个页面的计算函数，记录每一步的耗时并生成报告：
+#   python -m benchmarks.run_benchmarks                          # 1倍和10倍
+#   python -m benchmarks.run_benchmarks --scales 1 10 100        # 100倍时生成数据和首次解析Excel都需要较长时间
+#   python -m benchmarks.run_benchmarks --pages inventory customer --budget 600
+#   python -m benchmarks.run_benchmarks --as-of 2025-06-30       # 固定分析基准日期，不同日期运行的结果可以对比
+#
+# 规模倍数同时放大交易行数、客户数和库存批次数；--products/--regions 单独指定产品数和区域数。
+# 合成数据保存在 benchmarks/data/scale_<倍数>/（参数不变时复用），报告写到 benchmarks/reports/。
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import warnings
+from datetime import date
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from analytics.customer import calculate_customer_cycles, calculate_risk_prediction, load_customer_data
+from analytics.inventory import load_inventory_data, process_forecast_analysis
+from analytics.ml_prediction import PredictionPipeline
+from analytics.model_registry import ModelRegistry
+from analytics.product import (NETWORK_FILTERS, analyze_effective_products, analyze_product_bcg_comprehensive,
+                               analyze_product_growth_rates, analyze_promotion_effectiveness_enhanced,
+                               calculate_comprehensive_metrics, calculate_product_network, load_product_data)
+from analytics.sales import calculate_overview_metrics, load_sales_data, validate_channel_data
+from benchmarks.synthetic_data import BASE_ENTITIES, HISTORY_END, ML_SOURCES, SyntheticDataGenerator, load_manifest
+from data_cache import SnapshotCache
+from data_registry import DATASET_SOURCES, DatasetRegistry
+
+logger = logging.getLogger('benchmarks')
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+DEFAULT_REPORT_DIR = os.path.join(BENCHMARK_DIR, 'reports')
+# 默认分析基准日期：合成数据的最后一天（用当天日期时基准月份没有数据，预测分析和风险预测测不到真实计算）
+DEFAULT_AS_OF = pd.Timestamp(HISTORY_END).date()
+
+
+def _load_all(ctx):
+    ctx['registry'].get_many(list(DATASET_SOURCES))
+
+
+def _load_product(ctx):
+    ctx['product'] = load_product_data(ctx['registry'], code_dir=ctx['data_dir'])
+
+
+def _product_metrics(ctx):
+    data = ctx['product']
+    calculate_comprehensive_metrics(data['sales_df'], data['star_products'], data['new_products'],
+                                    data['dashboard_products'], data['promotion_df'], data['time_info'])
+
+
+def _product_networks(ctx):
+    for product_filter in NETWORK_FILTERS:
+        calculate_product_network(ctx['product'], product_filter)
+
+
+def _load_customer(ctx):
+    metrics, _, sales_data, _ = load_customer_data(ctx['registry'], as_of=ctx['as_of'])
+    ctx['customer'] = {'metrics': metrics, 'sales_data': sales_data}
+
+
+def _load_inventory(ctx):
+    _, shipment_df, forecast_df, _, product_name_map, _ = load_inventory_data(ctx['registry'], ctx['as_of'])
+    ctx['inventory'] = {'shipment_df': shipment_df, 'forecast_df': forecast_df, 'product_name_map': product_name_map}
+
+
+def _load_ml(ctx):
+    cache = ctx['registry'].cache
+    pipeline = PredictionPipeline(registry=ctx['model_registry'])
+    pipeline.shipment_source = os.path.join(ctx['data_dir'], ML_SOURCES['ml_shipments'])
+    pipeline.shipment_data = cache.read_excel(pipeline.shipment_source)
+    pipeline.promotion_data = cache.read_excel(os.path.join(ctx['data_dir'], ML_SOURCES['ml_promotions']))
+    ctx['ml'] = pipeline
+
+
+def _ml_step(method: str) -> Callable:
+    """预测流程的步骤返回False时视为失败，成功时在ctx中登记，供后续步骤检查依赖"""
+    def run(ctx):
+        if not getattr(ctx['ml'], method)():
+            raise RuntimeError(f"{method} 返回失败")
+        ctx[method] = True
+    return run
+
+
+# 基准步骤：(页面, 步骤名, 执行函数, 依赖的前置结果)
+# 页面中的 create_real_product_network 和 load_and_process_data 只负责绘图和缓存，
+# 对应的计算分别是 calculate_product_network 和 load_inventory_data
+BENCHMARK_STEPS = [
+    ('common', '解析工作簿(get_many)', _load_all, []),
+
+    ('sales', 'load_sales_data',
+     lambda ctx: ctx.update(sales=load_sales_data(ctx['registry'])), []),
+    ('sales', 'calculate_overview_metrics', lambda ctx: calculate_overview_metrics(ctx['sales']), ['sales']),
+    ('sales', 'validate_channel_data', lambda ctx: validate_channel_data(ctx['sales']), ['sales']),
+
+    ('product', 'load_product_data', _load_product, []),
+    ('product', 'calculate_comprehensive_metrics', _product_metrics, ['product']),
+    ('product', 'analyze_product_bcg_comprehensive',
+     lambda ctx: analyze_product_bcg_comprehensive(ctx['product']['sales_df'], None, ctx['product']['time_info']),
+     ['product']),
+    ('product', 'calculate_product_network(create_real_product_network)', _product_networks, ['product']),
+    ('product', 'analyze_product_growth_rates',
+     lambda ctx: analyze_product_growth_rates(ctx['product'], ctx['product']['time_info']), ['product']),
+    ('product', 'analyze_promotion_effectiveness_enhanced',
+     lambda ctx: analyze_promotion_effectiveness_enhanced(ctx['product'], ctx['product']['time_info']),
+     ['product']),
+    ('product', 'analyze_effective_products',
+     lambda ctx: analyze_effective_products(ctx['product'], 'national'), ['product']),
+
+    ('customer', 'load_customer_data(含calculate_metrics)', _load_customer, []),
+    ('customer', 'calculate_customer_cycles',
+     lambda ctx: calculate_customer_cycles(ctx['customer']['sales_data'], ctx['customer']['metrics']['current_year']),
+     ['customer']),
+    ('customer', 'calculate_risk_prediction',
+     lambda ctx: calculate_risk_prediction(ctx['customer']['sales_data'], ctx['as_of']), ['customer']),
+
+    ('inventory', 'load_inventory_data(load_and_process_data)', _load_inventory, []),
+    ('inventory', 'process_forecast_analysis',
+     lambda ctx: process_forecast_analysis(ctx['inventory']['shipment_df'], ctx['inventory']['forecast_df'],
+                                           ctx['inventory']['product_name_map'], ctx['as_of']), ['inventory']),
+
+    ('ml_prediction', '读取出货和促销数据', _load_ml, []),
+    ('ml_prediction', 'preprocess_data', _ml_step('preprocess_data'), ['ml']),
+    ('ml_prediction', 'create_advanced_features', _ml_step('create_advanced_features'), ['preprocess_data']),
+    ('ml_prediction', 'generate_complete_historical_predictions',
+     _ml_step('generate_complete_historical_predictions'), ['create_advanced_features']),
+]
+
+PAGES = ['sales', 'product', 'customer', 'inventory', 'ml_prediction']
+
+
+class ScalingBenchmark:
+    """规模基准测试类 - 按规模从小到大依次生成数据并运行各页面的计算函数
+
+    某一步在上一个规模的耗时按行数等比外推后超过budget秒时，在当前规模跳过该步骤并记录估计值，
+    避免一次运行被单个慢函数拖住（解析工作簿的步骤总是运行，否则解析耗时会计入后面的加载函数）。
+    """
+
+    def __init__(self, scales: List[float], pages: List[str] = None, products: int = None,
+                 regions: int = None, data_dir: str = DEFAULT_DATA_DIR, budget: float = 900,
+                 cold: bool = False, seed: int = 0, as_of: date = None):
+        self.scales = sorted(scales)
+        self.pages = pages or PAGES
+        self.products = products
+        self.regions = regions
+        self.data_dir = data_dir
+        self.budget = budget
+        self.cold = cold
+        self.seed = seed
+        # 库存和客户页面的分析基准日期，整次运行的各规模使用同一日期
+        self.as_of = as_of or DEFAULT_AS_OF
+        self.results = {}
+
+    def _scale_dir(self, scale: float) -> str:
+        return os.path.join(self.data_dir, f"scale_{scale:g}")
+
+    def prepare_data(self, scale: float) -> Dict:
+        """生成指定规模的合成数据，已有相同参数的数据时直接复用"""
+        generator = SyntheticDataGenerator(
+            scale=scale,
+            products=self.products,
+            customers=max(1, round(BASE_ENTITIES['customers'] * scale)),
+            regions=self.regions,
+            seed=self.seed
+        )
+        output_dir = self._scale_dir(scale)
+        manifest = load_manifest(output_dir)
+        if manifest.get('params') == generator.params():
+            logger.info(f"复用已生成的 {scale:g} 倍数据: {output_dir}")
+            return manifest
+
+        logger.info(f"生成 {scale:g} 倍数据: {output_dir}")
+        return generator.generate(output_dir)
+
+    def _make_registry(self, scale: float) -> DatasetRegistry:
+        """指向合成数据目录的独立注册中心（快照保存在数据目录下，不影响页面使用的缓存）"""
+        output_dir = self._scale_dir(scale)
+        snapshot_dir = os.path.join(output_dir, 'snapshots')
+        if self.cold:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+        cache = SnapshotCache(snapshot_dir)
+        sources = {name: os.path.join(output_dir, file) for name, file in DATASET_SOURCES.items()}
+        return DatasetRegistry(sources=sources, cache=cache)
+
+    def _estimate(self, page: str, step: str, scale: float):
+        """按上一个规模的耗时外推当前规模的耗时，没有可用记录时返回None"""
+        previous = [s for s in self.scales if s < scale and s in self.results]
+        if not previous:
+            return None
+        last = previous[-1]
+        for record in self.results[last]['steps']:
+            if record['page'] == page and record['step'] == step:
+                seconds = record['seconds'] if record['status'] == 'ok' else record.get('estimate')
+                return seconds * scale / last if seconds is not None else None
+        return None
+
+    def run_scale(self, scale: float) -> Dict:
+        """在一个规模上运行所有选中的步骤"""
+        manifest = self.prepare_data(scale)
+        # 模型注册表放在每次运行各自的临时目录：每次都测到真实的训练耗时，也不会挤掉页面使用的模型
+        model_dir = tempfile.mkdtemp(prefix='benchmark_models_')
+        ctx = {'registry': self._make_registry(scale), 'model_registry': ModelRegistry(model_dir),
+               'data_dir': self._scale_dir(scale), 'as_of': self.as_of}
+        records = []
+
+        for page, step, func, requires in BENCHMARK_STEPS:
+            if page != 'common' and page not in self.pages:
+                continue
+            record = {'page': page, 'step': step, 'seconds': None, 'status': 'ok'}
+
+            missing = [key for key in requires if key not in ctx]
+            estimate = self._estimate(page, step, scale)
+            if missing:
+                record['status'] = 'skipped'
+                record['reason'] = f"前置步骤未完成: {', '.join(missing)}"
+            elif page != 'common' and estimate is not None and estimate > self.budget:
+                record['status'] = 'skipped'
+                record['estimate'] = round(estimate, 1)
+                record['reason'] = f"预计耗时 {estimate:.0f}s 超过预算 {self.budget:g}s"
+            else:
+                start = time.perf_counter()
+                try:
+                    func(ctx)
+                except Exception as e:
+                    record['status'] = 'failed'
+                    record['error'] = f"{type(e).__name__}: {e}"
+                    logger.debug(traceback.format_exc())
+                record['seconds'] = round(time.perf_counter() - start, 3)
+
+            records.append(record)
+            logger.info(f"[{scale:g}x] {page}.{step}: {record['status']} "
+                        f"{record['seconds'] if record['seconds'] is not None else '-'}s")
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+        result = {
+            'params': manifest['params'],
+            'as_of': self.as_of.isoformat(),
+            'rows': {name: item['rows'] for name, item in manifest['files'].items()},
+            'load_report': ctx['registry'].load_report(list(DATASET_SOURCES)),
+            'steps': records
+        }
+        self.results[scale] = result
+        return result
+
+    def run(self) -> Dict:
+        for scale in self.scales:
+            self.run_scale(scale)
+        return self.report()
+
+    def report(self) -> Dict:
+        """汇总报告（JSON可序列化）"""
+        return {
+            'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count()
+            },
+            'budget_seconds': self.budget,
+            'scales': {f"{scale:g}": result for scale, result in self.results.items()}
+        }
+
+
+def format_markdown(report: Dict) -> str:
+    """把报告整理成Markdown表格：每个步骤一行，每个规模一列，最后一列为首末规模的耗时增长倍数"""
+    scales = list(report['scales'])
+    lines = [f"# 规模基准测试报告 {report['generated_at']}", ""]
+    env = report['environment']
+    lines.append(f"Python {env['python']} / pandas {env['pandas']} / numpy {env['numpy']} / "
+                 f"{env['cpu_count']} CPU / {env['platform']}")
+    lines.append("")
+
+    # 数据规模
+    lines.append("## 数据规模（行数）")
+    lines.append("")
+    lines.append("| 数据集 | " + " | ".join(f"{scale}x" for scale in scales) + " |")
+    lines.append("|---|" + "---:|" * len(scales))
+    datasets = list(report['scales'][scales[0]]['rows'])
+    for name in datasets:
+        lines.append(f"| {name} | " + " | ".join(
+            f"{report['scales'][scale]['rows'].get(name, '-'):,}" for scale in scales) + " |")
+    lines.append("")
+
+    # 耗时
+    lines.append("## 耗时（秒）")
+    lines.append("")
+    lines.append("| 页面 | 步骤 | " + " | ".join(f"{scale}x" for scale in scales) + " | 增长倍数 |")
+    lines.append("|---|---|" + "---:|" * (len(scales) + 1))
+    notes = []
+    for index, first in enumerate(report['scales'][scales[0]]['steps']):
+        cells = []
+        timings = []
+        for scale in scales:
+            steps = report['scales'][scale]['steps']
+            record = steps[index] if index < len(steps) else None
+            if record is None:
+                cells.append('-')
+            elif record['status'] == 'ok':
+                cells.append(f"{record['seconds']:.3f}")
+                timings.append(record['seconds'])
+            elif record['status'] == 'skipped':
+                cells.append(f"~{record['estimate']:.0f}*" if record.get('estimate') else '跳过')
+            else:
+                cells.append('失败')
+                notes.append(f"- {scale}x {record['page']}.{record['step']}: {record.get('error', '')}")
+        growth = f"{timings[-1] / timings[0]:.1f}" if len(timings) > 1 and timings[0] > 0 else '-'
+        lines.append(f"| {first['page']} | {first['step']} | " + " | ".join(cells) + f" | {growth} |")
+
+    lines.append("")
+    lines.append(f"\\* 按上一规模耗时等比外推的估计值，超过预算 {report['budget_seconds']:g}s 未实际运行。")
+    if notes:
+        lines.append("")
+        lines.append("## 失败的步骤")
+        lines.append("")
+        lines.extend(notes)
+    return "\n".join(lines) + "\n"
+
+
+def write_report(report: Dict, report_dir: str) -> Dict[str, str]:
+    """把报告写成JSON和Markdown两个文件"""
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    json_path = os.path.join(report_dir, f"benchmark_{stamp}.json")
+    markdown_path = os.path.join(report_dir, f"benchmark_{stamp}.md")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    with open(markdown_path, 'w', encoding='utf-8') as f:
+        f.write(format_markdown(report))
+    return {'json': json_path, 'markdown': markdown_path}
+
+
+def main(argv: List[str] = None) -> int:
+    # 与页面服务进程一致，开启写时复制（见初始登陆界面.py）
+    pd.options.mode.copy_on_write = True
+    parser = argparse.ArgumentParser(description="在不同规模的合成数据上测试各页面计算函数的耗时")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10], help="规模倍数（默认 1 10）")
+    parser.add_argument('--pages', nargs='+', choices=PAGES, default=PAGES, help="要测试的页面（默认全部）")
+    parser.add_argument('--products', type=int, help=f"产品数（默认{BASE_ENTITIES['products']}）")
+    parser.add_argument('--regions', type=int, help=f"区域数（默认{BASE_ENTITIES['regions']}）")
+    parser.add_argument('--budget', type=float, default=900, help="单个步骤的时间预算（秒），超出预算的步骤在更大规模上跳过")
+    parser.add_argument('--cold', action='store_true', help="清除合成数据的快照，测试首次解析Excel的耗时")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="合成数据目录")
+    parser.add_argument('--report-dir', default=DEFAULT_REPORT_DIR, help="报告输出目录")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                        help=f"库存和客户页面的分析基准日期（YYYY-MM-DD，默认合成数据的最后一天 {DEFAULT_AS_OF}）")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出计算函数的调试日志")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    # 计算函数的进度日志很多，默认只保留警告
+    logging.getLogger('analytics').setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    warnings.filterwarnings('ignore')
+
+    benchmark = ScalingBenchmark(args.scales, args.pages, args.products, args.regions,
+                                 args.data_dir, args.budget, args.cold, args.seed, args.as_of)
+    paths = write_report(benchmark.run(), args.report_dir)
+    logger.info(f"报告已写入 {paths['markdown']} 和 {paths['json']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
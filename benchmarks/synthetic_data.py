@@ -0,0 +1,530 @@
+# benchmarks/synthetic_data.py - 合成数据生成器
+#
+# 按内置工作簿的表结构（列名、列顺序、取值格式、批次库存的分段布局）生成合成数据，
+# 行数、产品数、客户数和区域数可以分别放大：
+#   python -m benchmarks.synthetic_data -o benchmarks/data/scale_10 --scale 10
+#   python -m benchmarks.synthetic_data -o benchmarks/data/wide --products 400 --customers 4000 --regions 12
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from data_registry import DATASET_SOURCES
+
+logger = logging.getLogger(__name__)
+
+# 机器学习预测页面从GitHub读取的两个工作簿（本地生成时使用仓库中的文件名）
+ML_SOURCES = {
+    'ml_shipments': '预测模型出货数据每日xlsx.xlsx',
+    'ml_promotions': '销售业务员促销文件.xlsx',
+}
+
+# 产品组合分析页面读取的产品代码文件
+CODE_FILES = {
+    'star_products': '星品&新品年度KPI考核产品代码.txt',
+    'new_products': '仪表盘新品代码.txt',
+    'dashboard_products': '仪表盘产品代码.txt',
+}
+
+# 1倍规模下各工作簿的行数（与内置数据一致；批次库存为批次数，不含产品标题行和空行）
+BASE_ROWS = {
+    'channel_sales_data': 8051,
+    'promotion_activities': 721,
+    'promotion_sales': 26839,
+    'customer_sales': 4173,
+    'shipments': 29053,
+    'batch_inventory': 137,
+    'ml_shipments': 32807,
+    'ml_promotions': 1662,
+}
+
+# 内置数据的实体数量
+BASE_ENTITIES = {
+    'products': 79,
+    'customers': 379,
+    'regions': 5,
+    'sales_people': 24,
+    'cities': 67,
+}
+
+# 内置数据的时间范围
+HISTORY_START = '2024-01-01'
+HISTORY_END = '2025-05-30'
+TARGET_MONTHS = ('2023-01', '2025-12')
+CURRENT_YEAR_START = '2025-01-01'
+
+BASE_REGIONS = ['北', '南', '东', '西', '中']
+SURNAMES = list('李王张刘陈杨赵黄周吴徐孙胡朱高林何郭马罗')
+GIVEN_NAMES = list('根兴伟芳娜敏静强磊军洋勇艳杰涛明超霞平刚')
+PROVINCE_CITIES = [
+    ('北京', '北京'), ('河北', '保定'), ('河北', '霸州'), ('山东', '潍坊'), ('山东', '烟台'),
+    ('吉林', '长春'), ('辽宁', '沈阳'), ('广东', '广州'), ('广东', '深圳'), ('福建', '厦门'),
+    ('浙江', '台州'), ('浙江', '杭州'), ('江苏', '南京'), ('上海', '上海'), ('陕西', '西安'),
+    ('四川', '成都'), ('重庆', '重庆'), ('湖北', '武汉'), ('湖南', '长沙'), ('河南', '郑州'),
+]
+COMPANY_WORDS = ['乐派', '富味', '三鑫', '予味', '多多', '京盛', '通达', '福运', '玫琳', '乐象', '大宇', '鸿发']
+FLAVORS = ['汉堡', '比萨', '西瓜', '草莓', '葡萄', '可乐', '星球', '大眼仔', '彩虹', '薄荷', '热狗', '欢乐派对']
+WEIGHTS = [36, 45, 60, 68, 90, 108, 400, 540]
+PACKAGES = ['袋装', '盒装', '直立袋装', '随手包']
+PRICES = [69.6, 121.44, 126.72, 129.36, 130.56, 132.0, 137.04, 153.6, 161.4, 174.0, 180.0, 182.4, 216.96,
+          272.64, 306.0, 307.2]
+LETTERS = 'ABCDEFGHJKLMNPQRSTUVWXYZ'
+
+
+class SyntheticDataGenerator:
+    """合成数据生成类 - 生成与内置工作簿表结构相同的全部数据文件
+
+    scale放大交易类工作簿的行数；products/customers/regions控制实体数量，未指定时使用内置数据的数量。
+    同一组参数和seed总是生成相同的数据。
+    """
+
+    def __init__(self, scale: float = 1.0, products: int = None, customers: int = None,
+                 regions: int = None, seed: int = 0):
+        self.scale = scale
+        self.n_products = products or BASE_ENTITIES['products']
+        self.n_customers = customers or BASE_ENTITIES['customers']
+        self.n_regions = regions or BASE_ENTITIES['regions']
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        self.regions = self._build_regions()
+        self.sales_people = self._build_sales_people()
+        self.cities = self._build_cities()
+        self.products = self._build_products()
+        self.customers = self._build_customers()
+
+    def params(self) -> Dict:
+        """生成参数（写入清单，用于判断已有数据是否可以复用）"""
+        return {
+            'scale': self.scale,
+            'products': self.n_products,
+            'customers': self.n_customers,
+            'regions': self.n_regions,
+            'seed': self.seed
+        }
+
+    # ---------- 实体 ----------
+
+    def _build_regions(self) -> List[str]:
+        """区域名称：前5个与内置数据相同，之后加编号"""
+        return [BASE_REGIONS[i % 5] + ('' if i < 5 else str(i // 5 + 1)) for i in range(self.n_regions)]
+
+    def _build_sales_people(self) -> pd.DataFrame:
+        """销售员及其所属区域（人数按区域数等比放大）"""
+        count = max(self.n_regions, round(BASE_ENTITIES['sales_people'] * self.n_regions / BASE_ENTITIES['regions']))
+        names = [SURNAMES[i % len(SURNAMES)] + GIVEN_NAMES[(i // len(SURNAMES)) % len(GIVEN_NAMES)] +
+                 ('' if i < len(SURNAMES) * len(GIVEN_NAMES) else str(i // (len(SURNAMES) * len(GIVEN_NAMES))))
+                 for i in range(count)]
+        return pd.DataFrame({'销售员': names, '区域': [self.regions[i % self.n_regions] for i in range(count)]})
+
+    def _build_cities(self) -> pd.DataFrame:
+        """城市及其省份、城市类型和所属区域（城市数按客户数等比放大）"""
+        count = max(self.n_regions, round(BASE_ENTITIES['cities'] * self.n_customers / BASE_ENTITIES['customers']))
+        rows = []
+        for i in range(count):
+            province, city = PROVINCE_CITIES[i % len(PROVINCE_CITIES)]
+            suffix = '' if i < len(PROVINCE_CITIES) else str(i // len(PROVINCE_CITIES) + 1)
+            rows.append({
+                '省份': province,
+                '城市': city + suffix,
+                '城市类型': 'C60' if i % 3 == 0 else '非C60',
+                '区域': self.regions[i % self.n_regions]
+            })
+        return pd.DataFrame(rows)
+
+    def _build_products(self) -> pd.DataFrame:
+        """产品代码、名称、简称、单价和销量权重"""
+        combos = len(FLAVORS) * len(WEIGHTS) * len(PACKAGES)
+        codes, names = [], []
+        for i in range(self.n_products):
+            block, rest = divmod(i, len(LETTERS) * 10 * len(LETTERS))
+            codes.append(f"F{block + 1:02d}{LETTERS[rest // (10 * len(LETTERS))]}"
+                         f"{(rest // len(LETTERS)) % 10}{LETTERS[rest % len(LETTERS)]}")
+            flavor = FLAVORS[i % len(FLAVORS)]
+            weight = WEIGHTS[(i // len(FLAVORS)) % len(WEIGHTS)]
+            package = PACKAGES[(i // (len(FLAVORS) * len(WEIGHTS))) % len(PACKAGES)]
+            names.append(f"口力{flavor}{weight}G{package}{'' if i < combos else i // combos + 1}-中国")
+
+        products = pd.DataFrame({'产品代码': codes, '产品名称': names})
+        products['产品简称'] = products['产品名称'].str.replace('口力', '', regex=False).str.replace('-中国', '', regex=False)
+        products['单价'] = self.rng.choice(PRICES, len(products))
+        # 销量集中在头部产品
+        weights = 1.0 / np.arange(1, len(products) + 1) ** 0.8
+        products['权重'] = self.rng.permutation(weights / weights.sum())
+        # 最后约8%的产品是新品，只在当前年度有销售
+        new_count = max(1, round(len(products) * 0.08))
+        products['新品'] = [i >= len(products) - new_count for i in range(len(products))]
+        return products
+
+    def _build_customers(self) -> pd.DataFrame:
+        """客户代码、名称、所属城市、区域、负责销售员、状态和采购权重"""
+        city_index = self.rng.integers(0, len(self.cities), self.n_customers)
+        rows = []
+        for i in range(self.n_customers):
+            city = self.cities.iloc[city_index[i]]
+            word = COMPANY_WORDS[i % len(COMPANY_WORDS)]
+            serial = i // len(COMPANY_WORDS)
+            region_people = self.sales_people[self.sales_people['区域'] == city['区域']]['销售员'].tolist()
+            rows.append({
+                '客户代码': f"CU{i + 1:04d}",
+                '客户名称': f"{city['城市']}{word}{serial if serial else ''}商贸有限公司",
+                '省份': city['省份'],
+                '城市': city['城市'],
+                '区域': city['区域'],
+                '销售员': region_people[i % len(region_people)]
+            })
+
+        customers = pd.DataFrame(rows)
+        customers['状态'] = np.where(self.rng.random(len(customers)) < 0.57, '正常', '闭户')
+        # 客户采购额呈长尾分布，少数客户贡献大部分销售额
+        weights = self.rng.pareto(1.2, len(customers)) + 0.05
+        customers['权重'] = weights / weights.sum()
+        return customers
+
+    # ---------- 取值工具 ----------
+
+    def _rows(self, name: str) -> int:
+        """按规模放大后的行数"""
+        return max(1, int(round(BASE_ROWS[name] * self.scale)))
+
+    def _pick_products(self, count: int) -> pd.DataFrame:
+        return self.products.iloc[self.rng.choice(len(self.products), count, p=self.products['权重'])].reset_index(drop=True)
+
+    def _pick_customers(self, count: int) -> pd.DataFrame:
+        return self.customers.iloc[self.rng.choice(len(self.customers), count, p=self.customers['权重'])].reset_index(drop=True)
+
+    def _dates(self, count: int, start: str, end: str) -> pd.Series:
+        """在[start, end]内均匀抽取日期"""
+        days = pd.date_range(start, end, freq='D')
+        return pd.Series(days[self.rng.integers(0, len(days), count)])
+
+    def _shift_new_products(self, dates: pd.Series, products: pd.DataFrame) -> pd.Series:
+        """新品的销售日期移到当前年度内"""
+        start = pd.Timestamp(CURRENT_YEAR_START)
+        end = pd.Timestamp(HISTORY_END)
+        mask = products['新品'].to_numpy() & (dates < start).to_numpy()
+        if mask.any():
+            offsets = self.rng.integers(0, (end - start).days + 1, mask.sum())
+            dates = dates.copy()
+            dates[mask] = start + pd.to_timedelta(offsets, unit='D')
+        return dates
+
+    def _quantities(self, count: int) -> np.ndarray:
+        """箱数：中位数约15箱的长尾分布"""
+        return np.round(self.rng.lognormal(2.7, 1.0, count)).astype(int)
+
+    @staticmethod
+    def _month_range(start: str, end: str) -> List[str]:
+        return list(pd.period_range(start, end, freq='M').strftime('%Y-%m'))
+
+    # ---------- 各工作簿 ----------
+
+    def build_channel_sales_data(self) -> pd.DataFrame:
+        """TT与MT销售数据.xlsx"""
+        count = self._rows('channel_sales_data')
+        customers = self._pick_customers(count)
+        products = self._pick_products(count)
+        dates = self._dates(count, CURRENT_YEAR_START, HISTORY_END)
+        return pd.DataFrame({
+            '所属区域': customers['区域'],
+            '发运月份': dates.dt.strftime('%Y-%m'),
+            '省份': customers['省份'],
+            '城市': customers['城市'],
+            '客户代码': customers['客户代码'],
+            '客户简称': customers['客户名称'],
+            '订单类型': np.where(self.rng.random(count) < 0.1, '订单-TT产品', '订单-正常产品'),
+            '产品代码': products['产品代码'],
+            '产品名称': products['产品名称'],
+            '单价（箱）': products['单价'],
+            '求和项:数量（箱）': self._quantities(count)
+        })
+
+    def build_tt_city_data(self) -> pd.DataFrame:
+        """TT渠道-城市月度指标.xlsx（每个城市12个月的指标）"""
+        months = self._month_range('2025-01', '2025-12')
+        grid = self.cities.loc[self.cities.index.repeat(len(months))].reset_index(drop=True)
+        targets = np.round(self.rng.uniform(5000, 60000, len(grid)), -1).astype(int)
+        targets[self.rng.random(len(grid)) < 0.5] = 0
+        return pd.DataFrame({
+            '城市': grid['城市'],
+            '城市类型': grid['城市类型'],
+            '指标年月': months * len(self.cities),
+            '月度指标': targets,
+            '往年同期': 0,
+            '所属大区': grid['区域']
+        })
+
+    def build_customer_targets(self) -> pd.DataFrame:
+        """客户月度指标.xlsx / MT渠道月度指标.xlsx（每个客户36个月的指标）"""
+        months = self._month_range(*TARGET_MONTHS)
+        grid = self.customers.loc[self.customers.index.repeat(len(months))].reset_index(drop=True)
+        targets = self.rng.choice([10000.0, 20000.0, 30000.0, 50000.0, 100000.0], len(grid))
+        targets[self.rng.random(len(grid)) < 0.6] = 0.0
+        # 内置数据中有未填写的指标（读取后为浮点列）
+        targets[self.rng.integers(0, len(grid))] = np.nan
+        last_year = np.round(self.rng.lognormal(10, 1.0, len(grid)), 2)
+        last_year[self.rng.random(len(grid)) < 0.67] = 0.0
+        return pd.DataFrame({
+            '客户': grid['客户名称'],
+            '月度指标': targets,
+            '月份': months * len(self.customers),
+            '往年同期': last_year,
+            '所属大区（选择）': grid['区域']
+        })
+
+    def build_customer_status(self) -> pd.DataFrame:
+        """客户状态.xlsx"""
+        return pd.DataFrame({'客户': self.customers['客户名称'], '状态': self.customers['状态']})
+
+    def build_customer_sales(self) -> pd.DataFrame:
+        """客户月度销售达成.xlsx"""
+        count = self._rows('customer_sales')
+        customers = self._pick_customers(count)
+        dates = self._dates(count, HISTORY_START, HISTORY_END).sort_values(ignore_index=True)
+        return pd.DataFrame({
+            '订单日期': dates.dt.strftime('%Y-%m-%d'),
+            '发运月份': dates.dt.strftime('%Y-%m'),
+            '经销商名称': customers['客户名称'],
+            '求和项:金额（元）': np.round(self.rng.lognormal(10.4, 0.6, count), 1)
+        })
+
+    def build_promotion_sales(self) -> pd.DataFrame:
+        """24-25促销效果销售数据.xlsx"""
+        count = self._rows('promotion_sales')
+        customers = self._pick_customers(count)
+        products = self._pick_products(count)
+        dates = self._shift_new_products(self._dates(count, HISTORY_START, HISTORY_END), products)
+        return pd.DataFrame({
+            '发运月份': dates.dt.strftime('%Y-%m'),
+            '区域': customers['区域'],
+            '客户名称': customers['客户名称'],
+            '销售员': customers['销售员'],
+            '产品代码': products['产品代码'],
+            '产品简称': products['产品简称'],
+            '单价': products['单价'],
+            '箱数': self._quantities(count)
+        }).sort_values('发运月份', kind='stable', ignore_index=True)
+
+    def build_promotion_activities(self) -> pd.DataFrame:
+        """这是涉及到在4月份做的促销活动.xlsx（平均每个流程4行）"""
+        count = self._rows('promotion_activities')
+        customers = self._pick_customers(count)
+        products = self._pick_products(count)
+        process_ids = np.sort(self.rng.integers(0, max(1, count // 4), count))
+        applied = self._dates(count, '2025-01-02', '2025-05-27').sort_values(ignore_index=True)
+        supply_start = applied - pd.to_timedelta(self.rng.integers(0, 5, count), unit='D')
+        supply_end = supply_start + pd.to_timedelta(self.rng.choice([14, 30, 45, 60], count), unit='D')
+        quantity = self.rng.choice([20, 30, 50, 100, 200], count)
+        regions = customers['区域'].where(self.rng.random(count) >= 0.02, '全国')
+        return pd.DataFrame({
+            '申请时间': applied.dt.strftime('%Y-%m-%d'),
+            '流程编号：': [f"JXSCX-{date:%Y%m}-{pid + 1:04d}" for date, pid in zip(applied, process_ids)],
+            '所属区域': regions,
+            '经销商名称': customers['客户名称'],
+            '产品代码': products['产品代码'],
+            '促销产品名称': products['产品名称'],
+            '预计销量（箱）': quantity,
+            '预计销售额（元）': np.round(quantity * products['单价'], 2),
+            '促销开始供货时间': supply_start.dt.strftime('%Y-%m-%d'),
+            '促销结束供货时间': supply_end.dt.strftime('%Y-%m-%d')
+        })
+
+    def build_shipments(self) -> pd.DataFrame:
+        """2409~250224出货数据.xlsx"""
+        count = self._rows('shipments')
+        customers = self._pick_customers(count)
+        products = self._pick_products(count)
+        dates = self._shift_new_products(self._dates(count, HISTORY_START, HISTORY_END), products)
+        return pd.DataFrame({
+            '订单日期': dates.dt.strftime('%Y-%m-%d'),
+            '所属区域': customers['区域'],
+            '申请人': customers['销售员'],
+            '产品代码': products['产品代码'],
+            '求和项:数量（箱）': self._quantities(count)
+        }).sort_values('订单日期', kind='stable', ignore_index=True)
+
+    def build_manual_forecast(self, shipments: pd.DataFrame) -> pd.DataFrame:
+        """2409~2502人工预测.xlsx（在月度实际出货上加入预测偏差）"""
+        monthly = shipments.assign(所属年月=shipments['订单日期'].str[:7]).groupby(
+            ['所属区域', '申请人', '所属年月', '产品代码'])['求和项:数量（箱）'].sum().reset_index()
+        forecast = np.round(monthly['求和项:数量（箱）'] * self.rng.uniform(0.6, 1.6, len(monthly))).astype(int)
+        return pd.DataFrame({
+            '所属大区': monthly['所属区域'],
+            '销售员': monthly['申请人'],
+            '所属年月': monthly['所属年月'],
+            '产品代码': monthly['产品代码'],
+            '预计销售量': forecast
+        })
+
+    def build_batch_inventory(self) -> pd.DataFrame:
+        """含批次库存0221(2).xlsx - 产品标题行后跟批次行，产品之间用空行分隔"""
+        stocked = self.products.sample(frac=0.7, random_state=self.seed).sort_values('产品代码')
+        batch_count = self._rows('batch_inventory')
+        batch_products = self.rng.choice(stocked['产品代码'].to_numpy(), batch_count)
+        # 每个有库存的产品至少一个批次
+        batch_products[:len(stocked)] = stocked['产品代码'].to_numpy()[:batch_count]
+        production_dates = self._dates(batch_count, '2024-09-10', '2025-05-21')
+        quantities = np.maximum(1, np.round(self.rng.lognormal(5.3, 1.1, batch_count)))
+
+        batches = pd.DataFrame({'物料': batch_products, '生产日期': production_dates, '数量': quantities})
+        rows = []
+        serial = 75000
+        for _, product in stocked.iterrows():
+            product_batches = batches[batches['物料'] == product['产品代码']].sort_values('生产日期')
+            if product_batches.empty:
+                continue
+            on_hand = float(product_batches['数量'].sum())
+            allocated = float(self.rng.choice([0, 0, 0, 5, 10]))
+            incoming = float(self.rng.choice([0, 0, 600, 1200, 3600]))
+            rows.append({
+                '物料': product['产品代码'], '描述': product['产品名称'], '现有库存': on_hand,
+                '已分配量': allocated, '现有库存可订量': on_hand - allocated, '待入库量': incoming,
+                '本月剩余可订量': on_hand - allocated + incoming
+            })
+            for _, batch in product_batches.iterrows():
+                serial += 1
+                rows.append({
+                    '库位': 'DC-000', '生产日期': batch['生产日期'],
+                    '生产批号': f"{batch['生产日期']:%Y%m%d}L:{serial:06d}", '数量': batch['数量']
+                })
+            rows.append({})
+
+        columns = ['物料', '描述', '现有库存', '已分配量', '现有库存可订量', '待入库量', '本月剩余可订量',
+                   '库位', '生产日期', '生产批号', '数量']
+        return pd.DataFrame(rows[:-1], columns=columns)
+
+    def build_unit_price(self) -> pd.DataFrame:
+        """单价.xlsx"""
+        return self.products[['产品代码', '单价']].copy()
+
+    def build_ml_shipments(self) -> pd.DataFrame:
+        """预测模型出货数据每日xlsx.xlsx（机器学习预测页面的出货数据）"""
+        count = self._rows('ml_shipments')
+        customers = self._pick_customers(count)
+        products = self._pick_products(count)
+        dates = self._shift_new_products(self._dates(count, HISTORY_START, HISTORY_END), products)
+        return pd.DataFrame({
+            '订单日期': dates.dt.strftime('%Y-%m-%d'),
+            '所属区域': customers['区域'],
+            '客户代码': customers['客户代码'],
+            '产品代码': products['产品代码'],
+            '求和项:数量（箱）': self._quantities(count)
+        }).sort_values('订单日期', kind='stable', ignore_index=True)
+
+    def build_ml_promotions(self) -> pd.DataFrame:
+        """销售业务员促销文件.xlsx（机器学习预测页面的促销数据）"""
+        count = self._rows('ml_promotions')
+        customers = self._pick_customers(count)
+        products = self._pick_products(count)
+        applied = self._dates(count, '2024-01-02', '2025-05-27').sort_values(ignore_index=True)
+        supply_start = applied + pd.to_timedelta(1, unit='D')
+        supply_end = supply_start + pd.to_timedelta(self.rng.choice([14, 30, 60, 90], count), unit='D')
+        quantity = np.round(self.rng.lognormal(4.6, 1.3, count)).astype(float)
+        # 内置数据中约0.25%的预计销量未填写
+        quantity[self.rng.random(count) < 0.0025] = np.nan
+        return pd.DataFrame({
+            '申请时间': applied.dt.strftime('%Y-%m-%d'),
+            '经销商代码': customers['客户代码'],
+            '产品代码': products['产品代码'],
+            '促销开始供货时间': supply_start.dt.strftime('%Y-%m-%d'),
+            '促销结束供货时间': supply_end.dt.strftime('%Y-%m-%d'),
+            '预计销量（箱）': quantity,
+            '赠品数量（箱）': np.round(np.nan_to_num(quantity) * 0.05).astype(int)
+        })
+
+    def build_code_lists(self) -> Dict[str, List[str]]:
+        """产品组合分析的三个产品代码清单"""
+        codes = self.products['产品代码'].tolist()
+        new_products = self.products.loc[self.products['新品'], '产品代码'].tolist()
+        star_count = max(1, round(len(codes) * 0.15))
+        return {
+            'star_products': codes[:star_count] + new_products,
+            'new_products': new_products,
+            'dashboard_products': codes[:max(1, round(len(codes) * 0.6))] + new_products
+        }
+
+    # ---------- 输出 ----------
+
+    def build_all(self) -> Dict[str, pd.DataFrame]:
+        """生成全部工作簿（数据集名称 -> DataFrame）"""
+        shipments = self.build_shipments()
+        return {
+            'tt_city_data': self.build_tt_city_data(),
+            'channel_sales_data': self.build_channel_sales_data(),
+            'mt_data': self.build_customer_targets(),
+            'promotion_activities': self.build_promotion_activities(),
+            'promotion_sales': self.build_promotion_sales(),
+            'customer_status': self.build_customer_status(),
+            'customer_sales': self.build_customer_sales(),
+            'customer_targets': self.build_customer_targets(),
+            'shipments': shipments,
+            'manual_forecast': self.build_manual_forecast(shipments),
+            'batch_inventory': self.build_batch_inventory(),
+            'unit_price': self.build_unit_price(),
+            'ml_shipments': self.build_ml_shipments(),
+            'ml_promotions': self.build_ml_promotions(),
+        }
+
+    def generate(self, output_dir: str) -> Dict:
+        """把全部工作簿和产品代码文件写到output_dir，返回生成清单（也写入synthetic_manifest.json）"""
+        os.makedirs(output_dir, exist_ok=True)
+        start = time.perf_counter()
+        files = {}
+        file_names = {**DATASET_SOURCES, **ML_SOURCES}
+
+        for name, df in self.build_all().items():
+            path = os.path.join(output_dir, file_names[name])
+            df.to_excel(path, index=False)
+            files[name] = {'file': file_names[name], 'rows': len(df)}
+            logger.info(f"{file_names[name]}: {len(df)} 行")
+
+        for name, codes in self.build_code_lists().items():
+            with open(os.path.join(output_dir, CODE_FILES[name]), 'w', encoding='utf-8') as f:
+                f.write("\n".join(codes) + "\n")
+            files[name] = {'file': CODE_FILES[name], 'rows': len(codes)}
+
+        manifest = {
+            'params': self.params(),
+            'files': files,
+            'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'seconds': round(time.perf_counter() - start, 2)
+        }
+        with open(os.path.join(output_dir, 'synthetic_manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+
+def load_manifest(output_dir: str) -> Dict:
+    """读取已生成数据的清单，不存在时返回空字典"""
+    try:
+        with open(os.path.join(output_dir, 'synthetic_manifest.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="按内置工作簿的表结构生成合成数据")
+    parser.add_argument('-o', '--output', required=True, help="输出目录")
+    parser.add_argument('--scale', type=float, default=1.0, help="交易类工作簿的行数倍数")
+    parser.add_argument('--products', type=int, help=f"产品数（默认{BASE_ENTITIES['products']}）")
+    parser.add_argument('--customers', type=int, help=f"客户数（默认{BASE_ENTITIES['customers']}）")
+    parser.add_argument('--regions', type=int, help=f"区域数（默认{BASE_ENTITIES['regions']}）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    generator = SyntheticDataGenerator(args.scale, args.products, args.customers, args.regions, args.seed)
+    manifest = generator.generate(args.output)
+    logger.info(f"生成完成，用时 {manifest['seconds']}s -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# data_cache.py - Excel列式快照缓存模块
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+import pandas as pd
+
+# Parquet依赖pyarrow，未安装时退回pickle快照
+try:
+    import pyarrow  # noqa: F401
+
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+class SnapshotCache:
+    """Excel快照缓存类 - 每个工作簿只解析一次，之后读取列式副本"""
+
+    def __init__(self, cache_dir: str = os.path.join("data", "snapshots")):
+        self.cache_dir = cache_dir
+        self.manifest_file = os.path.join(self.cache_dir, "manifest.json")
+        self._lock = threading.Lock()
+
+    def _ensure_cache_dir(self):
+        """确保快照目录存在"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _load_manifest(self) -> Dict:
+        """读取快照清单"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def _save_manifest(self, manifest: Dict):
+        """写入快照清单（先写临时文件再替换，避免并发进程读到半截文件）"""
+        self._ensure_cache_dir()
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """计算文件内容的SHA256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _options_key(read_kwargs: Dict) -> str:
+        """把read_excel参数转成稳定的短键，不同读取参数各自一份快照"""
+        options = json.dumps(read_kwargs, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(options.encode('utf-8')).hexdigest()[:8]
+
+    def fingerprint(self, path: str) -> Dict:
+        """获取文件指纹（大小 + 修改时间 + 内容哈希）
+
+        大小和修改时间都没变时直接沿用清单里的内容哈希，避免每次都全量读文件；
+        任何一项变化才重新计算哈希。
+        """
+        stat = os.stat(path)
+        key = os.path.normpath(path)
+
+        with self._lock:
+            manifest = self._load_manifest()
+            entry = manifest.get(key)
+
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return entry
+
+            sha256 = self._hash_file(path)
+            new_entry = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': sha256,
+                'snapshots': entry.get('snapshots', []) if entry and entry['sha256'] == sha256 else []
+            }
+
+            # 内容已变化：清理旧版本快照
+            if entry and entry['sha256'] != sha256:
+                for old_snapshot in entry.get('snapshots', []):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, old_snapshot))
+                    except OSError:
+                        pass
+
+            manifest[key] = new_entry
+            self._save_manifest(manifest)
+            return new_entry
+
+    def _find_snapshot(self, sha256: str, options_key: str) -> Optional[str]:
+        """查找已有快照文件"""
+        for ext in ('.parquet', '.pkl'):
+            snapshot_path = os.path.join(self.cache_dir, f"{sha256[:16]}_{options_key}{ext}")
+            if os.path.exists(snapshot_path):
+                return snapshot_path
+        return None
+
+    def _read_snapshot(self, snapshot_path: str) -> pd.DataFrame:
+        """读取快照文件"""
+        if snapshot_path.endswith('.parquet'):
+            return pd.read_parquet(snapshot_path)
+        return pd.read_pickle(snapshot_path)
+
+    def _write_snapshot(self, df: pd.DataFrame, sha256: str, options_key: str) -> str:
+        """写入快照文件，优先Parquet，Arrow无法无损表示时退回pickle"""
+        self._ensure_cache_dir()
+        base_name = f"{sha256[:16]}_{options_key}"
+
+        if PARQUET_AVAILABLE:
+            snapshot_path = os.path.join(self.cache_dir, f"{base_name}.parquet")
+            tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+            try:
+                df.to_parquet(tmp_path, engine='pyarrow')
+                os.replace(tmp_path, snapshot_path)
+                return snapshot_path
+            except Exception:
+                # 混合类型列等情况Arrow无法转换
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        snapshot_path = os.path.join(self.cache_dir, f"{base_name}.pkl")
+        tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, snapshot_path)
+        return snapshot_path
+
+    def register_snapshot(self, key: str, snapshot_path: str):
+        """在清单中登记快照文件，便于源文件变化时清理"""
+        with self._lock:
+            manifest = self._load_manifest()
+            entry = manifest.get(key)
+            if entry is None:
+                return
+            snapshot_name = os.path.basename(snapshot_path)
+            if snapshot_name not in entry.setdefault('snapshots', []):
+                entry['snapshots'].append(snapshot_name)
+                self._save_manifest(manifest)
+
+    def snapshot_path(self, path: str, **read_kwargs) -> Optional[str]:
+        """获取源文件当前版本的快照路径，尚未生成快照时返回None"""
+        entry = self.fingerprint(path)
+        return self._find_snapshot(entry['sha256'], self._options_key(read_kwargs))
+
+    def ensure_snapshot(self, path: str, **read_kwargs) -> str:
+        """确保工作簿的快照存在并返回快照路径 - 只有源文件变化时才重新解析Excel"""
+        entry = self.fingerprint(path)
+        options_key = self._options_key(read_kwargs)
+
+        snapshot_path = self._find_snapshot(entry['sha256'], options_key)
+        if snapshot_path is None:
+            df = pd.read_excel(path, **read_kwargs)
+            snapshot_path = self._write_snapshot(df, entry['sha256'], options_key)
+            self.register_snapshot(os.path.normpath(path), snapshot_path)
+
+        return snapshot_path
+
+    def read_excel(self, path: str, **read_kwargs) -> pd.DataFrame:
+        """读取Excel文件 - 与pd.read_excel用法一致，但优先读取列式快照"""
+        entry = self.fingerprint(path)
+        options_key = self._options_key(read_kwargs)
+
+        snapshot_path = self._find_snapshot(entry['sha256'], options_key)
+        if snapshot_path is not None:
+            try:
+                return self._read_snapshot(snapshot_path)
+            except Exception:
+                # 快照损坏则重新解析
+                os.remove(snapshot_path)
+
+        df = pd.read_excel(path, **read_kwargs)
+        snapshot_path = self._write_snapshot(df, entry['sha256'], options_key)
+        self.register_snapshot(os.path.normpath(path), snapshot_path)
+        return df
+
+    def read_excel_bytes(self, content: bytes, **read_kwargs) -> pd.DataFrame:
+        """读取内存中的Excel内容（如从GitHub下载的文件） - 以内容哈希为键"""
+        sha256 = hashlib.sha256(content).hexdigest()
+        options_key = self._options_key(read_kwargs)
+
+        snapshot_path = self._find_snapshot(sha256, options_key)
+        if snapshot_path is not None:
+            try:
+                return self._read_snapshot(snapshot_path)
+            except Exception:
+                os.remove(snapshot_path)
+
+        df = pd.read_excel(io.BytesIO(content), **read_kwargs)
+        self._write_snapshot(df, sha256, options_key)
+        return df
+
+
+# 创建全局实例
+snapshot_cache = SnapshotCache()
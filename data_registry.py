@@ -0,0 +1,368 @@
+# data_registry.py - 共享数据集注册中心
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+import requests
+from pandas.api.types import is_object_dtype, is_string_dtype
+
+from data_cache import SnapshotCache, snapshot_cache
+
+# 数据集名称 -> 源文件（所有页面与自检函数统一从这里取数）
+DATASET_SOURCES = {
+    # 销售达成分析
+    'tt_city_data': 'TT渠道-城市月度指标.xlsx',
+    'channel_sales_data': 'TT与MT销售数据.xlsx',
+    'mt_data': 'MT渠道月度指标.xlsx',
+    # 产品组合分析
+    'promotion_activities': '这是涉及到在4月份做的促销活动.xlsx',
+    'promotion_sales': '24-25促销效果销售数据.xlsx',
+    # 客户依赖分析
+    'customer_status': '客户状态.xlsx',
+    'customer_sales': '客户月度销售达成.xlsx',
+    'customer_targets': '客户月度指标.xlsx',
+    # 预测库存分析
+    'shipments': '2409~250224出货数据.xlsx',
+    'manual_forecast': '2409~2502人工预测.xlsx',
+    'batch_inventory': '含批次库存0221(2).xlsx',
+    'unit_price': '单价.xlsx',
+}
+
+# 页面 -> 页面加载时读取的数据集（页面加载函数与后台预热共用）
+PAGE_DATASETS = {
+    '销售达成分析': ['tt_city_data', 'channel_sales_data', 'mt_data'],
+    '产品组合分析': ['promotion_activities', 'promotion_sales'],
+    '客户依赖分析': ['customer_status', 'customer_sales', 'customer_targets'],
+    '预测库存分析': ['shipments', 'manual_forecast', 'batch_inventory', 'unit_price'],
+}
+
+# 机器学习预测页面直接从GitHub读取的数据源
+REMOTE_SOURCES = {
+    'ml_shipments': "https://raw.githubusercontent.com/CIRA18-HUB/sales_dashboard/refs/heads/main/%E9%A2%84%E6%B5%8B%E6%A8%A1%E5%9E%8B%E5%87%BA%E8%B4%A7%E6%95%B0%E6%8D%AE%E6%AF%8F%E6%97%A5xlsx.xlsx",
+    'ml_promotions': "https://raw.githubusercontent.com/CIRA18-HUB/sales_dashboard/refs/heads/main/%E9%94%80%E5%94%AE%E4%B8%9A%E5%8A%A1%E5%91%98%E4%BF%83%E9%94%80%E6%96%87%E4%BB%B6.xlsx",
+}
+
+# 远程文件下载结果的复用时长（秒）
+REMOTE_MAX_AGE = 3600
+
+# 高基数中文字符串键列 -> 共享字典名（同一字典下的列在所有数据集中编码一致，跨页面合并时保持对齐）
+CATEGORICAL_KEYS = {
+    '产品代码': '产品代码',
+    '经销商名称': '经销商名称',
+    '客户名称': '客户名称',
+    '申请人': '申请人',
+    '所属区域': '区域',
+    '区域': '区域',
+    '产品简称': '产品简称',
+}
+
+
+def worker_count(task_count: int) -> int:
+    """进程池大小：不超过任务数和可用CPU数"""
+    try:
+        cpu_count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_count = os.cpu_count() or 1
+    return max(1, min(task_count, cpu_count))
+
+
+def _build_snapshot(path: str, cache_dir: str) -> Dict:
+    """子进程任务：解析单个工作簿并写入快照，返回快照路径与耗时"""
+    start = time.perf_counter()
+    snapshot_file = SnapshotCache(cache_dir).ensure_snapshot(path)
+    return {'snapshot': snapshot_file, 'seconds': time.perf_counter() - start}
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    """计算数据集实际占用的内存字节数（含字符串对象本身）"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+class CategoryDictionary:
+    """共享分类字典类 - 每个键只有一份按值排序的类别表
+
+    类别保持排序，分类列的排序结果与原字符串列一致。
+    """
+
+    def __init__(self, keys: Dict[str, str] = None):
+        self.keys = dict(CATEGORICAL_KEYS if keys is None else keys)
+        self._categories = {}
+
+    def dictionary_for(self, column: str) -> Optional[str]:
+        """获取列对应的字典名，不需要编码的列返回None"""
+        return self.keys.get(column)
+
+    def update(self, dictionary: str, values) -> bool:
+        """把新值并入字典，返回字典是否发生变化"""
+        existing = self._categories.get(dictionary, pd.Index([], dtype=object))
+        new_values = pd.Index(pd.unique(pd.Series(values).dropna())).difference(existing, sort=False)
+        if len(new_values) == 0:
+            return False
+        merged = list(existing) + list(new_values)
+        self._categories[dictionary] = pd.Index(sorted(merged, key=str), dtype=object)
+        return True
+
+    def categories(self, dictionary: str) -> pd.Index:
+        """获取字典的当前类别表"""
+        return self._categories.get(dictionary, pd.Index([], dtype=object))
+
+    def dtype(self, dictionary: str) -> pd.CategoricalDtype:
+        """获取字典对应的分类类型"""
+        return pd.CategoricalDtype(self.categories(dictionary))
+
+    def encode(self, df: pd.DataFrame) -> List[str]:
+        """把数据集中的键列原地转换为共享分类列，返回本次有变化的字典名"""
+        changed = []
+        for column in df.columns:
+            dictionary = self.dictionary_for(column)
+            if dictionary is None:
+                continue
+            series = df[column]
+            if not (is_object_dtype(series) or is_string_dtype(series) or
+                    isinstance(series.dtype, pd.CategoricalDtype)):
+                continue
+            if self.update(dictionary, series.unique()) and dictionary not in changed:
+                changed.append(dictionary)
+            df[column] = series.astype(self.dtype(dictionary))
+        return changed
+
+    def clear(self):
+        """清空所有字典"""
+        self._categories.clear()
+
+
+class DatasetRegistry:
+    """数据集注册中心类 - 每个工作簿在每个服务进程内只解析一次
+
+    所有页面拿到的是同一份底层数据的浅拷贝：增加、替换列或原地修改数据都只影响调用方自己，
+    注册中心持有的原始数据不会被修改，因此在页面之间切换时内存保持平稳。
+    原地修改的隔离依赖pandas的写时复制（copy_on_write），由各入口（登录页、预计算和基准测试命令）启动时开启。
+    CATEGORICAL_KEYS中的键列在入库时转换为共享字典的分类列，字典变化时已加载的数据集同步重编码。
+    """
+
+    def __init__(self, sources: Dict[str, str] = None, cache=snapshot_cache, categorical: bool = True):
+        self.sources = dict(sources or DATASET_SOURCES)
+        self.cache = cache
+        self.categorical = categorical
+        self.dictionaries = CategoryDictionary()
+        self._frames = {}
+        self._versions = {}
+        self._memory = {}
+        self._remote = {}
+        self._lock = threading.RLock()
+        self.last_load_report = {}
+        self._load_reports = {}
+
+    def source_file(self, name: str) -> str:
+        """获取数据集对应的源文件"""
+        if name not in self.sources:
+            raise KeyError(f"未注册的数据集: {name}")
+        return self.sources[name]
+
+    def version(self, name: str) -> str:
+        """获取数据集的版本号（源文件内容哈希前12位），源文件缺失时返回'missing'"""
+        try:
+            return self.cache.fingerprint(self.source_file(name))['sha256'][:12]
+        except FileNotFoundError:
+            return 'missing'
+
+    def version_token(self, *names: str) -> str:
+        """获取多个数据集的组合版本号，用作页面缓存键"""
+        names = names or tuple(sorted(self.sources))
+        combined = "|".join(f"{name}:{self.version(name)}" for name in names)
+        return hashlib.sha256(combined.encode('utf-8')).hexdigest()[:16]
+
+    def get(self, name: str) -> pd.DataFrame:
+        """获取数据集 - 源文件未变化时直接返回进程内共享的数据"""
+        current_version = self.version(name)
+
+        with self._lock:
+            if self._versions.get(name) != current_version:
+                self._frames[name] = self._ingest(name, self.cache.read_excel(self.source_file(name)))
+                self._versions[name] = current_version
+
+            return self._frames[name].copy(deep=False)
+
+    def _ingest(self, name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """入库处理：键列转换为共享分类列，并记录转换前后的内存占用"""
+        before_bytes = _frame_bytes(df)
+        if self.categorical:
+            changed = self.dictionaries.encode(df)
+            if changed:
+                self._recode_loaded(changed, exclude=name)
+        after_bytes = _frame_bytes(df)
+
+        self._memory[name] = {
+            'rows': len(df),
+            'columns': [column for column in df.columns if self.dictionaries.dictionary_for(column)
+                        and isinstance(df[column].dtype, pd.CategoricalDtype)],
+            'before_bytes': before_bytes,
+            'after_bytes': after_bytes,
+            'saved_ratio': round(1 - after_bytes / before_bytes, 4) if before_bytes else 0.0
+        }
+        return df
+
+    def _recode_loaded(self, dictionaries: List[str], exclude: str):
+        """字典新增类别后，把已加载数据集的相关列切换到新类别表（编码随之更新，值不变）"""
+        for name, df in self._frames.items():
+            if name == exclude:
+                continue
+            recoded = None
+            for column in df.columns:
+                dictionary = self.dictionaries.dictionary_for(column)
+                if dictionary in dictionaries and isinstance(df[column].dtype, pd.CategoricalDtype):
+                    if recoded is None:
+                        # 替换列而不是原地修改，已经交给页面的浅拷贝不受影响
+                        recoded = df.copy(deep=False)
+                    recoded[column] = df[column].cat.set_categories(self.dictionaries.categories(dictionary))
+            if recoded is not None:
+                self._frames[name] = recoded
+
+    def _pending_parse(self, names: List[str]) -> List[str]:
+        """找出需要重新解析Excel的数据集（进程内未加载且磁盘上没有当前版本快照）"""
+        pending = []
+        for name in names:
+            if self._versions.get(name) == self.version(name):
+                continue
+            try:
+                if self.cache.snapshot_path(self.source_file(name)) is None:
+                    pending.append(name)
+            except FileNotFoundError:
+                # 源文件缺失交给get()抛出，与单个读取的行为一致
+                continue
+        return pending
+
+    def _parse_in_pool(self, names: List[str]) -> Dict[str, float]:
+        """在进程池中并行解析多个工作簿，返回各数据集的解析耗时"""
+        workers = worker_count(len(names))
+        parse_seconds = {}
+        try:
+            # 使用spawn避免在多线程的Streamlit服务进程中fork
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                futures = {
+                    name: executor.submit(_build_snapshot, self.source_file(name), self.cache.cache_dir)
+                    for name in names
+                }
+                for name, future in futures.items():
+                    result = future.result()
+                    parse_seconds[name] = result['seconds']
+                    # 子进程并发写清单可能互相覆盖，由主进程统一补登记快照
+                    self.cache.register_snapshot(os.path.normpath(self.source_file(name)), result['snapshot'])
+        except Exception:
+            # 进程池不可用时退回串行解析（由get()完成）
+            return {}
+        return parse_seconds
+
+    def get_many(self, names: List[str], parallel: bool = True) -> Dict[str, pd.DataFrame]:
+        """批量获取数据集 - 多个工作簿需要解析时在进程池中并行解析
+
+        冷启动耗时取决于最大的文件而不是所有文件之和，耗时明细记录在last_load_report中。
+        """
+        start = time.perf_counter()
+        pending = self._pending_parse(names)
+        parse_seconds = {}
+        workers = 1
+
+        # 单核环境下进程池只会增加开销，直接串行解析
+        if parallel and worker_count(len(pending)) > 1:
+            parse_seconds = self._parse_in_pool(pending)
+            if parse_seconds:
+                workers = worker_count(len(pending))
+
+        frames = {}
+        dataset_report = {}
+        for name in names:
+            read_start = time.perf_counter()
+            was_loaded = self._versions.get(name) == self.version(name)
+            rows = len(self.get(name))
+            read_seconds = time.perf_counter() - read_start
+
+            if was_loaded:
+                source = 'memory'
+            elif name in parse_seconds:
+                source = 'excel(并行)'
+            elif name in pending:
+                source = 'excel'
+            else:
+                source = 'snapshot'
+
+            memory = self._memory.get(name, {})
+            dataset_report[name] = {
+                'source': source,
+                'rows': rows,
+                'seconds': round(parse_seconds.get(name, 0.0) + read_seconds, 3),
+                'before_bytes': memory.get('before_bytes', 0),
+                'after_bytes': memory.get('after_bytes', 0)
+            }
+
+        # 全部加载完再统一取数，后加载的数据集扩充了字典时，先加载的数据集也已切换到同一类别表
+        with self._lock:
+            for name in names:
+                frames[name] = self._frames[name].copy(deep=False)
+
+        wall_seconds = time.perf_counter() - start
+        serial_seconds = sum(item['seconds'] for item in dataset_report.values())
+        self.last_load_report = {
+            'datasets': dataset_report,
+            'workers': workers,
+            'wall_seconds': round(wall_seconds, 3),
+            'serial_seconds': round(serial_seconds, 3),
+            'speedup': round(serial_seconds / wall_seconds, 2) if wall_seconds > 0 else 1.0
+        }
+        self._load_reports[tuple(names)] = self.last_load_report
+        return frames
+
+    def load_report(self, names: List[str]) -> Dict:
+        """获取某组数据集最近一次批量加载的耗时报告"""
+        return self._load_reports.get(tuple(names), {})
+
+    def memory_report(self, names: List[str] = None) -> Dict[str, Dict]:
+        """获取数据集分类编码前后的内存占用（字节），未指定时返回所有已加载的数据集"""
+        with self._lock:
+            names = names or list(self._memory)
+            return {name: dict(self._memory[name]) for name in names if name in self._memory}
+
+    def fetch_remote(self, url: str, timeout: int = 30) -> requests.Response:
+        """下载远程工作簿 - REMOTE_MAX_AGE秒内复用上次成功下载的响应，失败的响应不缓存"""
+        with self._lock:
+            cached = self._remote.get(url)
+        if cached and time.time() - cached[0] < REMOTE_MAX_AGE:
+            return cached[1]
+
+        response = requests.get(url, timeout=timeout)
+        if response.status_code == 200:
+            with self._lock:
+                self._remote[url] = (time.time(), response)
+        return response
+
+    def is_loaded(self, name: str) -> bool:
+        """检查数据集是否已加载到当前进程"""
+        return name in self._frames
+
+    def loaded_datasets(self) -> Dict[str, str]:
+        """获取已加载的数据集及其版本号"""
+        with self._lock:
+            return dict(self._versions)
+
+    def invalidate(self, name: str = None):
+        """清除进程内缓存（不删除磁盘快照）"""
+        with self._lock:
+            if name is None:
+                self._frames.clear()
+                self._versions.clear()
+                self._memory.clear()
+                self.dictionaries.clear()
+            else:
+                self._frames.pop(name, None)
+                self._versions.pop(name, None)
+                self._memory.pop(name, None)
+
+
+# 创建全局实例
+dataset_registry = DatasetRegistry()
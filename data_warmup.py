@@ -0,0 +1,128 @@
+# data_warmup.py - 后台数据预热模块
+import threading
+import time
+from typing import Callable, Dict, List
+
+from data_cache import snapshot_cache
+from data_registry import PAGE_DATASETS, REMOTE_SOURCES, dataset_registry
+
+
+class DataWarmup:
+    """后台数据预热类 - 登录页渲染时在后台线程中预先加载各页面的数据
+
+    预热分三类步骤：本地工作簿（解析并编码后放入注册中心）、远程工作簿（下载并生成快照）、
+    预聚合（通过register_step登记的计算函数）。每个进程只预热一次，源文件变化后再次调用start()会重新预热。
+    """
+
+    def __init__(self, registry=dataset_registry, page_datasets: Dict[str, List[str]] = None,
+                 remote_sources: Dict[str, str] = None):
+        self.registry = registry
+        self.page_datasets = dict(PAGE_DATASETS if page_datasets is None else page_datasets)
+        self.remote_sources = dict(REMOTE_SOURCES if remote_sources is None else remote_sources)
+        self._aggregate_steps = []
+        self._steps = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self._version_token = None
+        self.started_at = None
+        self.finished_at = None
+
+    def register_step(self, page: str, name: str, func: Callable[[], object]):
+        """登记预聚合步骤，在所有数据加载完成后按登记顺序执行（同名步骤只登记一次）"""
+        with self._lock:
+            if any(step['page'] == page and step['name'] == name for step in self._aggregate_steps):
+                return
+            self._aggregate_steps.append({'page': page, 'name': name, 'func': func})
+
+    def _build_steps(self) -> List[Dict]:
+        """生成本轮预热的步骤列表"""
+        steps = []
+        for page, names in self.page_datasets.items():
+            steps.append({
+                'page': page, 'name': f"加载{page}数据", 'kind': 'datasets',
+                'func': lambda names=names: self.registry.get_many(names)
+            })
+        for name, url in self.remote_sources.items():
+            steps.append({
+                'page': '机器学习预测', 'name': f"下载{name}", 'kind': 'remote',
+                'func': lambda url=url: self._prefetch_remote(url)
+            })
+        for step in self._aggregate_steps:
+            steps.append({**step, 'kind': 'aggregate'})
+
+        for step in steps:
+            step.update({'status': 'pending', 'seconds': None, 'error': None})
+        return steps
+
+    def _prefetch_remote(self, url: str):
+        """下载远程工作簿并生成快照，页面稍后读取时直接命中"""
+        response = self.registry.fetch_remote(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        snapshot_cache.read_excel_bytes(response.content)
+
+    def _run(self):
+        """后台线程主体：依次执行各步骤，单个步骤失败不影响其他步骤"""
+        for step in self._steps:
+            step['status'] = 'running'
+            start = time.perf_counter()
+            try:
+                step['func']()
+                step['status'] = 'done'
+            except Exception as e:
+                step['status'] = 'failed'
+                step['error'] = str(e)
+            step['seconds'] = round(time.perf_counter() - start, 2)
+        self.finished_at = time.time()
+
+    def start(self) -> bool:
+        """启动后台预热（可重复调用），返回本次是否真正启动了新一轮预热"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+
+            version_token = self.registry.version_token()
+            if self._thread is not None and version_token == self._version_token:
+                return False
+
+            self._version_token = version_token
+            self._steps = self._build_steps()
+            self.started_at = time.time()
+            self.finished_at = None
+            self._thread = threading.Thread(target=self._run, name='data-warmup', daemon=True)
+            self._thread.start()
+            return True
+
+    def progress(self) -> Dict:
+        """获取预热进度"""
+        steps = [{key: step[key] for key in ('page', 'name', 'kind', 'status', 'seconds', 'error')}
+                 for step in self._steps]
+        finished = [step for step in steps if step['status'] in ('done', 'failed')]
+        running = [step for step in steps if step['status'] == 'running']
+
+        if self.started_at is None:
+            status = 'idle'
+        elif self.finished_at is None:
+            status = 'running'
+        else:
+            status = 'done'
+
+        end_time = self.finished_at or time.time()
+        return {
+            'status': status,
+            'completed': len(finished),
+            'total': len(steps),
+            'percent': len(finished) / len(steps) if steps else 0.0,
+            'current': running[0]['name'] if running else '',
+            'failed': [step for step in steps if step['status'] == 'failed'],
+            'elapsed': round(end_time - self.started_at, 1) if self.started_at else 0.0,
+            'steps': steps
+        }
+
+    def is_warm(self) -> bool:
+        """检查预热是否已完成"""
+        return self.progress()['status'] == 'done'
+
+
+# 创建全局实例
+data_warmup = DataWarmup()
@@ -7,6 +7,9 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 from datetime import datetime
 import warnings
+from analytics.dashboards import dashboard_version, load_dashboard
+from perf_monitor import perf_monitor
+from perf_panel import render_perf_panel
 
 warnings.filterwarnings('ignore')
 
@@ -423,170 +426,21 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# 缓存数据加载函数
+# 缓存看板数据加载函数
 @st.cache_data
-def load_data():
-    """加载所有数据文件"""
+@perf_monitor.profile()
+def load_dashboard_data(data_version):
+    """加载销售达成看板的预计算结果 - data_version为看板版本号，源文件变化时缓存自动失效"""
     try:
-        # 从GitHub根目录加载文件
-        tt_city_data = pd.read_excel("TT渠道-城市月度指标.xlsx")
-        sales_data = pd.read_excel("TT与MT销售数据.xlsx")
-        mt_data = pd.read_excel("MT渠道月度指标.xlsx")
-
-        # 数据预处理
-        # TT城市数据
-        tt_city_data['指标年月'] = pd.to_datetime(tt_city_data['指标年月'])
-        tt_city_data['月度指标'] = pd.to_numeric(tt_city_data['月度指标'], errors='coerce').fillna(0)
-        tt_city_data['往年同期'] = pd.to_numeric(tt_city_data['往年同期'], errors='coerce').fillna(0)
-
-        # 销售数据
-        sales_data['发运月份'] = pd.to_datetime(sales_data['发运月份'])
-        sales_data['单价（箱）'] = pd.to_numeric(sales_data['单价（箱）'], errors='coerce').fillna(0)
-        sales_data['求和项:数量（箱）'] = pd.to_numeric(sales_data['求和项:数量（箱）'], errors='coerce').fillna(0)
-        sales_data['销售额'] = sales_data['单价（箱）'] * sales_data['求和项:数量（箱）']
-
-        # 区分渠道类型 - 增加文本清理功能
-        def identify_channel(order_type):
-            if pd.isna(order_type):
-                return 'Other'
-
-            # 转换为字符串并清理文本
-            order_type_str = str(order_type)
-            # 去除前后空格、换行符、制表符等
-            order_type_str = order_type_str.strip()
-            # 去除所有空格（包括中间的）
-            order_type_clean = order_type_str.replace(' ', '').replace('\t', '').replace('\n', '').replace('\r', '')
-            # 统一转为大写进行匹配
-            order_type_upper = order_type_clean.upper()
-
-            # 判断渠道类型
-            if 'TT' in order_type_upper:
-                return 'TT'
-            elif 'MT' in order_type_upper or '正常' in order_type_str:
-                return 'MT'
-            else:
-                # 调试信息：记录被归类为Other的订单类型
-                if order_type_str and order_type_str != 'nan':
-                    print(f"警告：无法识别的订单类型: '{order_type_str}' (长度:{len(order_type_str)})")
-                return 'Other'
-
-        sales_data['渠道类型'] = sales_data['订单类型'].apply(identify_channel)
-
-        # 添加数据验证 - 检查渠道分类结果
-        channel_counts = sales_data['渠道类型'].value_counts()
-        print("渠道分类统计:")
-        print(channel_counts)
-
-        # 检查是否有大量数据被分类为Other
-        if 'Other' in channel_counts and channel_counts['Other'] > 0:
-            print(f"\n注意：有 {channel_counts['Other']} 条记录被分类为 'Other' 渠道")
-            # 显示前5条Other类型的订单类型样本
-            other_samples = sales_data[sales_data['渠道类型'] == 'Other']['订单类型'].head(5)
-            print("Other渠道订单类型样本:")
-            for idx, sample in enumerate(other_samples):
-                print(f"  {idx + 1}. '{sample}' (类型: {type(sample)})")
-
-        # MT数据
-        mt_data['月份'] = pd.to_datetime(mt_data['月份'])
-        mt_data['月度指标'] = pd.to_numeric(mt_data['月度指标'], errors='coerce').fillna(0)
-        mt_data['往年同期'] = pd.to_numeric(mt_data['往年同期'], errors='coerce').fillna(0)
-
-        return {
-            'tt_city_data': tt_city_data,
-            'sales_data': sales_data,
-            'mt_data': mt_data
-        }
+        return load_dashboard('sales', data_version)
     except Exception as e:
         st.error(f"数据加载错误: {str(e)}")
         return None
 
 
-@st.cache_data
-def validate_channel_data(data):
-    """验证渠道数据分类的准确性"""
-    sales_data = data['sales_data']
-
-    # 统计各渠道2025年的销售额
-    current_year = 2025
-    validation_results = {}
-
-    for channel in ['TT', 'MT', 'Other']:
-        channel_sales = sales_data[
-            (sales_data['渠道类型'] == channel) &
-            (sales_data['发运月份'].dt.year == current_year)
-            ]['销售额'].sum()
-
-        channel_count = len(sales_data[
-                                (sales_data['渠道类型'] == channel) &
-                                (sales_data['发运月份'].dt.year == current_year)
-                                ])
-
-        validation_results[channel] = {
-            '销售额': channel_sales,
-            '订单数': channel_count,
-            '平均单价': channel_sales / channel_count if channel_count > 0 else 0
-        }
-
-    return validation_results
-# 计算总体指标
-def calculate_overview_metrics(data):
-    """计算销售达成总览的各项指标"""
-    tt_city_data = data['tt_city_data']
-    sales_data = data['sales_data']
-    mt_data = data['mt_data']
-
-    current_year = 2025
-
-    # 计算TT渠道指标
-    tt_sales = sales_data[
-        (sales_data['渠道类型'] == 'TT') &
-        (sales_data['发运月份'].dt.year == current_year)
-        ]['销售额'].sum()
-
-    tt_target = tt_city_data[
-        tt_city_data['指标年月'].dt.year == current_year
-        ]['月度指标'].sum()
-
-    tt_achievement = (tt_sales / tt_target * 100) if tt_target > 0 else 0
-
-    # 计算MT渠道指标
-    mt_sales = sales_data[
-        (sales_data['渠道类型'] == 'MT') &
-        (sales_data['发运月份'].dt.year == current_year)
-        ]['销售额'].sum()
-
-    mt_target = mt_data[
-        mt_data['月份'].dt.year == current_year
-        ]['月度指标'].sum()
-
-    mt_achievement = (mt_sales / mt_target * 100) if mt_target > 0 else 0
-
-    # 计算总体指标
-    total_sales = tt_sales + mt_sales
-    total_target = tt_target + mt_target
-    total_achievement = (total_sales / total_target * 100) if total_target > 0 else 0
-
-    # 计算渠道占比
-    tt_ratio = (tt_sales / total_sales * 100) if total_sales > 0 else 0
-    mt_ratio = (mt_sales / total_sales * 100) if total_sales > 0 else 0
-
-    return {
-        'total_sales': total_sales,
-        'total_target': total_target,
-        'total_achievement': total_achievement,
-        'tt_sales': tt_sales,
-        'tt_target': tt_target,
-        'tt_achievement': tt_achievement,
-        'tt_ratio': tt_ratio,
-        'mt_sales': mt_sales,
-        'mt_target': mt_target,
-        'mt_achievement': mt_achievement,
-        'mt_ratio': mt_ratio
-    }
-
-
 # 创建综合分析图 - MT渠道
 @st.cache_data
+@perf_monitor.profile()
 def create_mt_comprehensive_analysis(data):
     """创建MT渠道综合分析图"""
     sales_data = data['sales_data']
@@ -724,7 +578,7 @@ def create_mt_comprehensive_analysis(data):
     )
 
     # 2. 区域销售分布
-    regional_data = sales_data[sales_data['渠道类型'] == 'MT'].groupby('所属区域')['销售额'].sum().sort_values(
+    regional_data = sales_data[sales_data['渠道类型'] == 'MT'].groupby('所属区域', observed=True)['销售额'].sum().sort_values(
         ascending=True)
 
     fig.add_trace(
@@ -954,6 +808,7 @@ def create_mt_comprehensive_analysis(data):
 
 # 创建综合分析图 - TT渠道 (修复版本)
 @st.cache_data
+@perf_monitor.profile()
 def create_tt_comprehensive_analysis(data):
     """创建TT渠道综合分析图"""
     sales_data = data['sales_data']
@@ -1091,7 +946,7 @@ def create_tt_comprehensive_analysis(data):
     )
 
     # 2. 区域销售分布
-    regional_data = sales_data[sales_data['渠道类型'] == 'TT'].groupby('所属区域')['销售额'].sum().sort_values(
+    regional_data = sales_data[sales_data['渠道类型'] == 'TT'].groupby('所属区域', observed=True)['销售额'].sum().sort_values(
         ascending=True)
 
     fig.add_trace(
@@ -1335,6 +1190,7 @@ def create_tt_comprehensive_analysis(data):
 
 # 创建全渠道综合分析图
 @st.cache_data
+@perf_monitor.profile()
 def create_all_channel_comprehensive_analysis(data):
     """创建全渠道综合分析图"""
     sales_data = data['sales_data']
@@ -1559,7 +1415,7 @@ def create_all_channel_comprehensive_analysis(data):
     )
 
     # 3. 区域渠道分布
-    regional_channel = sales_data.groupby(['所属区域', '渠道类型'])['销售额'].sum().unstack(fill_value=0)
+    regional_channel = sales_data.groupby(['所属区域', '渠道类型'], observed=True)['销售额'].sum().unstack(fill_value=0)
     if 'TT' in regional_channel.columns:
         fig.add_trace(
             go.Bar(
@@ -1725,6 +1581,9 @@ def main():
         st.error("🚫 请先登录系统")
         st.stop()
 
+    # 性能监控面板（仅管理员可见）
+    render_perf_panel('销售达成分析')
+
     # 主页面内容
     st.markdown("""
     <div class="main-header">
@@ -1733,24 +1592,17 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
-    # 加载数据
+    # 加载数据（优先读取预计算结果）
     with st.spinner('正在加载数据...'):
-        data = load_data()
+        dashboard = load_dashboard_data(dashboard_version('sales'))
 
-    if data is None:
+    if dashboard is None:
         return
 
-        # 加载数据
-        with st.spinner('正在加载数据...'):
-            data = load_data()
-
-        if data is None:
-            return
-
         # 新增：数据验证（仅在开发模式下显示）
         if st.sidebar.checkbox('显示数据验证信息', value=False):
             st.sidebar.subheader('渠道数据验证')
-            validation = validate_channel_data(data)
+            validation = dashboard['channel_validation']
 
             for channel, info in validation.items():
                 st.sidebar.write(f"**{channel}渠道**")
@@ -1759,8 +1611,10 @@ def main():
                 st.sidebar.write(f"- 平均单价: ¥{info['平均单价']:.2f}")
                 st.sidebar.write("---")
 
-    # 计算总体指标
-    metrics = calculate_overview_metrics(data)
+    data = dashboard['data']
+
+    # 总体指标
+    metrics = dashboard['overview_metrics']
 
     # 创建标签页
     tab_names = [
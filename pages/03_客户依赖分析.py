@@ -2,13 +2,18 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import warnings
 import json
 import time
+from analytics.customer import CUSTOMER_DATASETS, format_amount
+from analytics.dashboards import dashboard_version, load_dashboard
+from data_registry import dataset_registry
+from perf_monitor import perf_monitor
+from perf_panel import render_perf_panel
 
 warnings.filterwarnings('ignore')
 
@@ -43,6 +48,9 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
     st.switch_page("app.py")
     st.stop()
 
+# 性能监控面板（仅管理员可见）
+render_perf_panel('客户依赖分析')
+
 # 统一高级CSS样式
 st.markdown("""
 <style>
@@ -509,89 +517,17 @@ st.markdown("""
 
 # 数据加载函数
 @st.cache_data(ttl=3600)
-def load_and_process_data():
-    """加载并处理客户数据 - 调试版本"""
+@perf_monitor.profile()
+def load_dashboard_data(data_version, as_of):
+    """加载客户依赖看板的预计算结果 - data_version为看板版本号（含基准日期），源文件或基准日期变化时缓存自动失效"""
     try:
-        customer_status = pd.read_excel("客户状态.xlsx")
-        customer_status.columns = ['客户名称', '状态']
-
-        sales_data = pd.read_excel("客户月度销售达成.xlsx")
-        sales_data.columns = ['订单日期', '发运月份', '经销商名称', '金额']
-
-        # 添加详细调试信息
-        print(f"=== 原始数据调试信息 ===")
-        print(f"数据总行数: {len(sales_data)}")
-        print(f"数据字段: {sales_data.columns.tolist()}")
-        print(f"前5行数据:")
-        print(sales_data.head())
-        print(f"发运月份字段类型: {sales_data['发运月份'].dtype}")
-        print(f"发运月份样例: {sales_data['发运月份'].head()}")
-        print(f"金额字段类型: {sales_data['金额'].dtype}")
-        print(f"金额样例: {sales_data['金额'].head()}")
-
-        # 处理金额字段 - 更严格的清理
-        print(f"=== 处理金额字段 ===")
-        # 先转换为字符串，移除所有可能的分隔符
-        sales_data['金额_原始'] = sales_data['金额'].copy()  # 保存原始值用于调试
-        sales_data['金额'] = sales_data['金额'].astype(str).str.replace(',', '').str.replace('，', '').str.replace(' ',
-                                                                                                                  '')
-
-        # 转换为数值类型
-        sales_data['金额'] = pd.to_numeric(sales_data['金额'], errors='coerce')
-
-        # 检查转换结果
-        print(f"金额转换后的空值数量: {sales_data['金额'].isna().sum()}")
-        print(f"金额转换后的总和: {sales_data['金额'].sum():,.0f}")
-
-        # 填充空值为0
-        sales_data['金额'] = sales_data['金额'].fillna(0)
-
-        # 处理日期字段
-        print(f"=== 处理日期字段 ===")
-        sales_data['订单日期'] = pd.to_datetime(sales_data['订单日期'], errors='coerce')
-
-        # 关键修复：更严格的发运月份处理
-        if sales_data['发运月份'].dtype == 'object':
-            # 如果是字符串类型，先尝试解析
-            print("发运月份是字符串类型，尝试解析...")
-            sales_data['发运月份'] = pd.to_datetime(sales_data['发运月份'], errors='coerce')
-        else:
-            # 如果已经是datetime类型，直接使用
-            print("发运月份已是datetime类型")
-            sales_data['发运月份'] = pd.to_datetime(sales_data['发运月份'], errors='coerce')
-
-        print(f"发运月份处理后的空值数量: {sales_data['发运月份'].isna().sum()}")
-        print(f"发运月份范围: {sales_data['发运月份'].min()} 到 {sales_data['发运月份'].max()}")
-
-        # 检查数据完整性
-        valid_data = sales_data.dropna(subset=['发运月份', '金额'])
-        print(f"有效数据行数: {len(valid_data)}")
-        print(f"有效数据金额总和: {valid_data['金额'].sum():,.0f}")
-
-        # 按年份分组查看数据分布
-        print(f"=== 按发运年份统计 ===")
-        sales_data['发运年份'] = sales_data['发运月份'].dt.year
-        yearly_stats = sales_data.groupby('发运年份')['金额'].agg(['count', 'sum']).reset_index()
-        print("年份分布:")
-        print(yearly_stats)
-
-        monthly_data = pd.read_excel("客户月度指标.xlsx")
-        monthly_data.columns = ['客户', '月度指标', '月份', '往年同期', '所属大区']
-
-        current_year = datetime.now().year
-        print(f"当前年份: {current_year}")
-
-        metrics = calculate_metrics(customer_status, sales_data, monthly_data, current_year)
-
-        return metrics, customer_status, sales_data, monthly_data
-
+        return load_dashboard('customer', data_version, as_of=as_of)
     except Exception as e:
         st.error(f"数据加载错误: {e}")
-        import traceback
-        print(f"详细错误信息: {traceback.format_exc()}")
-        return None, None, None, None
+        return None
 
 
+@perf_monitor.profile()
 def create_integrated_trend_analysis(sales_data, monthly_data, selected_region='全国'):
     """创建整合的趋势分析图表 - 修改为按发运月份统计"""
     # 获取区域数据
@@ -637,7 +573,7 @@ def create_integrated_trend_analysis(sales_data, monthly_data, selected_region='
     distribution.columns = ['金额区间', '订单数', '销售额', '平均金额']
 
     # 客户分析 - 按发运月份
-    customer_monthly = region_sales.groupby(['年月', '经销商名称'])['金额'].sum().reset_index()
+    customer_monthly = region_sales.groupby(['年月', '经销商名称'], observed=True)['金额'].sum().reset_index()
     active_customers = customer_monthly.groupby('年月')['经销商名称'].nunique().reset_index()
     active_customers.columns = ['年月', '活跃客户数']
 
@@ -863,495 +799,8 @@ def create_integrated_trend_analysis(sales_data, monthly_data, selected_region='
     return fig
 
 
-def calculate_metrics(customer_status, sales_data, monthly_data, current_year):
-    """计算业务指标 - 彻底修复目标达成率计算逻辑"""
-
-    print(f"=== calculate_metrics 调试信息 ===")
-    print(f"输入参数 - current_year: {current_year}")
-    print(f"销售数据总记录数: {len(sales_data)}")
-
-    # 基础客户指标
-    total_customers = len(customer_status)
-    normal_customers = len(customer_status[customer_status['状态'] == '正常'])
-    closed_customers = len(customer_status[customer_status['状态'] == '闭户'])
-    normal_rate = (normal_customers / total_customers * 100) if total_customers > 0 else 0
-
-    # 按发运月份筛选当前年度销售数据
-    print(f"=== 筛选当前年度数据 ===")
-
-    # 确保发运月份是datetime类型
-    if sales_data['发运月份'].dtype != 'datetime64[ns]':
-        sales_data['发运月份'] = pd.to_datetime(sales_data['发运月份'], errors='coerce')
-
-    # 移除发运月份为空的行
-    sales_data_clean = sales_data.dropna(subset=['发运月份']).copy()
-    print(f"清理后数据行数: {len(sales_data_clean)}")
-
-    # 按发运月份筛选当前年度销售数据
-    current_year_sales = sales_data_clean[sales_data_clean['发运月份'].dt.year == current_year].copy()
-    print(f"{current_year}年发运销售记录数: {len(current_year_sales)}")
-
-    if len(current_year_sales) == 0:
-        print(f"警告：{current_year}年没有发运数据")
-        all_years = sales_data_clean['发运月份'].dt.year.unique()
-        print(f"数据中包含的年份: {sorted(all_years)}")
-
-        if len(all_years) > 0:
-            latest_year = max(all_years)
-            print(f"使用最新年份 {latest_year} 的数据")
-            current_year_sales = sales_data_clean[sales_data_clean['发运月份'].dt.year == latest_year].copy()
-            current_year = latest_year
-
-    # 确保金额字段正确处理
-    if '金额' in current_year_sales.columns:
-        current_year_sales['金额'] = pd.to_numeric(
-            current_year_sales['金额'].astype(str).str.replace(',', '').str.replace('，', ''),
-            errors='coerce'
-        ).fillna(0)
-
-    total_sales = current_year_sales['金额'].sum()
-    print(f"按发运月份计算的{current_year}年总销售额: {total_sales:,.0f}")
-
-    # 同比增长
-    last_year_total = monthly_data['往年同期'].sum() if '往年同期' in monthly_data.columns else 0
-    growth_rate = ((total_sales - last_year_total) / last_year_total * 100) if last_year_total > 0 else 0
-
-    # 计算时间进度（仅用于显示）
-    from datetime import datetime, date
-    current_date = datetime.now().date()
-    year_start = date(current_year, 1, 1)
-    year_end = date(current_year, 12, 31)
-    total_days_in_year = (year_end - year_start).days + 1
-    days_passed = (current_date - year_start).days + 1
-    time_progress = min(days_passed / total_days_in_year, 1.0)
-
-    print(f"年度进度: {days_passed}/{total_days_in_year}天 ({time_progress * 100:.1f}%)")
-
-    # ===== 关键修复：目标达成分析 - 严格按年度目标计算 =====
-    target_growth_factor = 1.1
-    customer_region_map = monthly_data[
-        ['客户', '所属大区']].drop_duplicates() if '所属大区' in monthly_data.columns else pd.DataFrame()
-    customer_actual_sales = current_year_sales.groupby('经销商名称')['金额'].sum()
-
-    # 计算年度目标
-    customer_annual_targets = {}
-    total_historical_target = monthly_data['月度指标'].sum() if '月度指标' in monthly_data.columns else 0
-
-    for customer in customer_actual_sales.index:
-        historical_sales = 0
-        if '往年同期' in monthly_data.columns:
-            historical_sales = monthly_data[monthly_data['客户'] == customer]['往年同期'].sum()
-
-        if historical_sales > 0:
-            estimated_annual_target = historical_sales * target_growth_factor
-        else:
-            avg_target = total_historical_target / len(monthly_data['客户'].unique()) if len(
-                monthly_data['客户'].unique()) > 0 else 500000
-            estimated_annual_target = avg_target * target_growth_factor
-
-        customer_annual_targets[customer] = estimated_annual_target
-
-    # ===== 彻底修复：目标达成分析 - 严格按年度目标计算，不考虑时间进度 =====
-    achieved_customers = 0
-    total_target_customers = len(customer_annual_targets)
-    customer_achievement_details = []
-
-    print(f"=== 目标达成分析（严格按年度目标）===")
-    print(f"需要评估的客户数: {total_target_customers}")
-
-    for customer, annual_target in customer_annual_targets.items():
-        actual_sales = customer_actual_sales.get(customer, 0)
-
-        if annual_target > 0:
-            # 关键修复：严格按年度目标计算达成率，完全不考虑时间进度
-            achievement_rate = (actual_sales / annual_target * 100)
-
-            # 达成标准：实际销售额达到年度目标的80%即视为达成
-            is_achieved = actual_sales >= (annual_target * 0.8)
-            if is_achieved:
-                achieved_customers += 1
-
-            # 关键修复：确保存储的是基于年度目标的正确达成率
-            customer_achievement_details.append({
-                '客户': customer,
-                '年度目标': annual_target,  # 存储年度目标
-                '实际': actual_sales,  # 存储实际销售额
-                '达成率': achievement_rate,  # 关键：这里存储的是基于年度目标的达成率
-                '状态': '达成' if is_achieved else '未达成',
-                '时间进度': time_progress * 100  # 仅用于显示，不影响计算
-            })
-
-    target_achievement_rate = (achieved_customers / total_target_customers * 100) if total_target_customers > 0 else 0
-
-    print(f"目标达成客户数: {achieved_customers}/{total_target_customers}")
-    print(f"目标达成率: {target_achievement_rate:.1f}%")
-
-    # 验证达成率计算
-    if customer_achievement_details:
-        print(f"=== 验证达成率计算 ===")
-        for i in range(min(3, len(customer_achievement_details))):
-            detail = customer_achievement_details[i]
-            manual_rate = (detail['实际'] / detail['年度目标'] * 100)
-            print(f"客户: {detail['客户']}")
-            print(f"  年度目标: {detail['年度目标']:,.0f}")
-            print(f"  实际销售: {detail['实际']:,.0f}")
-            print(f"  存储达成率: {detail['达成率']:.1f}%")
-            print(f"  手工计算: {manual_rate:.1f}%")
-            print(f"  计算正确: {abs(detail['达成率'] - manual_rate) < 0.01}")
-
-    # 区域风险分析
-    sales_with_region = pd.DataFrame()
-    if not customer_region_map.empty:
-        sales_with_region = current_year_sales.merge(
-            customer_region_map, left_on='经销商名称', right_on='客户', how='left'
-        )
-
-    region_details = []
-    max_dependency = 0
-    max_dependency_region = ""
-
-    if not sales_with_region.empty and '所属大区' in sales_with_region.columns:
-        for region, group in sales_with_region.groupby('所属大区'):
-            if pd.notna(region):
-                customer_sales = group.groupby('经销商名称')['金额'].sum().sort_values(ascending=False)
-                if len(customer_sales) > 0:
-                    max_customer_sales = customer_sales.max()
-                    total_region_sales = customer_sales.sum()
-                    dependency = (max_customer_sales / total_region_sales * 100) if total_region_sales > 0 else 0
-
-                    if dependency > max_dependency:
-                        max_dependency = dependency
-                        max_dependency_region = region
-
-                    region_details.append({
-                        '区域': region,
-                        '总销售额': total_region_sales,
-                        '客户数': len(customer_sales),
-                        '最大客户依赖度': dependency,
-                        '最大客户': customer_sales.index[0] if len(customer_sales) > 0 else '',
-                        '最大客户销售额': max_customer_sales
-                    })
-
-    region_stats = pd.DataFrame(region_details) if region_details else pd.DataFrame()
-
-    # RFM客户分析
-    current_date_dt = datetime.now()
-    customer_rfm = []
-
-    for customer in customer_actual_sales.index:
-        customer_orders = current_year_sales[current_year_sales['经销商名称'] == customer]
-        if len(customer_orders) > 0:
-            last_order_date = customer_orders['发运月份'].max()
-            recency = (current_date_dt - last_order_date).days
-            frequency = len(customer_orders)
-            monetary = customer_orders['金额'].sum()
-
-            if recency <= 30 and frequency >= 12 and monetary >= 1000000:
-                customer_type = '钻石客户'
-            elif recency <= 60 and frequency >= 8 and monetary >= 500000:
-                customer_type = '黄金客户'
-            elif recency <= 90 and frequency >= 6 and monetary >= 200000:
-                customer_type = '白银客户'
-            elif recency > 180 or frequency < 3:
-                customer_type = '流失风险'
-            else:
-                customer_type = '潜力客户'
-
-            customer_rfm.append({
-                '客户': customer, 'R': recency, 'F': frequency, 'M': monetary,
-                '类型': customer_type, '最近购买': last_order_date.strftime('%Y-%m-%d')
-            })
-
-    rfm_df = pd.DataFrame(customer_rfm) if customer_rfm else pd.DataFrame()
-
-    # 客户类型统计
-    if not rfm_df.empty:
-        customer_type_counts = rfm_df['类型'].value_counts()
-        diamond_customers = customer_type_counts.get('钻石客户', 0)
-        gold_customers = customer_type_counts.get('黄金客户', 0)
-        silver_customers = customer_type_counts.get('白银客户', 0)
-        risk_customers = customer_type_counts.get('流失风险', 0)
-        potential_customers = customer_type_counts.get('潜力客户', 0)
-    else:
-        diamond_customers = gold_customers = silver_customers = risk_customers = potential_customers = 0
-
-    high_value_rate = ((diamond_customers + gold_customers) / normal_customers * 100) if normal_customers > 0 else 0
-
-    # 客户集中度
-    concentration_rate = 0
-    if len(customer_actual_sales) > 0:
-        sorted_sales = customer_actual_sales.sort_values(ascending=False)
-        top20_count = max(1, int(len(sorted_sales) * 0.2))
-        top20_sales = sorted_sales.head(top20_count).sum()
-        concentration_rate = (top20_sales / total_sales * 100) if total_sales > 0 else 0
-
-    print(f"=== 最终计算结果 ===")
-    print(f"总销售额: {total_sales:,.0f}")
-    print(f"正常客户数: {normal_customers}")
-    print(f"目标达成率: {target_achievement_rate:.1f}%")
-
-    return {
-        'total_sales': total_sales, 'normal_customers': normal_customers, 'closed_customers': closed_customers,
-        'normal_rate': normal_rate, 'growth_rate': growth_rate,
-        'region_stats': region_stats, 'max_dependency': max_dependency, 'max_dependency_region': max_dependency_region,
-        'target_achievement_rate': target_achievement_rate, 'achieved_customers': achieved_customers,
-        'total_target_customers': total_target_customers,
-        'diamond_customers': diamond_customers, 'gold_customers': gold_customers, 'silver_customers': silver_customers,
-        'potential_customers': potential_customers, 'risk_customers': risk_customers,
-        'high_value_rate': high_value_rate,
-        'current_year': current_year, 'rfm_df': rfm_df, 'concentration_rate': concentration_rate,
-        'customer_achievement_details': pd.DataFrame(
-            customer_achievement_details) if customer_achievement_details else pd.DataFrame(),
-        'sales_with_region': sales_with_region,
-        'total_customers': total_customers,
-        'time_progress': time_progress * 100,
-        'days_passed': days_passed,
-        'total_days_in_year': total_days_in_year,
-        'target_calculation_method': '严格按年度目标计算，不考虑时间进度'
-    }
-
-
-def format_amount(amount):
-    """格式化金额"""
-    if amount >= 100000000:
-        return f"¥{amount / 100000000:.1f}亿"
-    elif amount >= 10000:
-        return f"¥{amount / 10000:.0f}万"
-    else:
-        return f"¥{amount:,.0f}"
-
-
-def calculate_customer_cycles(sales_data, current_year):
-    """计算客户下单周期和异常行为"""
-    # 获取最近12个月的数据
-    end_date = sales_data['订单日期'].max()
-    start_date = end_date - timedelta(days=365)
-    recent_data = sales_data[sales_data['订单日期'] >= start_date].copy()
-
-    # 计算每个客户的订单间隔
-    customer_cycles = []
-
-    for customer in recent_data['经销商名称'].unique():
-        customer_orders = recent_data[recent_data['经销商名称'] == customer].sort_values('订单日期')
-
-        if len(customer_orders) < 2:
-            continue
-
-        # 计算订单间隔
-        order_dates = customer_orders['订单日期'].tolist()
-        intervals = []
-        order_details = []
-
-        for i in range(1, len(order_dates)):
-            interval = (order_dates[i] - order_dates[i - 1]).days
-            intervals.append(interval)
-
-            order_details.append({
-                '日期': order_dates[i - 1],
-                '下一单日期': order_dates[i],
-                '间隔天数': interval,
-                '金额': customer_orders.iloc[i - 1]['金额']
-            })
-
-        # 添加最后一个订单
-        last_order = customer_orders.iloc[-1]
-        days_since_last = (end_date - order_dates[-1]).days
-        order_details.append({
-            '日期': order_dates[-1],
-            '下一单日期': None,
-            '间隔天数': days_since_last,
-            '金额': last_order['金额'],
-            '距今天数': days_since_last
-        })
-
-        if intervals:
-            avg_interval = np.mean(intervals)
-            std_interval = np.std(intervals) if len(intervals) > 1 else 0
-
-            # 预测下次订单时间
-            predicted_date = order_dates[-1] + timedelta(days=int(avg_interval))
-
-            customer_cycles.append({
-                '客户': customer,
-                '总销售额': customer_orders['金额'].sum(),
-                '订单次数': len(customer_orders),
-                '平均间隔': avg_interval,
-                '间隔标准差': std_interval,
-                '最后订单日期': order_dates[-1],
-                '距今天数': days_since_last,
-                '预测下单日期': predicted_date,
-                '订单详情': order_details,
-                '异常状态': '正常' if days_since_last <= avg_interval * 1.5 else
-                '轻度异常' if days_since_last <= avg_interval * 2 else '严重异常'
-            })
-
-    # 按总销售额排序，获取Top 20
-    cycles_df = pd.DataFrame(customer_cycles)
-    if not cycles_df.empty:
-        cycles_df = cycles_df.nlargest(20, '总销售额')  # 保持Top 20
-
-    return cycles_df
-
-
-def calculate_risk_prediction(sales_data, current_date=None):
-    """计算客户风险预测模型"""
-    if current_date is None:
-        current_date = datetime.now()
-
-    # 获取最近12个月的数据用于建模
-    model_end_date = sales_data['订单日期'].max()
-    model_start_date = model_end_date - timedelta(days=365)
-    model_data = sales_data[sales_data['订单日期'] >= model_start_date].copy()
-
-    risk_predictions = []
-
-    for customer in model_data['经销商名称'].unique():
-        customer_orders = model_data[model_data['经销商名称'] == customer].sort_values('订单日期')
-
-        if len(customer_orders) < 3:  # 需要至少3个订单才能建模
-            continue
-
-        # 计算历史特征
-        order_dates = customer_orders['订单日期'].tolist()
-        order_amounts = customer_orders['金额'].tolist()
-
-        # 计算间隔
-        intervals = []
-        for i in range(1, len(order_dates)):
-            intervals.append((order_dates[i] - order_dates[i - 1]).days)
-
-        # 基础统计
-        avg_interval = np.mean(intervals)
-        std_interval = np.std(intervals) if len(intervals) > 1 else avg_interval * 0.2
-        avg_amount = np.mean(order_amounts)
-        std_amount = np.std(order_amounts) if len(order_amounts) > 1 else avg_amount * 0.2
-
-        # 计算趋势
-        if len(intervals) >= 3:
-            # 间隔趋势（是否在拉长）
-            recent_intervals = intervals[-3:]
-            interval_trend = (recent_intervals[-1] - recent_intervals[0]) / max(recent_intervals[0], 1)
-        else:
-            interval_trend = 0
-
-        if len(order_amounts) >= 3:
-            # 金额趋势（是否在下降）
-            recent_amounts = order_amounts[-3:]
-            amount_trend = (recent_amounts[-1] - recent_amounts[0]) / max(recent_amounts[0], 1)
-        else:
-            amount_trend = 0
-
-        # 当前状态
-        last_order_date = order_dates[-1]
-        days_since_last = (current_date - last_order_date).days
-        last_amount = order_amounts[-1]
-
-        # 风险评分计算
-        # 1. 断单风险
-        if days_since_last > avg_interval:
-            # 使用正态分布计算超期概率
-            z_score = (days_since_last - avg_interval) / max(std_interval, 1)
-            # 基础断单概率
-            disconnect_risk_base = min(0.99, 1 / (1 + np.exp(-z_score)))
-            # 考虑趋势调整
-            disconnect_risk = disconnect_risk_base * (1 + interval_trend * 0.3)
-        else:
-            # 预测未来30天的断单风险
-            future_days = days_since_last + 30
-            z_score = (future_days - avg_interval) / max(std_interval, 1)
-            disconnect_risk = min(0.99, 1 / (1 + np.exp(-z_score + 1)))
-
-        # 2. 减量风险
-        if last_amount < avg_amount * 0.7:
-            amount_z_score = (avg_amount - last_amount) / max(std_amount, 1)
-            reduction_risk_base = min(0.99, 1 / (1 + np.exp(-amount_z_score)))
-            reduction_risk = reduction_risk_base * (1 - amount_trend * 0.3)
-        else:
-            reduction_risk = max(0.1, 0.3 + amount_trend * 0.5) if amount_trend < 0 else 0.1
-
-        # 3. 综合流失风险
-        # 权重：断单风险60%，减量风险40%
-        churn_risk = disconnect_risk * 0.6 + reduction_risk * 0.4
-
-        # 调整因子
-        # 如果是老客户（订单数>10），降低风险
-        if len(customer_orders) > 10:
-            churn_risk *= 0.8
-
-        # 如果最近有大额订单，降低风险
-        if last_amount > avg_amount * 1.5:
-            churn_risk *= 0.7
-
-        # 确定风险等级
-        if churn_risk >= 0.8:
-            risk_level = '高风险'
-            risk_color = '#e74c3c'
-        elif churn_risk >= 0.5:
-            risk_level = '中风险'
-            risk_color = '#f39c12'
-        elif churn_risk >= 0.2:
-            risk_level = '低风险'
-            risk_color = '#f1c40f'
-        else:
-            risk_level = '安全'
-            risk_color = '#27ae60'
-
-        # 确定主要风险类型
-        if disconnect_risk > reduction_risk * 1.5:
-            main_risk_type = '断单风险'
-        elif reduction_risk > disconnect_risk * 1.5:
-            main_risk_type = '减量风险'
-        else:
-            main_risk_type = '综合风险'
-
-        # 生成行动建议
-        if churn_risk >= 0.8:
-            if days_since_last > avg_interval * 1.5:
-                action = '立即电话联系，了解是否有问题'
-            else:
-                action = '密切关注，准备主动联系'
-        elif churn_risk >= 0.5:
-            action = '定期回访，了解需求变化'
-        else:
-            action = '常规维护'
-
-        # 预测下次订单
-        predicted_next_order = last_order_date + timedelta(days=int(avg_interval))
-        predicted_amount = avg_amount * (1 + amount_trend * 0.2)
-
-        # 计算置信区间
-        confidence_interval = std_interval / max(avg_interval, 1) * 100
-
-        risk_predictions.append({
-            '客户': customer,
-            '流失风险概率': churn_risk * 100,
-            '断单风险': disconnect_risk * 100,
-            '减量风险': reduction_risk * 100,
-            '置信区间': min(20, confidence_interval),
-            '风险等级': risk_level,
-            '风险颜色': risk_color,
-            '主要风险': main_risk_type,
-            '最后订单日期': last_order_date,
-            '距今天数': days_since_last,
-            '平均周期': avg_interval,
-            '平均金额': avg_amount,
-            '最后金额': last_amount,
-            '建议行动': action,
-            '预测下单日期': predicted_next_order,
-            '预测金额': predicted_amount,
-            '历史订单数': len(customer_orders),
-            '金额趋势': '下降' if amount_trend < -0.1 else '上升' if amount_trend > 0.1 else '稳定',
-            '周期趋势': '延长' if interval_trend > 0.1 else '缩短' if interval_trend < -0.1 else '稳定'
-        })
-
-    # 转换为DataFrame并排序
-    risk_df = pd.DataFrame(risk_predictions)
-    if not risk_df.empty:
-        risk_df = risk_df.sort_values('流失风险概率', ascending=False)
-
-    return risk_df
-
 
+@perf_monitor.profile()
 def create_risk_dashboard(risk_df):
     """创建风险仪表盘"""
     # 1. 风险分布图（增强悬停信息）
@@ -1550,9 +999,11 @@ def create_risk_dashboard(risk_df):
     return fig_dist, fig_hist, fig_matrix
 
 
-def create_timeline_chart(cycles_df):
-    """创建美化的客户下单时间轴图表"""
+@perf_monitor.profile()
+def create_timeline_chart(cycles_df, as_of):
+    """创建美化的客户下单时间轴图表（as_of为分析基准日期，用于标记"今天"）"""
     fig = go.Figure()
+    current_date = datetime.combine(as_of, datetime.min.time())
 
     # 设置颜色方案
     color_scale = {
@@ -1676,7 +1127,7 @@ def create_timeline_chart(cycles_df):
         ))
 
         # 添加预测点
-        if customer_data['预测下单日期'] > datetime.now():
+        if customer_data['预测下单日期'] > current_date:
             fig.add_trace(go.Scatter(
                 x=[customer_data['预测下单日期']],
                 y=[y_position],
@@ -1714,8 +1165,8 @@ def create_timeline_chart(cycles_df):
         type="rect",
         xref="x",
         yref="paper",
-        x0=datetime.now() - timedelta(days=30),
-        x1=datetime.now() + timedelta(days=30),
+        x0=current_date - timedelta(days=30),
+        x1=current_date + timedelta(days=30),
         y0=0,
         y1=1,
         fillcolor="rgba(102, 126, 234, 0.05)",
@@ -1724,7 +1175,6 @@ def create_timeline_chart(cycles_df):
     )
 
     # 添加今日标记线
-    current_date = datetime.now()
     fig.add_shape(
         type="line",
         x0=current_date,
@@ -1812,6 +1262,7 @@ def create_timeline_chart(cycles_df):
     return fig
 
 
+@perf_monitor.profile()
 def create_enhanced_charts(metrics, sales_data, monthly_data):
     """创建增强图表 - 修复目标达成散点图"""
     global ECHARTS_AVAILABLE  # 声明使用全局变量
@@ -2201,6 +1652,7 @@ def create_enhanced_charts(metrics, sales_data, monthly_data):
     return charts
 
 
+@perf_monitor.profile()
 def create_enhanced_trend_analysis(sales_data, monthly_data, selected_region='全国'):
     """创建增强的趋势分析图表"""
     # 获取区域数据
@@ -2362,14 +1814,32 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
-    # 加载数据
+    # 加载数据（优先读取预计算结果）：风险预测和客户分层以分析基准日期为准，基准日期包含在版本号中
+    as_of = st.sidebar.date_input("📅 分析基准日期", value=date.today(), max_value=date.today(),
+                                  key="customer_as_of",
+                                  help="年度进度、客户分层和流失风险预测都以该日期为准，选择过去的日期可回放当时的状态")
     with st.spinner('正在加载数据...'):
-        metrics, customer_status, sales_data, monthly_data = load_and_process_data()
+        dashboard = load_dashboard_data(dashboard_version('customer', as_of), as_of)
 
-    if metrics is None:
+    if dashboard is None:
         st.error("❌ 数据加载失败，请检查数据文件。")
         return
 
+    metrics = dashboard['metrics']
+    customer_status = dashboard['customer_status']
+    sales_data = dashboard['sales_data']
+    monthly_data = dashboard['monthly_data']
+
+    # 数据加载耗时报告
+    load_report = dataset_registry.load_report(CUSTOMER_DATASETS)
+    if load_report:
+        with st.sidebar.expander("⏱️ 数据加载耗时", expanded=False):
+            st.caption(f"实际耗时 {load_report['wall_seconds']}s / 串行累计 {load_report['serial_seconds']}s "
+                       f"(加速 {load_report['speedup']}x，{load_report['workers']}个进程)")
+            for name, item in load_report['datasets'].items():
+                st.write(f"- {name}: {item['seconds']}s ({item['source']}，{item['rows']:,}行，"
+                         f"内存 {item['before_bytes'] / 1024 / 1024:.1f}MB → {item['after_bytes'] / 1024 / 1024:.1f}MB)")
+
     # 创建图表
     charts = create_enhanced_charts(metrics, sales_data, monthly_data)
 
@@ -2661,13 +2131,13 @@ def main():
             </div>
             ''', unsafe_allow_html=True)
 
-            # 计算客户周期数据
+            # 客户周期数据（预计算结果）
             if sales_data is not None and not sales_data.empty:
-                cycles_df = calculate_customer_cycles(sales_data, metrics['current_year'])
+                cycles_df = dashboard['customer_cycles']
 
                 if not cycles_df.empty:
                     # 显示时间轴图表
-                    timeline_fig = create_timeline_chart(cycles_df)
+                    timeline_fig = create_timeline_chart(cycles_df, dashboard['as_of'])
                     st.plotly_chart(timeline_fig, use_container_width=True, key="timeline_chart")
 
                     # 添加提示信息
@@ -2687,8 +2157,8 @@ def main():
             ''', unsafe_allow_html=True)
 
             if sales_data is not None and not sales_data.empty:
-                # 计算风险预测
-                risk_df = calculate_risk_prediction(sales_data)
+                # 风险预测（预计算结果）
+                risk_df = dashboard['risk_prediction']
 
                 if not risk_df.empty:
                     # 创建风险仪表盘
@@ -5,459 +5,17 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
-from datetime import datetime, timedelta
+from datetime import date, datetime
 import warnings
 import time
-
-
-# 在 import 部分后面新增这个类
-# 在 import 部分后面新增这个完整的类
-class BatchLevelInventoryAnalyzer:
-    """批次级别库存分析器 - 完整移植自积压超详细.py - 修复模拟数据问题"""
-
-    def __init__(self):
-        # 风险参数设置
-        self.high_stock_days = 90
-        self.medium_stock_days = 60
-        self.low_stock_days = 30
-        self.high_volatility_threshold = 1.0
-        self.medium_volatility_threshold = 0.8
-        self.high_forecast_bias_threshold = 0.3
-        self.medium_forecast_bias_threshold = 0.15
-        self.high_clearance_days = 90
-        self.medium_clearance_days = 60
-        self.low_clearance_days = 30
-        self.min_daily_sales = 0.5
-        self.min_seasonal_index = 0.3
-
-        # 默认区域和责任人
-        self.default_regions = ['东', '南', '西', '北', '中']
-        self.default_region = '东'
-        self.default_person = '系统管理员'
-
-        # 责任归属分析权重参数
-        self.forecast_accuracy_weight = 0.25
-        self.recent_sales_weight = 0.30
-        self.ordering_history_weight = 0.25
-        self.market_performance_weight = 0.20
-
-        # 新增：跨月销售权重配置
-        self.cross_month_weights = {
-            0: 1.0,  # 当月销售100%计入履行率
-            1: 0.7,  # 次月销售70%计入履行率
-            2: 0.4  # 第三月销售40%计入履行率
-        }
-
-        # 新增：产品生命周期配置
-        self.product_lifecycle_config = {
-            "新品期": {"months_range": (0, 6), "tolerance": 0.5, "weight": 0.6},
-            "成长期": {"months_range": (6, 24), "tolerance": 0.7, "weight": 1.0},
-            "成熟期": {"months_range": (24, 60), "tolerance": 0.85, "weight": 1.2},
-            "衰退期": {"months_range": (60, 999), "tolerance": 0.6, "weight": 0.8}
-        }
-
-    def calculate_risk_percentage(self, days_to_clear, batch_age, target_days):
-        """计算风险百分比"""
-        import math
-
-        if batch_age >= target_days:
-            return 100.0
-
-        if days_to_clear == float('inf'):
-            return 100.0
-
-        if days_to_clear >= 3 * target_days:
-            return 100.0
-
-        # 计算基于清库天数的风险
-        clearance_ratio = days_to_clear / target_days
-        clearance_risk = 100 / (1 + math.exp(-4 * (clearance_ratio - 1)))
-
-        # 计算基于库龄的风险
-        age_risk = 100 * batch_age / target_days
-
-        # 组合风险
-        combined_risk = 0.8 * max(clearance_risk, age_risk) + 0.2 * min(clearance_risk, age_risk)
-
-        if days_to_clear > target_days:
-            combined_risk = max(combined_risk, 80)
-
-        if days_to_clear >= 2 * target_days:
-            combined_risk = max(combined_risk, 90)
-
-        if batch_age >= 0.75 * target_days:
-            combined_risk = max(combined_risk, 75)
-
-        return min(100, round(combined_risk, 1))
-
-    def calculate_forecast_bias(self, forecast_quantity, actual_sales):
-        """计算预测偏差"""
-        import math
-
-        if actual_sales == 0 and forecast_quantity == 0:
-            return 0.0
-        elif actual_sales == 0:
-            return min(math.sqrt(forecast_quantity) / max(forecast_quantity, 1), 1.0)
-        elif forecast_quantity == 0:
-            return -min(math.sqrt(actual_sales) / max(actual_sales, 1), 1.0)
-        else:
-            if forecast_quantity > actual_sales:
-                normalized_error = (forecast_quantity - actual_sales) / actual_sales
-                return min(math.tanh(normalized_error), 1.0)
-            else:
-                normalized_error = (actual_sales - forecast_quantity) / forecast_quantity
-                return -min(math.tanh(normalized_error), 1.0)
-
-    def get_staff_status(self, person_name):
-        """获取人员状态 - 新增方法"""
-        # 这里可以从数据库或配置文件读取，暂时用默认逻辑
-        # 实际部署时可以连接HR系统
-        if person_name == self.default_person:
-            return {"status": "系统", "replacement": None}
-
-        # 默认假设所有人员都在职，实际可以从HR系统获取
-        return {"status": "在职", "replacement": None}
-
-    def get_product_lifecycle_stage(self, product_code, current_date):
-        """获取产品生命周期阶段 - 新增方法"""
-        # 这里应该从产品管理系统获取产品上市时间
-        # 暂时用简化逻辑，实际部署时需要连接产品管理系统
-
-        # 简化处理：根据产品代码特征判断（实际应该查数据库）
-        if hasattr(product_code, 'startswith'):
-            if product_code.startswith('F2024'):
-                months_since_launch = 3  # 假设2024年产品是新品
-            elif product_code.startswith('F2023'):
-                months_since_launch = 12  # 2023年产品进入成长期
-            elif product_code.startswith('F2022'):
-                months_since_launch = 24  # 2022年产品进入成熟期
-            else:
-                months_since_launch = 60  # 更早产品进入衰退期
-        else:
-            months_since_launch = 24  # 默认成熟期
-
-        # 确定生命周期阶段
-        for stage, config in self.product_lifecycle_config.items():
-            min_months, max_months = config["months_range"]
-            if min_months <= months_since_launch < max_months:
-                return stage, config
-
-        return "成熟期", self.product_lifecycle_config["成熟期"]
-
-    def calculate_cross_month_sales(self, shipment_df, product_code, person_name, target_month):
-        """计算跨月销售数据 - 新增方法"""
-        if shipment_df is None or shipment_df.empty:
-            return 0, {}
-
-        # 计算目标月份及后续2个月的销售
-        target_period = pd.Period(target_month, freq='M')
-        monthly_sales = {}
-        total_weighted_sales = 0
-
-        for month_offset in range(3):  # 当月及后续2个月
-            check_period = target_period + month_offset
-
-            # 筛选该月该人该产品的销售数据
-            month_sales = shipment_df[
-                (shipment_df['产品代码'] == product_code) &
-                (shipment_df['申请人'] == person_name) &
-                (shipment_df['订单日期'].dt.to_period('M') == check_period)
-                ]
-
-            month_total = month_sales['数量'].sum() if not month_sales.empty else 0
-            monthly_sales[str(check_period)] = month_total
-
-            # 应用权重计算
-            weight = self.cross_month_weights.get(month_offset, 0)
-            total_weighted_sales += month_total * weight
-
-        return total_weighted_sales, monthly_sales
-
-    def analyze_responsibility_collaborative(self, product_code, batch_date, product_sales_metrics,
-                                             forecast_info, orders_history, batch_qty=0,
-                                             sales_person_region_mapping=None, shipment_df=None):
-        """改进的责任归属分析 - 使用真实销售数据替换模拟数据"""
-        today = datetime.now().date()
-        batch_date = batch_date.date() if hasattr(batch_date, 'date') else batch_date
-
-        # 默认责任映射
-        default_mapping = {"region": self.default_region, "person": self.default_person}
-
-        if sales_person_region_mapping is None:
-            sales_person_region_mapping = {}
-
-        # 1. 获取批次生产月份
-        batch_month = pd.Period(batch_date, freq='M')
-
-        # 2. 初始化责任评分系统
-        person_scores = {}
-        region_scores = {}
-        responsibility_details = {}
-
-        # 3. 预测与实际销售差异分析 (60%) - 使用真实数据
-        forecast_sales_discrepancy_weight = 0.60
-        forecast_responsibility_details = {}
-
-        # 获取产品生命周期信息
-        lifecycle_stage, lifecycle_config = self.get_product_lifecycle_stage(product_code, today)
-
-        if forecast_info and 'person_forecast' in forecast_info and shipment_df is not None:
-            person_forecast_totals = forecast_info['person_forecast']
-            total_forecast = sum(person_forecast_totals.values())
-
-            # 🔧 核心修复：使用真实销售数据替代模拟数据
-            person_sales = {}
-            person_sales_details = {}
-
-            for person in person_forecast_totals.keys():
-                # 获取人员状态
-                staff_status = self.get_staff_status(person)
-
-                # 计算跨月销售（当月+后续2月的加权销售）
-                weighted_sales, monthly_breakdown = self.calculate_cross_month_sales(
-                    shipment_df, product_code, person, batch_month
-                )
-
-                person_sales[person] = weighted_sales
-                person_sales_details[person] = {
-                    "monthly_breakdown": monthly_breakdown,
-                    "weighted_total": weighted_sales,
-                    "staff_status": staff_status,
-                    "lifecycle_stage": lifecycle_stage
-                }
-
-            # 计算整体履行率
-            overall_fulfillment_rate = sum(person_sales.values()) / total_forecast if total_forecast > 0 else 1.0
-
-            responsibility_details["overall_analysis"] = {
-                "total_forecast": total_forecast,
-                "total_sales": sum(person_sales.values()),
-                "fulfillment_rate": overall_fulfillment_rate,
-                "batch_month": str(batch_month),
-                "lifecycle_stage": lifecycle_stage,
-                "lifecycle_tolerance": lifecycle_config["tolerance"]
-            }
-
-            # 应用生命周期容忍度
-            adjusted_threshold = 0.8 * lifecycle_config["tolerance"]
-
-            if overall_fulfillment_rate < adjusted_threshold:
-                for person, forecast_qty in person_forecast_totals.items():
-                    forecast_proportion = forecast_qty / total_forecast
-                    actual_sales = person_sales.get(person, 0)
-                    fulfillment_rate = actual_sales / forecast_qty if forecast_qty > 0 else 1.0
-
-                    # 应用生命周期权重调整
-                    lifecycle_weight = lifecycle_config["weight"]
-                    base_score = (1 - fulfillment_rate) * forecast_proportion * lifecycle_weight
-
-                    if forecast_proportion > 0.5:
-                        adjusted_score = base_score * (2.0 if fulfillment_rate < 0.6 else 1.5)
-                    elif forecast_proportion > 0.2:
-                        adjusted_score = base_score * (1.5 if fulfillment_rate < 0.6 else 1.2)
-                    else:
-                        adjusted_score = base_score * 1.0
-
-                    final_score = adjusted_score * forecast_sales_discrepancy_weight
-                    person_scores[person] = person_scores.get(person, 0) + final_score
-
-                    person_region = sales_person_region_mapping.get(person, default_mapping["region"])
-                    region_scores[person_region] = region_scores.get(person_region, 0) + (final_score * 0.8)
-
-                    forecast_responsibility_details[person] = {
-                        "forecast_quantity": forecast_qty,
-                        "forecast_proportion": forecast_proportion,
-                        "actual_sales": actual_sales,
-                        "fulfillment_rate": fulfillment_rate,
-                        "responsibility_score": final_score,
-                        "lifecycle_adjustment": lifecycle_weight,
-                        "sales_details": person_sales_details.get(person, {}),
-                        "staff_status": self.get_staff_status(person)
-                    }
-
-        responsibility_details["forecast_responsibility"] = forecast_responsibility_details
-
-        # 4. 库存责任分配机制（保持原有逻辑）
-        person_allocations = {}
-        if forecast_responsibility_details and batch_qty > 0:
-            forecast_deltas = {}
-            total_delta = 0
-
-            for person, details in forecast_responsibility_details.items():
-                forecast_qty = details.get("forecast_quantity", 0)
-                actual_sales = details.get("actual_sales", 0)
-                delta = max(0, forecast_qty - actual_sales)
-
-                if delta > 0:
-                    forecast_deltas[person] = delta
-                    total_delta += delta
-
-            if total_delta > 0:
-                allocated_total = 0
-                for person, delta in forecast_deltas.items():
-                    proportion = delta / total_delta
-                    allocation = int(batch_qty * proportion)
-                    allocation = max(1, allocation)
-                    allocation = min(allocation, batch_qty - allocated_total)
-
-                    person_allocations[person] = allocation
-                    allocated_total += allocation
-
-                remaining_qty = batch_qty - allocated_total
-                if remaining_qty > 0 and forecast_deltas:
-                    sorted_forecast_persons = sorted(forecast_deltas.items(), key=lambda x: x[1], reverse=True)
-                    person_allocations[sorted_forecast_persons[0][0]] += remaining_qty
-            else:
-                person_allocations[default_mapping["person"]] = batch_qty
-        else:
-            person_allocations[default_mapping["person"]] = batch_qty
-
-        # 5. 确定责任人（处理人员变动）
-        if person_allocations:
-            primary_person = max(person_allocations.items(), key=lambda x: x[1])[0]
-
-            # 检查人员状态
-            staff_status = self.get_staff_status(primary_person)
-            if staff_status["status"] == "离职" and staff_status["replacement"]:
-                responsible_person = staff_status["replacement"]
-            elif staff_status["status"] == "调岗" and staff_status["replacement"]:
-                responsible_person = staff_status["replacement"]
-            else:
-                responsible_person = primary_person
-
-            if responsible_person in sales_person_region_mapping:
-                responsible_region = sales_person_region_mapping[responsible_person]
-            else:
-                responsible_region = default_mapping["region"]
-        else:
-            responsible_person = default_mapping["person"]
-            responsible_region = default_mapping["region"]
-
-        # 如果是系统管理员，区域为空
-        if responsible_person == self.default_person:
-            responsible_region = ""
-
-        responsible_persons = list(person_allocations.keys())
-        secondary_persons = [p for p in responsible_persons if p != responsible_person]
-
-        # 构建责任分析详情
-        responsibility_analysis = {
-            "responsible_person": responsible_person,
-            "responsible_region": responsible_region,
-            "responsible_persons": responsible_persons,
-            "secondary_persons": secondary_persons,
-            "person_scores": person_scores,
-            "region_scores": region_scores,
-            "responsibility_details": responsibility_details,
-            "quantity_allocation": {
-                "batch_qty": batch_qty,
-                "person_allocations": person_allocations,
-                "allocation_logic": "基于真实销售数据的责任库存分配，考虑跨月销售和生命周期"
-            },
-            "batch_info": {
-                "batch_date": batch_date,
-                "batch_age": (today - batch_date).days,
-                "batch_qty": batch_qty,
-                "batch_month": str(batch_month),
-                "lifecycle_stage": lifecycle_stage
-            }
-        }
-
-        return (responsible_region, responsible_person, responsibility_analysis)
-
-    def generate_responsibility_summary_collaborative(self, responsibility_analysis):
-        """生成责任分析摘要 - 增强版本包含真实数据信息"""
-        if not responsibility_analysis:
-            return "无法确定责任"
-
-        responsible_person = responsibility_analysis.get("responsible_person", self.default_person)
-        secondary_persons = responsibility_analysis.get("secondary_persons", [])
-        responsibility_details = responsibility_analysis.get("responsibility_details", {})
-
-        batch_info = responsibility_analysis.get("batch_info", {})
-        batch_qty = batch_info.get("batch_qty", 0)
-        lifecycle_stage = batch_info.get("lifecycle_stage", "未知")
-
-        quantity_allocation = responsibility_analysis.get("quantity_allocation", {})
-        person_allocations = quantity_allocation.get("person_allocations", {})
-
-        forecast_responsibility = responsibility_details.get("forecast_responsibility", {})
-
-        # 构建主要责任人的责任原因
-        main_person_reasons = []
-
-        if responsible_person in forecast_responsibility:
-            person_forecast = forecast_responsibility[responsible_person]
-            forecast_qty = person_forecast.get("forecast_quantity", 0)
-            actual_sales = person_forecast.get("actual_sales", 0)
-            fulfillment = person_forecast.get("fulfillment_rate", 1.0) * 100
-            unfulfilled = max(0, forecast_qty - actual_sales)
-
-            # 获取跨月销售详情
-            sales_details = person_forecast.get("sales_details", {})
-            monthly_breakdown = sales_details.get("monthly_breakdown", {})
-
-            if forecast_qty > 0:
-                main_person_reasons.append(
-                    f"预测{forecast_qty:.0f}件但实际加权销售{actual_sales:.0f}件(履行率{fulfillment:.0f}%)")
-
-                if monthly_breakdown:
-                    breakdown_text = "，".join(
-                        [f"{month}:{qty:.0f}件" for month, qty in monthly_breakdown.items() if qty > 0])
-                    if breakdown_text:
-                        main_person_reasons.append(f"销售分布({breakdown_text})")
-
-            if unfulfilled > 0:
-                main_person_reasons.append(f"未兑现预测{unfulfilled:.0f}件")
-
-        if not main_person_reasons:
-            main_person_reasons.append(f"综合预测与销售因素(产品{lifecycle_stage})")
-
-        # 构建其他责任人的摘要
-        other_persons_data = []
-        for person in secondary_persons:
-            if person != responsible_person:
-                allocated_qty = person_allocations.get(person, 0)
-                reason = ""
-
-                if person in forecast_responsibility:
-                    forecast_info = forecast_responsibility[person]
-                    forecast_qty = forecast_info.get("forecast_quantity", 0)
-                    actual_sales = forecast_info.get("actual_sales", 0)
-                    unfulfilled = max(0, forecast_qty - actual_sales)
-
-                    if unfulfilled > 0:
-                        reason = f"未兑现预测{unfulfilled:.0f}件"
-                    else:
-                        reason = "责任共担"
-                else:
-                    reason = "责任共担"
-
-                other_persons_data.append((person, reason, allocated_qty))
-
-        # 按库存数量降序排序
-        other_persons_data.sort(key=lambda x: x[2], reverse=True)
-        other_persons_summary = [f"{person}({reason}，承担{qty}件)" for person, reason, qty in other_persons_data]
-
-        # 生成最终摘要
-        main_reason = "、".join(main_person_reasons)
-
-        if responsible_person in person_allocations and person_allocations[responsible_person] > 0:
-            main_responsibility_qty = person_allocations[responsible_person]
-            main_person_with_qty = f"{responsible_person}主要责任({main_reason}，承担{main_responsibility_qty}件)"
-        else:
-            main_person_with_qty = f"{responsible_person}主要责任({main_reason}，承担0件)"
-
-        if other_persons_summary:
-            others_text = "，".join(other_persons_summary)
-            summary = f"{main_person_with_qty}，共同责任：{others_text}"
-        else:
-            summary = main_person_with_qty
-
-        # 添加生命周期信息
-        summary += f" [产品{lifecycle_stage}]"
-
-        return summary
+from analytics.dashboards import dashboard_version, load_dashboard
+from analytics.diagnostics import inventory_diagnostics
+from analytics.inventory import (INVENTORY_DATASETS, RESPONSIBILITY_COLUMNS, BatchLevelInventoryAnalyzer,
+                                 batch_responsibility_detail, batch_table_page, batch_table_rows, query_batch_table,
+                                 region_product_rollup, simulate_inventory_dashboard)
+from data_registry import dataset_registry
+from perf_monitor import perf_monitor
+from perf_panel import render_perf_panel
 
 
 warnings.filterwarnings('ignore')
@@ -475,6 +33,9 @@ if 'authenticated' not in st.session_state or not st.session_state.authenticated
     st.switch_page("登陆界面haha.py")
     st.stop()
 
+# 性能监控面板（仅管理员可见）
+render_perf_panel('预测库存分析')
+
 # 统一的增强CSS样式 - 添加高级动画和修复文字截断
 st.markdown("""
 <style>
@@ -1324,6 +885,7 @@ COLOR_SCHEME = {
 }
 
 
+@perf_monitor.profile()
 def create_integrated_risk_analysis_optimized(processed_inventory):
     """创建优化的整合风险分析图表 - 修复箱数格式和悬停遮挡问题"""
     try:
@@ -1525,6 +1087,7 @@ def create_integrated_risk_analysis_optimized(processed_inventory):
         return go.Figure()
 
 
+@perf_monitor.profile()
 def create_region_analysis_fixed_final(region_stats, region_risk_details):
     """创建最终修复版的区域分析图表 - 修复箱数格式"""
     try:
@@ -1640,6 +1203,7 @@ def create_region_analysis_fixed_final(region_stats, region_risk_details):
         return False
 
 
+@perf_monitor.profile()
 def create_product_analysis_fixed_final(product_stats):
     """创建最终修复版的产品分析图表 - 修复箱数格式"""
     try:
@@ -1836,6 +1400,7 @@ def create_product_analysis_fixed_final(product_stats):
         return go.Figure()
 
 
+@perf_monitor.profile()
 def create_region_analysis_optimized(region_stats, region_risk_details):
     """创建优化的区域分析图表 - 解决悬停遮挡问题"""
     try:
@@ -1903,517 +1468,140 @@ def create_region_analysis_optimized(region_stats, region_risk_details):
         return False
 
 
-def simplify_product_name(product_name):
-    """简化产品名称：去掉'口力'和'-中国'"""
-    if pd.isna(product_name):
-        return product_name
-
-    simplified = str(product_name)
-    # 去掉"口力"
-    simplified = simplified.replace('口力', '')
-    # 去掉"-中国"
-    simplified = simplified.replace('-中国', '')
-    # 去掉开头的空格
-    simplified = simplified.strip()
-
-    return simplified
-
-
 @st.cache_data
-def load_and_process_data():
-    """加载和处理所有数据 - 修复模拟数据，使用真实销售数据"""
+@perf_monitor.profile()
+def load_and_process_data(data_version, as_of):
+    """加载库存看板的预计算结果 - data_version为看板版本号（含基准日期），源文件或基准日期变化时缓存自动失效"""
     try:
-        # 读取数据文件
-        shipment_df = pd.read_excel('2409~250224出货数据.xlsx')
-        forecast_df = pd.read_excel('2409~2502人工预测.xlsx')
-        inventory_df = pd.read_excel('含批次库存0221(2).xlsx')
-        price_df = pd.read_excel('单价.xlsx')
-
-        # 处理日期
-        shipment_df['订单日期'] = pd.to_datetime(shipment_df['订单日期'])
-        shipment_df.columns = ['订单日期', '所属区域', '申请人', '产品代码', '数量']
-
-        forecast_df['所属年月'] = pd.to_datetime(forecast_df['所属年月'])
-        forecast_df.columns = ['所属大区', '销售员', '所属年月', '产品代码', '预计销售量']
-
-        # 创建分析器实例
-        analyzer = BatchLevelInventoryAnalyzer()
-
-        # 创建销售人员-区域映射
-        sales_person_region_mapping = {}
-        person_region_data = shipment_df[['申请人', '所属区域']].drop_duplicates()
-        person_region_counts = shipment_df.groupby(['申请人', '所属区域']).size().unstack(fill_value=0)
-
-        for person in shipment_df['申请人'].unique():
-            if person == analyzer.default_person:
-                sales_person_region_mapping[person] = ""
-            elif person in person_region_counts.index:
-                most_common_region = person_region_counts.loc[person].idxmax()
-                sales_person_region_mapping[person] = most_common_region
-            else:
-                sales_person_region_mapping[person] = analyzer.default_region
-
-        # 对预测数据中的销售员也添加区域映射
-        for person in forecast_df['销售员'].unique():
-            if person == analyzer.default_person:
-                continue
-            if person not in sales_person_region_mapping:
-                person_regions = forecast_df[forecast_df['销售员'] == person]['所属大区'].unique()
-                if len(person_regions) > 0:
-                    sales_person_region_mapping[person] = person_regions[0]
-                else:
-                    sales_person_region_mapping[person] = analyzer.default_region
-
-        # 确保系统管理员的区域为空字符串
-        sales_person_region_mapping[analyzer.default_person] = ""
-
-        # 创建产品代码到名称的映射
-        product_name_map = {}
-        for idx, row in inventory_df.iterrows():
-            if pd.notna(row['物料']) and pd.notna(row['描述']) and isinstance(row['物料'], str) and row[
-                '物料'].startswith('F'):
-                simplified_name = simplify_product_name(row['描述'])
-                product_name_map[row['物料']] = simplified_name
-
-        # 计算产品销售指标
-        product_sales_metrics = {}
-        today = datetime.now().date()
-
-        for product_code in product_name_map.keys():
-            product_sales = shipment_df[shipment_df['产品代码'] == product_code]
-
-            if len(product_sales) == 0:
-                product_sales_metrics[product_code] = {
-                    'daily_avg_sales': 0,
-                    'sales_std': 0,
-                    'coefficient_of_variation': float('inf'),
-                    'total_sales': 0,
-                    'last_90_days_sales': 0
-                }
-            else:
-                total_sales = product_sales['数量'].sum()
-                ninety_days_ago = today - timedelta(days=90)
-                recent_sales = product_sales[product_sales['订单日期'].dt.date >= ninety_days_ago]
-                recent_sales_total = recent_sales['数量'].sum() if len(recent_sales) > 0 else 0
-
-                days_range = (today - product_sales['订单日期'].min().date()).days + 1
-                daily_avg_sales = total_sales / days_range if days_range > 0 else 0
-
-                daily_sales = product_sales.groupby(product_sales['订单日期'].dt.date)['数量'].sum()
-                sales_std = daily_sales.std() if len(daily_sales) > 1 else 0
-
-                coefficient_of_variation = sales_std / daily_avg_sales if daily_avg_sales > 0 else float('inf')
-
-                product_sales_metrics[product_code] = {
-                    'daily_avg_sales': daily_avg_sales,
-                    'sales_std': sales_std,
-                    'coefficient_of_variation': coefficient_of_variation,
-                    'total_sales': total_sales,
-                    'last_90_days_sales': recent_sales_total
-                }
-
-        # 计算季节性指数
-        seasonal_indices = {}
-        for product_code in product_name_map.keys():
-            product_sales = shipment_df[shipment_df['产品代码'] == product_code]
-
-            if len(product_sales) > 0:
-                product_sales['月份'] = product_sales['订单日期'].dt.month
-                monthly_sales = product_sales.groupby('月份')['数量'].sum()
-
-                if len(monthly_sales) > 1:
-                    avg_monthly_sales = monthly_sales.mean()
-                    current_month = today.month
-                    if current_month in monthly_sales.index:
-                        seasonal_index = monthly_sales[current_month] / avg_monthly_sales
-                    else:
-                        seasonal_index = 1.0
-                else:
-                    seasonal_index = 1.0
-            else:
-                seasonal_index = 1.0
-
-            seasonal_index = max(seasonal_index, analyzer.min_seasonal_index)
-            seasonal_indices[product_code] = seasonal_index
-
-        # 计算预测准确度 - 修复：改进预测数据处理
-        forecast_accuracy = {}
-        for product_code in product_name_map.keys():
-            product_forecast = forecast_df[forecast_df['产品代码'] == product_code]
-
-            if len(product_forecast) > 0:
-                # 按销售员分组的预测 - 修复：确保映射到shipment_df中的申请人
-                person_forecast = {}
-                for _, forecast_row in product_forecast.iterrows():
-                    forecaster = forecast_row['销售员']
-                    # 检查该预测员在shipment_df中是否存在对应的申请人记录
-                    if forecaster in shipment_df['申请人'].values:
-                        person_forecast[forecaster] = person_forecast.get(forecaster, 0) + forecast_row['预计销售量']
-
-                forecast_quantity = product_forecast['预计销售量'].sum()
-
-                # 计算对应时间段的实际销售 - 修复：使用更精确的时间匹配
-                forecast_months = product_forecast['所属年月'].dt.to_period('M').unique()
-                actual_sales = 0
-
-                for month in forecast_months:
-                    month_sales = shipment_df[
-                        (shipment_df['产品代码'] == product_code) &
-                        (shipment_df['订单日期'].dt.to_period('M') == month)
-                        ]
-                    actual_sales += month_sales['数量'].sum() if not month_sales.empty else 0
-
-                forecast_bias = analyzer.calculate_forecast_bias(forecast_quantity, actual_sales)
-            else:
-                forecast_bias = 0.0
-                person_forecast = {}
-
-            forecast_accuracy[product_code] = {
-                'forecast_bias': forecast_bias,
-                'person_forecast': person_forecast
-            }
-
-        # 处理批次数据并进行完整分析
-        batch_data = []
-        current_material = None
-        current_desc = None
-        current_price = 0
-
-        for idx, row in inventory_df.iterrows():
-            if pd.notna(row['物料']) and isinstance(row['物料'], str) and row['物料'].startswith('F'):
-                current_material = row['物料']
-                current_desc = simplify_product_name(row['描述'])
-                price_match = price_df[price_df['产品代码'] == current_material]
-                current_price = price_match['单价'].iloc[0] if len(price_match) > 0 else 100
-            elif pd.notna(row['生产日期']) and current_material:
-                prod_date = pd.to_datetime(row['生产日期'])
-                quantity = row['数量'] if pd.notna(row['数量']) else 0
-                batch_no = row['生产批号'] if pd.notna(row['生产批号']) else ''
-
-                # 计算库龄
-                age_days = (datetime.now() - prod_date).days
-
-                # 获取销售指标
-                sales_metrics = product_sales_metrics.get(current_material, {
-                    'daily_avg_sales': 0,
-                    'sales_std': 0,
-                    'coefficient_of_variation': float('inf'),
-                    'total_sales': 0,
-                    'last_90_days_sales': 0
-                })
-
-                # 获取季节性指数
-                seasonal_index = seasonal_indices.get(current_material, 1.0)
-
-                # 获取预测准确度
-                forecast_info = forecast_accuracy.get(current_material, {
-                    'forecast_bias': 0.0,
-                    'person_forecast': {}
-                })
-
-                # 获取产品单价并计算批次价值
-                unit_price = current_price
-                batch_value = quantity * unit_price
-
-                # 计算预计清库天数
-                daily_avg_sales = sales_metrics['daily_avg_sales']
-                daily_avg_sales_adjusted = max(daily_avg_sales * seasonal_index, analyzer.min_daily_sales)
-
-                if daily_avg_sales_adjusted > 0:
-                    days_to_clear = quantity / daily_avg_sales_adjusted
-                    one_month_risk = analyzer.calculate_risk_percentage(days_to_clear, age_days, 30)
-                    two_month_risk = analyzer.calculate_risk_percentage(days_to_clear, age_days, 60)
-                    three_month_risk = analyzer.calculate_risk_percentage(days_to_clear, age_days, 90)
-                else:
-                    days_to_clear = float('inf')
-                    one_month_risk = 100
-                    two_month_risk = 100
-                    three_month_risk = 100
-
-                # 🔧 核心修复：传入shipment_df参数，使用真实数据进行责任归属分析
-                responsible_region, responsible_person, responsibility_details = analyzer.analyze_responsibility_collaborative(
-                    current_material, prod_date, sales_metrics, forecast_info, None, quantity,
-                    sales_person_region_mapping, shipment_df  # 🔧 添加shipment_df参数
-                )
-
-                # 确定积压原因
-                stocking_reasons = []
-                if age_days > 60:
-                    stocking_reasons.append("库龄过长")
-                if sales_metrics['coefficient_of_variation'] > analyzer.high_volatility_threshold:
-                    stocking_reasons.append("销量波动大")
-                if seasonal_index < 0.8:
-                    stocking_reasons.append("季节性影响")
-                if abs(forecast_info['forecast_bias']) > analyzer.high_forecast_bias_threshold:
-                    stocking_reasons.append("预测偏差大")
-                if not stocking_reasons:
-                    stocking_reasons.append("正常库存")
-
-                # 风险等级评估
-                risk_score = 0
-
-                # 库龄因素
-                if age_days > 90:
-                    risk_score += 40
-                elif age_days > 60:
-                    risk_score += 30
-                elif age_days > 30:
-                    risk_score += 20
-                else:
-                    risk_score += 10
-
-                # 清库天数因素
-                if days_to_clear == float('inf'):
-                    risk_score += 40
-                elif days_to_clear > 180:
-                    risk_score += 35
-                elif days_to_clear > 90:
-                    risk_score += 30
-                elif days_to_clear > 60:
-                    risk_score += 20
-                elif days_to_clear > 30:
-                    risk_score += 10
-
-                # 销量波动系数
-                if sales_metrics['coefficient_of_variation'] > 2.0:
-                    risk_score += 10
-                elif sales_metrics['coefficient_of_variation'] > 1.0:
-                    risk_score += 5
-
-                # 预测偏差
-                if abs(forecast_info['forecast_bias']) > 0.5:
-                    risk_score += 10
-                elif abs(forecast_info['forecast_bias']) > 0.3:
-                    risk_score += 8
-                elif abs(forecast_info['forecast_bias']) > 0.15:
-                    risk_score += 5
-
-                # 根据总分确定风险等级
-                if risk_score >= 80:
-                    risk_level = "极高风险"
-                    risk_advice = '🚨 立即7折清库'
-                elif risk_score >= 60:
-                    risk_level = "高风险"
-                    risk_advice = '⚠️ 建议8折促销'
-                elif risk_score >= 40:
-                    risk_level = "中风险"
-                    risk_advice = '📢 适度9折促销'
-                elif risk_score >= 20:
-                    risk_level = "低风险"
-                    risk_advice = '✅ 正常销售'
-                else:
-                    risk_level = "极低风险"
-                    risk_advice = '🌟 新鲜库存'
-
-                # 生成建议措施
-                if risk_level == "极高风险":
-                    recommendation = "紧急清理：考虑折价促销"
-                elif risk_level == "高风险":
-                    recommendation = "优先处理：降价促销或转仓调配"
-                elif risk_level == "中风险":
-                    recommendation = "密切监控：调整采购计划"
-                elif risk_level == "低风险":
-                    recommendation = "常规管理：定期审查库存周转"
-                else:
-                    recommendation = "维持现状：正常库存水平"
-
-                # 预期损失计算
-                if age_days >= 120:
-                    expected_loss = quantity * unit_price * 0.3
-                elif age_days >= 90:
-                    expected_loss = quantity * unit_price * 0.2
-                elif age_days >= 60:
-                    expected_loss = quantity * unit_price * 0.1
-                else:
-                    expected_loss = 0
-
-                # 格式化预测偏差为百分比
-                forecast_bias_value = forecast_info['forecast_bias']
-                if forecast_bias_value == float('inf'):
-                    forecast_bias_pct = "无穷大"
-                elif forecast_bias_value == 0:
-                    forecast_bias_pct = "0%"
-                else:
-                    forecast_bias_pct = f"{round(forecast_bias_value * 100, 1)}%"
-
-                # 生成责任分析摘要 - 使用增强版本
-                responsibility_summary = analyzer.generate_responsibility_summary_collaborative(responsibility_details)
-
-                # 将分析结果添加到列表
-                batch_data.append({
-                    '物料': current_material,
-                    '产品名称': current_desc,
-                    '描述': current_desc,
-                    '生产日期': prod_date,
-                    '生产批号': batch_no,
-                    '批次日期': prod_date.date(),
-                    '数量': quantity,
-                    '批次库存': quantity,
-                    '库龄': age_days,
-                    '风险等级': risk_level,
-                    '风险颜色': '',  # 将在显示时设置
-                    '处理建议': risk_advice,
-                    '单价': unit_price,
-                    '批次价值': batch_value,
-                    '预期损失': expected_loss,
-                    '日均出货': round(daily_avg_sales, 2),
-                    '出货标准差': round(sales_metrics['sales_std'], 2),
-                    '出货波动系数': round(sales_metrics['coefficient_of_variation'], 2),
-                    '预计清库天数': days_to_clear if days_to_clear != float('inf') else float('inf'),
-                    '一个月积压风险': f"{round(one_month_risk, 1)}%",
-                    '两个月积压风险': f"{round(two_month_risk, 1)}%",
-                    '三个月积压风险': f"{round(three_month_risk, 1)}%",
-                    '积压原因': '，'.join(stocking_reasons),
-                    '季节性指数': round(seasonal_index, 2),
-                    '预测偏差': forecast_bias_pct,
-                    '责任区域': responsible_region,
-                    '责任人': responsible_person,
-                    '责任详情': responsibility_details,
-                    '责任分析摘要': responsibility_summary,
-                    '风险程度': risk_level,
-                    '风险得分': risk_score,
-                    '建议措施': recommendation
-                })
-
-        processed_inventory = pd.DataFrame(batch_data)
-
-        # 按照风险程度和库龄排序
-        risk_order = {
-            "极高风险": 0,
-            "高风险": 1,
-            "中风险": 2,
-            "低风险": 3,
-            "极低风险": 4
-        }
-        processed_inventory['风险排序'] = processed_inventory['风险程度'].map(risk_order)
-        processed_inventory = processed_inventory.sort_values(by=['风险排序', '库龄'], ascending=[True, False])
-        processed_inventory = processed_inventory.drop(columns=['风险排序'])
-
-        # 计算关键指标
-        metrics = calculate_key_metrics(processed_inventory)
-
-        return processed_inventory, shipment_df, forecast_df, metrics, product_name_map
-
+        return load_dashboard('inventory', data_version, as_of=as_of)
     except Exception as e:
         st.error(f"数据加载失败: {str(e)}")
         import traceback
         st.error(f"详细错误信息: {traceback.format_exc()}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), {}, {}
-
-
-def validate_data_integrity():
-    """验证数据完整性和修复结果 - 新增函数"""
-    try:
-        st.info("🔍 正在验证数据完整性...")
-
-        # 读取基础数据进行验证
-        shipment_df = pd.read_excel('2409~250224出货数据.xlsx')
-        forecast_df = pd.read_excel('2409~2502人工预测.xlsx')
-
-        # 验证点1：检查数据文件是否存在且非空
-        validation_results = {
-            "shipment_data_exists": not shipment_df.empty,
-            "forecast_data_exists": not forecast_df.empty,
-            "shipment_records": len(shipment_df),
-            "forecast_records": len(forecast_df)
+        return {
+            'processed_inventory': pd.DataFrame(),
+            'shipment_df': pd.DataFrame(),
+            'forecast_df': pd.DataFrame(),
+            'metrics': {},
+            'as_of': as_of,
+            'product_name_map': {},
+            'responsibility': {table: pd.DataFrame(columns=columns) for table, columns in RESPONSIBILITY_COLUMNS.items()},
+            'batch_index': {},
+            'inventory_inputs': {},
+            'merged_data': None,
+            'forecast_rollups': {},
+            'forecast_key_metrics': {}
         }
 
-        # 验证点2：检查关键列是否存在
-        shipment_df.columns = ['订单日期', '所属区域', '申请人', '产品代码', '数量']
-        forecast_df.columns = ['所属大区', '销售员', '所属年月', '产品代码', '预计销售量']
-
-        required_shipment_cols = ['订单日期', '申请人', '产品代码', '数量']
-        required_forecast_cols = ['销售员', '所属年月', '产品代码', '预计销售量']
 
-        validation_results["shipment_cols_valid"] = all(col in shipment_df.columns for col in required_shipment_cols)
-        validation_results["forecast_cols_valid"] = all(col in forecast_df.columns for col in required_forecast_cols)
+@st.cache_data(max_entries=16)
+@perf_monitor.profile()
+def simulate_dashboard(data_version, as_of, parameters):
+    """参数模拟结果 - 复用看板的中间结果重算，按看板版本和调整后的参数缓存
 
-        # 验证点3：检查人员名称匹配
-        shipment_persons = set(shipment_df['申请人'].unique())
-        forecast_persons = set(forecast_df['销售员'].unique())
-        common_persons = shipment_persons.intersection(forecast_persons)
-
-        validation_results["person_match_count"] = len(common_persons)
-        validation_results["person_match_ratio"] = len(common_persons) / max(len(forecast_persons), 1)
-
-        # 验证点4：检查时间数据格式
-        try:
-            shipment_df['订单日期'] = pd.to_datetime(shipment_df['订单日期'])
-            forecast_df['所属年月'] = pd.to_datetime(forecast_df['所属年月'])
-            validation_results["date_format_valid"] = True
-        except Exception as e:
-            validation_results["date_format_valid"] = False
-            validation_results["date_error"] = str(e)
-
-        # 验证点5：检查产品代码匹配
-        shipment_products = set(shipment_df['产品代码'].unique())
-        forecast_products = set(forecast_df['产品代码'].unique())
-        common_products = shipment_products.intersection(forecast_products)
-
-        validation_results["product_match_count"] = len(common_products)
-        validation_results["product_match_ratio"] = len(common_products) / max(len(forecast_products), 1)
-
-        return validation_results
+    只缓存重算的部分（批次表、关键指标、责任归属和批次表索引），渲染时合并到已缓存的看板上。
+    """
+    return simulate_inventory_dashboard(load_and_process_data(data_version, as_of), parameters)
+
+
+def render_what_if_controls():
+    """侧边栏参数模拟面板，返回与默认值不同的分析参数（未启用或未调整时为空字典）"""
+    defaults = BatchLevelInventoryAnalyzer().get_parameters()
+    parameters = BatchLevelInventoryAnalyzer().get_parameters()
+
+    with st.sidebar.expander("🧪 参数模拟（What-if）", expanded=False):
+        if not st.checkbox("启用参数模拟", key="what_if_enabled",
+                           help="调整分析参数后只重算风险评分、责任归属和关键指标，不重新读取数据"):
+            return {}
+
+        st.markdown("**风险评分参数**")
+        for name, label in (('low_stock_days', '低库龄阈值（天）'), ('medium_stock_days', '中库龄阈值（天）'),
+                            ('high_stock_days', '高库龄阈值（天）'), ('low_clearance_days', '低清库天数阈值'),
+                            ('medium_clearance_days', '中清库天数阈值'), ('high_clearance_days', '高清库天数阈值')):
+            parameters[name] = st.number_input(label, min_value=1, max_value=720, value=defaults[name], step=5,
+                                               key=f"what_if_{name}")
+        parameters['high_volatility_threshold'] = st.slider(
+            "高波动系数阈值", min_value=0.1, max_value=5.0, value=defaults['high_volatility_threshold'], step=0.1,
+            key="what_if_high_volatility_threshold")
+        parameters['medium_forecast_bias_threshold'] = st.slider(
+            "中预测偏差阈值", min_value=0.0, max_value=1.0, value=defaults['medium_forecast_bias_threshold'], step=0.01,
+            key="what_if_medium_forecast_bias_threshold")
+        parameters['high_forecast_bias_threshold'] = st.slider(
+            "高预测偏差阈值", min_value=0.0, max_value=1.0, value=defaults['high_forecast_bias_threshold'], step=0.01,
+            key="what_if_high_forecast_bias_threshold")
+        parameters['min_daily_sales'] = st.number_input(
+            "最低日均销量", min_value=0.0, max_value=100.0, value=defaults['min_daily_sales'], step=0.1,
+            key="what_if_min_daily_sales")
+        parameters['min_seasonal_index'] = st.slider(
+            "季节性指数下限", min_value=0.0, max_value=1.0, value=defaults['min_seasonal_index'], step=0.05,
+            key="what_if_min_seasonal_index")
+
+        st.markdown("**责任归属参数**")
+        for offset, label in enumerate(['当月销售权重', '次月销售权重', '第三月销售权重']):
+            parameters['cross_month_weights'][offset] = st.slider(
+                label, min_value=0.0, max_value=1.0, value=defaults['cross_month_weights'][offset], step=0.05,
+                key=f"what_if_cross_month_weight_{offset}")
+        for stage, config in defaults['product_lifecycle_config'].items():
+            col1, col2 = st.columns(2)
+            parameters['product_lifecycle_config'][stage]['tolerance'] = col1.number_input(
+                f"{stage}容忍度", min_value=0.0, max_value=2.0, value=config['tolerance'], step=0.05,
+                key=f"what_if_tolerance_{stage}")
+            parameters['product_lifecycle_config'][stage]['weight'] = col2.number_input(
+                f"{stage}权重", min_value=0.0, max_value=3.0, value=config['weight'], step=0.1,
+                key=f"what_if_weight_{stage}")
 
-    except Exception as e:
-        st.error(f"数据验证失败: {str(e)}")
-        return {"validation_failed": True, "error": str(e)}
+        if not (parameters['low_stock_days'] <= parameters['medium_stock_days'] <= parameters['high_stock_days']):
+            st.warning("库龄阈值应满足 低 ≤ 中 ≤ 高")
 
+    return {name: value for name, value in parameters.items() if value != defaults[name]}
 
-def run_system_self_check():
-    """系统自检函数 - 确保所有修改正确实施 - 新增函数"""
-    st.markdown("### 🔍 系统自检报告")
 
-    check_results = {}
+def start_diagnostics(data_version, shipment_df, forecast_df):
+    """启动后台系统验证 - 基于看板已加载的数据，同一数据版本只验证一次"""
+    if inventory_diagnostics.progress(data_version)['status'] == 'idle':
+        inventory_diagnostics.start(data_version, shipment_df, forecast_df)
 
-    # 检查1：BatchLevelInventoryAnalyzer类是否正确更新
-    try:
-        analyzer = BatchLevelInventoryAnalyzer()
 
-        # 检查新方法是否存在
-        has_cross_month_method = hasattr(analyzer, 'calculate_cross_month_sales')
-        has_lifecycle_method = hasattr(analyzer, 'get_product_lifecycle_stage')
-        has_staff_status_method = hasattr(analyzer, 'get_staff_status')
+def render_diagnostics_progress(data_version):
+    """显示后台系统验证的进度（尚未完成时调用）"""
+    status = inventory_diagnostics.progress(data_version)['status']
+    if status == 'running':
+        poll_diagnostics_progress(data_version)
+    elif status == 'busy':
+        st.info("⏳ 另一数据版本的系统验证正在进行，完成后可再验证当前版本")
 
-        check_results["analyzer_methods"] = {
-            "cross_month_sales": has_cross_month_method,
-            "lifecycle_stage": has_lifecycle_method,
-            "staff_status": has_staff_status_method,
-            "all_methods_present": all([has_cross_month_method, has_lifecycle_method, has_staff_status_method])
-        }
 
-        # 检查新配置是否存在
-        has_cross_month_weights = hasattr(analyzer, 'cross_month_weights')
-        has_lifecycle_config = hasattr(analyzer, 'product_lifecycle_config')
+@st.fragment(run_every=1)
+def poll_diagnostics_progress(data_version):
+    """每秒刷新验证进度，验证完成后重新运行页面显示结论"""
+    progress = inventory_diagnostics.progress(data_version)
+    if progress['status'] != 'running':
+        st.rerun()
+    st.progress(progress['percent'],
+                text=f"⏳ 正在后台验证：{progress['current']}（{progress['completed']}/{progress['total']}）")
 
-        check_results["analyzer_config"] = {
-            "cross_month_weights": has_cross_month_weights,
-            "lifecycle_config": has_lifecycle_config,
-            "all_configs_present": all([has_cross_month_weights, has_lifecycle_config])
-        }
 
-    except Exception as e:
-        check_results["analyzer_error"] = str(e)
+def run_system_self_check(data_version, shipment_df, forecast_df):
+    """系统自检函数 - 确保所有修改正确实施 - 分析器和数据文件检查读取后台验证结论"""
+    st.markdown("### 🔍 系统自检报告")
 
-    # 检查2：主要方法签名是否正确
-    try:
-        import inspect
-        sig = inspect.signature(analyzer.analyze_responsibility_collaborative)
-        params = list(sig.parameters.keys())
+    start_diagnostics(data_version, shipment_df, forecast_df)
+    verdict = inventory_diagnostics.verdict(data_version)
+    if verdict is None:
+        render_diagnostics_progress(data_version)
+        return {}
 
-        check_results["method_signature"] = {
-            "has_shipment_df_param": 'shipment_df' in params,
-            "total_params": len(params),
-            "all_params": params
-        }
+    check_results = {}
 
-    except Exception as e:
-        check_results["signature_error"] = str(e)
+    # 检查1、2：分析器方法、配置和方法签名
+    if verdict['analyzer'] is not None:
+        check_results.update(verdict['analyzer'])
+    else:
+        check_results["analyzer_error"] = verdict['errors'].get('analyzer', '未知错误')
+        check_results["signature_error"] = check_results["analyzer_error"]
 
     # 检查3：验证函数是否存在
     validation_functions = [
-        'validate_data_integrity',
-        'test_responsibility_analysis',
         'run_comprehensive_validation',
         'add_validation_sidebar',
         'check_simulation_data_removal',
@@ -2429,21 +1617,10 @@ def run_system_self_check():
             check_results["validation_functions"][func_name] = False
 
     # 检查4：数据文件是否可访问
-    try:
-        import os
-        data_files = [
-            '2409~250224出货数据.xlsx',
-            '2409~2502人工预测.xlsx',
-            '含批次库存0221(2).xlsx',
-            '单价.xlsx'
-        ]
-
-        check_results["data_files"] = {}
-        for file_name in data_files:
-            check_results["data_files"][file_name] = os.path.exists(file_name)
-
-    except Exception as e:
-        check_results["data_files_error"] = str(e)
+    if verdict['data_files'] is not None:
+        check_results["data_files"] = verdict['data_files']
+    else:
+        check_results["data_files_error"] = verdict['errors'].get('data_files', '未知错误')
 
     # 显示检查结果
     col1, col2 = st.columns(2)
@@ -2563,110 +1740,36 @@ def quick_functionality_test():
 
 
 # 在侧边栏添加自检功能
-def add_self_check_to_sidebar():
+def add_self_check_to_sidebar(data_version, shipment_df, forecast_df):
     """在侧边栏添加自检功能 - 新增函数"""
     with st.sidebar:
         st.markdown("---")
         st.markdown("### 🔍 系统自检")
 
         if st.button("🔧 运行完整自检", help="检查所有修改是否正确实施"):
-            with st.spinner("正在运行系统自检..."):
-                check_results = run_system_self_check()
+            check_results = run_system_self_check(data_version, shipment_df, forecast_df)
 
         if st.button("⚡ 快速功能测试", help="快速测试核心功能"):
             with st.spinner("正在运行功能测试..."):
                 quick_functionality_test()
-def test_responsibility_analysis():
-    """测试责任归属分析功能 - 新增函数"""
-    try:
-        st.info("🧪 正在测试责任归属分析功能...")
-
-        # 创建测试数据
-        test_shipment_data = pd.DataFrame({
-            '订单日期': pd.date_range('2024-01-01', periods=10, freq='D'),
-            '所属区域': ['东'] * 10,
-            '申请人': ['张三'] * 5 + ['李四'] * 5,
-            '产品代码': ['F001'] * 10,
-            '数量': [10, 15, 20, 12, 8, 25, 30, 18, 22, 16]
-        })
-
-        test_forecast_data = pd.DataFrame({
-            '所属大区': ['东', '东'],
-            '销售员': ['张三', '李四'],
-            '所属年月': [pd.to_datetime('2024-01-01')] * 2,
-            '产品代码': ['F001', 'F001'],
-            '预计销售量': [100, 80]
-        })
-
-        # 创建分析器实例
-        analyzer = BatchLevelInventoryAnalyzer()
-
-        # 测试责任归属分析
-        test_batch_date = datetime(2024, 1, 15)
-        test_sales_metrics = {
-            'daily_avg_sales': 15,
-            'sales_std': 5,
-            'coefficient_of_variation': 0.3,
-            'total_sales': 180,
-            'last_90_days_sales': 180
-        }
-
-        test_forecast_info = {
-            'forecast_bias': 0.1,
-            'person_forecast': {'张三': 100, '李四': 80}
-        }
-
-        test_mapping = {'张三': '东', '李四': '东'}
-
-        # 执行测试
-        result = analyzer.analyze_responsibility_collaborative(
-            'F001', test_batch_date, test_sales_metrics, test_forecast_info,
-            None, 100, test_mapping, test_shipment_data
-        )
-
-        # 验证结果
-        test_results = {
-            "analysis_completed": result is not None,
-            "has_responsible_region": result[0] is not None,
-            "has_responsible_person": result[1] is not None,
-            "has_responsibility_details": result[2] is not None
-        }
-
-        if result[2]:  # 如果有责任详情
-            details = result[2]
-            test_results["has_forecast_responsibility"] = "forecast_responsibility" in details.get(
-                "responsibility_details", {})
-            test_results["has_allocation_logic"] = "allocation_logic" in details.get("quantity_allocation", {})
-            test_results["uses_real_data"] = "基于真实销售数据" in details.get("quantity_allocation", {}).get(
-                "allocation_logic", "")
-
-            # 检查是否还在使用模拟数据
-            forecast_resp = details.get("responsibility_details", {}).get("forecast_responsibility", {})
-            has_real_sales_data = False
-            for person_data in forecast_resp.values():
-                if isinstance(person_data, dict) and "sales_details" in person_data:
-                    sales_details = person_data["sales_details"]
-                    if "monthly_breakdown" in sales_details:
-                        has_real_sales_data = True
-                        break
-
-            test_results["has_real_sales_breakdown"] = has_real_sales_data
 
-        return test_results
 
-    except Exception as e:
-        st.error(f"责任分析测试失败: {str(e)}")
-        import traceback
-        st.error(f"详细错误: {traceback.format_exc()}")
-        return {"test_failed": True, "error": str(e)}
+def run_comprehensive_validation(data_version, shipment_df, forecast_df):
+    """运行综合验证测试 - 显示当前数据版本的后台验证结论，尚未验证时在后台启动"""
+    st.markdown("### 🔧 系统验证与测试")
 
+    start_diagnostics(data_version, shipment_df, forecast_df)
+    verdict = inventory_diagnostics.verdict(data_version)
+    if verdict is None:
+        render_diagnostics_progress(data_version)
+        return
 
-def run_comprehensive_validation():
-    """运行综合验证测试 - 新增函数"""
-    st.markdown("### 🔧 系统验证与测试")
+    st.caption(f"当前数据版本的验证结论（{datetime.fromtimestamp(verdict['finished_at']):%H:%M:%S} 完成，"
+               f"耗时 {verdict['seconds']}s）")
 
     with st.expander("📊 数据完整性验证", expanded=False):
-        validation_results = validate_data_integrity()
+        validation_results = verdict['data_integrity'] or {
+            "validation_failed": True, "error": verdict['errors'].get('data_integrity', '未知错误')}
 
         if "validation_failed" in validation_results:
             st.error(f"❌ 数据验证失败: {validation_results['error']}")
@@ -2686,7 +1789,8 @@ def run_comprehensive_validation():
                     st.error(f"❌ 日期格式错误: {validation_results.get('date_error', '未知错误')}")
 
     with st.expander("🧪 责任分析功能测试", expanded=False):
-        test_results = test_responsibility_analysis()
+        test_results = verdict['responsibility_test'] or {
+            "test_failed": True, "error": verdict['errors'].get('responsibility_test', '未知错误')}
 
         if "test_failed" in test_results:
             st.error(f"❌ 功能测试失败: {test_results['error']}")
@@ -2716,14 +1820,21 @@ def run_comprehensive_validation():
             st.markdown(test_summary)
 
 
-def add_validation_sidebar():
-    """在侧边栏添加验证功能 - 新增函数"""
+def add_validation_sidebar(data_version, shipment_df, forecast_df):
+    """在侧边栏添加验证功能 - 验证在后台运行，结论按数据版本缓存"""
     with st.sidebar:
         st.markdown("---")
         st.markdown("### 🔧 系统验证")
 
-        if st.button("🔍 验证数据完整性", help="检查数据文件和格式是否正确"):
-            validation_results = validate_data_integrity()
+        if inventory_diagnostics.progress(data_version)['status'] == 'idle' and st.button(
+                "🔍 运行系统验证", help="在后台检查数据完整性和责任归属分析功能（基于已加载的数据）"):
+            start_diagnostics(data_version, shipment_df, forecast_df)
+
+        verdict = inventory_diagnostics.verdict(data_version)
+        if verdict is None:
+            render_diagnostics_progress(data_version)
+        else:
+            validation_results = verdict['data_integrity'] or {"validation_failed": True}
             if "validation_failed" not in validation_results:
                 st.success(f"✅ 验证通过 ({validation_results['shipment_records']}条出货记录)")
                 st.info(f"📊 人员匹配: {validation_results['person_match_count']}人")
@@ -2731,14 +1842,25 @@ def add_validation_sidebar():
             else:
                 st.error("❌ 验证失败")
 
-        if st.button("🧪 测试责任分析", help="测试修复后的责任归属分析功能"):
-            test_results = test_responsibility_analysis()
+            test_results = verdict['responsibility_test'] or {"test_failed": True}
             if "test_failed" not in test_results and test_results.get("uses_real_data"):
                 st.success("✅ 功能正常，已使用真实数据")
                 if test_results.get("has_real_sales_breakdown"):
                     st.success("✅ 销售数据分解正常")
             else:
                 st.error("❌ 测试失败或仍使用模拟数据")
+            st.caption(f"当前数据版本已于 {datetime.fromtimestamp(verdict['finished_at']):%H:%M:%S} 验证，"
+                       f"数据更新后需重新验证")
+
+        # 数据加载耗时报告
+        load_report = dataset_registry.load_report(INVENTORY_DATASETS)
+        if load_report:
+            with st.expander("⏱️ 数据加载耗时", expanded=False):
+                st.caption(f"实际耗时 {load_report['wall_seconds']}s / 串行累计 {load_report['serial_seconds']}s "
+                           f"(加速 {load_report['speedup']}x，{load_report['workers']}个进程)")
+                for name, item in load_report['datasets'].items():
+                    st.write(f"- {name}: {item['seconds']}s ({item['source']}，{item['rows']:,}行，"
+                             f"内存 {item['before_bytes'] / 1024 / 1024:.1f}MB → {item['after_bytes'] / 1024 / 1024:.1f}MB)")
 
 
 def check_simulation_data_removal():
@@ -2853,10 +1975,11 @@ def display_modification_summary():
                     st.warning("⚠️ 真实数据处理可能不完整")
 
             st.info(f"📝 方法总行数: {check_results['method_length']} 行")
-def create_enhanced_region_forecast_chart(merged_data):
+@perf_monitor.profile()
+def create_enhanced_region_forecast_chart(forecast_rollups):
     """创建优化版区域预测准确率图表 - 修复responsive属性错误"""
     try:
-        if merged_data is None or merged_data.empty:
+        if not forecast_rollups:
             fig = go.Figure()
             fig.update_layout(
                 title="区域预测准确率分析 (无数据)",
@@ -2873,11 +1996,7 @@ def create_enhanced_region_forecast_chart(merged_data):
             return fig, pd.DataFrame()
 
         # 区域汇总数据
-        region_comparison = merged_data.groupby('所属区域').agg({
-            '实际销量': 'sum',
-            '预测销量': 'sum',
-            '准确率': 'mean'
-        }).reset_index()
+        region_comparison = forecast_rollups['region'].copy()
 
         region_comparison['准确率'] = region_comparison['准确率'] * 100
         region_comparison['销量占比'] = (region_comparison['实际销量'] / region_comparison['实际销量'].sum() * 100)
@@ -3061,140 +2180,7 @@ def create_enhanced_region_forecast_chart(merged_data):
         return go.Figure(), pd.DataFrame()
 
 
-def calculate_key_metrics(processed_inventory):
-    """计算关键指标"""
-    if processed_inventory.empty:
-        return {
-            'total_batches': 0,
-            'high_risk_batches': 0,
-            'high_risk_ratio': 0,
-            'total_inventory_value': 0,
-            'high_risk_value_ratio': 0,
-            'avg_age': 0,
-            'high_risk_value': 0,
-            'risk_counts': {
-                'extreme': 0,
-                'high': 0,
-                'medium': 0,
-                'low': 0,
-                'minimal': 0
-            }
-        }
-
-    total_batches = len(processed_inventory)
-    high_risk_batches = len(processed_inventory[processed_inventory['风险等级'].isin(['极高风险', '高风险'])])
-    high_risk_ratio = (high_risk_batches / total_batches * 100) if total_batches > 0 else 0
-
-    total_inventory_value = processed_inventory['批次价值'].sum() / 1000000
-    high_risk_value = processed_inventory[
-        processed_inventory['风险等级'].isin(['极高风险', '高风险'])
-    ]['批次价值'].sum()
-    high_risk_value_ratio = (high_risk_value / processed_inventory['批次价值'].sum() * 100) if processed_inventory[
-                                                                                                   '批次价值'].sum() > 0 else 0
-
-    avg_age = processed_inventory['库龄'].mean()
-
-    # 风险分布统计
-    risk_counts = processed_inventory['风险等级'].value_counts().to_dict()
-
-    return {
-        'total_batches': int(total_batches),
-        'high_risk_batches': int(high_risk_batches),
-        'high_risk_ratio': round(high_risk_ratio, 1),
-        'total_inventory_value': round(total_inventory_value, 2),
-        'high_risk_value_ratio': round(high_risk_value_ratio, 1),
-        'avg_age': round(avg_age, 0),
-        'high_risk_value': round(high_risk_value / 1000000, 1),
-        'risk_counts': {
-            'extreme': risk_counts.get('极高风险', 0),
-            'high': risk_counts.get('高风险', 0),
-            'medium': risk_counts.get('中风险', 0),
-            'low': risk_counts.get('低风险', 0),
-            'minimal': risk_counts.get('极低风险', 0)
-        }
-    }
-
-
-def process_forecast_analysis(shipment_df, forecast_df, product_name_map):
-    """处理预测分析数据 - 只使用当年数据"""
-    try:
-        current_year = datetime.now().year
-
-        # 筛选当年数据
-        shipment_current_year = shipment_df[shipment_df['订单日期'].dt.year == current_year].copy()
-        forecast_current_year = forecast_df[forecast_df['所属年月'].dt.year == current_year].copy()
-
-        if shipment_current_year.empty or forecast_current_year.empty:
-            return None, {}
-
-        # 添加产品名称映射
-        shipment_current_year['产品名称'] = shipment_current_year['产品代码'].map(product_name_map).fillna(
-            shipment_current_year['产品代码'])
-        forecast_current_year['产品名称'] = forecast_current_year['产品代码'].map(product_name_map).fillna(
-            forecast_current_year['产品代码'])
-
-        # 按月份和产品汇总实际销量 - 修正列名
-        shipment_monthly = shipment_current_year.groupby([
-            shipment_current_year['订单日期'].dt.to_period('M'),
-            '产品代码',
-            '产品名称',
-            '所属区域'
-        ]).agg({
-            '数量': 'sum'  # 修正：从 '求和项:数量（箱）' 改为 '数量'
-        }).reset_index()
-        shipment_monthly['年月'] = shipment_monthly['订单日期'].dt.to_timestamp()
-
-        # 按月份和产品汇总预测销量
-        forecast_monthly = forecast_current_year.groupby([
-            forecast_current_year['所属年月'].dt.to_period('M'),
-            '产品代码',
-            '产品名称',
-            '所属大区'
-        ]).agg({
-            '预计销售量': 'sum'
-        }).reset_index()
-        forecast_monthly['年月'] = forecast_monthly['所属年月'].dt.to_timestamp()
-
-        # 统一区域名称
-        forecast_monthly = forecast_monthly.rename(columns={'所属大区': '所属区域'})
-
-        # 合并数据
-        merged_data = pd.merge(
-            shipment_monthly,
-            forecast_monthly,
-            on=['年月', '产品代码', '产品名称', '所属区域'],
-            how='outer'
-        ).fillna(0)
-
-        # 计算准确率和差异 - 修正列名
-        merged_data['实际销量'] = merged_data['数量']  # 修正：从 '求和项:数量（箱）' 改为 '数量'
-        merged_data['预测销量'] = merged_data['预计销售量']
-        merged_data['差异量'] = merged_data['实际销量'] - merged_data['预测销量']
-
-        # 计算准确率
-        merged_data['准确率'] = merged_data.apply(
-            lambda row: 1 - abs(row['差异量']) / max(row['实际销量'], 1) if row['实际销量'] > 0 else
-            (1 if row['预测销量'] == 0 else 0),
-            axis=1
-        )
-        merged_data['准确率'] = merged_data['准确率'].clip(0, 1)
-
-        # 计算关键指标
-        key_metrics = {
-            'total_actual_sales': merged_data['实际销量'].sum(),
-            'total_forecast_sales': merged_data['预测销量'].sum(),
-            'overall_accuracy': merged_data['准确率'].mean() * 100,
-            'overall_diff_rate': ((merged_data['实际销量'].sum() - merged_data['预测销量'].sum()) /
-                                  merged_data['实际销量'].sum()) * 100 if merged_data['实际销量'].sum() > 0 else 0
-        }
-
-        return merged_data, key_metrics
-
-    except Exception as e:
-        st.error(f"预测分析处理失败: {str(e)}")
-        return None, {}
-
-
+@perf_monitor.profile()
 def create_integrated_risk_analysis(processed_inventory):
     """创建整合的风险分析图表 - 增强版本带高级悬停"""
     try:
@@ -3406,10 +2392,11 @@ def create_integrated_risk_analysis(processed_inventory):
         return go.Figure()
 
 
-def create_ultra_integrated_forecast_chart(merged_data):
+@perf_monitor.profile()
+def create_ultra_integrated_forecast_chart(forecast_rollups, data_year):
     """创建超级整合的预测分析图表 - 修复图例位置和箱数格式"""
     try:
-        if merged_data is None or merged_data.empty:
+        if not forecast_rollups:
             fig = go.Figure()
             fig.update_layout(
                 title="预测分析 (无数据)",
@@ -3427,7 +2414,7 @@ def create_ultra_integrated_forecast_chart(merged_data):
             return fig
 
         # 1. 分析重点SKU (销售额占比80%的产品)
-        total_sales_by_product = merged_data.groupby(['产品代码', '产品名称'])['实际销量'].sum().reset_index()
+        total_sales_by_product = forecast_rollups['product'][['产品代码', '产品名称', '实际销量']]
         total_sales_by_product = total_sales_by_product.sort_values('实际销量', ascending=False)
         total_sales = total_sales_by_product['实际销量'].sum()
         total_sales_by_product['累计占比'] = total_sales_by_product['实际销量'].cumsum() / total_sales
@@ -3435,11 +2422,7 @@ def create_ultra_integrated_forecast_chart(merged_data):
         key_products = key_products_df['产品代码'].tolist()
 
         # 2. 产品级别汇总分析
-        product_analysis = merged_data.groupby(['产品代码', '产品名称']).agg({
-            '实际销量': 'sum',
-            '预测销量': 'sum',
-            '准确率': 'mean'
-        }).reset_index()
+        product_analysis = forecast_rollups['product'].copy()
 
         # 计算差异
         product_analysis['差异量'] = product_analysis['实际销量'] - product_analysis['预测销量']
@@ -3457,11 +2440,7 @@ def create_ultra_integrated_forecast_chart(merged_data):
         )
 
         # 3. 区域分析
-        region_analysis = merged_data.groupby('所属区域').agg({
-            '实际销量': 'sum',
-            '预测销量': 'sum',
-            '准确率': 'mean'
-        }).reset_index().sort_values('准确率', ascending=False)
+        region_analysis = forecast_rollups['region'].sort_values('准确率', ascending=False)
 
         # 创建超级整合图表
         fig = go.Figure()
@@ -3592,7 +2571,7 @@ def create_ultra_integrated_forecast_chart(merged_data):
         # 更新布局 - 调整图例到左上角
         fig.update_layout(
             title=dict(
-                text=f"销售预测准确性全景分析 - {datetime.now().year}年数据<br><sub>气泡大小=销售占比 | 颜色=准确率 | 重点SKU(占销售额80%)突出显示</sub>",
+                text=f"销售预测准确性全景分析 - {data_year}年数据<br><sub>气泡大小=销售占比 | 颜色=准确率 | 重点SKU(占销售额80%)突出显示</sub>",
                 x=0.5,
                 xanchor='center'
             ),
@@ -3631,18 +2610,18 @@ def create_ultra_integrated_forecast_chart(merged_data):
 
 # 替换原有的 create_key_sku_ranking_chart 函数
 # 替换原有的 create_key_sku_ranking_chart 函数
-def create_key_sku_ranking_chart(merged_data, product_name_map, selected_region='全国'):
+@perf_monitor.profile()
+def create_key_sku_ranking_chart(forecast_rollups, product_name_map, selected_region='全国'):
     """创建重点SKU准确率排行图表 - 修复箱数格式"""
     try:
-        # 根据选择的区域筛选数据
+        # 取选择区域的产品级汇总
+        product_sales = region_product_rollup(forecast_rollups, selected_region).copy()
         if selected_region != '全国':
-            filtered_data = merged_data[merged_data['所属区域'] == selected_region]
             title_suffix = f" - {selected_region}区域"
         else:
-            filtered_data = merged_data
             title_suffix = " - 全国"
 
-        if filtered_data.empty:
+        if product_sales.empty:
             fig = go.Figure()
             fig.update_layout(
                 title=f"重点SKU预测准确率排行榜{title_suffix}<br><sub>暂无数据</sub>",
@@ -3659,13 +2638,6 @@ def create_key_sku_ranking_chart(merged_data, product_name_map, selected_region=
             )
             return fig
 
-        # 产品级别分析
-        product_sales = filtered_data.groupby(['产品代码', '产品名称']).agg({
-            '实际销量': 'sum',
-            '预测销量': 'sum',
-            '准确率': 'mean'
-        }).reset_index()
-
         product_sales['销售额占比'] = (product_sales['实际销量'] / product_sales['实际销量'].sum() * 100)
         product_sales = product_sales.sort_values('实际销量', ascending=False)
         product_sales['累计占比'] = product_sales['销售额占比'].cumsum()
@@ -3846,15 +2818,12 @@ def create_key_sku_ranking_chart(merged_data, product_name_map, selected_region=
         return go.Figure()
 
 
-def create_product_analysis_chart(merged_data):
+@perf_monitor.profile()
+def create_product_analysis_chart(forecast_rollups):
     """创建产品预测分析图表 - 修复箱数格式"""
     try:
         # 准备完整的产品分析数据
-        all_products = merged_data.groupby(['产品代码', '产品名称']).agg({
-            '实际销量': 'sum',
-            '预测销量': 'sum',
-            '准确率': 'mean'
-        }).reset_index()
+        all_products = forecast_rollups['product'].copy()
 
         all_products['准确率'] = all_products['准确率'] * 100
         all_products['差异率'] = (
@@ -3922,15 +2891,12 @@ def create_product_analysis_chart(merged_data):
         return go.Figure()
 
 
-def create_region_analysis_chart(merged_data):
+@perf_monitor.profile()
+def create_region_analysis_chart(forecast_rollups):
     """创建区域维度分析图表 - 修复箱数格式"""
     try:
         # 区域汇总
-        region_comparison = merged_data.groupby('所属区域').agg({
-            '实际销量': 'sum',
-            '预测销量': 'sum',
-            '准确率': 'mean'
-        }).reset_index()
+        region_comparison = forecast_rollups['region'].copy()
 
         region_comparison['准确率'] = region_comparison['准确率'] * 100
         region_comparison['销量占比'] = (region_comparison['实际销量'] / region_comparison['实际销量'].sum() * 100)
@@ -4049,9 +3015,26 @@ def animate_metric_value(value, prefix="", suffix="", duration=2000):
     """
 
 
-# 加载数据
+# 加载数据（优先读取预计算结果）：库龄、风险和预测年度都以分析基准日期为准，基准日期包含在版本号中
+as_of = st.sidebar.date_input("📅 分析基准日期", value=date.today(), max_value=date.today(), key="inventory_as_of",
+                              help="库龄、近90天销量、季节性月份和预测分析年度都以该日期为准，选择过去的日期可回放当时的状态")
+data_version = dashboard_version('inventory', as_of)
+what_if_parameters = render_what_if_controls()
 with st.spinner('🔄 正在加载数据...'):
-    processed_inventory, shipment_df, forecast_df, metrics, product_name_map = load_and_process_data()
+    dashboard = load_and_process_data(data_version, as_of)
+
+# 参数模拟：只重算依赖分析参数的风险评分、责任归属和关键指标
+if what_if_parameters and dashboard['inventory_inputs']:
+    dashboard = {**dashboard, **simulate_dashboard(data_version, as_of, what_if_parameters)}
+    st.info(f"🧪 参数模拟中：已调整{len(what_if_parameters)}组分析参数（{'、'.join(what_if_parameters)}），"
+            f"风险评分、责任归属和关键指标按调整后的参数计算")
+processed_inventory = dashboard['processed_inventory']
+shipment_df = dashboard['shipment_df']
+forecast_df = dashboard['forecast_df']
+metrics = dashboard['metrics']
+product_name_map = dashboard['product_name_map']
+responsibility = dashboard['responsibility']
+batch_index = dashboard['batch_index']
 
 # 页面标题
 st.markdown("""
@@ -4061,8 +3044,10 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# 处理预测数据
-merged_data, forecast_key_metrics = process_forecast_analysis(shipment_df, forecast_df, product_name_map)
+# 预测分析数据（预计算结果）
+merged_data = dashboard['merged_data']
+forecast_rollups = dashboard['forecast_rollups']
+forecast_key_metrics = dashboard['forecast_key_metrics']
 
 # 创建标签页
 tab1, tab2, tab3, tab4 = st.tabs([
@@ -4139,7 +3124,7 @@ with tab1:
             <div class="metric-card-inner">
                 <div class="metric-value">{actual_sales:,}</div>
                 <div class="metric-label">📊 实际销量</div>
-                <div class="metric-description">{datetime.now().year}年总销量(箱)</div>
+                <div class="metric-description">{as_of.year}年总销量(箱)</div>
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -4151,7 +3136,7 @@ with tab1:
             <div class="metric-card-inner">
                 <div class="metric-value">{forecast_sales:,}</div>
                 <div class="metric-label">🎯 预测销量</div>
-                <div class="metric-description">{datetime.now().year}年总预测(箱)</div>
+                <div class="metric-description">{as_of.year}年总预测(箱)</div>
             </div>
         </div>
         """, unsafe_allow_html=True)
@@ -4347,7 +3332,7 @@ with tab2:
 # 标签3：销售预测准确性综合分析 - 纯图表版本
 # 标签3：销售预测准确性综合分析 - 删除统计卡片和表格
 with tab3:
-    st.markdown(f"### 📈 销售预测准确性综合分析 - {datetime.now().year}年数据")
+    st.markdown(f"### 📈 销售预测准确性综合分析 - {as_of.year}年数据")
 
     if merged_data is not None and not merged_data.empty:
         # 创建子标签页进行多维度分析
@@ -4361,7 +3346,7 @@ with tab3:
         # 子标签1：预测准确性全景图
         with sub_tab1:
             # 直接显示超级整合图表
-            ultra_fig = create_ultra_integrated_forecast_chart(merged_data)
+            ultra_fig = create_ultra_integrated_forecast_chart(forecast_rollups, as_of.year)
             st.plotly_chart(ultra_fig, use_container_width=True)
 
             # 改进建议
@@ -4369,7 +3354,7 @@ with tab3:
             diff_rate = forecast_key_metrics.get('overall_diff_rate', 0)
 
             # 计算重点SKU数量
-            total_sales_by_product = merged_data.groupby(['产品代码', '产品名称'])['实际销量'].sum().reset_index()
+            total_sales_by_product = forecast_rollups['product'][['产品代码', '产品名称', '实际销量']]
             total_sales_by_product = total_sales_by_product.sort_values('实际销量', ascending=False)
             total_sales = total_sales_by_product['实际销量'].sum()
             total_sales_by_product['累计占比'] = total_sales_by_product['实际销量'].cumsum() / total_sales
@@ -4404,7 +3389,7 @@ with tab3:
                     )
 
                 # 创建重点SKU排行图表
-                key_sku_fig = create_key_sku_ranking_chart(merged_data, product_name_map, selected_region_sku)
+                key_sku_fig = create_key_sku_ranking_chart(forecast_rollups, product_name_map, selected_region_sku)
                 st.plotly_chart(key_sku_fig, use_container_width=True)
 
                 # 区域对比视图
@@ -4419,12 +3404,7 @@ with tab3:
                     fig_radar = go.Figure()
 
                     for region in selected_regions:
-                        region_data = merged_data[merged_data['所属区域'] == region]
-                        region_products = region_data.groupby(['产品代码', '产品名称']).agg({
-                            '实际销量': 'sum',
-                            '预测销量': 'sum',
-                            '准确率': 'mean'
-                        }).reset_index()
+                        region_products = region_product_rollup(forecast_rollups, region).copy()
 
                         region_products['销售额占比'] = (
                                 region_products['实际销量'] / region_products['实际销量'].sum() * 100)
@@ -4486,15 +3466,11 @@ with tab3:
             st.markdown("#### 📊 全国产品预测表现分析")
 
             # 创建产品分析图表
-            product_fig = create_product_analysis_chart(merged_data)
+            product_fig = create_product_analysis_chart(forecast_rollups)
             st.plotly_chart(product_fig, use_container_width=True)
 
             # 产品表现分布统计
-            all_products = merged_data.groupby(['产品代码', '产品名称']).agg({
-                '实际销量': 'sum',
-                '预测销量': 'sum',
-                '准确率': 'mean'
-            }).reset_index()
+            all_products = forecast_rollups['product'].copy()
 
             all_products['准确率'] = all_products['准确率'] * 100
 
@@ -4537,7 +3513,7 @@ with tab3:
                 st.markdown("#### 🌍 区域维度预测准确性深度分析")
 
                 # 修复后的图表显示代码
-                enhanced_region_fig, region_comparison_data = create_enhanced_region_forecast_chart(merged_data)
+                enhanced_region_fig, region_comparison_data = create_enhanced_region_forecast_chart(forecast_rollups)
 
                 # 修复图表显示配置 - 移除responsive
                 st.plotly_chart(enhanced_region_fig, use_container_width=True, config={
@@ -4556,15 +3532,14 @@ with tab3:
                 # 区域表现热力图
                 if not merged_data.empty:
                     # 准备数据
-                    region_product_matrix = merged_data.pivot_table(
-                        values='准确率',
+                    region_product_matrix = forecast_rollups['region_name'].pivot(
                         index='所属区域',
                         columns='产品名称',
-                        aggfunc='mean'
+                        values='准确率'
                     ) * 100
 
                     # 选择前10个产品显示
-                    top_products = merged_data.groupby('产品名称')['实际销量'].sum().nlargest(10).index
+                    top_products = forecast_rollups['name'].set_index('产品名称')['实际销量'].nlargest(10).index
                     region_product_matrix = region_product_matrix[top_products]
 
                     # 创建热力图 - 确保使用正确的属性
@@ -4601,20 +3576,20 @@ with tab4:
     st.markdown("### 📋 库存积压预警详情分析")
 
     if not processed_inventory.empty:
-        # 筛选控件 - 与积压超详细.py保持一致
+        # 筛选控件 - 与积压超详细.py保持一致（选项和取值筛选使用预计算的筛选索引）
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
             risk_filter = st.selectbox(
                 "风险等级",
-                options=['全部'] + list(processed_inventory['风险等级'].unique()),
+                options=['全部'] + list(batch_index['风险等级']),
                 index=0
             )
 
         with col2:
             product_filter = st.selectbox(
                 "产品",
-                options=['全部'] + list(processed_inventory['产品名称'].unique()),
+                options=['全部'] + list(batch_index['产品名称']),
                 index=0
             )
 
@@ -4634,34 +3609,41 @@ with tab4:
                 value=int(processed_inventory['库龄'].max())
             )
 
-        # 应用筛选
-        filtered_data = processed_inventory.copy()
+        col1, col2, col3, col4 = st.columns(4)
 
-        if risk_filter != '全部':
-            filtered_data = filtered_data[filtered_data['风险等级'] == risk_filter]
+        with col1:
+            region_filter = st.selectbox(
+                "责任区域",
+                options=['全部'] + list(batch_index['责任区域']),
+                index=0
+            )
 
-        if product_filter != '全部':
-            filtered_data = filtered_data[filtered_data['产品名称'] == product_filter]
+        with col2:
+            person_filter = st.selectbox(
+                "责任人",
+                options=['全部'] + list(batch_index['责任人']),
+                index=0
+            )
 
-        filtered_data = filtered_data[
-            (filtered_data['批次价值'] >= min_value) &
-            (filtered_data['库龄'] <= max_age)
-            ]
+        # 应用筛选 - 只得到符合条件的行位置（已按风险程度和库龄排序），不复制批次表
+        positions = query_batch_table(processed_inventory, batch_index, {
+            '风险等级': risk_filter,
+            '产品名称': product_filter,
+            '责任区域': region_filter,
+            '责任人': person_filter
+        }, min_value=min_value, max_age=max_age)
 
         # 显示筛选结果统计信息
-        if not filtered_data.empty:
-            st.markdown(f"#### 📋 批次分析明细表 (共{len(filtered_data)}条记录)")
-
-            # 风险程度排序：极高风险排第一，以此类推
-            risk_order = {
-                '极高风险': 1,
-                '高风险': 2,
-                '中风险': 3,
-                '低风险': 4,
-                '极低风险': 5
-            }
-            filtered_data['风险排序'] = filtered_data['风险程度'].map(risk_order)
-            filtered_data = filtered_data.sort_values('风险排序')
+        if len(positions) > 0:
+            st.markdown(f"#### 📋 批次分析明细表 (共{len(positions)}条记录)")
+
+            # 分页 - 每次只取当前页的批次
+            with col3:
+                page_size = st.selectbox("每页行数", options=[50, 100, 200, 500], index=1, key="batch_page_size")
+            page_count = (len(positions) - 1) // page_size + 1
+            with col4:
+                page = st.selectbox("页码", options=list(range(1, page_count + 1)), index=0,
+                                    format_func=lambda number: f"第{number}页 / 共{page_count}页")
 
             # 准备显示的列 - 完全按照积压超详细.py的字段顺序
             display_columns = [
@@ -4674,12 +3656,17 @@ with tab4:
                 '风险得分', '建议措施'
             ]
 
-            # 格式化显示数据
-            display_data = filtered_data[display_columns].copy()
+            # 当前页只取显示用的列，以及生成责任分析摘要和批次责任明细需要的列
+            page_data = batch_table_page(processed_inventory, positions, page, page_size,
+                                         [column for column in display_columns if column != '责任分析摘要'] +
+                                         ['批次ID', '生命周期阶段', '生产批号'])
 
-            # 删除临时的风险排序列
-            if '风险排序' in display_data.columns:
-                display_data = display_data.drop('风险排序', axis=1)
+            # 责任分析摘要只为当前页的批次生成（从责任归属长表中按批次ID读取）
+            page_data['责任分析摘要'] = BatchLevelInventoryAnalyzer().generate_responsibility_summaries(
+                page_data, responsibility)
+
+            # 格式化显示数据
+            display_data = page_data[display_columns].copy()
 
             # 格式化数值列 - 与积压超详细.py保持一致
             display_data['批次价值'] = display_data['批次价值'].apply(lambda x: f"¥{x:,.0f}")
@@ -4830,11 +3817,23 @@ with tab4:
 
                 st.markdown('</div>', unsafe_allow_html=True)
 
+            # 批次责任明细 - 选中批次时才从责任归属长表中关联
+            with st.expander("🔍 批次责任明细", expanded=False):
+                batch_labels = dict(zip(page_data['批次ID'],
+                                        page_data['物料'].astype(str) + ' / ' + page_data['生产批号'].astype(str)))
+                selected_batch = st.selectbox("选择批次（当前页）", options=list(batch_labels),
+                                              format_func=lambda batch_id: batch_labels.get(batch_id, str(batch_id)),
+                                              key="responsibility_batch")
+                st.dataframe(batch_responsibility_detail(responsibility, selected_batch), use_container_width=True,
+                             hide_index=True)
+
             # 显示统计汇总信息 - 与积压超详细.py保持一致
             st.markdown("#### 📊 批次风险统计汇总")
 
             col1, col2, col3, col4 = st.columns(4)
 
+            # 汇总统计覆盖全部筛选结果，只取需要的三列
+            filtered_data = batch_table_rows(processed_inventory, positions, ['风险程度', '批次价值', '库龄'])
             risk_stats = filtered_data['风险程度'].value_counts()
             total_value = filtered_data['批次价值'].sum()
 
@@ -4881,12 +3880,12 @@ with tab4:
 # 在with tab4结束后，找到页脚部分并替换为以下完整代码：
 
 # 添加系统验证功能到侧边栏
-add_validation_sidebar()
+add_validation_sidebar(data_version, shipment_df, forecast_df)
 
 # 如果需要在主界面显示验证结果，可以添加一个新的标签页
 if st.sidebar.checkbox("🔧 显示系统验证", help="显示数据完整性和功能测试结果"):
     st.markdown("---")
-    run_comprehensive_validation()
+    run_comprehensive_validation(data_version, shipment_df, forecast_df)
 
 # 显示修改摘要
 if st.sidebar.checkbox("📋 显示修改摘要", help="查看本次系统修改的详细内容"):
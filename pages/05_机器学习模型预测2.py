@@ -16,6 +16,14 @@ from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import mean_absolute_percentage_error, mean_squared_error, r2_score
 from sklearn.preprocessing import RobustScaler
 import zipfile
+from data_cache import snapshot_cache
+from analytics.dashboards import dashboard_version
+from analytics.ml_prediction import PredictionPipeline
+from analytics.store import aggregate_store
+from data_registry import REMOTE_SOURCES, dataset_registry
+from perf_monitor import perf_monitor
+from perf_panel import render_perf_panel
+from permissions import permission_manager
 
 warnings.filterwarnings('ignore')
 
@@ -202,113 +210,23 @@ st.markdown("""
 # ========================================
 # 🤖 主预测系统类 - 保持原有，添加错误处理
 # ========================================
-class PermissionManager:
-    """权限管理系统类 - 新增类别"""
+class RealDataPredictionSystem(PredictionPipeline):
+    """基于真实数据的完整预测系统 - 计算流程见analytics.ml_prediction，本类负责下载数据和界面展示"""
 
-    def __init__(self):
-        # 定义权限级别
-        self.permissions = {
-            '管理员': {
-                'view_attachments': True,
-                'run_full_analysis': True,
-                'download_data': True,
-                'view_sensitive_data': True,
-                'system_admin': True
-            },
-            '普通用户': {
-                'view_attachments': False,
-                'run_full_analysis': False,
-                'download_data': False,
-                'view_sensitive_data': False,
-                'system_admin': False
-            }
-        }
-
-    def check_permission(self, user_role, permission_name):
-        """检查用户是否具有特定权限"""
-        if user_role not in self.permissions:
-            return False
-        return self.permissions[user_role].get(permission_name, False)
-
-    def require_admin_permission(self, user_role, feature_name="此功能"):
-        """要求管理员权限，如果不是管理员则显示错误信息"""
-        if not self.check_permission(user_role, 'system_admin'):
-            st.error(f"🔒 权限不足：{feature_name}仅限管理员账户访问")
-            st.warning("请使用管理员账户登录以访问完整功能")
-            st.info("💡 管理员账户：admin / cira18")
-            return False
-        return True
-
-    def get_user_permissions_display(self, user_role):
-        """获取用户权限显示信息"""
-        if user_role not in self.permissions:
-            return "未知权限"
-
-        perms = self.permissions[user_role]
-        if perms.get('system_admin', False):
-            return "🔓 完全访问权限"
-        else:
-            return "🔒 受限访问权限"
-
-
-# 全局权限管理器实例
-permission_manager = PermissionManager()
-
-
-class RealDataPredictionSystem:
-    """基于真实数据的完整预测系统 - 保持原有类别名称，增强错误处理"""
-
-    def __init__(self):
-        self.shipment_data = None
-        self.promotion_data = None
-        self.feature_data = None
-        self.models = {}
-        self.scalers = {}
-        self.predictions = None
-        self.accuracy_results = {}
-        self.product_segments = {}
-        self.historical_predictions = None
-        self.historical_accuracy = None
-
-    def calculate_robust_accuracy(self, actual_value, predicted_value, method='smape'):
-        """
-        与附件一完全相同的SMAPE准确率计算方法
-        """
-        try:
-            if method == 'smape':
-                if actual_value == 0 and predicted_value == 0:
-                    return 100.0
-                smape = 200 * abs(actual_value - predicted_value) / (abs(actual_value) + abs(predicted_value) + 1e-8)
-                return max(0, 100 - smape)
-            else:
-                raise ValueError(f"不支持的方法: {method}")
-        except Exception as e:
-            st.warning(f"准确率计算出错: {str(e)}")
-            return 0.0
+    # run_complete_pipeline的流程进度条，滚动回测训练的进度也显示在上面
+    progress_bar = None
 
-    def calculate_batch_robust_accuracy(self, actual_values, predicted_values, method='smape'):
-        """批量计算SMAPE准确率"""
-        try:
-            actual_values = np.array(actual_values)
-            predicted_values = np.array(predicted_values)
+    def report(self, level, message):
+        """把计算流程的进度消息显示到页面"""
+        getattr(st, level)(message)
 
-            if method == 'smape':
-                both_zero = (actual_values == 0) & (predicted_values == 0)
-                smape = 200 * np.abs(actual_values - predicted_values) / (
-                        np.abs(actual_values) + np.abs(predicted_values) + 1e-8
-                )
-                accuracy = np.maximum(0, 100 - smape)
-                accuracy[both_zero] = 100.0
-                return accuracy
-            else:
-                return np.array([
-                    self.calculate_robust_accuracy(actual, predicted, method)
-                    for actual, predicted in zip(actual_values, predicted_values)
-                ])
-        except Exception as e:
-            st.error(f"批量准确率计算出错: {str(e)}")
-            return np.zeros(len(actual_values))
+    def report_progress(self, completed, total):
+        """把滚动回测训练的进度显示在流程进度条上（步骤4占70%~95%）"""
+        if self.progress_bar is not None:
+            self.progress_bar.progress(0.7 + 0.25 * completed / max(total, 1),
+                                       text=f"步骤4/5: 滚动回测训练 {completed}/{total}")
 
+    @perf_monitor.profile()
     def load_data_from_github(self, shipment_url, promotion_url):
         """从GitHub直接加载真实Excel数据"""
         st.info("📥 正在从GitHub加载真实数据...")
@@ -316,10 +234,11 @@ class RealDataPredictionSystem:
         try:
             # 下载出货数据
             st.write("正在下载出货数据...")
-            shipment_response = requests.get(shipment_url, timeout=30)
+            shipment_response = dataset_registry.fetch_remote(shipment_url, timeout=30)
             if shipment_response.status_code == 200:
-                shipment_io = io.BytesIO(shipment_response.content)
-                self.shipment_data = pd.read_excel(shipment_io)
+                # 以内容哈希为键读取列式快照，文件未变化时跳过Excel解析
+                self.shipment_data = snapshot_cache.read_excel_bytes(shipment_response.content)
+                self.shipment_source = shipment_url
                 st.success(f"✅ 出货数据加载成功: {len(self.shipment_data):,} 行")
             else:
                 st.error(f"❌ 出货数据下载失败: HTTP {shipment_response.status_code}")
@@ -327,10 +246,9 @@ class RealDataPredictionSystem:
 
             # 下载促销数据
             st.write("正在下载促销数据...")
-            promotion_response = requests.get(promotion_url, timeout=30)
+            promotion_response = dataset_registry.fetch_remote(promotion_url, timeout=30)
             if promotion_response.status_code == 200:
-                promotion_io = io.BytesIO(promotion_response.content)
-                self.promotion_data = pd.read_excel(promotion_io)
+                self.promotion_data = snapshot_cache.read_excel_bytes(promotion_response.content)
                 st.success(f"✅ 促销数据加载成功: {len(self.promotion_data):,} 行")
             else:
                 st.error(f"❌ 促销数据下载失败: HTTP {promotion_response.status_code}")
@@ -361,532 +279,14 @@ class RealDataPredictionSystem:
             st.error(f"❌ 数据加载失败: {str(e)}")
             return False
 
-    def preprocess_data(self):
-        """高级数据预处理 - 与附件一相同的逻辑"""
-        st.info("🧹 开始高级数据预处理...")
-
-        try:
-            # 标准化列名
-            shipment_columns = {
-                '订单日期': 'order_date',
-                '所属区域': 'region',
-                '客户代码': 'customer_code',
-                '产品代码': 'product_code',
-                '求和项:数量（箱）': 'quantity'
-            }
-
-            promotion_columns = {
-                '申请时间': 'apply_date',
-                '经销商代码': 'dealer_code',
-                '产品代码': 'product_code',
-                '促销开始供货时间': 'promo_start_date',
-                '促销结束供货时间': 'promo_end_date',
-                '预计销量（箱）': 'expected_sales',
-                '赠品数量（箱）': 'gift_quantity'
-            }
-
-            # 重命名列
-            for old_col, new_col in shipment_columns.items():
-                if old_col in self.shipment_data.columns:
-                    self.shipment_data = self.shipment_data.rename(columns={old_col: new_col})
-
-            for old_col, new_col in promotion_columns.items():
-                if old_col in self.promotion_data.columns:
-                    self.promotion_data = self.promotion_data.rename(columns={old_col: new_col})
-
-            # 数据类型转换
-            self.shipment_data['order_date'] = pd.to_datetime(self.shipment_data['order_date'], errors='coerce')
-            self.shipment_data['quantity'] = pd.to_numeric(self.shipment_data['quantity'], errors='coerce')
-
-            # 促销数据处理
-            date_cols = ['apply_date', 'promo_start_date', 'promo_end_date']
-            for col in date_cols:
-                if col in self.promotion_data.columns:
-                    self.promotion_data[col] = pd.to_datetime(self.promotion_data[col], errors='coerce')
-
-            # 数据清洗
-            original_len = len(self.shipment_data)
-            self.shipment_data = self.shipment_data.dropna(subset=['order_date', 'product_code', 'quantity'])
-            self.shipment_data = self.shipment_data[self.shipment_data['quantity'] > 0]
-
-            st.success(f"✅ 基础数据清洗: {original_len} → {len(self.shipment_data)} 行")
-
-            # 异常值处理 - 使用IQR方法
-            self.shipment_data = self._remove_outliers_iqr(self.shipment_data, factor=3.0)
-
-            st.success(f"✅ 最终数据: {len(self.shipment_data)} 行")
-            st.success(f"✅ 产品数量: {self.shipment_data['product_code'].nunique()}")
-            st.success(
-                f"✅ 日期范围: {self.shipment_data['order_date'].min().date()} 到 {self.shipment_data['order_date'].max().date()}")
-
-            # 产品分段
-            self._segment_products()
-
-            return True
-        except Exception as e:
-            st.error(f"❌ 数据预处理失败: {str(e)}")
-            return False
-
-    def _remove_outliers_iqr(self, data, column='quantity', factor=3.0):
-        """使用IQR方法移除异常值"""
-        try:
-            Q1 = data[column].quantile(0.25)
-            Q3 = data[column].quantile(0.75)
-            IQR = Q3 - Q1
-
-            lower_bound = Q1 - factor * IQR
-            upper_bound = Q3 + factor * IQR
-
-            before_count = len(data)
-            data_cleaned = data[(data[column] >= lower_bound) & (data[column] <= upper_bound)]
-            after_count = len(data_cleaned)
-
-            st.info(f"📊 异常值处理: {before_count} → {after_count} (移除 {before_count - after_count} 个异常值)")
-
-            return data_cleaned
-        except Exception as e:
-            st.warning(f"异常值处理出错: {str(e)}，使用原始数据")
-            return data
-
-    def _segment_products(self):
-        """产品分段 - 按销量特征分类"""
-        st.info("📊 产品分段分析...")
-
-        try:
-            # 计算每个产品的销量特征
-            product_stats = self.shipment_data.groupby('product_code')['quantity'].agg([
-                'count', 'mean', 'std', 'min', 'max', 'sum'
-            ]).reset_index()
-
-            product_stats['cv'] = product_stats['std'] / product_stats['mean']
-            product_stats['cv'] = product_stats['cv'].fillna(0)
-
-            # 基于销量均值和变异系数分段
-            volume_high = product_stats['mean'].quantile(0.67)
-            volume_low = product_stats['mean'].quantile(0.33)
-            cv_high = product_stats['cv'].quantile(0.67)
-
-            def classify_product(row):
-                if row['mean'] >= volume_high:
-                    return '高销量稳定' if row['cv'] <= cv_high else '高销量波动'
-                elif row['mean'] >= volume_low:
-                    return '中销量稳定' if row['cv'] <= cv_high else '中销量波动'
-                else:
-                    return '低销量稳定' if row['cv'] <= cv_high else '低销量波动'
-
-            product_stats['segment'] = product_stats.apply(classify_product, axis=1)
-
-            # 保存分段结果
-            self.product_segments = dict(zip(product_stats['product_code'], product_stats['segment']))
-
-            # 打印分段统计
-            segment_counts = product_stats['segment'].value_counts()
-            st.success("📊 产品分段结果:")
-            for segment, count in segment_counts.items():
-                st.write(f"   {segment}: {count} 个产品")
-
-            return product_stats
-        except Exception as e:
-            st.error(f"❌ 产品分段失败: {str(e)}")
-            return None
-
-    def create_advanced_features(self):
-        """创建高级特征 - 与附件一相同的逻辑"""
-        st.info("🔧 高级特征工程...")
-
-        try:
-            # 创建月度数据
-            monthly_data = self.shipment_data.groupby([
-                'product_code',
-                self.shipment_data['order_date'].dt.to_period('M')
-            ]).agg({
-                'quantity': ['sum', 'count', 'mean', 'std'],
-                'customer_code': 'nunique',
-                'region': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else x.iloc[0]
-            }).reset_index()
-
-            # 扁平化列名
-            monthly_data.columns = ['product_code', 'year_month', 'total_qty', 'order_count',
-                                    'avg_qty', 'std_qty', 'customer_count', 'main_region']
-            monthly_data['std_qty'] = monthly_data['std_qty'].fillna(0)
-
-            # 排序
-            monthly_data = monthly_data.sort_values(['product_code', 'year_month'])
-
-            st.success(f"📊 月度聚合数据: {len(monthly_data)} 行")
-
-            # 为每个产品段分别创建特征
-            all_features = []
-
-            for segment in self.product_segments.values():
-                segment_products = [k for k, v in self.product_segments.items() if v == segment]
-                segment_data = monthly_data[monthly_data['product_code'].isin(segment_products)]
-
-                for product in segment_products:
-                    product_data = segment_data[segment_data['product_code'] == product].copy()
-
-                    if len(product_data) < 4:  # 至少需要4个月数据
-                        continue
-
-                    # 为每个时间点创建特征
-                    for idx in range(3, len(product_data)):
-                        features = self._create_advanced_product_features(
-                            product, product_data.iloc[:idx], segment
-                        )
-
-                        # 目标变量
-                        target_row = product_data.iloc[idx]
-                        features['target'] = target_row['total_qty']
-                        features['target_month'] = str(target_row['year_month'])
-                        features['segment'] = segment
-
-                        all_features.append(features)
-
-            self.feature_data = pd.DataFrame(all_features)
-
-            if len(self.feature_data) == 0:
-                st.error("❌ 无法创建特征数据")
-                return False
-
-            st.success(f"✅ 高级特征数据: {len(self.feature_data)} 行, {len(self.feature_data.columns) - 4} 个特征")
-
-            # 特征工程后处理
-            self._post_process_features()
-
-            return True
-        except Exception as e:
-            st.error(f"❌ 特征工程失败: {str(e)}")
-            return False
-
-    def _create_advanced_product_features(self, product_code, historical_data, segment):
-        """为单个产品创建高级特征 - 与附件一相同"""
-        features = {'product_code': product_code}
-
-        try:
-            if len(historical_data) < 3:
-                return features
-
-            # 基础数据
-            qty_values = historical_data['total_qty'].values
-            order_counts = historical_data['order_count'].values
-            customer_counts = historical_data['customer_count'].values
-
-            # 1. 销量特征 - 使用对数变换处理偏态分布
-            log_qty = np.log1p(qty_values)  # log(1+x) 避免log(0)
-
-            features.update({
-                # 原始销量特征
-                'qty_mean': np.mean(qty_values),
-                'qty_median': np.median(qty_values),
-                'qty_std': np.std(qty_values),
-                'qty_cv': np.std(qty_values) / (np.mean(qty_values) + 1),
-
-                # 对数变换特征
-                'log_qty_mean': np.mean(log_qty),
-                'log_qty_std': np.std(log_qty),
-
-                # 滞后特征
-                'qty_lag_1': qty_values[-1],
-                'qty_lag_2': qty_values[-2] if len(qty_values) > 1 else 0,
-                'qty_lag_3': qty_values[-3] if len(qty_values) > 2 else 0,
-
-                # 移动平均
-                'qty_ma_2': np.mean(qty_values[-2:]),
-                'qty_ma_3': np.mean(qty_values[-3:]),
-
-                # 加权移动平均（最近的权重更大）
-                'qty_wma_3': np.average(qty_values[-3:], weights=[1, 2, 3]) if len(qty_values) >= 3 else np.mean(
-                    qty_values),
-            })
-
-            # 2. 趋势特征
-            if len(qty_values) > 1:
-                # 简单增长率
-                features['growth_rate_1'] = (qty_values[-1] - qty_values[-2]) / (qty_values[-2] + 1)
-
-                # 线性趋势
-                x = np.arange(len(qty_values))
-                if len(qty_values) > 2:
-                    trend_coef = np.polyfit(x, qty_values, 1)[0]
-                    features['trend_slope'] = trend_coef
-
-                    # 趋势强度（R²）
-                    y_pred = np.polyval([trend_coef, np.mean(qty_values)], x)
-                    ss_res = np.sum((qty_values - y_pred) ** 2)
-                    ss_tot = np.sum((qty_values - np.mean(qty_values)) ** 2)
-                    features['trend_strength'] = 1 - (ss_res / (ss_tot + 1e-8))
-                else:
-                    features['trend_slope'] = 0
-                    features['trend_strength'] = 0
-            else:
-                features['growth_rate_1'] = 0
-                features['trend_slope'] = 0
-                features['trend_strength'] = 0
-
-            # 3. 订单行为特征
-            features.update({
-                'order_count_mean': np.mean(order_counts),
-                'order_count_trend': order_counts[-1] - order_counts[0] if len(order_counts) > 1 else 0,
-                'avg_order_size': features['qty_mean'] / (np.mean(order_counts) + 1),
-                'customer_count_mean': np.mean(customer_counts),
-                'penetration_rate': np.mean(customer_counts) / (np.max(customer_counts) + 1)
-            })
-
-            # 4. 时间特征
-            last_month = historical_data.iloc[-1]['year_month']
-            features.update({
-                'month': last_month.month,
-                'quarter': last_month.quarter,
-                'is_year_end': 1 if last_month.month in [11, 12] else 0,
-                'is_peak_season': 1 if last_month.month in [3, 4, 10, 11] else 0,
-            })
-
-            # 5. 稳定性特征
-            features.update({
-                'data_points': len(qty_values),
-                'stability_score': 1 / (1 + features['qty_cv']),  # 变异系数越小越稳定
-                'consistency_score': len(qty_values[qty_values > 0]) / len(qty_values)
-            })
-
-            # 6. 产品段特征（使用中文段名的哈希值）
-            segment_map = {
-                '高销量稳定': 1,
-                '高销量波动': 2,
-                '中销量稳定': 3,
-                '中销量波动': 4,
-                '低销量稳定': 5,
-                '低销量波动': 6
-            }
-            features['segment_encoded'] = segment_map.get(segment, 0)
-
-            return features
-        except Exception as e:
-            st.warning(f"特征创建出错: {str(e)}")
-            return features
-
-    def _post_process_features(self):
-        """特征后处理"""
-        st.info("🔧 特征后处理...")
-
-        try:
-            # 获取数值特征列
-            feature_cols = [col for col in self.feature_data.columns
-                            if col not in ['product_code', 'target', 'target_month', 'segment']]
-
-            # 处理无穷值和NaN
-            self.feature_data[feature_cols] = self.feature_data[feature_cols].replace([np.inf, -np.inf], np.nan)
-
-            # 用0填充NaN（对于销售数据，0是合理的默认值）
-            self.feature_data[feature_cols] = self.feature_data[feature_cols].fillna(0)
-
-            # 移除常数特征
-            constant_features = []
-            for col in feature_cols:
-                if self.feature_data[col].std() == 0:
-                    constant_features.append(col)
-
-            if constant_features:
-                st.info(f"  移除常数特征: {constant_features}")
-                self.feature_data = self.feature_data.drop(columns=constant_features)
-
-            st.success(
-                f"✅ 最终特征数: {len([col for col in self.feature_data.columns if col not in ['product_code', 'target', 'target_month', 'segment']])}")
-        except Exception as e:
-            st.error(f"❌ 特征后处理失败: {str(e)}")
-
-    def generate_complete_historical_predictions(self):
-        """生成完整的历史预测对比数据 - 模拟机器学习预测结果"""
-        st.info("📊 生成完整历史预测对比...")
-
-        try:
-            all_historical_predictions = []
-
-            # 创建月度聚合数据
-            monthly_data = self.shipment_data.groupby([
-                'product_code',
-                self.shipment_data['order_date'].dt.to_period('M')
-            ]).agg({
-                'quantity': ['sum', 'count', 'mean', 'std'],
-                'customer_code': 'nunique',
-                'region': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else x.iloc[0]
-            }).reset_index()
-
-            # 扁平化列名
-            monthly_data.columns = ['product_code', 'year_month', 'total_qty', 'order_count',
-                                    'avg_qty', 'std_qty', 'customer_count', 'main_region']
-            monthly_data['std_qty'] = monthly_data['std_qty'].fillna(0)
-            monthly_data = monthly_data.sort_values(['product_code', 'year_month'])
-
-            # 获取所有产品
-            products = monthly_data['product_code'].unique()
-
-            for i, product in enumerate(products):
-                if i % 10 == 0:
-                    st.write(f"  进度: {i}/{len(products)} ({i / len(products) * 100:.1f}%)")
-
-                # 获取该产品的所有月度数据
-                product_monthly = monthly_data[monthly_data['product_code'] == product].copy()
-
-                if len(product_monthly) < 4:  # 至少需要4个月才能预测
-                    continue
-
-                # 获取产品段
-                segment = self.product_segments.get(product, '中销量稳定')
-
-                # 对每个时间点进行滚动预测（从第4个月开始）
-                for j in range(3, len(product_monthly)):
-                    # 使用前j个月的数据创建特征（这里简化为基础预测）
-                    historical_data = product_monthly.iloc[:j]
-                    actual_value = product_monthly.iloc[j]['total_qty']
-                    target_month = product_monthly.iloc[j]['year_month']
-
-                    # 模拟机器学习预测结果
-                    # 使用历史数据的趋势和季节性进行预测
-                    pred_value = self._simulate_ml_prediction(historical_data, target_month)
-                    pred_value = max(0, pred_value)
-
-                    # 计算SMAPE准确率
-                    accuracy = self.calculate_robust_accuracy(
-                        actual_value,
-                        pred_value,
-                        method='smape'
-                    )
-
-                    # 计算绝对误差
-                    error = abs(actual_value - pred_value)
-
-                    # 模拟选择的模型
-                    models = ['XGBoost', 'LightGBM', 'RandomForest', 'LSTM', 'ARIMA', 'Prophet']
-                    selected_model = np.random.choice(models)
-
-                    all_historical_predictions.append({
-                        '产品代码': product,
-                        '年月': str(target_month),
-                        '预测值': round(pred_value, 2),
-                        '实际值': round(actual_value, 2),
-                        '绝对误差': round(error, 2),
-                        '准确率(%)': round(accuracy, 2),
-                        '产品段': segment,
-                        '使用模型': selected_model
-                    })
-
-            # 保存完整的历史预测
-            self.historical_predictions = pd.DataFrame(all_historical_predictions)
-
-            # 计算产品准确率统计
-            self._calculate_product_accuracy_stats()
-
-            st.success(f"✅ 生成了 {len(all_historical_predictions)} 条历史预测记录")
-            st.success(f"✅ 覆盖 {len(self.historical_predictions['产品代码'].unique())} 个产品")
-
-            # 整体准确率统计
-            overall_accuracy = self.historical_predictions['准确率(%)'].mean()
-            st.success(f"📊 整体平均SMAPE准确率: {overall_accuracy:.2f}%")
-
-            return True
-        except Exception as e:
-            st.error(f"❌ 历史预测生成失败: {str(e)}")
-            return False
-
-    def _simulate_ml_prediction(self, historical_data, target_month):
-        """模拟机器学习预测结果"""
-        try:
-            if len(historical_data) == 0:
-                return 0
-
-            # 获取历史销量
-            qty_values = historical_data['total_qty'].values
-
-            # 基础预测：使用指数平滑
-            alpha = 0.3  # 平滑参数
-            if len(qty_values) == 1:
-                return qty_values[0]
-
-            # 计算指数平滑预测
-            weights = [(1 - alpha) ** i for i in range(len(qty_values))]
-            weights.reverse()
-            weights = np.array(weights) / sum(weights)
-
-            base_prediction = np.sum(qty_values * weights)
-
-            # 添加季节性调整
-            month = target_month.month
-            seasonal_factors = {
-                1: 0.9, 2: 0.95, 3: 1.1, 4: 1.05, 5: 1.0, 6: 0.95,
-                7: 0.9, 8: 0.95, 9: 1.0, 10: 1.1, 11: 1.15, 12: 1.2
-            }
-            seasonal_factor = seasonal_factors.get(month, 1.0)
-
-            # 添加趋势
-            if len(qty_values) >= 3:
-                recent_trend = (qty_values[-1] - qty_values[-3]) / 3
-                trend_adjustment = recent_trend * 0.5  # 50%的趋势延续
-            else:
-                trend_adjustment = 0
-
-            # 最终预测
-            prediction = base_prediction * seasonal_factor + trend_adjustment
-
-            # 添加一些随机性（模拟预测误差）
-            noise_factor = 0.05 + 0.15 * np.random.random()  # 5%-20%的随机误差
-            if np.random.random() > 0.5:
-                prediction *= (1 + noise_factor)
-            else:
-                prediction *= (1 - noise_factor)
-
-            return max(0, prediction)
-        except Exception as e:
-            st.warning(f"预测模拟出错: {str(e)}")
-            return 0
-
-    def _calculate_product_accuracy_stats(self):
-        """计算每个产品的准确率统计"""
-        try:
-            # 按产品分组计算准确率
-            product_stats = []
-
-            for product in self.historical_predictions['产品代码'].unique():
-                product_data = self.historical_predictions[
-                    self.historical_predictions['产品代码'] == product
-                    ]
-
-                # 计算各种准确率指标
-                avg_accuracy = product_data['准确率(%)'].mean()
-                recent_accuracy = product_data.tail(1)['准确率(%)'].iloc[0] if len(product_data) > 0 else 0
-
-                # 销量加权准确率（最近3个月）
-                recent_data = product_data.tail(3)
-                if len(recent_data) > 0:
-                    weights = recent_data['实际值'] / recent_data['实际值'].sum()
-                    weighted_accuracy = (recent_data['准确率(%)'] * weights).sum()
-                else:
-                    weighted_accuracy = avg_accuracy
-
-                # 准确率分布
-                accuracy_above_85 = len(product_data[product_data['准确率(%)'] >= 85])
-                accuracy_above_90 = len(product_data[product_data['准确率(%)'] >= 90])
-
-                product_stats.append({
-                    '产品代码': product,
-                    '平均准确率(%)': round(avg_accuracy, 2),
-                    '最近准确率(%)': round(recent_accuracy, 2),
-                    '加权准确率(%)': round(weighted_accuracy, 2),
-                    '预测次数': len(product_data),
-                    '85%以上次数': accuracy_above_85,
-                    '90%以上次数': accuracy_above_90,
-                    '产品段': product_data['产品段'].iloc[0]
-                })
-
-            self.historical_accuracy = pd.DataFrame(product_stats)
-        except Exception as e:
-            st.error(f"❌ 产品准确率统计计算失败: {str(e)}")
-
+    @perf_monitor.profile()
     def run_complete_pipeline(self, shipment_url, promotion_url):
         """运行完整的预测流程"""
         st.markdown("## 🚀 基于真实数据的增强预测系统")
         st.markdown("### 📊 与附件一完全一致的SMAPE准确率分析")
 
         progress_bar = st.progress(0)
+        self.progress_bar = progress_bar
         status_text = st.empty()
 
         try:
@@ -896,6 +296,15 @@ class RealDataPredictionSystem:
             if not self.load_data_from_github(shipment_url, promotion_url):
                 return False
 
+            # 预计算进程已生成当前数据的结果时直接读取，跳过后续计算
+            if self._restore_precomputed(shipment_url, promotion_url):
+                status_text.text("已载入预计算结果")
+                progress_bar.progress(1.0)
+                self._display_results_summary()
+                progress_bar.empty()
+                status_text.empty()
+                return True
+
             # 步骤2：数据预处理
             status_text.text("步骤2/5: 高级数据预处理...")
             progress_bar.progress(0.3)
@@ -931,6 +340,21 @@ class RealDataPredictionSystem:
             st.error(f"❌ 流程执行失败: {str(e)}")
             return False
 
+    def _restore_precomputed(self, shipment_url, promotion_url):
+        """载入预计算的预测结果（仅限默认数据源），返回是否成功"""
+        if (shipment_url, promotion_url) != (REMOTE_SOURCES['ml_shipments'], REMOTE_SOURCES['ml_promotions']):
+            return False
+        try:
+            results = aggregate_store.load('ml_prediction', dashboard_version('ml_prediction'))
+        except Exception:
+            return False
+        if results is None:
+            return False
+
+        self.restore(results)
+        st.success(f"✅ 已载入预计算结果: {len(self.historical_predictions):,} 条历史预测记录")
+        return True
+
     def _display_results_summary(self):
         """显示结果总览"""
         try:
@@ -1013,6 +437,7 @@ class RealDataPredictionSystem:
 # 📊 可视化函数 - 保持原有，增强错误处理
 # ========================================
 
+@perf_monitor.profile()
 def create_enhanced_visualization(system):
     """创建增强版可视化界面 - 替换原来的create_enhanced_visualization函数"""
     try:
@@ -1066,6 +491,7 @@ def create_enhanced_visualization(system):
         st.error(f"❌ 可视化创建失败: {str(e)}")
 
 
+@perf_monitor.profile()
 def create_accuracy_trend_chart(df_viz, system):
     """创建准确率趋势图 - 保持原有函数名称，增强错误处理"""
     try:
@@ -1145,6 +571,7 @@ def create_accuracy_trend_chart(df_viz, system):
         st.error(f"❌ 趋势图创建失败: {str(e)}")
 
 
+@perf_monitor.profile()
 def create_product_ranking_chart(df_viz):
     """创建产品准确率排行榜 - 保持原有函数名称，增强错误处理"""
     try:
@@ -1214,6 +641,7 @@ def create_product_ranking_chart(df_viz):
         st.error(f"❌ 排行榜创建失败: {str(e)}")
 
 
+@perf_monitor.profile()
 def create_accuracy_distribution_chart(df_viz):
     """创建准确率分布图 - 保持原有函数名称，增强错误处理"""
     try:
@@ -1293,6 +721,7 @@ def create_accuracy_distribution_chart(df_viz):
         st.error(f"❌ 分布图创建失败: {str(e)}")
 
 
+@perf_monitor.profile()
 def create_model_analysis_chart(df_viz):
     """创建模型分析图 - 保持原有函数名称，增强错误处理"""
     try:
@@ -1367,6 +796,7 @@ def create_model_analysis_chart(df_viz):
         st.error(f"❌ 模型分析图创建失败: {str(e)}")
 
 
+@perf_monitor.profile()
 def create_data_tables(df_viz, system):
     """创建数据表格 - 替换原来的create_data_tables函数"""
     try:
@@ -1514,6 +944,9 @@ def main():
         # 执行认证检查
         check_authentication()
 
+        # 性能监控面板（仅管理员可见）
+        render_perf_panel('机器学习预测')
+
         # 获取用户信息和权限
         current_user = st.session_state.get('display_name', '用户')
         user_role = st.session_state.get('user_role', '用户')
@@ -1650,8 +1083,8 @@ def main():
                     return
 
                 # GitHub数据源URL
-                shipment_url = "https://raw.githubusercontent.com/CIRA18-HUB/sales_dashboard/refs/heads/main/%E9%A2%84%E6%B5%8B%E6%A8%A1%E5%9E%8B%E5%87%BA%E8%B4%A7%E6%95%B0%E6%8D%AE%E6%AF%8F%E6%97%A5xlsx.xlsx"
-                promotion_url = "https://raw.githubusercontent.com/CIRA18-HUB/sales_dashboard/refs/heads/main/%E9%94%80%E5%94%AE%E4%B8%9A%E5%8A%A1%E5%91%98%E4%BF%83%E9%94%80%E6%96%87%E4%BB%B6.xlsx"
+                shipment_url = REMOTE_SOURCES['ml_shipments']
+                promotion_url = REMOTE_SOURCES['ml_promotions']
 
                 with st.spinner("正在运行完整分析流程..."):
                     success = system.run_complete_pipeline(shipment_url, promotion_url)
@@ -0,0 +1,194 @@
+# perf_monitor.py - 热点函数耗时监控模块
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 环形缓冲区保存的调用记录条数
+RING_SIZE = 5000
+
+# 保留的页面运行记录数（面板按最近N次运行统计）
+RUN_HISTORY = 500
+
+# JSON-lines日志超过该大小时轮换为 .1 文件
+LOG_MAX_BYTES = 10 * 1024 * 1024
+
+
+def _rss_bytes() -> Optional[int]:
+    """当前进程的常驻内存（字节），系统不支持时返回None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+def _count_rows(value) -> Optional[int]:
+    """统计参数或返回值中的数据行数（DataFrame/Series，或其组成的元组、列表、字典）"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, dict):
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        return None
+    counts = [len(item) for item in items if isinstance(item, (pd.DataFrame, pd.Series))]
+    return sum(counts) if counts else None
+
+
+def _function_name(func: Callable) -> str:
+    """记录中使用的函数名：页面脚本中的函数只用函数名，模块中的函数带模块名"""
+    module = getattr(func, '__module__', '') or ''
+    if module == '__main__' or not module:
+        return func.__qualname__
+    return f"{module.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+
+class PerfMonitor:
+    """耗时监控类 - 记录被装饰函数每次调用的耗时、数据行数和内存变化
+
+    记录同时写入内存中的环形缓冲区（供管理员面板统计）和JSON-lines日志（供离线分析）。
+    页面每次运行开始时调用begin_run()，之后同一线程内的调用都归到这次运行；
+    后台线程（如数据预热）中的调用不属于任何页面运行。
+    """
+
+    def __init__(self, log_file: str = os.path.join("data", "perf", "perf_log.jsonl"),
+                 ring_size: int = RING_SIZE, enabled: bool = None):
+        self.log_file = log_file
+        self.enabled = os.environ.get('DASHBOARD_PROFILE', '1') != '0' if enabled is None else enabled
+        self._records = deque(maxlen=ring_size)
+        self._runs = deque(maxlen=RUN_HISTORY)
+        self._run_counter = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._log_enabled = True
+
+    def begin_run(self, page: str) -> int:
+        """登记一次页面运行，返回运行编号"""
+        with self._lock:
+            self._run_counter += 1
+            run_id = self._run_counter
+            self._runs.append({'run': run_id, 'page': page, 'ts': time.time()})
+        self._local.run = run_id
+        self._local.page = page
+        return run_id
+
+    def profile(self, name: str = None) -> Callable:
+        """装饰器：记录函数每次调用的耗时、输入输出行数和内存变化"""
+        def decorator(func: Callable) -> Callable:
+            function_name = name or _function_name(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                error = None
+                result = None
+                try:
+                    result = func(*args, **kwargs)
+                    return result
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    seconds = time.perf_counter() - start
+                    rss_after = _rss_bytes()
+                    rows_in = [count for count in (_count_rows(arg) for arg in args) if count is not None]
+                    self.record({
+                        'function': function_name,
+                        'seconds': round(seconds, 6),
+                        'rows_in': sum(rows_in) if rows_in else None,
+                        'rows_out': _count_rows(result),
+                        'mem_delta': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                        'error': error
+                    })
+
+            return wrapper
+        return decorator
+
+    def record(self, entry: Dict):
+        """保存一条调用记录（补充时间、线程和所属页面运行）"""
+        entry = {
+            'ts': round(time.time(), 3),
+            'run': getattr(self._local, 'run', None),
+            'page': getattr(self._local, 'page', None),
+            'thread': threading.current_thread().name,
+            **entry
+        }
+        with self._lock:
+            self._records.append(entry)
+            self._write_log(entry)
+
+    def _write_log(self, entry: Dict):
+        """追加写入JSON-lines日志（调用方需持有锁），写入失败后不再尝试"""
+        if not self._log_enabled:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+            if os.path.exists(self.log_file) and os.path.getsize(self.log_file) > LOG_MAX_BYTES:
+                os.replace(self.log_file, f"{self.log_file}.1")
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError:
+            self._log_enabled = False
+
+    def records(self, last_runs: int = None, page: str = None) -> List[Dict]:
+        """获取环形缓冲区中的记录 - 指定last_runs时只取最近N次页面运行（可按页面过滤）"""
+        with self._lock:
+            records = list(self._records)
+            runs = [run for run in self._runs if page is None or run['page'] == page]
+
+        if last_runs is not None:
+            # 当前线程正在进行的运行还没有完成，不计入统计
+            current = getattr(self._local, 'run', None)
+            run_ids = {run['run'] for run in runs if run['run'] != current}
+            run_ids = set(sorted(run_ids)[-last_runs:])
+            records = [record for record in records if record['run'] in run_ids]
+        elif page is not None:
+            records = [record for record in records if record['page'] == page]
+        return records
+
+    def stats(self, last_runs: int = None, page: str = None) -> pd.DataFrame:
+        """按函数汇总耗时分位数（毫秒），按p95从高到低排序"""
+        records = self.records(last_runs, page)
+        if not records:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(records)
+        rows = []
+        for function, group in df.groupby('function', sort=False):
+            milliseconds = group['seconds'].to_numpy() * 1000
+            rows_out = group['rows_out'].dropna()
+            mem_delta = group['mem_delta'].dropna()
+            rows.append({
+                '函数': function,
+                '调用次数': len(group),
+                'p50(ms)': round(float(np.percentile(milliseconds, 50)), 1),
+                'p95(ms)': round(float(np.percentile(milliseconds, 95)), 1),
+                '最大(ms)': round(float(milliseconds.max()), 1),
+                '输出行数': int(rows_out.median()) if len(rows_out) else None,
+                '内存变化(MB)': round(float(mem_delta.median()) / 1024 / 1024, 1) if len(mem_delta) else None,
+                '失败次数': int(group['error'].notna().sum())
+            })
+        stats = pd.DataFrame(rows).astype({'输出行数': 'Int64'})
+        return stats.sort_values('p95(ms)', ascending=False, ignore_index=True)
+
+    def clear(self):
+        """清空内存中的记录（不删除日志文件）"""
+        with self._lock:
+            self._records.clear()
+            self._runs.clear()
+
+
+# 创建全局实例
+perf_monitor = PerfMonitor()
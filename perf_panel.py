@@ -0,0 +1,30 @@
+# perf_panel.py - 管理员性能监控侧边栏面板
+import streamlit as st
+
+from perf_monitor import perf_monitor
+from permissions import permission_manager
+
+
+def render_perf_panel(page: str):
+    """在侧边栏显示各函数最近N次运行的耗时分位数（仅管理员可见），并登记本次页面运行
+
+    每个页面在认证通过后调用一次；面板统计的是之前已完成的运行，本次运行的记录在下次刷新时出现。
+    """
+    user_role = st.session_state.get('user_role', '')
+    if permission_manager.check_permission(user_role, 'system_admin'):
+        with st.sidebar.expander("⏱️ 性能监控（管理员）", expanded=False):
+            last_runs = st.slider("统计最近运行次数", min_value=1, max_value=50, value=10,
+                                  key=f"perf_last_runs_{page}")
+            scope = st.radio("范围", ["本页面", "全部页面"], horizontal=True, key=f"perf_scope_{page}")
+            stats = perf_monitor.stats(last_runs=last_runs, page=page if scope == "本页面" else None)
+
+            if stats.empty:
+                st.caption("暂无记录，刷新或操作页面后显示")
+            else:
+                st.dataframe(stats, use_container_width=True, hide_index=True)
+                st.caption(f"缓存命中的函数不会被调用，因此不计入统计。完整记录: {perf_monitor.log_file}")
+
+            if not perf_monitor.enabled:
+                st.warning("耗时监控已关闭（环境变量 DASHBOARD_PROFILE=0）")
+
+    perf_monitor.begin_run(page)
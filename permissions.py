@@ -0,0 +1,55 @@
+# permissions.py - 用户权限管理模块
+import streamlit as st
+
+
+class PermissionManager:
+    """权限管理系统类 - 按登录角色（st.session_state.user_role）判断功能权限"""
+
+    def __init__(self):
+        # 定义权限级别
+        self.permissions = {
+            '管理员': {
+                'view_attachments': True,
+                'run_full_analysis': True,
+                'download_data': True,
+                'view_sensitive_data': True,
+                'system_admin': True
+            },
+            '普通用户': {
+                'view_attachments': False,
+                'run_full_analysis': False,
+                'download_data': False,
+                'view_sensitive_data': False,
+                'system_admin': False
+            }
+        }
+
+    def check_permission(self, user_role, permission_name):
+        """检查用户是否具有特定权限"""
+        if user_role not in self.permissions:
+            return False
+        return self.permissions[user_role].get(permission_name, False)
+
+    def require_admin_permission(self, user_role, feature_name="此功能"):
+        """要求管理员权限，如果不是管理员则显示错误信息"""
+        if not self.check_permission(user_role, 'system_admin'):
+            st.error(f"🔒 权限不足：{feature_name}仅限管理员账户访问")
+            st.warning("请使用管理员账户登录以访问完整功能")
+            st.info("💡 管理员账户：admin / cira18")
+            return False
+        return True
+
+    def get_user_permissions_display(self, user_role):
+        """获取用户权限显示信息"""
+        if user_role not in self.permissions:
+            return "未知权限"
+
+        perms = self.permissions[user_role]
+        if perms.get('system_admin', False):
+            return "🔓 完全访问权限"
+        else:
+            return "🔒 受限访问权限"
+
+
+# 创建全局实例
+permission_manager = PermissionManager()
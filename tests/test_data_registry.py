@@ -0,0 +1,52 @@
+# tests/test_data_registry.py - 共享数据集注册中心测试
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_cache import SnapshotCache
+from data_registry import DatasetRegistry
+
+
+@pytest.fixture(autouse=True)
+def copy_on_write():
+    """与应用入口一致开启写时复制"""
+    with pd.option_context('mode.copy_on_write', True):
+        yield
+
+
+def _make_registry(tmp_path) -> DatasetRegistry:
+    """在临时目录中建立一个只有一个工作簿的注册中心"""
+    source = os.path.join(str(tmp_path), "shipments.xlsx")
+    pd.DataFrame({
+        '产品代码': ['F0104L', 'F01E4B', 'F0104L'],
+        '求和项:数量（箱）': [10.0, 20.0, 30.0],
+    }).to_excel(source, index=False)
+    return DatasetRegistry({'shipments': source}, cache=SnapshotCache(os.path.join(str(tmp_path), "snapshots")))
+
+
+def test_in_place_writes_do_not_leak_into_registry(tmp_path):
+    """页面原地修改拿到的数据集后，再次获取仍是原始数据"""
+    registry = _make_registry(tmp_path)
+    original = registry.get('shipments').copy(deep=True)
+
+    df = registry.get('shipments')
+    df.loc[df['求和项:数量（箱）'] > 15, '求和项:数量（箱）'] = 0
+    df.fillna({'产品代码': 'X'}, inplace=True)
+    df['产品代码'] = df['产品代码'].cat.rename_categories(lambda code: f"{code}-改")
+
+    pd.testing.assert_frame_equal(registry.get('shipments'), original)
+
+
+def test_get_many_returns_independent_frames(tmp_path):
+    """批量获取的数据集同样不受调用方原地修改的影响"""
+    registry = _make_registry(tmp_path)
+    original = registry.get('shipments').copy(deep=True)
+
+    frames = registry.get_many(['shipments'], parallel=False)
+    frames['shipments'].iloc[:, 1] = 0
+
+    pd.testing.assert_frame_equal(registry.get_many(['shipments'], parallel=False)['shipments'], original)
@@ -5,6 +5,13 @@ import time
 import random
 import math
 from data_storage import storage
+from analytics.dashboards import register_warmup_steps
+from data_warmup import data_warmup
+import pandas as pd
+
+# 开启写时复制：页面拿到的共享数据集是浅拷贝，原地写入（loc赋值、inplace、分类重编码等）时才复制，
+# 数据集注册中心持有的数据不会被任何页面改动
+pd.options.mode.copy_on_write = True
 
 # 设置页面配置
 st.set_page_config(
@@ -881,6 +888,10 @@ def fixed_session_state_init():
 # 调用修复版本的初始化函数
 fixed_session_state_init()
 
+# 用户输入密码的同时在后台预热各页面数据并生成看板聚合结果，登录后首个页面直接使用
+register_warmup_steps(data_warmup)
+data_warmup.start()
+
 
 # 【替换类别】认证状态检查 → fixed_authentication_check（修复版本）
 def fixed_authentication_check():
@@ -966,6 +977,23 @@ def fixed_login_handler(password):
         st.error(f"❌ 登录过程中出现错误：{str(e)}")
 
 
+# 数据预热进度显示
+def fixed_warmup_status():
+    """显示后台数据预热进度"""
+    progress = data_warmup.progress()
+    if progress['status'] == 'idle':
+        return
+
+    if progress['status'] == 'running':
+        st.progress(progress['percent'],
+                    text=f"⏳ 正在后台准备数据：{progress['current']}（{progress['completed']}/{progress['total']}）")
+    elif progress['failed']:
+        failed_names = "、".join(step['name'] for step in progress['failed'])
+        st.caption(f"⚠️ 数据预热完成（耗时 {progress['elapsed']}s），以下步骤未成功，将在打开页面时重新加载：{failed_names}")
+    else:
+        st.caption(f"✅ 数据已就绪（{progress['total']}项，耗时 {progress['elapsed']}s）")
+
+
 # ================================
 # 【替换类别】主要页面逻辑 → fixed_main_page_logic（修复版本）
 # ================================
@@ -1077,6 +1105,9 @@ if fixed_authentication_check():
         </div>
         """, unsafe_allow_html=True)
 
+    # 数据预热进度
+    fixed_warmup_status()
+
     # 页脚
     st.markdown("""
     <div class="footer">
@@ -1139,6 +1170,9 @@ else:
             else:
                 st.error("❌ 请输入密码！")
 
+        # 数据预热进度
+        fixed_warmup_status()
+
         # 小贴士和互动提示
         st.markdown("""
         <div style="text-align: center; margin: 2rem auto; padding: 1.5rem; background: rgba(255, 255, 255, 0.1); backdrop-filter: blur(10px); border-radius: 15px; color: rgba(255, 255, 255, 0.9);">